@@ -1,6 +1,5 @@
 import logging
 import os
-import json
 from pathlib import Path
 import asyncio
 
@@ -14,7 +13,15 @@ from core.hooks import HOOKS  # type: ignore
 from core.helpers import is_owner  # type: ignore
 from modules import initiative  # type: ignore
 from core.permissions import check_roll_permission  # type: ignore
-from storage.backup import create_backup  # type: ignore
+from storage.backup import create_snapshot, prune_snapshots, find_snapshot, list_snapshots, read_snapshot, restore_snapshot  # type: ignore
+from storage.repository import get_repository, record_key  # type: ignore
+from storage.index import get_index  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from modules.reference import reference, get_reference_data  # type: ignore
+from modules.simulate import shutdown_pool  # type: ignore
+from core.perf import TrackedCommandTree, start_loop_monitor, get_monitor, instrument_responses, before_prefix_command, after_prefix_command  # type: ignore
+from core.metrics import start_exporters, stop_exporters  # type: ignore
+from storage.files import run_io, shutdown_io_pool, install_loop_io_detector, decode  # type: ignore
 
 # Basic logging
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(name)s: %(message)s')
@@ -35,9 +42,57 @@ class DCCBot(commands.Bot):
     - Sync slash commands
     """
     def __init__(self):
-        super().__init__(command_prefix=BOT_PREFIX, intents=INTENTS)
+        # TrackedCommandTree labels each interaction's task for loop-stall attribution
+        super().__init__(command_prefix=BOT_PREFIX, intents=INTENTS, tree_cls=TrackedCommandTree)
+
+    async def close(self):
+        # Persist any write-behind buffered character saves before disconnecting
+        try:
+            flushed = await get_repository().flush()
+            if flushed:
+                logger.info('Flushed %d buffered character record(s)', flushed)
+        except Exception as e:
+            logger.warning('Character flush on close failed: %s', e)
+        # Write pending initiative snapshots now rather than on the next group commit
+        try:
+            await initiative.ENCOUNTERS.flush()
+        except Exception as e:
+            logger.warning('Encounter snapshot flush on close failed: %s', e)
+        # Let queued hook events finish (bounded) before tearing down
+        await HOOKS.drain()
+        get_monitor().stop()
+        await stop_exporters()
+        # Stop /simulate worker processes (if any were started)
+        shutdown_pool()
+        shutdown_io_pool(wait=False)
+        await super().close()
 
     async def setup_hook(self):
+        # STORAGE_IO_DEBUG=1: log any blocking file access made on the event loop thread
+        install_loop_io_detector()
+        # Event-loop lag sampling and stall attribution (/perf loop)
+        start_loop_monitor()
+        # Per-command latency histograms (/perf top, METRICS_FILE / METRICS_PORT export)
+        instrument_responses()
+        await start_exporters()
+        # Build the character index once (it also answers ownership checks); the repository keeps it current on save/delete
+        try:
+            count = await run_io(get_index().build)
+            logger.info('Character index built (%d records)', count)
+        except Exception as e:
+            logger.warning('Character index build failed: %s', e)
+        # Initiative snapshots: list saved encounters now, parse each on first use in its channel
+        try:
+            saved = await initiative.ENCOUNTERS.restore()
+            if saved:
+                logger.info('Found %d saved initiative encounter(s)', saved)
+        except Exception as e:
+            logger.warning('Encounter snapshot restore failed: %s', e)
+        # Parse the large spell catalog once up front instead of on the first /spell keystroke
+        try:
+            await run_io(get_reference_data().get, 'Spells.json')
+        except Exception as e:
+            logger.warning('Spells.json preload failed: %s', e)
         cogs_dir = Path(__file__).parent / 'cogs'
         if cogs_dir.exists():
             for py in sorted(cogs_dir.glob('*.py')):
@@ -60,16 +115,8 @@ class DCCBot(commands.Bot):
         if not has_spell:
             logger.warning('Spells cog not detected; registering fallback /spell command')
 
-            def _root_dir() -> str:
-                return str(Path(__file__).parent)
-
             def _load_spells() -> dict:
-                try:
-                    path = Path(_root_dir()) / 'Spells.json'
-                    with open(path, 'r', encoding='utf-8') as f:
-                        return json.load(f)
-                except Exception:
-                    return {}
+                return reference('Spells.json', {})
 
             def _bucket_for_class(klass: str) -> str | None:
                 k = (klass or '').strip().lower()
@@ -237,7 +284,6 @@ class DCCBot(commands.Bot):
     async def _nightly_backup_task(self):
         """Simple nightly backup loop. Reads HH:MM UTC from NIGHTLY_BACKUP_UTC (default 03:00)."""
         from datetime import datetime, timedelta, timezone
-        from storage.backup import create_backup
         target_str = os.getenv('NIGHTLY_BACKUP_UTC', '03:00')
         try:
             hh, mm = [int(x) for x in target_str.split(':', 1)]
@@ -250,13 +296,23 @@ class DCCBot(commands.Bot):
                 target = target + timedelta(days=1)
             await asyncio.sleep((target - now).total_seconds())
             try:
-                path, count = create_backup()
-                logger.info('Nightly backup created: %s (%d files)', path, count)
+                await get_repository().flush()
+                info = await run_io(create_snapshot)
+                logger.info('Nightly backup %s: %d files, %d new blobs (%d bytes) in %.0f ms',
+                            info.id, info.files, info.new_blobs, info.bytes_stored, info.elapsed_ms)
+                pruned = await run_io(prune_snapshots)
+                if pruned.removed or pruned.blobs_removed:
+                    logger.info('Backup retention removed %d snapshot(s) and %d blob(s)',
+                                len(pruned.removed), pruned.blobs_removed)
             except Exception as e:
                 logger.exception('Nightly backup failed: %s', e)
 
 bot = DCCBot()
 
+# Label and time prefix commands (app commands are handled by TrackedCommandTree)
+bot.before_invoke(before_prefix_command)
+bot.after_invoke(after_prefix_command)
+
 @bot.check
 async def global_owner_check(ctx: commands.Context):
     try:
@@ -393,18 +449,101 @@ async def sync_slash(interaction: discord.Interaction, scope: str | None = None,
         except Exception:
             pass
 
+async def _run_with_progress(interaction: discord.Interaction, label: str, func, *args):
+    """Run a blocking backup call on the storage pool, editing the deferred reply with its progress."""
+    state = [0, 0]
+
+    def progress(done: int, total: int) -> None:
+        state[0], state[1] = done, total  # called from the worker thread
+
+    task = asyncio.ensure_future(run_io(func, *args, progress=progress))
+    shown = None
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=2.0)
+        if done:
+            return task.result()
+        text = f"⏳ {label}: {state[0]}/{state[1]} files"
+        if text != shown:
+            shown = text
+            try:
+                await interaction.edit_original_response(content=text)
+            except Exception:
+                pass
+
 @bot.tree.command(name="backup", description="Admin: create a characters backup now")
 async def backup_slash(interaction: discord.Interaction):
     app_info = await bot.application_info()
     if interaction.user.id != app_info.owner.id:
         await interaction.response.send_message("Not authorized.", ephemeral=True)
         return
+    # Only changed files are read, but the first snapshot hashes everything
+    await interaction.response.defer(ephemeral=True, thinking=True)
     try:
-        path, count = create_backup()
-        await interaction.response.send_message(f"✅ Backup created: `{path}` ({count} files)", ephemeral=True)
+        await get_repository().flush()  # include write-behind saves
+        info = await _run_with_progress(interaction, "Backing up", create_snapshot)
+        pruned = await run_io(prune_snapshots)
+        text = (f"✅ Backup `{info.id}`: {info.files} files, {info.hashed} changed, "
+                f"{info.new_blobs} new blobs ({info.bytes_stored / 1024:.1f} KB stored) in {info.elapsed_ms:.0f} ms")
+        if pruned.removed:
+            text += f"\nRetention removed {len(pruned.removed)} snapshot(s), freed {pruned.bytes_freed / 1024:.1f} KB."
+        await interaction.edit_original_response(content=text)
     except Exception as e:
         logger.exception("/backup failed: %s", e)
-        await interaction.response.send_message("Backup failed. Check logs.", ephemeral=True)
+        await interaction.followup.send("Backup failed. Check logs.", ephemeral=True)
+
+@bot.tree.command(name="restore", description="Admin: restore characters from a backup snapshot")
+@discord.app_commands.describe(
+    at="Snapshot id or UTC time (YYYY-MM-DD or YYYY-MM-DD HH:MM); the newest snapshot at or before it is used",
+    character="Restore only this character (default: every file in the snapshot)",
+)
+async def restore_slash(interaction: discord.Interaction, at: str | None = None, character: str | None = None):
+    app_info = await bot.application_info()
+    if interaction.user.id != app_info.owner.id:
+        await interaction.response.send_message("Not authorized.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        repo = get_repository()
+        await repo.flush()
+        snapshot_id = await run_io(find_snapshot, at)
+        if snapshot_id is None:
+            await interaction.followup.send(f"No backup found at or before `{at}`.", ephemeral=True)
+            return
+        paths = [f"{record_key(character)}.json"] if character else None
+        blobs, missing = await run_io(read_snapshot, snapshot_id, paths)
+        if not blobs:
+            await interaction.followup.send(f"`{character}` is not in backup `{snapshot_id}`.", ephemeral=True)
+            return
+        # Records go through the repository so caches and indexes follow; anything else is copied back as-is
+        records, other = [], []
+        for rel, raw in blobs.items():
+            try:
+                data = decode(raw) if '/' not in rel else None
+            except (ValueError, OSError, EOFError):
+                data = None
+            if isinstance(data, dict):
+                records.append((rel[:-5], data))
+            else:
+                other.append(rel)
+        if records:
+            await repo.save_batch(records)
+        if other:
+            await _run_with_progress(interaction, "Restoring", restore_snapshot, snapshot_id, other)
+        await interaction.edit_original_response(
+            content=f"✅ Restored {len(records) + len(other)} file(s) from backup `{snapshot_id}`."
+                    + (f" Not in backup: {', '.join(missing)}" if missing else ""))
+    except Exception as e:
+        logger.exception("/restore failed: %s", e)
+        await interaction.followup.send("Restore failed. Check logs.", ephemeral=True)
+
+@restore_slash.autocomplete('at')
+async def _restore_at_autocomplete(interaction: discord.Interaction, current: str):
+    try:
+        ids = await run_io(list_snapshots)
+    except Exception:
+        return []
+    cur = (current or '').strip()
+    return [discord.app_commands.Choice(name=i, value=i) for i in reversed(ids) if i.startswith(cur)][:25]
 
 # --- Slash: spellsync (admin) ---
 @bot.tree.command(name="spellsync", description="Admin: force-sync app commands to this guild")
@@ -437,10 +576,17 @@ async def debugapp_slash(interaction: discord.Interaction):
         names = sorted(getattr(c, 'name', '?') for c in cmds)
         guilds = [g.id for g in bot.guilds]
         gid = os.getenv('GUILD_ID')
+        cache = get_repository().stats()
         text = "\n".join([
             f"Guilds: {guilds}",
             f"GUILD_ID env: {gid!r}",
             f"Commands ({len(names)}): {', '.join(names)}",
+            f"Character cache: {cache['entries']}/{cache['max_entries']} entries, "
+            f"hits {cache['hits']}, misses {cache['misses']} ({cache['hit_rate']:.0%}), writes {cache['writes']}"
+            + (f", dirty {cache['dirty']}, flushes {cache['flushes']}" if cache.get('write_behind') else ""),
+            "Reference data: " + (', '.join(
+                f"{n} {v['bytes'] // 1024}KB {v['load_ms']:.0f}ms x{v['loads']}" for n, v in get_reference_data().stats().items()
+            ) or 'none loaded'),
         ])
         await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
     except Exception as e:
@@ -458,22 +604,19 @@ async def debugapp_slash(interaction: discord.Interaction):
             if not (member and member.guild_permissions.administrator):
                 await interaction.response.send_message("Only administrators can list characters for other users.", ephemeral=True)
                 return
+        # Owned keys come from the in-memory index; only those records are loaded (cached)
+        entries = get_index().owned_by(target.id)
+        repo = get_repository()
         try:
-            files = [f for f in os.listdir(SAVE_FOLDER) if f.endswith('.json')]
+            loaded = await asyncio.gather(*(repo.load(e.key) for e in entries))
         except Exception as e:
-            await interaction.response.send_message(f"Could not read characters folder: {e}", ephemeral=True)
+            await interaction.response.send_message(f"Could not read characters: {e}", ephemeral=True)
             return
         owned: list[tuple[str,int,int,int]] = []
-        for fn in sorted(files):
-            path = os.path.join(SAVE_FOLDER, fn)
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            except Exception:
-                continue
-            if str(data.get('owner')) != str(target.id):
+        for entry, data in zip(entries, loaded):
+            if not isinstance(data, dict):
                 continue
-            name = data.get('name') or os.path.splitext(fn)[0]
+            name = data.get('name') or entry.display
             hp_cur = 0; hp_max = 0
             hp = data.get('hp')
             if isinstance(hp, dict):
@@ -502,27 +645,21 @@ async def debugapp_slash(interaction: discord.Interaction):
 
     @bot.tree.command(name="deletechar", description="Delete a character you own (admins can delete any)")
     async def deletechar_slash(interaction: discord.Interaction, name: str):
-        path = os.path.join(SAVE_FOLDER, f"{name}.json")
-        if not os.path.exists(path):
+        key = record_key(name)
+        owners = get_owner_index()
+        if not owners.exists(key):
             await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
             return
-        # Permission: owner or admin
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            await interaction.response.send_message(f"Could not read file: {e}", ephemeral=True)
-            return
+        # Permission: owner or admin (owner index; the record is never read)
         member = interaction.guild and interaction.guild.get_member(interaction.user.id)
         is_admin = bool(member and member.guild_permissions.administrator)
-        if not is_admin and str(data.get('owner')) != str(interaction.user.id):
+        if not is_admin and owners.owner_of(key) != str(interaction.user.id):
             await interaction.response.send_message("You do not own this character.", ephemeral=True)
             return
-        try:
-            os.remove(path)
+        if await get_repository().delete(key):
             await interaction.response.send_message(f"Deleted '{name}'.", ephemeral=True)
-        except Exception as e:
-            await interaction.response.send_message(f"Delete failed: {e}", ephemeral=True)
+        else:
+            await interaction.response.send_message("Delete failed.", ephemeral=True)
 
     # --- Prefix: spellsync (admin) ---
     @bot.command(name="spellsync", help="Admin: force-sync app commands to this guild")
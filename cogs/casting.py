@@ -1,14 +1,17 @@
 import os
-import json
 from typing import Optional, Tuple, List, Dict, Any
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
 from utils.dice import roll_dice
 from modules.utils import dcc_dice_chain_step  # type: ignore
+from modules.spellbook import hydrate_spell  # type: ignore
+from modules.reference import reference  # type: ignore
+from modules.tables import parse_result_key, result_table  # type: ignore
 
 
 def _parse_result_key(key: str) -> Tuple[Optional[int], Optional[int], str]:
@@ -17,33 +20,13 @@ def _parse_result_key(key: str) -> Tuple[Optional[int], Optional[int], str]:
     Returns (low, high, normalized_label). Use None for open-ended.
     Supports forms: '1', '2-11', '32+', '1 or lower'.
     """
-    s = str(key).strip()
-    lab = s
-    # 'N or lower'
-    import re
-    m = re.match(r"^(-?\d+)\s*or\s*lower$", s, re.I)
-    if m:
-        hi = int(m.group(1))
-        return None, hi, lab
-    # 'N+'
-    m = re.match(r"^(-?\d+)\+$", s)
-    if m:
-        lo = int(m.group(1))
-        return lo, None, lab
-    # 'A-B'
-    m = re.match(r"^(-?\d+)\s*-\s*(-?\d+)$", s)
-    if m:
-        a, b = int(m.group(1)), int(m.group(2))
-        if a <= b:
-            return a, b, lab
-        else:
-            return b, a, lab
-    # exact number
-    try:
-        n = int(s)
-        return n, n, lab
-    except Exception:
-        return None, None, lab
+    return parse_result_key(key)
+
+
+def _result_label(table: dict, total: int) -> Optional[str]:
+    """Label of the first range (sorted by low, high) containing total, via the compiled table."""
+    key = result_table(table).lookup(total)
+    return str(key).strip() if key is not None else None
 
 
 class CastingCog(commands.Cog):
@@ -57,33 +40,14 @@ class CastingCog(commands.Cog):
         return os.path.dirname(os.path.dirname(__file__))
 
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_record(self, name: str, data: dict) -> bool:
-        safe = (data.get('name') or name).strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            return True
-        except Exception:
-            return False
+        return await get_repository().save(data.get('name') or name, data)
 
     def _load_spells_data(self) -> dict:
-        try:
-            path = os.path.join(self._root_dir(), 'Spells.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        # Shared, read-only parse of Spells.json (reloaded when the file changes)
+        return reference('Spells.json', {})
 
     def _caster_info(self, data: dict) -> Tuple[str, int]:
         """Return (caster_type, caster_level).
@@ -170,27 +134,8 @@ class CastingCog(commands.Cog):
                 return (0, 'N/A', 'No table')
             r, _ = roll_dice(die)
             total = int(r) + int(bonus or 0)
-            # choose entry by matching parsed key ranges
-            parsed: List[Tuple[Optional[int], Optional[int], str]] = []
-            for k in tbl.keys():
-                lo, hi, lab = _parse_result_key(k)
-                parsed.append((lo, hi, lab))
-            def _key(x: Tuple[Optional[int], Optional[int], str]):
-                lo, hi, _ = x
-                return (lo if lo is not None else -10**9, hi if hi is not None else 10**9)
-            parsed.sort(key=_key)
-            chosen_key = None
-            for lo, hi, lab in parsed:
-                ok = False
-                if lo is None and hi is not None:
-                    ok = total <= hi
-                elif lo is not None and hi is None:
-                    ok = total >= lo
-                elif lo is not None and hi is not None:
-                    ok = lo <= total <= hi
-                if ok:
-                    chosen_key = lab
-                    break
+            # choose entry by matching parsed key ranges (compiled once per table)
+            chosen_key = _result_label(tbl, total)
             if chosen_key is None:
                 chosen_key = str(total)
             val = tbl.get(chosen_key)
@@ -201,29 +146,7 @@ class CastingCog(commands.Cog):
 
     def _match_result(self, results: dict, total: int) -> Optional[Tuple[str, Any]]:
         """Pick the first matching result entry for a total score."""
-        ranges: List[Tuple[Optional[int], Optional[int], str]] = []
-        for key in results.keys():
-            lo, hi, lab = _parse_result_key(key)
-            ranges.append((lo, hi, lab))
-        # Sort by lower bound (None first), then by upper
-        def _key(x: Tuple[Optional[int], Optional[int], str]):
-            lo, hi, _ = x
-            return (lo if lo is not None else -10**9, hi if hi is not None else 10**9)
-        ranges.sort(key=_key)
-        chosen_label: Optional[str] = None
-        for lo, hi, lab in ranges:
-            ok = False
-            if lo is None and hi is None:
-                continue
-            if lo is None and hi is not None:
-                ok = total <= hi
-            elif lo is not None and hi is None:
-                ok = total >= lo
-            else:
-                ok = (lo is not None and hi is not None and lo <= total <= hi)
-            if ok:
-                chosen_label = lab
-                break
+        chosen_label = _result_label(results, total)
         if chosen_label is None:
             return None
         return chosen_label, results.get(chosen_label)
@@ -263,30 +186,11 @@ class CastingCog(commands.Cog):
             return (0, 'N/A', 'Disapproval table not found.')
         r, _ = roll_dice('1d20')
         # Find the matching entry by key ranges
-        chosen_key = None
         chosen_val: Any = None
-        # Build parsed list
-        parsed: List[Tuple[Optional[int], Optional[int], str]] = []
-        for k in tbl.keys():
-            lo, hi, lab = _parse_result_key(k)
-            parsed.append((lo, hi, lab))
-        def _key(x: Tuple[Optional[int], Optional[int], str]):
-            lo, hi, _ = x
-            return (lo if lo is not None else -10**9, hi if hi is not None else 10**9)
-        parsed.sort(key=_key)
-        for lo, hi, lab in parsed:
-            ok = False
-            if lo is None and hi is not None:
-                ok = r <= hi
-            elif lo is not None and hi is None:
-                ok = r >= lo
-            elif lo is not None and hi is not None:
-                ok = lo <= r <= hi
-            if ok:
-                chosen_key = lab
-                chosen_val = tbl.get(lab)
-                break
-        if chosen_key is None:
+        chosen_key = _result_label(tbl, int(r))
+        if chosen_key is not None:
+            chosen_val = tbl.get(chosen_key)
+        else:
             # fallback: exact string match
             chosen_key = str(r)
             chosen_val = tbl.get(chosen_key, 'No entry found.')
@@ -306,29 +210,11 @@ class CastingCog(commands.Cog):
         r, _ = roll_dice(die)
         total = int(r) + int(bonus or 0)
         # choose entry via parsed ranges
-        chosen_key = None
         chosen_val: Any = None
-        parsed: List[Tuple[Optional[int], Optional[int], str]] = []
-        for k in tbl.keys():
-            lo, hi, lab = _parse_result_key(k)
-            parsed.append((lo, hi, lab))
-        def _key(x: Tuple[Optional[int], Optional[int], str]):
-            lo, hi, _ = x
-            return (lo if lo is not None else -10**9, hi if hi is not None else 10**9)
-        parsed.sort(key=_key)
-        for lo, hi, lab in parsed:
-            ok = False
-            if lo is None and hi is not None:
-                ok = total <= hi
-            elif lo is not None and hi is None:
-                ok = total >= lo
-            elif lo is not None and hi is not None:
-                ok = lo <= total <= hi
-            if ok:
-                chosen_key = lab
-                chosen_val = tbl.get(lab)
-                break
-        if chosen_key is None:
+        chosen_key = _result_label(tbl, total)
+        if chosen_key is not None:
+            chosen_val = tbl.get(chosen_key)
+        else:
             chosen_key = str(total)
             chosen_val = tbl.get(chosen_key, 'No entry found.')
         text = chosen_val if isinstance(chosen_val, str) else (chosen_val.get('text') if isinstance(chosen_val, dict) else str(chosen_val))
@@ -371,6 +257,13 @@ class CastingCog(commands.Cog):
             return
         spells_data = self._load_spells_data()
         found = self._find_spell(spells_data, caster_type, spell)
+        if not found:
+            # Patron spells are not in Spells.json; hydrate them from the known reference
+            ref = self._find_known_spell_entry(data, spell)
+            if isinstance(ref, dict) and str(ref.get('source') or '').lower() == 'patron':
+                blob = hydrate_spell(ref)
+                if isinstance(blob.get('results'), dict) and blob.get('results'):
+                    found = (str(ref.get('name')), f"level {ref.get('level') or '?'}", blob)
         if not found:
             await interaction.response.send_message(f"Spell '{spell}' not found for this caster.", ephemeral=True)
             return
@@ -690,11 +583,10 @@ class CastingCog(commands.Cog):
                     # Ensure unique filename by suffixing if needed
                     base_name = fam_rec.get('name') or 'Familiar'
                     safe_base = base_name
-                    # If a file with same sanitized name exists, append numeric suffix
+                    # If a record with the same key exists (or awaits its flush), append numeric suffix
                     idx = 2
                     while True:
-                        path_try = os.path.join(SAVE_FOLDER, f"{safe_base.strip().lower().replace(' ', '_')}.json")
-                        if not os.path.exists(path_try):
+                        if not await get_repository().exists_async(safe_base):
                             break
                         safe_base = f"{base_name} {idx}"
                         idx += 1
@@ -733,24 +625,8 @@ class CastingCog(commands.Cog):
         cur = (current or '').lower()
         items: List[app_commands.Choice[str]] = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
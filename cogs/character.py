@@ -1,62 +1,45 @@
 import asyncio
-import json
-import os
-import random
 import re
-from pathlib import Path
 from typing import Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
 from models.character import Character  # type: ignore
-from storage.files import async_load_json, async_save_json  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
+from storage.counters import reserve_char_names  # type: ignore
+from modules.spellbook import hydrate_spell  # type: ignore
+from modules.reference import reference  # type: ignore
+from modules.funnel import ABILITIES, Lv0Character, load_funnel_tables, roll_funnel  # type: ignore
 from modules.utils import get_modifier, ABILITY_ORDER, ability_name, ability_emoji, character_trained_weapons, apply_condition, get_luck_current  # type: ignore
-from utils.dice import roll_dice  # type: ignore
+from utils.dice import roll_dice, compile_dice  # type: ignore
 
-CHAR_EXT = '.json'
+# /create count limits: one player's funnel, or a whole table's (admins / manage server)
+FUNNEL_PER_PLAYER = 4
+FUNNEL_PER_TABLE = 40
 
 class CharacterCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     # Helpers
-    def _char_path(self, name: str) -> Path:
-        safe = name.lower().strip().replace(' ', '_')
-        return Path(SAVE_FOLDER) / f"{safe}{CHAR_EXT}"
-
     async def _load_character(self, name: str) -> Optional[Character]:
-        path = self._char_path(name)
-        if not path.exists():
+        data = await get_repository().load(name)
+        if not isinstance(data, dict):
             return None
-        data = await async_load_json(path)
         return Character.from_dict(data)
 
-    async def _save_character(self, char: Character):
-        path = self._char_path(char.name)
-        await async_save_json(path, char.to_dict())
+    async def _save_character(self, char: Character) -> bool:
+        return await get_repository().save(char.name, char.to_dict())
 
     # Raw JSON helpers for editing
     async def _load_record(self, name: str) -> Optional[dict]:
-        path = self._char_path(name)
-        if not path.exists():
-            return None
-        try:
-            with path.open('r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_record(self, name: str, data: dict) -> bool:
-        path = self._char_path(name)
-        try:
-            with path.open('w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4)
-            return True
-        except Exception:
-            return False
+        return await get_repository().save(name, data)
 
     def _build_sheet_embed(self, data: dict) -> discord.Embed:
         # Build display name as: Title Name Occupation (for Clerics by alignment/level), then append level/class
@@ -505,8 +488,10 @@ class CharacterCog(commands.Cog):
         if await self._load_character(name):
             await ctx.reply(f"Character '{name}' already exists.")
             return
-        char = Character(name=name)
-        await self._save_character(char)
+        char = Character(name=name, owner=ctx.author.id)
+        if not await self._save_character(char):
+            await ctx.reply(f"Failed to save character '{name}'.")
+            return
         await ctx.reply(f"Created character '{char.name}'.")
         try:
             await ctx.reply(
@@ -517,11 +502,9 @@ class CharacterCog(commands.Cog):
 
     @commands.command(name='delete')
     async def delete_character(self, ctx: commands.Context, *, name: str):
-        path = self._char_path(name)
-        if not path.exists():
+        if not await get_repository().delete(name):
             await ctx.reply(f"Character '{name}' not found.")
             return
-        path.unlink(missing_ok=True)
         await ctx.reply(f"Deleted character '{name}'.")
 
     @commands.command(name='sheet')
@@ -546,270 +529,95 @@ class CharacterCog(commands.Cog):
         await ctx.reply(embed=embed)
 
     # --- Slash: 0-level generator ---
-    # Keep dice parsing consistent with /roll (supports dlN, k[h|l]N, step +/-d, modifiers)
-    DCC_CHAIN = [3,4,5,6,7,8,10,12,14,16,20,24,30]
-    ROLL_PATTERN = re.compile(
-        r"^\s*([0-9]*)d(\d+)((?:[+-]d\d*)*)(?:(k|dl)([hl]?\d+|[hl]))?(?:([+-])\s*(\d+))?\s*$",
-        re.IGNORECASE,
-    )
-
+    # Dice parsing is shared with /roll via utils.dice (supports dlN, k[h|l]N, step +/-d, explode, modifiers)
     def _parse_expr(self, text: str):
-        m = self.ROLL_PATTERN.match(text)
-        if not m:
-            return None
-        count_raw, sides_raw, steps_cluster, mode_raw, mode_arg_raw, sign, mod_raw = m.groups()
-        count = int(count_raw) if count_raw else 1
-        sides = int(sides_raw)
-        original_sides = sides
-        if steps_cluster and sides in self.DCC_CHAIN:
-            step_tokens = re.findall(r"([+-])d(\d*)", steps_cluster)
-            net_steps = 0
-            for sign_tok, num_tok in step_tokens:
-                magnitude = int(num_tok) if num_tok else 1
-                net_steps += magnitude if sign_tok == '+' else -magnitude
-            if net_steps != 0:
-                idx = self.DCC_CHAIN.index(sides)
-                new_idx = max(0, min(len(self.DCC_CHAIN)-1, idx + net_steps))
-                sides = self.DCC_CHAIN[new_idx]
-        mode = mode_raw.lower() if mode_raw else None
-        mode_arg = mode_arg_raw.lower() if mode_arg_raw else None
-        if mode == 'k' and mode_arg:
-            if mode_arg in ('h','l'):
-                pass
-            elif (mode_arg[0] in ('h','l')) and mode_arg[1:].isdigit():
-                pass
-            elif mode_arg.isdigit():
-                pass
-            else:
-                return None
-        if mode == 'dl' and mode_arg and not mode_arg.isdigit():
-            return None
-        mod = int(mod_raw) if (mod_raw) else None
-        return (count, sides, mode, mode_arg, sign, mod, original_sides)
-
-    def _apply_mode(self, rolls, mode, mode_arg):
-        if not mode:
-            return rolls, []
-        sorted_pairs = sorted(enumerate(rolls), key=lambda x: x[1])
-        indices = [i for i,_ in sorted_pairs]
-        if mode == 'k':
-            if mode_arg and mode_arg.startswith('l'):
-                n = 1
-                tail = mode_arg[1:]
-                if tail.isdigit(): n = int(tail)
-                kept_indices = indices[:n]
-            elif mode_arg and mode_arg.startswith('h'):
-                n = 1
-                tail = mode_arg[1:]
-                if tail.isdigit(): n = int(tail)
-                kept_indices = indices[-n:]
-            elif mode_arg and mode_arg.isdigit():
-                n = int(mode_arg)
-                kept_indices = indices[-n:]
-            else:
-                kept_indices = indices[-1:]
-            kept_set = set(kept_indices)
-            kept = [rolls[i] for i in range(len(rolls)) if i in kept_set]
-            dropped = [rolls[i] for i in range(len(rolls)) if i not in kept_set]
-            return kept, dropped
-        if mode == 'dl':
-            n = int(mode_arg) if (mode_arg and mode_arg.isdigit()) else 1
-            if n >= len(rolls):
-                n = len(rolls) - 1
-            drop_indices = set(indices[:n])
-            kept = [rolls[i] for i in range(len(rolls)) if i not in drop_indices]
-            dropped = [rolls[i] for i in range(len(rolls)) if i in drop_indices]
-            return kept, dropped
-        return rolls, []
+        compiled = compile_dice(text)
+        return compiled.legacy_tuple() if compiled is not None else None
 
     def _roll_total(self, expr: str) -> tuple[int, list[int], list[int]]:
-        parsed = self._parse_expr(expr)
-        if not parsed:
+        compiled = compile_dice(expr)
+        if compiled is None:
             raise ValueError(f"Invalid dice spec: {expr}")
-        count, sides, mode, mode_arg, sign, mod, _orig = parsed
-        base = [random.randint(1, sides) for _ in range(count or 1)]
-        kept, dropped = self._apply_mode(base, mode, mode_arg)
-        subtotal = sum(kept)
-        if sign and mod:
-            subtotal = subtotal + (mod if sign == '+' else -mod)
-        return int(subtotal), kept, dropped
-
-    def _next_char_name(self) -> str:
-        # Pick the next available CharN based on files in SAVE_FOLDER, case-insensitive.
-        Path(SAVE_FOLDER).mkdir(parents=True, exist_ok=True)
-        import re
-        pat = re.compile(r"^char(\d+)\.json$", re.IGNORECASE)
-        used: list[int] = []
-        try:
-            for f in os.listdir(SAVE_FOLDER):
-                m = pat.match(f)
-                if m:
-                    try:
-                        used.append(int(m.group(1)))
-                    except Exception:
-                        continue
-        except Exception:
-            pass
-        nxt = max(used, default=0) + 1
-        # Ensure we don't overwrite if something else is present; bump until filename is free
-        while True:
-            candidate = f"Char{nxt}"
-            safe = candidate.lower().strip().replace(' ', '_')
-            p = Path(SAVE_FOLDER) / f"{safe}{CHAR_EXT}"
-            if not p.exists():
-                return candidate
-            nxt += 1
-
-    @app_commands.command(name="create", description="Create a random level 0 DCC character")
-    @app_commands.describe(expression="Ability roll expression (e.g., 3d6, 4d6dl1, 4d6kh3). Default 3d6.")
-    async def create_lv0(self, interaction: discord.Interaction, expression: Optional[str] = None):
+        res = compiled.roll()
+        return int(res.total), res.kept, res.dropped
+
+    @app_commands.command(name="create", description="Create random level 0 DCC characters (a funnel: up to 4 per player)")
+    @app_commands.describe(
+        expression="Ability roll expression (e.g., 3d6, 4d6dl1, 4d6kh3). Default 3d6.",
+        count=f"How many characters to create (default 1; up to {FUNNEL_PER_PLAYER}, or {FUNNEL_PER_TABLE} for admins rolling a table's funnel)",
+    )
+    async def create_lv0(self, interaction: discord.Interaction, expression: Optional[str] = None, count: int = 1):
         spec = (expression or "3d6").strip()
-        # Validate once
-        try:
-            _ = self._parse_expr(spec)
-            if _ is None:
-                raise ValueError()
-        except Exception:
+        # Validate and compile once for the whole batch
+        dice = compile_dice(spec)
+        if dice is None:
             await interaction.response.send_message(f"Invalid expression '{spec}'. Try '3d6' or '4d6dl1'.", ephemeral=True)
             return
-        # Roll abilities
-        abilities_order = ["STR","AGI","STA","INT","PER","LCK"]
-        stats = {}
-        mods = {}
-        rolls_detail = {}
-        for ab in abilities_order:
-            total, kept, dropped = self._roll_total(spec)
-            stats[ab] = int(total)
-            mods[ab] = int(get_modifier(total))
-            rolls_detail[ab] = {"kept": kept, "dropped": dropped}
-        max_luck_mod = mods["LCK"]
-        # Occupation
-        occ_path = Path(__file__).resolve().parents[1] / 'occupations_full.json'
-        try:
-            with occ_path.open('r', encoding='utf-8') as f:
-                occ_data = json.load(f)
-        except Exception:
-            occ_data = {}
-        # Choose 1..100 key
-        if occ_data:
-            k = str(random.randint(1, 100))
-            occ = occ_data.get(k, {})
-            occupation = occ.get('name', 'Gongfarmer')
-            weapon = occ.get('weapon', 'club (1d4)')
-            goods = occ.get('goods', 'sack of night soil')
+        member = interaction.guild and interaction.guild.get_member(interaction.user.id)
+        is_admin = bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
+        limit = FUNNEL_PER_TABLE if is_admin else FUNNEL_PER_PLAYER
+        count = int(count or 1)
+        if count < 1 or count > limit:
+            await interaction.response.send_message(f"Count must be between 1 and {limit}.", ephemeral=True)
+            return
+        # Names come from an atomic counter: concurrent /create calls never share one
+        names = await reserve_char_names(count)
+        chars = roll_funnel(names, interaction.user.id, dice, load_funnel_tables())
+        if count == 1:
+            ok = await self._save_record(names[0], chars[0].record)
         else:
-            occupation = 'Gongfarmer'
-            weapon = 'trowel (1d4)'
-            goods = 'sack of night soil'
-        weapon_name = weapon.split(' (')[0] if isinstance(weapon, str) else str(weapon)
-        inventory = [weapon_name, goods]
-        # Augur
-        aug_path = Path(__file__).resolve().parents[1] / 'auguries.json'
-        try:
-            with aug_path.open('r', encoding='utf-8') as f:
-                aug = json.load(f)
-        except Exception:
-            aug = {}
-        if aug:
-            sign, effect = random.choice(list(aug.items()))
+            ok = await get_repository().save_batch([(c.record['name'], c.record) for c in chars])
+        if not ok:
+            await interaction.response.send_message("Failed to save character." if count == 1 else "Failed to save some characters.", ephemeral=True)
+            return
+        if count == 1:
+            await self._send_created(interaction, chars[0], spec)
         else:
-            sign, effect = ("Harsh winter", "All attack rolls")
-        # Base derived
-        hp = max(1, random.randint(1, 4) + mods["STA"])  # d4 + STA
-        ac = 10 + mods["AGI"]
-        reflex = mods["AGI"]
-        fort = mods["STA"]
-        will = mods["PER"]
-        initiative = mods["AGI"]
-        speed = 30
-        attack = 0
-        # Apply augur via luck mod
-        if effect in ["Harsh winter", "Pack hunter"]:
-            attack += max_luck_mod
-        if effect == "Lucky sign":
-            reflex += max_luck_mod; fort += max_luck_mod; will += max_luck_mod
-        if effect == "Struck by lightning":
-            reflex += max_luck_mod
-        if effect == "Lived through famine":
-            fort += max_luck_mod
-        if effect == "Resisted temptation":
-            will += max_luck_mod
-        if effect == "Charmed house":
-            ac += max_luck_mod
-        if effect == "Speed of the cobra":
-            initiative += max_luck_mod
-        if effect == "Bountiful harvest":
-            hp += max_luck_mod
-        if effect == "Wild child":
-            speed += max_luck_mod * 5
-        extra_langs = max_luck_mod if effect == "Birdsong" else 0
-        # Languages
-        languages = []
-        if extra_langs > 0:
-            known_languages = ["Elvish","Dwarvish","Halfling","Draconic","Infernal","Celestial","Goblin","Orc"]
-            pick = max(0, min(len(known_languages), extra_langs))
-            if pick:
-                languages = random.sample(known_languages, pick)
-        # Coin
-        cp = sum(random.randint(1, 12) for _ in range(5))
-        # Name and alignment
-        character_name = self._next_char_name()
-        alignment = random.choice(["Lawful","Neutral","Chaotic"])
-        # Build full record (raw JSON to preserve wider schema)
-        record = {
-            "name": character_name,
-            "alignment": alignment,
-            "class": "Lv0",
-            "level": 0,
-            "owner": interaction.user.id,
-            "occupation": occupation,
-            "weapon": weapon_name,
-            "inventory": inventory,
-            "birth_augur": {"sign": sign, "effect": effect},
-            "max_luck_mod": max_luck_mod,
-            "hp": {"current": hp, "max": hp},
-            "luck": {"current": int(stats.get("LCK", 0)), "max": int(stats.get("LCK", 0))},
-            "ac": ac,
-            "saves": {"reflex": reflex, "fortitude": fort, "will": will},
-            "initiative": initiative,
-            "speed": speed,
-            "attack": attack,
-            "attack_bonus": 0,
-            "cp": cp,
-            "abilities": {k: {"max": int(stats[k]), "current": int(stats[k]), "mod": int(mods[k])} for k in stats},
-            "armor": "unarmored",
-            "shield": False,
-            "fumble_die": "d4",
-            "action_die": "1d20",
-            "crit_die": "1d4",
-            "crit_table": "I",
-            "languages": languages
-        }
-        # Save
-        out_path = self._char_path(character_name)
+            lines = []
+            for c in chars:
+                r = c.record
+                sv = r['saves']
+                lines.append(
+                    f"**{r['name']}** — {r['occupation']} ({c.weapon}), {r['alignment']}\n"
+                    f"HP {r['hp']['max']} AC {r['ac']} Init {r['initiative']:+} R/F/W {sv['reflex']:+}/{sv['fortitude']:+}/{sv['will']:+} | "
+                    + " ".join(f"{ab} {c.stats[ab]}" for ab in ABILITIES)
+                    + f" | {r['birth_augur']['sign']}"
+                )
+            text = "\n".join(lines)
+            if len(text) > 4000:
+                text = text[:3997] + '…'
+            emb = discord.Embed(title=f"✅ {count} new level 0 characters ({spec})", description=text, color=0x2ECC71)
+            emb.set_footer(text=f"{names[0]} – {names[-1]}" if len(names) > 1 else names[0])
+            await interaction.response.send_message(embed=emb, ephemeral=True)
+        # Friendly reminder after creation
         try:
-            with out_path.open('w', encoding='utf-8') as f:
-                json.dump(record, f, indent=4)
-        except Exception as e:
-            await interaction.response.send_message(f"Failed to save character: {e}", ephemeral=True)
-            return
+            await interaction.followup.send(
+                "You've created a character! Remember to set alignment with `/set alignment` and then set languages with `/lang`",
+                ephemeral=True,
+            )
+        except Exception:
+            pass
+
+    async def _send_created(self, interaction: discord.Interaction, char: Lv0Character, spec: str) -> None:
         # Reply with summary and rolls
+        record, stats, mods = char.record, char.stats, char.mods
+        sv = record['saves']
         lines = [
-            f"✅ New level 0 character: **{character_name}**",
-            f"Occupation: {occupation}  |  Weapon: {weapon}",
-            f"HP {hp}, AC {ac}, Init {initiative:+}, Saves R/F/W {reflex:+}/{fort:+}/{will:+}",
-            f"Augur: {sign} — {effect}",
-            f"CP: {cp}",
+            f"✅ New level 0 character: **{record['name']}**",
+            f"Occupation: {record['occupation']}  |  Weapon: {char.weapon}",
+            f"HP {record['hp']['max']}, AC {record['ac']}, Init {record['initiative']:+}, Saves R/F/W {sv['reflex']:+}/{sv['fortitude']:+}/{sv['will']:+}",
+            f"Augur: {record['birth_augur']['sign']} — {record['birth_augur']['effect']}",
+            f"CP: {record['cp']}",
             "Stats: " + ", ".join(
                 f"{ability_emoji(ab)} {ability_name(ab)} {stats[ab]} ({mods[ab]:+})".strip()
-                for ab in abilities_order
+                for ab in ABILITIES
             ),
         ]
         # compact roll details per stat
         detail = " | ".join(
-            f"{ab}:{'+'.join(map(str, rolls_detail[ab]['kept']))}"
-            + (f" dl({'+'.join(map(str, rolls_detail[ab]['dropped']))})" if rolls_detail[ab]['dropped'] else "")
-            for ab in abilities_order
+            f"{ab}:{'+'.join(map(str, char.rolls[ab]['kept']))}"
+            + (f" dl({'+'.join(map(str, char.rolls[ab]['dropped']))})" if char.rolls[ab]['dropped'] else "")
+            for ab in ABILITIES
         )
         lines.append("Rolls (" + spec + "): " + detail)
         await interaction.response.send_message("\n".join(lines), ephemeral=True)
@@ -818,28 +626,14 @@ class CharacterCog(commands.Cog):
             await interaction.followup.send(embed=sheet_embed, ephemeral=True)
         except Exception:
             pass
-        # Friendly reminder after creation
-        try:
-            await interaction.followup.send(
-                "You've created a character! Remember to set alignment with `/set alignment` and then set languages with `/lang`",
-                ephemeral=True,
-            )
-        except Exception:
-            pass
 
     @app_commands.command(name="sheet", description="Show a character sheet")
     @app_commands.describe(name="Character name, e.g., Char1")
     async def sheet_slash(self, interaction: discord.Interaction, name: str):
-        path = self._char_path(name)
-        if not path.exists():
+        data = await self._load_record(name)
+        if not data:
             await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
             return
-        try:
-            with path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            await interaction.response.send_message(f"Failed to load character: {e}", ephemeral=True)
-            return
         emb = self._build_sheet_embed(data)
         await interaction.response.send_message(embed=emb, ephemeral=True)
 
@@ -1023,15 +817,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5].replace('_',' ')
-                if cur and cur not in nm.lower():
-                    continue
-                items.append(app_commands.Choice(name=nm, value=nm))
-                if len(items) >= 25:
-                    break
+            for e in get_index().search(cur):
+                items.append(app_commands.Choice(name=e.label, value=e.label))
         except Exception:
             pass
         return items
@@ -1041,35 +828,16 @@ class CharacterCog(commands.Cog):
         cur = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fn)
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        rec = json.load(f)
-                except Exception:
-                    continue
-                if not bool(rec.get('dead')):
-                    continue
-                nm = rec.get('name') or fn[:-5].replace('_',' ')
-                if cur and cur not in str(nm).lower():
-                    continue
-                items.append(app_commands.Choice(name=str(nm), value=str(nm)))
-                if len(items) >= 25:
-                    break
+            for nm in get_index().names(cur, where=lambda e: e.dead):
+                items.append(app_commands.Choice(name=nm, value=nm))
         except Exception:
             pass
         return items
 
     # ---- Spellbook helpers ----
     def _load_spells_data(self) -> dict:
-        try:
-            path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Spells.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        # Shared, read-only parse of Spells.json (reloaded when the file changes)
+        return reference('Spells.json', {})
 
     def _bucket_for_char(self, data: dict) -> Optional[str]:
         cls = str(data.get('class') or '').strip().lower()
@@ -1079,27 +847,6 @@ class CharacterCog(commands.Cog):
             return 'Cleric Spells'
         return None
 
-    def _lookup_spell_blob(self, spells: dict, name: str, bucket_hint: Optional[str], level_hint: Optional[int]) -> tuple[Optional[str], Optional[int], dict]:
-        nm_key = str(name or '').strip()
-        if bucket_hint and level_hint in (1,2,3,4,5):
-            blob = (
-                spells.get('spells', {})
-                      .get(bucket_hint, {})
-                      .get(f'level {int(level_hint)}', {})
-                      .get(nm_key, {})
-                or {}
-            )
-            if blob:
-                return bucket_hint, int(level_hint), blob
-        # Fall back: search both buckets & levels for exact name
-        for b in ['Wizard Spells','Cleric Spells']:
-            for lv in (1,2,3,4,5):
-                pool = spells.get('spells', {}).get(b, {}).get(f'level {lv}', {}) or {}
-                for nm in pool.keys():
-                    if str(nm).strip().lower() == nm_key.lower():
-                        return b, lv, pool.get(nm, {})
-        return None, None, {}
-
     def _build_spellbook_embed(self, data: dict, spells: dict, level: int, *, mode: str = 'summary') -> discord.Embed:
         name = str(data.get('name') or 'Unnamed').strip() or 'Unnamed'
         cls = str(data.get('class') or '').strip()
@@ -1129,7 +876,8 @@ class CharacterCog(commands.Cog):
             nm = str(entry.get('name') or '').strip()
             if not nm:
                 continue
-            _, _, blob = self._lookup_spell_blob(spells, nm, bucket_hint, level)
+            # Records store references; pull the static payload from the catalog (or the patron file)
+            blob = hydrate_spell(entry, bucket_hint, level)
             rng = _txt(blob.get('range')); dur = _txt(blob.get('duration'))
             cast = _txt(blob.get('casting_time')); save = _txt(blob.get('save'))
             flags = []
@@ -1644,24 +1392,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -1780,23 +1512,8 @@ class CharacterCog(commands.Cog):
         q = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fn)
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        rec = json.load(f)
-                except Exception:
-                    continue
-                if not rec.get('dead'):
-                    continue
-                disp = str(rec.get('name') or fn[:-5].replace('_',' '))
-                if q and q not in disp.lower():
-                    continue
+            for disp in get_index().names(q, where=lambda e: e.dead):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -1922,24 +1639,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -2190,24 +1891,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -2298,24 +1983,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -2422,24 +2091,8 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -2810,19 +2463,12 @@ class CharacterCog(commands.Cog):
         if msg:
             await interaction.response.send_message(f"🚫 {msg}", ephemeral=True)
             return
-        # Save under new filename
+        # Save under the new filename and remove the old one (indexes follow in the same step)
         new_data = dict(data)
         new_data['name'] = new
-        saved = await self._save_record(new, new_data)
-        if not saved:
+        if not await get_repository().rename(current, new, new_data):
             await interaction.response.send_message("Failed to save new record.", ephemeral=True)
             return
-        # Remove old file
-        old_path = self._char_path(current)
-        try:
-            old_path.unlink(missing_ok=True)
-        except Exception:
-            pass
         # If this is a familiar, update master's notes reference
         try:
             if str(data.get('class','')).strip().lower() == 'familiar':
@@ -3056,9 +2702,7 @@ class CharacterCog(commands.Cog):
         cur = (current or '').lower()
         choices: list[app_commands.Choice[str]] = []
         try:
-            path = Path(__file__).resolve().parents[1] / 'occupations_full.json'
-            with path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = reference('occupations_full.json', {})
             # File structure is likely a list of objects with 'name'
             pool = []
             if isinstance(data, list):
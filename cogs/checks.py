@@ -1,16 +1,16 @@
-import os, json
 import discord
 from discord import app_commands
 from discord.ext import commands
 from typing import Optional
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
 from utils.dice import roll_dice
 from modules.utils import (
-    get_modifier, get_luck_current, consume_luck_and_save, get_max_luck_mod,
-    ability_name, ability_emoji, ABILITY_INFO, ABILITY_ORDER, get_global_roll_penalty
+    get_modifier, get_luck_current, burn_luck, get_max_luck_mod,
+    ability_name, ability_emoji, ABILITY_INFO, ABILITY_ORDER, get_global_roll_penalty, save_modifier
 )  # type: ignore
-from modules.initiative import INITIATIVE_ORDER, CURRENT_TURN_INDEX  # type: ignore
+from modules.initiative import encounter_for  # type: ignore
 
 # Build choices from centralized ability mapping to avoid drift
 ABILITY_CHOICES = [
@@ -34,15 +34,7 @@ class ChecksCog(commands.Cog):
 
     # --- helpers ---
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.lower().strip().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     def _ability_mod(self, data: dict, key: str) -> int:
         try:
@@ -80,20 +72,7 @@ class ChecksCog(commands.Cog):
             return
 
         # Prefer stored total; fallback to ability + class_saves
-        try:
-            stored = int((data.get('saves') or {}).get(save_key, 0) or 0)
-        except Exception:
-            stored = 0
-        if stored == 0:
-            abil_map = {"reflex": "AGI", "fortitude": "STA", "will": "PER"}
-            amod = self._ability_mod(data, abil_map.get(save_key, "STA"))
-            try:
-                class_bonus = int((data.get('class_saves') or {}).get(save_key, 0) or 0)
-            except Exception:
-                class_bonus = 0
-            save_mod = amod + class_bonus
-        else:
-            save_mod = stored
+        save_mod = save_modifier(data, save_key)
 
         b = int(bonus or 0)
         roll, _ = roll_dice('1d20')
@@ -131,15 +110,11 @@ class ChecksCog(commands.Cog):
                         await interaction.response.send_message("Halfling donor not found or not a Halfling.", ephemeral=True)
                         return
                     donor_name = str(donor.get('name') or burn_from_halfling)
-                    safe = donor_name.lower().strip().replace(' ', '_')
-                    path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                    burn_used = int(consume_luck_and_save(donor, requested, filename=path) or 0)
+                    burn_used = int(await burn_luck(donor_name, requested, mirror=donor) or 0)
                     total += burn_used  # 1:1 from halfling donor
                     donor_used = True
                 else:
-                    safe = name.lower().strip().replace(' ', '_')
-                    path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                    burn_used = int(consume_luck_and_save(data, requested, filename=path) or 0)
+                    burn_used = int(await burn_luck(name, requested, mirror=data) or 0)
                     cls = str(data.get('class') or '').strip().lower()
                     if burn_used > 0 and cls == 'thief':
                         luck_die = str(data.get('luck_die') or 'd3')
@@ -271,14 +246,10 @@ class ChecksCog(commands.Cog):
                     await interaction.response.send_message("Halfling donor not found or not a Halfling.", ephemeral=True)
                     return
                 donor_label = str(donor.get('name') or burn_from_halfling)
-                safe = donor_label.strip().lower().replace(' ', '_')
-                path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                burn_used = int(consume_luck_and_save(donor, requested, filename=path) or 0)
+                burn_used = int(await burn_luck(donor_label, requested, mirror=donor) or 0)
                 total += burn_used  # 1:1 bonus
             else:
-                safe = name.lower().strip().replace(' ', '_')
-                path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                burn_used = int(consume_luck_and_save(data, requested, filename=path) or 0)
+                burn_used = int(await burn_luck(name, requested, mirror=data) or 0)
                 # Thief Luck & Wits: roll luck die per point burned
                 cls = str(data.get('class') or '').strip().lower()
                 if burn_used > 0 and cls == 'thief':
@@ -354,12 +325,10 @@ class ChecksCog(commands.Cog):
         who = (name or '').strip()
         data = await self._load_record(who) if who else None
         # If no name provided, attempt to use current initiative combatant label
-        if not data and not who and CURRENT_TURN_INDEX is not None:
-            try:
-                cur = INITIATIVE_ORDER[CURRENT_TURN_INDEX]
-                who = cur.get('name') or cur.get('display') or 'Creature'
-            except Exception:
-                who = 'Creature'
+        enc = await encounter_for(interaction, create=False)
+        cur = enc.current() if (not data and not who and enc is not None) else None
+        if cur is not None:
+            who = cur.get('name') or cur.get('display') or 'Creature'
         resolved_will = None
         label = who or 'Creature'
         if data:
@@ -416,7 +385,8 @@ class ChecksCog(commands.Cog):
         items: list[app_commands.Choice[str]] = []
         # First, suggest current initiative combatants
         try:
-            for e in INITIATIVE_ORDER:
+            enc = await encounter_for(interaction, create=False)
+            for e in (enc.entries if enc is not None else ()):
                 disp = str(e.get('name') or e.get('display') or '').strip()
                 if not disp:
                     continue
@@ -429,15 +399,8 @@ class ChecksCog(commands.Cog):
             pass
         # Fill remaining with saved character names
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                disp = fn[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
-                items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
+            for e in get_index().search(cur, limit=25 - len(items)):
+                items.append(app_commands.Choice(name=e.label, value=e.label))
         except Exception:
             pass
         return items
@@ -494,14 +457,8 @@ class ChecksCog(commands.Cog):
         try:
             items = []
             cur = (current or "").lower()
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.lower().endswith('.json'):
-                    continue
-                name = os.path.splitext(fn)[0]
-                if cur in name.lower():
-                    items.append(app_commands.Choice(name=name, value=name))
-                if len(items) >= 25:
-                    break
+            for e in get_index().search(cur):
+                items.append(app_commands.Choice(name=e.key, value=e.key))
             return items
         except Exception:
             return []
@@ -533,9 +490,7 @@ class ChecksCog(commands.Cog):
             await interaction.response.send_message("Only Halflings can share Luck.", ephemeral=True)
             return
         # Burn luck from the halfling and grant +points to ally
-        safe = str(data.get('name') or halfling).strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        used = int(consume_luck_and_save(data, int(points), filename=path) or 0)
+        used = int(await burn_luck(str(data.get('name') or halfling), int(points), mirror=data) or 0)
         if used <= 0:
             await interaction.response.send_message("No Luck burned (insufficient Luck).", ephemeral=True)
             return
@@ -623,9 +578,7 @@ class ChecksCog(commands.Cog):
         burn_used = 0
         luck_bonus = 0
         if isinstance(burn, int) and burn and burn > 0:
-            safe = name.lower().strip().replace(' ', '_')
-            path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-            burn_used = int(consume_luck_and_save(data, int(burn), filename=path) or 0)
+            burn_used = int(await burn_luck(name, int(burn), mirror=data) or 0)
             if burn_used > 0 and cls == 'thief':
                 ld = str(data.get('luck_die') or 'd3')
                 luck_bonus, _ = roll_dice(f"{burn_used}{ld}")
@@ -685,24 +638,9 @@ class ChecksCog(commands.Cog):
         q = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5].replace('_',' ')
-                if q and q not in nm.lower():
-                    continue
-                # Filter to halfling or thief for relevance
-                try:
-                    with open(os.path.join(SAVE_FOLDER, fn), 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    cls = str(data.get('class','')).strip().lower()
-                    if cls not in {'halfling','thief'}:
-                        continue
-                except Exception:
-                    continue
-                items.append(app_commands.Choice(name=nm, value=nm))
-                if len(items) >= 25:
-                    break
+            # Filter to halfling or thief for relevance
+            for e in get_index().search(q, where=lambda e: e.char_class.lower() in {'halfling', 'thief'}):
+                items.append(app_commands.Choice(name=e.label, value=e.label))
         except Exception:
             pass
         return items
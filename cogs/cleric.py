@@ -1,12 +1,14 @@
 import os
-import json
 from typing import Optional, Tuple, Any, List
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
+from modules.reference import reference  # type: ignore
+from modules.tables import result_table  # type: ignore
 from utils.dice import roll_dice
 
 
@@ -21,25 +23,10 @@ class ClericCog(commands.Cog):
         return os.path.dirname(os.path.dirname(__file__))
 
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_record(self, name: str, data: dict) -> bool:
-        safe = (data.get('name') or name).strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            return True
-        except Exception:
-            return False
+        return await get_repository().save(data.get('name') or name, data)
 
     def _ability_mod(self, data: dict, key: str) -> int:
         try:
@@ -54,31 +41,8 @@ class ClericCog(commands.Cog):
             return 0
 
     def _load_spells_data(self) -> dict:
-        try:
-            path = os.path.join(self._root_dir(), 'Spells.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
-
-    def _parse_result_key(self, key: str) -> Tuple[Optional[int], Optional[int]]:
-        s = str(key).strip()
-        import re
-        m = re.match(r"^(-?\d+)\s*or\s*lower$", s, re.I)
-        if m:
-            return None, int(m.group(1))
-        m = re.match(r"^(-?\d+)\+$", s)
-        if m:
-            return int(m.group(1)), None
-        m = re.match(r"^(-?\d+)\s*-\s*(-?\d+)$", s)
-        if m:
-            a, b = int(m.group(1)), int(m.group(2))
-            return (a, b) if a <= b else (b, a)
-        try:
-            n = int(s)
-            return n, n
-        except Exception:
-            return None, None
+        # Shared, read-only parse of Spells.json (reloaded when the file changes)
+        return reference('Spells.json', {})
 
     def _roll_disapproval(self, spells_data: dict) -> Tuple[int, str, str]:
         table_def = spells_data.get('Disapproval Table', {})
@@ -88,31 +52,12 @@ class ClericCog(commands.Cog):
         if not isinstance(tbl, dict) or not tbl:
             return (0, 'N/A', 'Disapproval table not found.')
         r, rolls = roll_dice('1d20')
-        # match roll to first appropriate key
-        chosen_key = None
+        # match roll to first appropriate key (ranges sorted by lower bound; compiled once per table)
         chosen_val: Any = None
-        # sort by lower bound
-        parsed: List[Tuple[Optional[int], Optional[int], str]] = []
-        for k in tbl.keys():
-            lo, hi = self._parse_result_key(k)
-            parsed.append((lo, hi, k))
-        def _key(x):
-            lo, hi, _ = x
-            return (lo if lo is not None else -10**9, hi if hi is not None else 10**9)
-        parsed.sort(key=_key)
-        for lo, hi, lab in parsed:
-            ok = False
-            if lo is None and hi is not None:
-                ok = r <= hi
-            elif lo is not None and hi is None:
-                ok = r >= lo
-            elif lo is not None and hi is not None:
-                ok = lo <= r <= hi
-            if ok:
-                chosen_key = lab
-                chosen_val = tbl.get(lab)
-                break
-        if chosen_key is None:
+        chosen_key = result_table(tbl).lookup(int(r))
+        if chosen_key is not None:
+            chosen_val = tbl.get(chosen_key)
+        else:
             chosen_key = str(r)
             chosen_val = tbl.get(chosen_key, 'No entry found.')
         text = chosen_val if isinstance(chosen_val, str) else (chosen_val.get('text') if isinstance(chosen_val, dict) else str(chosen_val))
@@ -379,24 +324,8 @@ class ClericCog(commands.Cog):
         cur = (current or '').lower()
         items: List[app_commands.Choice[str]] = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
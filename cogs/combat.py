@@ -1,24 +1,27 @@
-import os, json, re
+import re
 import discord
 from discord import app_commands
 from discord.ext import commands
 from typing import Optional, List
 
-from modules import initiative as init_mod  # type: ignore
+from modules.initiative import encounter_for  # type: ignore
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository, CommitError  # type: ignore
+from storage.index import get_index  # type: ignore
 from utils.dice import roll_dice
 from modules.utils import (
-    get_modifier, dcc_dice_chain_step, is_weapon_trained,
-    get_luck_current, consume_luck_and_save, get_max_luck_mod,
+    get_modifier,
+    get_luck_current, burn_luck,
     ability_name, ability_emoji,
-    double_damage_dice_expr,
     select_crit_table_for_character, load_crit_tables, lookup_crit_entry,
     load_fumble_tables, lookup_fumble_entry,
     resolve_crit_damage_bonus, roll_multiple_dice_expr,
     tags_to_conditions, apply_condition, load_conditions,
     apply_targeted_effects_from_entry, apply_targeted_effects_from_tags,
-    get_global_roll_penalty,
+    crit_threat_min,
+)  # type: ignore
+from modules.attack import (
+    AttackError, SPELL_DIE_CLASSES, action_dice, action_die_index, plan_attack, resolve_weapons,
 )  # type: ignore
 from modules.data_constants import WEAPON_TABLE  # type: ignore
 
@@ -30,25 +33,61 @@ class CombatCog(commands.Cog):
 
     # Helpers
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.lower().strip().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
+
+    async def _save_record(self, name: str, data: dict) -> bool:
+        return await get_repository().save(name, data)
 
-    def _save_record(self, name: str, data: dict) -> bool:
-        safe = name.lower().strip().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
+    def _apply_damage(self, rec: dict, dmg: int, dying: bool = True) -> tuple[int, int]:
+        """Subtract dmg from rec's current HP in place; returns (before, after).
+
+        With `dying`, dropping to 0 kills a level-0 character outright or starts the
+        dying countdown (level turns); healing above 0 clears it.
+        """
+        hp = rec.get('hp', {}) if isinstance(rec.get('hp'), dict) else {}
+        cur = int(hp.get('current', 0) or 0)
+        mx = hp.get('max')
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            return True
+            mx = int(mx) if mx is not None else None
         except Exception:
-            return False
+            mx = None
+        new_cur = max(0, int(cur) - int(dmg))
+        hp['current'] = int(new_cur)
+        if mx is not None:
+            hp['max'] = int(mx)
+        rec['hp'] = hp
+        if dying:
+            try:
+                if cur > 0 and new_cur == 0:
+                    lvl = int(rec.get('level', 0) or 0)
+                    if lvl <= 0:
+                        rec['dead'] = True
+                        try:
+                            import time as _t
+                            rec['time_of_death'] = int(_t.time())
+                        except Exception:
+                            pass
+                    else:
+                        rec.setdefault('dying', {})['remaining_turns'] = int(lvl)
+                if new_cur > 0 and rec.get('dying'):
+                    rec.pop('dying', None)
+            except Exception:
+                pass
+        return cur, new_cur
+
+    async def _damage_record(self, name: str, dmg: int, mirror: Optional[dict] = None, dying: bool = True) -> Optional[tuple[int, int]]:
+        """Apply damage to the saved record under its lock (no lost concurrent updates).
+
+        `mirror` (the caller's loaded copy) is refreshed with the committed record.
+        """
+        async with get_repository().transaction(name) as (rec,):
+            if rec is None:
+                return None
+            before, after = self._apply_damage(rec, dmg, dying=dying)
+        if mirror is not None:
+            mirror.clear()
+            mirror.update(rec)
+        return before, after
 
     def _ability_mod(self, data: dict, key: str) -> int:
         try:
@@ -88,34 +127,6 @@ class CombatCog(commands.Cog):
         data['inventory'] = out
         return out
 
-    def _has_in_inventory(self, data: dict, name: str) -> bool:
-        inv = self._normalize_inventory(data)
-        key = (name or '').strip().lower()
-        for it in inv:
-            try:
-                if it.get('name','').strip().lower() == key and int(it.get('qty',0)) > 0:
-                    return True
-            except Exception:
-                continue
-        return False
-
-    def _attack_bonus(self, data: dict) -> int:
-        try:
-            return int(data.get('attack_bonus', data.get('attack', 0)) or 0)
-        except Exception:
-            return 0
-
-    def _parse_action_dice(self, data: dict) -> List[str]:
-        """Return list of action dice from character data.
-        Prefers 'action_dice' (e.g., '1d20+1d14'); falls back to 'action_die'.
-        """
-        try:
-            raw = str(data.get('action_dice') or data.get('action_die') or '1d20')
-        except Exception:
-            raw = '1d20'
-        parts = [p.strip() for p in raw.replace(',', '+').split('+') if p.strip()]
-        return parts if parts else ['1d20']
-
     # Command: /attack
     @app_commands.command(name="attack", description="Make an attack with your equipped weapon or an initiative monster's saved attack (optional Halfling donor Luck)")
     @app_commands.describe(
@@ -149,14 +160,8 @@ class CombatCog(commands.Cog):
         # If no character, attempt initiative monster path
         if not data:
             # Find attacker in initiative by exact name or abbr (case-insensitive)
-            attacker = None
-            q = (name or '').strip().lower()
-            for e in init_mod.INITIATIVE_ORDER:
-                nm = str(e.get('name','')).strip().lower()
-                ab = str(e.get('abbr','')).strip().lower()
-                if q and (q == nm or q == ab):
-                    attacker = e
-                    break
+            enc = await encounter_for(interaction)
+            attacker = enc.find(name)
             if not attacker:
                 await interaction.response.send_message(f"Attacker '{name}' not found (no character or initiative entry).", ephemeral=True)
                 return
@@ -234,13 +239,7 @@ class CombatCog(commands.Cog):
                         defender_ac = None
                 else:
                     # Try initiative entry
-                    tq = tname.lower()
-                    tgt = None
-                    for e in init_mod.INITIATIVE_ORDER:
-                        nm = str(e.get('name','')).strip().lower()
-                        ab = str(e.get('abbr','')).strip().lower()
-                        if tq and (tq == nm or tq == ab):
-                            tgt = e; break
+                    tgt = enc.find(tname)
                     if tgt is not None:
                         defender_label = tgt.get('name')
                         try:
@@ -272,32 +271,18 @@ class CombatCog(commands.Cog):
             if is_hit is True:
                 if defender_data is not None:
                     try:
-                        hp = defender_data.get('hp', {}) if isinstance(defender_data.get('hp'), dict) else {}
-                        cur = int(hp.get('current', 0) or 0)
-                        mx = hp.get('max')
-                        try:
-                            mx = int(mx) if mx is not None else None
-                        except Exception:
-                            mx = None
-                        new_cur = max(0, int(cur) - int(dmg_final))
-                        hp['current'] = int(new_cur)
-                        if mx is not None:
-                            hp['max'] = int(mx)
-                        defender_data['hp'] = hp
-                        self._save_record(defender_label or target, defender_data)
-                        apply_text = f"\n• {defender_label or target} HP: {cur} → {new_cur}"
+                        res = await self._damage_record(defender_label or target, dmg_final, mirror=defender_data, dying=False)
+                        if res is not None:
+                            cur, new_cur = res
+                            apply_text = f"\n• {defender_label or target} HP: {cur} → {new_cur}"
+                    except CommitError:
+                        apply_text = f"\n• ⚠️ {defender_label or target} HP change could not be saved"
                     except Exception:
                         apply_text = ""
                 else:
                     # If defender is an initiative entry with hp, reduce it in memory
                     if target:
-                        tq = target.strip().lower()
-                        tgt = None
-                        for e in init_mod.INITIATIVE_ORDER:
-                            nm = str(e.get('name','')).strip().lower()
-                            ab = str(e.get('abbr','')).strip().lower()
-                            if tq and (tq == nm or tq == ab):
-                                tgt = e; break
+                        tgt = enc.find(target)
                         if tgt is not None and tgt.get('hp') is not None:
                             try:
                                 cur = int(tgt.get('hp') or 0)
@@ -305,6 +290,7 @@ class CombatCog(commands.Cog):
                                 cur = 0
                             new_cur = max(0, cur - int(dmg_final))
                             tgt['hp'] = int(new_cur)
+                            enc.touch()
                             apply_text = f"\n• {tgt.get('name')} HP: {cur} → {new_cur}"
 
             # Basic nat 20/1 banner
@@ -349,26 +335,19 @@ class CombatCog(commands.Cog):
                     defender_ac = int(defender_data.get('ac', 10) or 10)
             except Exception:
                 defender_data = None
-        # Determine weapon
-        wkey = (weapon or data.get('weapon') or '').strip().lower()
-        off_wkey = str(offhand or '').strip().lower()
-        if not wkey:
-            await interaction.response.send_message("No weapon equipped. Use /equip weapon or specify a weapon.", ephemeral=True)
+        # Determine and validate the weapon(s)
+        try:
+            weapons = resolve_weapons(data, weapon, offhand)
+        except AttackError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
             return
-        is_shield_bash = False
-        # Special case: Dwarf shield bash via /attack shield
-        if wkey == 'shield':
-            cls_low = str(data.get('class','') or '').strip().lower()
-            if cls_low != 'dwarf':
-                await interaction.response.send_message("❌ Shield bash is a Dwarf feature.", ephemeral=True)
-                return
-            # Must have shield equipped (not just in inventory)
-            if not bool(data.get('shield')):
-                await interaction.response.send_message("❌ You must have a shield equipped to use shield bash.", ephemeral=True)
-                return
+        wkey, off_wkey = weapons.key, weapons.off_key
+        use_twf = bool(off_wkey)
+        if weapons.shield_bash:
             # Enforce: only one shield bash per round (levels 5+ still only one bash per round)
             try:
-                current_round = int(getattr(init_mod, 'COMBAT_ROUND', 0) or 0)
+                enc = await encounter_for(interaction, create=False)
+                current_round = int(enc.round or 0) if enc is not None else 0
             except Exception:
                 current_round = 0
             if current_round > 0:
@@ -387,91 +366,12 @@ class CombatCog(commands.Cog):
                     await self._save_record(name, data)
                 except Exception:
                     pass
-            # Define a virtual weapon entry for shield bash
-            wentry = {
-                'damage': '1d3',
-                'type': 'melee',
-                'tags': ['melee','shield','bash']
-            }
-            weapon_meta = None
-            is_shield_bash = True
-        else:
-            wentry = WEAPON_TABLE.get(wkey)
-            weapon_meta = None
-            if not isinstance(wentry, dict):
-                # Try to resolve as a custom weapon from inventory metadata
-                inv = self._normalize_inventory(data)
-                for it in inv:
-                    if str(it.get('name','')).strip().lower() == wkey and isinstance(it.get('weapon'), dict):
-                        weapon_meta = dict(it['weapon'])
-                        tags = list(weapon_meta.get('tags') or [])
-                        wentry = {
-                            'damage': weapon_meta.get('damage') or '1d2',
-                            'type': 'missile' if any(str(t).lower() == 'missile' for t in tags) else 'melee',
-                            'tags': tags,
-                        }
-                        break
-                if not isinstance(wentry, dict):
-                    await interaction.response.send_message(f"❌ Unknown weapon '{wkey}'.", ephemeral=True)
-                    return
-        # Inventory check
-        if not self._has_in_inventory(data, wkey):
-            await interaction.response.send_message(f"❌ You don't have a {wkey} in your inventory.", ephemeral=True)
-            return
-        # Two-weapon fighting off-hand resolution and validation (if provided)
-        off_wentry = None
-        off_weapon_meta = None
-        use_twf = False
-        if off_wkey:
-            # No shield when dual-wielding
-            if bool(data.get('shield')):
-                await interaction.response.send_message("❌ Two-weapon fighting can't be used while a shield is equipped. Toggle your shield off first.", ephemeral=True)
-                return
-            # Primary must be melee and one-handed
-            if str(wentry.get('type','melee')).lower() != 'melee':
-                await interaction.response.send_message("❌ Two-weapon fighting is melee-only; your primary weapon isn't melee.", ephemeral=True)
-                return
-            if bool(wentry.get('two_handed')):
-                await interaction.response.send_message("❌ Primary weapon must be one-handed for two-weapon fighting.", ephemeral=True)
-                return
-            # Resolve off-hand key
-            off_wentry = WEAPON_TABLE.get(off_wkey)
-            if not isinstance(off_wentry, dict):
-                inv = self._normalize_inventory(data)
-                for it in inv:
-                    if str(it.get('name','')).strip().lower() == off_wkey and isinstance(it.get('weapon'), dict):
-                        off_weapon_meta = dict(it['weapon'])
-                        otags = list(off_weapon_meta.get('tags') or [])
-                        off_wentry = {
-                            'damage': off_weapon_meta.get('damage') or '1d2',
-                            'type': 'missile' if any(str(t).lower() == 'missile' for t in otags) else 'melee',
-                            'tags': otags,
-                        }
-                        break
-                if not isinstance(off_wentry, dict):
-                    await interaction.response.send_message(f"❌ Unknown off-hand weapon '{off_wkey}'.", ephemeral=True)
-                    return
-            # Off-hand inventory check
-            if not self._has_in_inventory(data, off_wkey):
-                await interaction.response.send_message(f"❌ You don't have an off-hand {off_wkey} in your inventory.", ephemeral=True)
-                return
-            # Off-hand must be melee and one-handed
-            if str(off_wentry.get('type','melee')).lower() != 'melee':
-                await interaction.response.send_message("❌ Two-weapon fighting is melee-only.", ephemeral=True)
-                return
-            if bool(off_wentry.get('two_handed')):
-                await interaction.response.send_message("❌ Off-hand weapon must be one-handed.", ephemeral=True)
-                return
-            use_twf = True
         # Attack die (select from action dice; downgrade if untrained with this weapon per DCC dice chain)
-        act_parts = self._parse_action_dice(data)
+        act_parts = action_dice(data)
         # Interactive prompt if multiple dice and none specified (non-wizard classes only)
         used_prompt = False
-        try:
-            cls_low = str(data.get('class','') or '').strip().lower()
-        except Exception:
-            cls_low = ''
-        if (not die) and len(act_parts) >= 2 and cls_low not in {'wizard','mage','elf'}:
+        cls_low = str(data.get('class','') or '').strip().lower()
+        if (not die) and len(act_parts) >= 2 and cls_low not in SPELL_DIE_CLASSES:
             try:
                 class DiePicker(discord.ui.View):
                     def __init__(self, dice: list[str]):
@@ -493,255 +393,48 @@ class CombatCog(commands.Cog):
                     die = view.choice
             except Exception:
                 pass
-        idx = 0
-        if die:
-            s = str(die).strip().lower()
-            try:
-                for i, d in enumerate(act_parts):
-                    if str(d).strip().lower() == s:
-                        idx = i
-                        break
-            except Exception:
-                pass
-            if idx == 0 and s in {"second","2","#2","die2"} and len(act_parts) >= 2:
-                idx = 1
-            elif idx == 0 and s in {"third","3","#3","die3"} and len(act_parts) >= 3:
-                idx = 2
-        # Wizards' additional action dice are for spell checks only; force first die for attacks
-        try:
-            cls_low = str(data.get('class','') or '').strip().lower()
-        except Exception:
-            cls_low = ''
-        if idx > 0 and cls_low in {'wizard','mage','elf'}:
-            idx = 0
-        base_action_die = act_parts[idx] if act_parts else '1d20'
-        trained = is_weapon_trained(data, wkey)
-        is_lv0 = str(data.get('class','')).strip().lower() in ('lv0','0','level 0','level-0')
-        # Lv0 are untrained but do not suffer the untrained die penalty
-        action_die = base_action_die if (trained or is_lv0) else dcc_dice_chain_step(base_action_die, -1)
-        # Dwarf shield bash uses a d14 instead of a d20 for the attack roll
-        if is_shield_bash:
-            action_die = '1d14'
-        # Two-weapon fighting per-hand dice (based on Agility mod) — adjust primary and compute off-hand die
-        off_action_die = None
-        if use_twf:
-            agi_mod = self._ability_mod(data, 'AGI')
-            # Halfling special: treat AGI as at least 16 (modifier floor to +2) when dual-wielding,
-            # then use the normal two-weapon table. This allows high AGI to reach 0/0 penalties.
-            try:
-                if str((data.get('class') or '')).strip().lower() == 'halfling':
-                    agi_mod = max(int(agi_mod), 2)
-            except Exception:
-                pass
-            if agi_mod <= -3:
-                prim_step, off_step = (-1, -4)
-            elif agi_mod == -2:
-                prim_step, off_step = (-1, -3)
-            elif agi_mod == -1:
-                prim_step, off_step = (-1, -2)
-            elif agi_mod == 0:
-                prim_step, off_step = (0, -2)
-            elif agi_mod == 1:
-                prim_step, off_step = (0, -1)
-            else:
-                prim_step, off_step = (0, 0)
-            # Apply training penalties separately per hand
-            off_trained = is_weapon_trained(data, off_wkey)
-            prim_die_base = base_action_die if (trained or is_lv0) else dcc_dice_chain_step(base_action_die, -1)
-            off_die_base  = base_action_die if (off_trained or is_lv0) else dcc_dice_chain_step(base_action_die, -1)
-            action_die = dcc_dice_chain_step(prim_die_base, prim_step)
-            off_action_die = dcc_dice_chain_step(off_die_base, off_step)
+        # Sheet-derived modifiers (shared with /simulate attack)
+        plan = plan_attack(data, weapons, act_parts[action_die_index(act_parts, die, cls_low)],
+                           range=(range.value if isinstance(range, app_commands.Choice) else None),
+                           deed=bool(deed), backstab=bool(backstab), mounted=bool(mounted),
+                           target_mounted=bool(target_mounted), charge=bool(charge))
+        action_die = plan.action_die
+        trained, is_lv0 = plan.trained, plan.is_lv0
+        wtype, is_throwing = plan.wtype, plan.is_throwing
+        atk_bonus, weapon_atk_bonus = plan.attack_bonus, plan.weapon_bonus
+        used_ability, no_ability_mod, abil_mod = plan.ability, plan.no_ability_mod, plan.ability_mod
+        aug, mlm = plan.augur, plan.max_luck_mod
+        backstab_flagged = plan.backstab
         atk_roll, atk_rolls = roll_dice(action_die, force=force)
-        # Mods
-        atk_bonus = self._attack_bonus(data)
-        weapon_atk_bonus = 0
-        ability_override = None
-        no_ability_mod = False
-        if weapon_meta:
-            try:
-                weapon_atk_bonus = int(weapon_meta.get('attack_bonus') or 0)
-            except Exception:
-                weapon_atk_bonus = 0
-            try:
-                ca_raw = str(weapon_meta.get('ability') or '').strip().upper()
-                if ca_raw in ('STR','AGI','STA','INT','PER','LCK'):
-                    ability_override = ca_raw
-                elif ca_raw in ('', 'NONE'):
-                    no_ability_mod = True
-            except Exception:
-                pass
-        wtype = str(wentry.get('type','melee'))
-        tags = wentry.get('tags', []) or []
-        tags_l = [t.lower() for t in tags]
-        is_thrown_capable = 'thrown' in tags_l
-        # Treat as a thrown/missile attack only if the weapon is ranged, or if it's thrown-capable and the user explicitly provided a range option.
-        is_missile = (wtype != 'melee')
-        is_throwing = bool(is_missile or (is_thrown_capable and (range is not None)))
-        # If a custom weapon defines an explicit ability, prefer it; allow 'none' to remove ability mod
-        used_ability = ability_override or ('AGI' if is_throwing else 'STR')
-        abil_mod = 0 if no_ability_mod else self._ability_mod(data, used_ability)
-        atk_total = int(atk_roll) + int(atk_bonus) + int(weapon_atk_bonus) + int(abil_mod)
+        atk_total = int(atk_roll) + plan.attack_mod
         # Notes accumulator (for flags like mounted, backstab, etc.)
         notes: list[str] = []
         # Global penalty (e.g., groggy)
-        try:
-            gpen, gnotes = get_global_roll_penalty(data)
-            if gpen:
-                atk_total += int(gpen)
-                if gnotes:
-                    notes.append("; ".join(gnotes))
-        except Exception:
-            pass
+        if plan.penalty and plan.penalty_notes:
+            notes.append("; ".join(plan.penalty_notes))
 
-        # Mighty Deed option (Warrior melee only): compute deed die and add to attack now; add to damage later
-        deed_active = False
+        # Mighty Deed (Warrior/Dwarf melee): roll a new deed for each attack; adds to attack and damage
+        deed_active = apply_deed = plan.deed_sides > 0
         deed_value = 0
         deed_roll = 0
-        deed_flat_plus = 0
-        deed_die_display = ''
+        deed_flat_plus = plan.deed_plus
+        deed_die_display = plan.deed_die
         deed_success = False
-        cls_low = str(data.get('class','')).strip().lower()
-        apply_deed = (cls_low in {'warrior','dwarf'}) and (str(wtype).lower() == 'melee')
         if apply_deed:
-            # Warriors and Dwarves always roll a deed per melee attack; show the field for both
-            deed_active = True
-            raw = str(data.get('deed_die') or '').strip().lower() or 'd3'
-            deed_die_display = raw
-            m = re.match(r"^d(\d+)(?:\+(\d+))?$", raw)
-            sides = 3
-            if m:
-                try:
-                    sides = int(m.group(1))
-                    deed_flat_plus = int(m.group(2) or 0)
-                except Exception:
-                    sides = 3; deed_flat_plus = 0
-            # Roll a new deed for each attack (each action die)
-            deed_roll, _ = roll_dice(f"1d{sides}")
+            deed_roll, _ = roll_dice(f"1d{plan.deed_sides}")
             deed_value = int(deed_roll) + int(deed_flat_plus)
             atk_total += int(deed_value)
             # If deed not explicitly declared, note the auto deed for transparency
-            if not bool(deed) and cls_low in {'warrior','dwarf'}:
+            if not bool(deed):
                 notes.append(f"auto deed {deed_die_display} +{int(deed_value)}")
-        elif bool(deed):
-            notes.append("deed ignored (requires Warrior/Dwarf melee)")
-
-        # Warrior/Dwarf Luck weapon: fixed Luck modifier applies to one chosen weapon from level 1
-        try:
-            cls_now = str(data.get('class','')).strip().lower()
-            if cls_now in {'warrior','dwarf'}:
-                key_name = 'warrior_luck_weapon' if cls_now == 'warrior' else 'dwarf_luck_weapon'
-                key_mod  = 'warrior_luck_weapon_mod' if cls_now == 'warrior' else 'dwarf_luck_weapon_mod'
-                lw = str(data.get(key_name) or '').strip().lower()
-                if lw and wkey == lw:
-                    lmod = int(data.get(key_mod, 0) or 0)
-                    if lmod:
-                        atk_total += lmod
-                        notes.append(f"luck weapon {lw} {lmod:+}")
-        except Exception:
-            pass
-
-        # Thief backstab: add skill bonus to attack; note for display. Auto-crit applied after hit resolution.
-        is_thief = str(data.get('class','')).strip().lower() == 'thief'
-        can_backstab = 'backstab' in tags_l
-        backstab_flagged = bool(backstab) and is_thief and can_backstab
-        backstab_applied = False
-        backstab_bonus_val = 0
-        if bool(backstab) and not can_backstab:
-            # Requested but weapon doesn't support backstab per tags
-            notes.append("backstab not supported by this weapon")
-        if backstab_flagged:
-            try:
-                ts = (data.get('thief_skills') or {}).get('skills') or {}
-                backstab_bonus_val = int(ts.get('backstab', 0) or 0)
-            except Exception:
-                backstab_bonus_val = 0
-            if backstab_bonus_val:
-                atk_total += backstab_bonus_val
-                backstab_applied = True
-                notes.append(f"backstab +{backstab_bonus_val} to attack")
-            else:
-                notes.append("backstab attempt")
-
-        # Augury-based attack adjustments (use static max Luck modifier)
-        try:
-            aug = (data.get('birth_augur') or {}).get('effect') or ''
-            aug = str(aug).strip()
-            mlm = int(get_max_luck_mod(data) or 0)
-        except Exception:
-            aug = ''
-            mlm = 0
-        # Determine melee/missile flags for augury checks
-        is_melee_like = (wtype == 'melee' and not is_throwing)
-        is_missile_like = bool(is_throwing or (wtype != 'melee'))
-        if mlm:
-            if aug == 'All attack rolls':
-                atk_total += mlm
-                notes.append(f"augur: all attacks {mlm:+}")
-            if aug == 'Melee attack rolls' and is_melee_like:
-                atk_total += mlm
-                notes.append(f"augur: melee attack {mlm:+}")
-            if aug == 'Missile fire attack rolls' and is_missile_like:
-                atk_total += mlm
-                notes.append(f"augur: missile attack {mlm:+}")
-            if aug == 'Unarmed attack rolls':
-                # heuristic detection of unarmed
-                if wkey in ('unarmed','fist','fists','punch','kick') or 'unarmed' in tags_l:
-                    atk_total += mlm
-                    notes.append(f"augur: unarmed attack {mlm:+}")
-            if aug == 'Mounted attack rolls' and bool(mounted):
-                atk_total += mlm
-                notes.append(f"augur: mounted attack {mlm:+}")
-            if aug == 'Attack and damage rolls for 0-level starting weapon':
-                try:
-                    start_w = str(data.get('weapon') or '').strip().lower()
-                except Exception:
-                    start_w = ''
-                if start_w and wkey == start_w:
-                    atk_total += mlm
-                    notes.append(f"augur: pack hunter attack {mlm:+}")
+        notes.extend(plan.notes)
 
         # Damage
-        dmg_expr = str(wentry.get('damage') or '1d2')
-        # Mounted combat: higher ground (mounted vs unmounted) is typically +1 to attack; apply simply here.
-        if mounted and not target_mounted:
-            atk_total += 1
-            notes.append('mounted:higher_ground +1')
-        # Mounted charge: lance/spear double damage dice
-        if mounted and charge:
-            try:
-                wtags = [t.lower() for t in (wentry.get('tags') or [])]
-            except Exception:
-                wtags = []
-            if 'mounted' in wtags:
-                dmg_expr = double_damage_dice_expr(dmg_expr)
-                notes.append('mounted:charge double damage dice')
-        base_dmg_expr = dmg_expr
+        dmg_expr = base_dmg_expr = plan.damage
         dmg_total, dmg_rolls = roll_dice(dmg_expr)
-        dmg_mod = 0
-        if not is_throwing and wtype == 'melee':
-            dmg_mod = self._ability_mod(data, 'STR')
-        elif is_throwing and rng == 'close':
-            dmg_mod = self._ability_mod(data, 'STR')  # STR applies at close range for thrown
-        # Augury-based damage adjustments
-        add_dmg = 0
-        if mlm:
-            if aug == 'Damage rolls':
-                add_dmg += mlm
-            if aug == 'Melee damage rolls' and is_melee_like:
-                add_dmg += mlm
-            if aug == 'Missile fire damage rolls' and is_missile_like:
-                add_dmg += mlm
-            if aug == 'Attack and damage rolls for 0-level starting weapon':
-                try:
-                    start_w = str(data.get('weapon') or '').strip().lower()
-                except Exception:
-                    start_w = ''
-                if start_w and wkey == start_w:
-                    add_dmg += mlm
+        dmg_mod = plan.damage_mod
         # Clamp minimal damage to 1
-        dmg_final = max(1, int(dmg_total) + int(dmg_mod) + (int(deed_value) if apply_deed else 0) + int(add_dmg))
-        if add_dmg:
-            notes.append(f"augur: damage {add_dmg:+}")
+        dmg_final = max(1, int(dmg_total) + int(dmg_mod) + int(deed_value) + int(plan.augur_damage))
 
         # Determine target AC once; we'll compute hit after all modifiers
         hit_text = ''
@@ -772,17 +465,13 @@ class CombatCog(commands.Cog):
                     await interaction.response.send_message("Halfling donor not found or not a Halfling.", ephemeral=True)
                     return
                 donor_name = str(donor.get('name') or burn_from_halfling)
-                safe = donor_name.lower().strip().replace(' ', '_')
-                path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                burn_used = int(consume_luck_and_save(donor, requested, filename=path) or 0)
+                burn_used = int(await burn_luck(donor_name, requested, mirror=donor) or 0)
                 atk_total += burn_used  # donor bonus 1:1
                 donor_used = True
                 if requested > burn_used:
                     cap_note = " Donor lacks that much Luck."  # rare
             else:
-                safe = name.lower().strip().replace(' ', '_')
-                path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-                burn_used = int(consume_luck_and_save(data, requested, filename=path) or 0)
+                burn_used = int(await burn_luck(name, requested, mirror=data) or 0)
                 try:
                     cls = str(data.get('class') or '').strip().lower()
                 except Exception:
@@ -825,18 +514,7 @@ class CombatCog(commands.Cog):
             else:
                 # Crit on natural die_sides or in-class threat range (warrior 19-20/18-20/17-20 on d20)
                 # Only applies to a d20 action die; other dice follow simple max-only crits
-                threat_min = None
-                try:
-                    if die_sides == 20:
-                        thr = str(data.get('crit_threat') or '').strip()
-                        if '-' in thr:
-                            threat_min = int(thr.split('-', 1)[0])
-                        else:
-                            # Support single value like '20' if present
-                            tv = int(thr) if thr.isdigit() else None
-                            threat_min = tv
-                except Exception:
-                    threat_min = None
+                threat_min = crit_threat_min(data, die_sides)
                 if r == die_sides:
                     nat_text = ' — Critical!'
                 elif threat_min is not None and r >= int(threat_min):
@@ -850,9 +528,7 @@ class CombatCog(commands.Cog):
         if deed_active:
             deed_success = (int(deed_value) >= 3) and (is_hit is True or tac_val is None)
 
-        target_text = f" vs {target}" if target else ''
         rng_text = f" [{rng}]" if is_throwing else ''
-        train_note = "" if (trained or is_lv0) else " (untrained: action die stepped down)"
         if no_ability_mod:
             abil_label = 'No ability'
             abil_emoji = ''
@@ -881,14 +557,10 @@ class CombatCog(commands.Cog):
             table_key = select_crit_table_for_character(data)
             tables = load_crit_tables().get('tables', {})
             # Roll the character's crit die (e.g., Lv0: 1d4) instead of a fixed d20
-            crit_die = str(data.get('crit_die') or '1d4').strip()
-            # Fallback safety: ensure it looks like NdX
-            if not crit_die or 'd' not in crit_die:
-                crit_die = '1d4'
-            crit_roll, _ = roll_dice(crit_die)
+            crit_roll, _ = roll_dice(plan.crit_die)
             # Luck applies to critical hit table rolls (all classes)
             try:
-                lck = int(self._ability_mod(data, 'LCK'))
+                lck = int(plan.luck_mod)
                 if lck:
                     crit_roll = int(crit_roll) + lck
                     notes.append(f"luck: crit roll {lck:+}")
@@ -966,13 +638,17 @@ class CombatCog(commands.Cog):
                 tags = centry.get('tags', []) or []
                 conds = tags_to_conditions(tags)
                 if conds and defender_data is not None and target:
-                    for c in conds:
-                        apply_condition(defender_data, c.get('key'), c.get('payload'))
-                    # Targeted effects (HP/ability adjustments)
-                    changes = apply_targeted_effects_from_entry(defender_data, centry, {})
+                    async with get_repository().transaction(target) as (fresh,):
+                        rec = fresh if fresh is not None else defender_data
+                        for c in conds:
+                            apply_condition(rec, c.get('key'), c.get('payload'))
+                        # Targeted effects (HP/ability adjustments)
+                        changes = apply_targeted_effects_from_entry(rec, centry, {})
+                    if fresh is not None:
+                        defender_data.clear()
+                        defender_data.update(fresh)
                     if changes:
                         extra_text += "\n  ↳ Effects: " + "; ".join(changes)
-                    self._save_record(target, defender_data)
                     # Pretty labels
                     reg = (load_conditions() or {}).get('conditions', {})
                     labels = []
@@ -988,11 +664,11 @@ class CombatCog(commands.Cog):
             fdata = load_fumble_tables()
             tables = fdata.get('tables', {})
             # Use armor-based fumble die from character data (defaults to d4 if missing)
-            fdie = str(data.get('fumble_die') or 'd4')
+            fdie = plan.fumble_die
             froll, _ = roll_dice(fdie)
             # Luck applies inversely on fumbles: subtract Luck mod (so +2 Luck → -2 to roll; -2 Luck → +2 to roll)
             try:
-                lck = int(self._ability_mod(data, 'LCK'))
+                lck = int(plan.luck_mod)
                 if lck:
                     froll = int(froll) - int(lck)
                     notes.append(f"luck: fumble roll {-int(lck):+}")
@@ -1023,13 +699,17 @@ class CombatCog(commands.Cog):
                 tags = fentry.get('tags', []) or []
                 conds = tags_to_conditions(tags)
                 if conds:
-                    for c in conds:
-                        apply_condition(data, c.get('key'), c.get('payload'))
-                    # Targeted effects (if any) from tags on self
-                    changes = apply_targeted_effects_from_tags(data, tags)
+                    async with get_repository().transaction(name) as (fresh,):
+                        rec = fresh if fresh is not None else data
+                        for c in conds:
+                            apply_condition(rec, c.get('key'), c.get('payload'))
+                        # Targeted effects (if any) from tags on self
+                        changes = apply_targeted_effects_from_tags(rec, tags)
+                    if fresh is not None:
+                        data.clear()
+                        data.update(fresh)
                     if changes:
                         extra_text += "\n  ↳ Effects on you: " + "; ".join(changes)
-                    self._save_record(name, data)
                     reg = (load_conditions() or {}).get('conditions', {})
                     labels = []
                     for c in conds:
@@ -1045,38 +725,13 @@ class CombatCog(commands.Cog):
         apply_text = ""
         if is_hit is True and defender_data is not None:
             try:
-                hp = defender_data.get('hp', {}) if isinstance(defender_data.get('hp'), dict) else {}
-                cur = int(hp.get('current', 0) or 0)
-                mx = hp.get('max')
-                try:
-                    mx = int(mx) if mx is not None else None
-                except Exception:
-                    mx = None
-                new_cur = max(0, int(cur) - int(dmg_final))
-                hp['current'] = int(new_cur)
-                if mx is not None:
-                    hp['max'] = int(mx)
-                defender_data['hp'] = hp
-                # Dying system: if HP drops to 0
-                try:
-                    if cur > 0 and new_cur == 0:
-                        lvl = int(defender_data.get('level', 0) or 0)
-                        if lvl <= 0:
-                            defender_data['dead'] = True
-                            try:
-                                import time as _t
-                                defender_data['time_of_death'] = int(_t.time())
-                            except Exception:
-                                pass
-                        else:
-                            defender_data.setdefault('dying', {})['remaining_turns'] = int(lvl)
-                    # If HP above 0 after previous dying state, clear it
-                    if new_cur > 0 and defender_data.get('dying'):
-                        defender_data.pop('dying', None)
-                except Exception:
-                    pass
-                self._save_record(target, defender_data)
-                apply_text = f"\n• {target} HP: {cur} → {new_cur}"
+                # Dying system applies if HP drops to 0
+                res = await self._damage_record(target, dmg_final, mirror=defender_data)
+                if res is not None:
+                    cur, new_cur = res
+                    apply_text = f"\n• {target} HP: {cur} → {new_cur}"
+            except CommitError:
+                apply_text = f"\n• ⚠️ {target} HP change could not be saved"
             except Exception:
                 apply_text = ""
 
@@ -1085,7 +740,6 @@ class CombatCog(commands.Cog):
                 notes.append(f"forced attack die = {int(force)}")
             except Exception:
                 notes.append("forced attack die")
-        note_text = ("\n• Notes: " + ", ".join(notes)) if notes else ""
         # Friendly fire on miss when firing into melee (missile/thrown only)
         ff_text = ""
         try:
@@ -1189,40 +843,20 @@ class CombatCog(commands.Cog):
 
         # Off-hand follow-up attack (two-weapon fighting)
         try:
-            if 'use_twf' in locals() and use_twf and (off_action_die is not None) and (off_wkey):
+            off = plan.offhand
+            if use_twf and off is not None:
                 # Off-hand attack roll
-                off_weapon_atk_bonus = 0
-                off_ability_override = None
-                off_no_ability_mod = False
-                if off_weapon_meta:
-                    try:
-                        off_weapon_atk_bonus = int(off_weapon_meta.get('attack_bonus') or 0)
-                    except Exception:
-                        off_weapon_atk_bonus = 0
-                    try:
-                        ca_raw = str(off_weapon_meta.get('ability') or '').strip().upper()
-                        if ca_raw in ('STR','AGI','STA','INT','PER','LCK'):
-                            off_ability_override = ca_raw
-                        elif ca_raw in ('', 'NONE'):
-                            off_no_ability_mod = True
-                    except Exception:
-                        pass
-                off_used_ability = off_ability_override or 'STR'
-                off_abil_mod = 0 if off_no_ability_mod else self._ability_mod(data, off_used_ability)
+                off_used_ability = off.ability or 'STR'
+                off_abil_mod = off.ability_mod
+                off_action_die = off.action_die
                 off_atk_roll, off_atk_rolls = roll_dice(off_action_die, force=force)
-                off_atk_total = int(off_atk_roll) + int(self._attack_bonus(data)) + int(off_weapon_atk_bonus) + int(off_abil_mod)
+                off_atk_total = int(off_atk_roll) + plan.offhand_attack_mod
                 # Global penalty (e.g., groggy)
-                try:
-                    gpen_off, gnotes_off = get_global_roll_penalty(data)
-                    if gpen_off:
-                        off_atk_total += int(gpen_off)
-                        if gnotes_off:
-                            # Append to main notes; off-hand embed is separate
-                            notes.append("; ".join(gnotes_off))
-                except Exception:
-                    pass
+                if plan.penalty and plan.penalty_notes:
+                    # Append to main notes; off-hand embed is separate
+                    notes.append("; ".join(plan.penalty_notes))
                 # Apply deed value to attack if active
-                if 'apply_deed' in locals() and apply_deed:
+                if apply_deed:
                     off_atk_total += int(deed_value)
                 # Resolve hit
                 off_is_hit = None
@@ -1248,66 +882,27 @@ class CombatCog(commands.Cog):
                     elif r2 == off_die_sides:
                         off_nat_text = ' — Critical!'
                 # Damage
-                off_dmg_expr = str((off_wentry or {}).get('damage') or '1d2')
+                off_dmg_expr = off.damage
                 off_dmg_total, off_dmg_rolls = roll_dice(off_dmg_expr)
-                off_dmg_mod = self._ability_mod(data, 'STR')
-                off_add_dmg = 0
-                try:
-                    if mlm:
-                        if aug == 'Damage rolls':
-                            off_add_dmg += mlm
-                        if aug == 'Melee damage rolls':
-                            off_add_dmg += mlm
-                except Exception:
-                    pass
-                off_dmg_final = max(1, int(off_dmg_total) + int(off_dmg_mod) + (int(deed_value) if ('apply_deed' in locals() and apply_deed) else 0) + int(off_add_dmg))
+                off_dmg_final = max(1, int(off_dmg_total) + int(off.damage_mod) + int(deed_value) + int(off.augur_damage))
                 # Apply damage
                 off_apply_text = ''
                 if off_is_hit is True:
                     if defender_data is not None:
                         try:
-                            hp = defender_data.get('hp', {}) if isinstance(defender_data.get('hp'), dict) else {}
-                            cur = int(hp.get('current', 0) or 0)
-                            mx = hp.get('max')
-                            try:
-                                mx = int(mx) if mx is not None else None
-                            except Exception:
-                                mx = None
-                            new_cur = max(0, int(cur) - int(off_dmg_final))
-                            hp['current'] = int(new_cur)
-                            if mx is not None:
-                                hp['max'] = int(mx)
-                            defender_data['hp'] = hp
                             # Dying system for off-hand damage
-                            try:
-                                if cur > 0 and new_cur == 0:
-                                    lvl = int(defender_data.get('level', 0) or 0)
-                                    if lvl <= 0:
-                                        defender_data['dead'] = True
-                                        try:
-                                            import time as _t
-                                            defender_data['time_of_death'] = int(_t.time())
-                                        except Exception:
-                                            pass
-                                    else:
-                                        defender_data.setdefault('dying', {})['remaining_turns'] = int(lvl)
-                                if new_cur > 0 and defender_data.get('dying'):
-                                    defender_data.pop('dying', None)
-                            except Exception:
-                                pass
-                            self._save_record(target, defender_data)
-                            off_apply_text = f"\n• {target} HP: {cur} → {new_cur}"
+                            res = await self._damage_record(target, off_dmg_final, mirror=defender_data)
+                            if res is not None:
+                                cur, new_cur = res
+                                off_apply_text = f"\n• {target} HP: {cur} → {new_cur}"
+                        except CommitError:
+                            off_apply_text = f"\n• ⚠️ {target} HP change could not be saved"
                         except Exception:
                             off_apply_text = ''
                     else:
                         if target:
-                            tq = target.strip().lower()
-                            tgt = None
-                            for e in init_mod.INITIATIVE_ORDER:
-                                nm = str(e.get('name','')).strip().lower()
-                                ab = str(e.get('abbr','')).strip().lower()
-                                if tq and (tq == nm or tq == ab):
-                                    tgt = e; break
+                            enc = await encounter_for(interaction)
+                            tgt = enc.find(target)
                             if tgt is not None and tgt.get('hp') is not None:
                                 try:
                                     cur = int(tgt.get('hp') or 0)
@@ -1315,6 +910,7 @@ class CombatCog(commands.Cog):
                                     cur = 0
                                 new_cur = max(0, cur - int(off_dmg_final))
                                 tgt['hp'] = int(new_cur)
+                                enc.touch()
                                 off_apply_text = f"\n• {tgt.get('name')} HP: {cur} → {new_cur}"
                 # Build embed
                 off_title_target = f" → {target}" if target else ''
@@ -1324,12 +920,12 @@ class CombatCog(commands.Cog):
                     description=f"Weapon: {off_wkey}",
                     color=off_color,
                 )
-                deed_part = (f"; Deed +{deed_value}") if ('apply_deed' in locals() and apply_deed) else ""
+                deed_part = (f"; Deed +{deed_value}") if apply_deed else ""
                 off_atk_field = (
-                    f"Roll {off_atk_roll} on {off_action_die}; AB {self._attack_bonus(data):+}; {ability_emoji(off_used_ability)} {ability_name(off_used_ability)} {off_abil_mod:+}; Total {off_atk_total}{off_hit_text}{off_nat_text}{deed_part}"
+                    f"Roll {off_atk_roll} on {off_action_die}; AB {atk_bonus:+}; {ability_emoji(off_used_ability)} {ability_name(off_used_ability)} {off_abil_mod:+}; Total {off_atk_total}{off_hit_text}{off_nat_text}{deed_part}"
                 )
                 off_emb.add_field(name="Attack", value=off_atk_field, inline=False)
-                deed_dmg_part = (f"; Deed +{deed_value}") if ('apply_deed' in locals() and apply_deed) else ""
+                deed_dmg_part = (f"; Deed +{deed_value}") if apply_deed else ""
                 off_dmg_field = (
                     f"Roll {off_dmg_total} on {off_dmg_expr}{deed_dmg_part}; Total {off_dmg_final}"
                 )
@@ -1351,7 +947,8 @@ class CombatCog(commands.Cog):
         choices: list[app_commands.Choice[str]] = []
         # Initiative entries (name and abbr)
         seen = set()
-        for e in init_mod.INITIATIVE_ORDER:
+        enc = await encounter_for(interaction, create=False)
+        for e in (enc.entries if enc is not None else ()):
             disp = e.get('name') or e.get('display') or ''
             ab = e.get('abbr') or ''
             show = f"{disp} [{ab}]" if ab else str(disp)
@@ -1370,15 +967,8 @@ class CombatCog(commands.Cog):
                 break
         # Characters from SAVE_FOLDER
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5]
-                if q and q not in nm.lower():
-                    continue
-                choices.append(app_commands.Choice(name=nm, value=nm))
-                if len(choices) >= 25:
-                    break
+            for e in get_index().search(q, limit=25 - len(choices)):
+                choices.append(app_commands.Choice(name=e.key, value=e.key))
         except Exception:
             pass
         return choices[:25]
@@ -1399,7 +989,7 @@ class CombatCog(commands.Cog):
             data = await self._load_record(str(target_name))
             if data:
                 cls_low = str(data.get('class','') or '').strip().lower()
-                parts = self._parse_action_dice(data)
+                parts = action_dice(data)
                 if cls_low in {'wizard','mage','elf'} and parts:
                     dice = [parts[0]]
                 else:
@@ -1433,13 +1023,8 @@ class CombatCog(commands.Cog):
             qname = ''
         q = (current or '').strip().lower()
         choices: list[app_commands.Choice[str]] = []
-        attacker = None
-        qq = qname.strip().lower()
-        for e in init_mod.INITIATIVE_ORDER:
-            nm = str(e.get('name','')).strip().lower()
-            ab = str(e.get('abbr','')).strip().lower()
-            if qq and (qq == nm or qq == ab):
-                attacker = e; break
+        enc = await encounter_for(interaction, create=False)
+        attacker = enc.find(qname) if enc is not None else None
         if attacker and attacker.get('atk'):
             chunks = [c.strip() for c in re.split(r"[;,]", str(attacker.get('atk'))) if c.strip()]
             for c in chunks:
@@ -1462,24 +1047,8 @@ class CombatCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -1488,24 +1057,8 @@ class CombatCog(commands.Cog):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -1,8 +1,7 @@
 from __future__ import annotations
 import re
 import random
-import json
-from pathlib import Path
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -10,21 +9,19 @@ from typing import List, Tuple, Optional
 
 from core import embeds
 from core.hooks import HOOKS
+from utils.dice import compile_dice, apply_keep  # type: ignore
+from utils.dice_stats import distribution, normalize_expression  # type: ignore
+from modules.reference import reference  # type: ignore
 import logging
 logger = logging.getLogger('dccbot')
 
-# DCC dice chain for potential future step-up/step-down features
-DCC_CHAIN = [3,4,5,6,7,8,10,12,14,16,20,24,30]
-
-ROLL_PATTERN = re.compile(
-    r"^\s*([0-9]*)d(\d+)((?:[+-]d\d*)*)(?:(k|dl)([hl]?\d+|[hl]))?(?:([+-])\s*(\d+))?\s*$",
-    re.IGNORECASE,
-)
-# Supports step-up / step-down tokens immediately after base die: +d / +d2 / -d / -d2
-# Multiple sets separated by commas or spaces: "2d20+d k1+5, d7-1 3d6dl1 4d6+d2dl1"
+# Parsing/rolling lives in utils.dice (one compiled, LRU-cached engine shared with roll_dice and /create)
 SPLIT_PATTERN = re.compile(r"[\s,;]+")
+# '/roll stats 1d20+5 >=15' -> expression plus optional target total
+STATS_TARGET = re.compile(r"\s*(?:>=|vs\s+|dc\s*)(-?\d+)\s*$", re.IGNORECASE)
 
 # Explanation of notation implemented:
+# NdX!       explode on max face (NdX!E explodes on E or higher)
 # NdXk1      keep highest 1 (classic 'k1')
 # NdXkL1     keep lowest 1 (kL1) - optional variant
 # NdXdrop1   drop lowest 1 (alias dropL1)
@@ -52,8 +49,7 @@ class DiceCog(commands.Cog):
         # Special: "/roll occupation" uses the 1-100 occupation table from occupations_full.json
         if expr_clean.lower() in ("occupation", "occ"):
             try:
-                occ_path = Path(__file__).resolve().parents[1] / 'occupations_full.json'
-                data = json.loads(occ_path.read_text(encoding='utf-8'))
+                data = reference('occupations_full.json', {})
                 roll = random.randint(1, 100)
                 entry = data.get(str(roll))
                 if not entry:
@@ -76,6 +72,10 @@ class DiceCog(commands.Cog):
                 else:
                     await interaction.response.send_message(msg, ephemeral=True)
             return
+        # "/roll stats <expr> [>=N]": exact odds instead of a roll
+        if expr_clean.lower().split(None, 1)[0] == "stats":
+            await self.send_stats(interaction, expr_clean[5:].strip())
+            return
         parts = [p for p in SPLIT_PATTERN.split(expr_clean) if p]
         if not parts:
             await interaction.response.send_message(embed=self.help_embed(), ephemeral=True)
@@ -84,19 +84,14 @@ class DiceCog(commands.Cog):
             results = []
             total_sum = 0
             for part in parts:
-                parsed = self.parse_expression(part)
-                if not parsed:
+                compiled = compile_dice(part)
+                if compiled is None:
                     results.append(f"`{part}` -> invalid")
                     continue
-                count, sides, mode, mode_arg, sign, mod, original_sides = parsed
-                roll_list = [random.randint(1, sides) for _ in range(count or 1)]
-                original = roll_list.copy()
-                kept, dropped = self.apply_mode(roll_list, mode, mode_arg)
-                subtotal = sum(kept)
-                if sign and mod:
-                    subtotal = subtotal + (mod if sign == '+' else -mod)
+                res = compiled.roll()
+                subtotal = res.total
                 total_sum += subtotal
-                segment = self.format_segment(part, original, kept, dropped, subtotal, sides, original_sides)
+                segment = self.format_segment(part, res.rolls, res.kept, res.dropped, subtotal, compiled.sides, compiled.base_sides)
                 results.append(segment)
             description = "\n".join(results)
             description += f"\n\nTotal Sum: **{total_sum}**"
@@ -110,14 +105,51 @@ class DiceCog(commands.Cog):
                     await interaction.followup.send(text, ephemeral=True)
                 else:
                     await interaction.response.send_message(text, ephemeral=True)
-            await HOOKS.emit('dice.roll.completed', user_id=getattr(interaction.user, 'id', None), guild_id=getattr(getattr(interaction, 'guild', None), 'id', None), expression=expr_clean)
+            HOOKS.emit_nowait('dice.roll.completed', user_id=getattr(interaction.user, 'id', None), guild_id=getattr(getattr(interaction, 'guild', None), 'id', None), expression=expr_clean)
         except Exception as e:
             logger.exception("/roll failed: %s", e)
             if interaction.response.is_done():
                 await interaction.followup.send("Sorry, the roll failed. Check your expression and try again.", ephemeral=True)
             else:
                 await interaction.response.send_message("Sorry, the roll failed. Check your expression and try again.", ephemeral=True)
-            await HOOKS.emit('dice.roll.failed', user_id=getattr(interaction.user, 'id', None), guild_id=getattr(getattr(interaction, 'guild', None), 'id', None), expression=expr_clean, error=str(e))
+            HOOKS.emit_nowait('dice.roll.failed', user_id=getattr(interaction.user, 'id', None), guild_id=getattr(getattr(interaction, 'guild', None), 'id', None), expression=expr_clean, error=str(e))
+
+    async def send_stats(self, interaction: discord.Interaction, text: str):
+        target: Optional[int] = None
+        m = STATS_TARGET.search(text)
+        if m:
+            target = int(m.group(1))
+            text = text[:m.start()].strip()
+        if not text:
+            await interaction.response.send_message("Usage: `/roll stats <expression> [>=N]`, e.g. `stats 1d20+5 >=15`", ephemeral=True)
+            return
+        try:
+            # Cached after the first request; large keep/drop pools can take a moment, so keep it off the loop
+            dist = await asyncio.to_thread(distribution, text)
+        except ValueError as e:
+            await interaction.response.send_message(f"Can't compute odds: {e}", ephemeral=True)
+            return
+        except Exception as e:
+            logger.exception("/roll stats failed: %s", e)
+            await interaction.response.send_message("Sorry, computing the odds failed.", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=embeds.info(self.format_stats(text, dist, target), "Roll Odds"), ephemeral=True)
+
+    def format_stats(self, text: str, dist, target: Optional[int] = None) -> str:
+        pct = ", ".join(f"p{p}={dist.percentile(p)}" for p in (10, 25, 50, 75, 90))
+        lines = [
+            f"`{text}` (as `{normalize_expression(text)}`)",
+            f"Range: {dist.min}–{dist.max} | Mean: **{dist.mean:.2f}** | SD: {dist.stdev:.2f}",
+            f"Percentiles: {pct}",
+        ]
+        if target is not None:
+            lines.append(f"P(total ≥ {target}) = **{dist.p_at_least(target) * 100:.2f}%**")
+        # P(>= N) table, thinned to at most ~20 rows for wide ranges
+        span = dist.max - dist.min + 1
+        step = max(1, -(-span // 20))
+        rows = [f"≥{v:>4}: {dist.p_at_least(v) * 100:6.2f}%" for v in range(dist.min, dist.max + 1, step)]
+        lines.append("```\n" + "\n".join(rows) + "\n```")
+        return "\n".join(lines)
 
     @app_commands.command(name="rollping", description="Debug: check dice cog responsiveness")
     async def rollping(self, interaction: discord.Interaction):
@@ -126,89 +158,12 @@ class DiceCog(commands.Cog):
     # --- Parsing and mechanics ---
 
     def parse_expression(self, text: str) -> Optional[Tuple[int, int, Optional[str], Optional[str], Optional[str], Optional[int], int]]:
-        m = ROLL_PATTERN.match(text)
-        if not m:
-            return None
-        count_raw, sides_raw, steps_cluster, mode_raw, mode_arg_raw, sign, mod_raw = m.groups()
-        count = int(count_raw) if count_raw else 1
-        sides = int(sides_raw)
-        original_sides = sides
-        # Apply step adjustments if base die in chain
-        if steps_cluster and sides in DCC_CHAIN:
-            step_tokens = re.findall(r"([+-])d(\d*)", steps_cluster)
-            net_steps = 0
-            for sign_tok, num_tok in step_tokens:
-                magnitude = int(num_tok) if num_tok else 1
-                net_steps += magnitude if sign_tok == '+' else -magnitude
-            if net_steps != 0:
-                idx = DCC_CHAIN.index(sides)
-                new_idx = max(0, min(len(DCC_CHAIN)-1, idx + net_steps))
-                sides = DCC_CHAIN[new_idx]
-        mode = None
-        mode_arg = None
-        if mode_raw:
-            mode = mode_raw.lower()  # 'k' or 'dl'
-            if mode_arg_raw:
-                mode_arg = mode_arg_raw.lower()
-            else:
-                # defaults: k -> highest 1, dl -> lowest 1
-                mode_arg = 'h' if mode == 'k' else '1'
-        # validate mode args
-        if mode == 'k' and mode_arg:
-            if mode_arg in ('h', 'l'):
-                pass
-            elif (mode_arg[0] in ('h', 'l')) and mode_arg[1:].isdigit():
-                pass
-            elif mode_arg.isdigit():
-                pass
-            else:
-                return None
-        if mode == 'dl' and mode_arg and not mode_arg.isdigit():
-            # dl only accepts digits (drop lowest N)
-            return None
-        mod = int(mod_raw) if mod_raw else None
-        return (count, sides, mode, mode_arg, sign, mod, original_sides)
+        """(count, sides, mode, mode_arg, sign, mod, original_sides) or None; see utils.dice.compile_dice."""
+        compiled = compile_dice(text)
+        return compiled.legacy_tuple() if compiled is not None else None
 
     def apply_mode(self, rolls: List[int], mode: Optional[str], mode_arg: Optional[str]) -> Tuple[List[int], List[int]]:
-        if not mode:
-            return rolls, []
-        # Interpret semantics
-        sorted_pairs = sorted(enumerate(rolls), key=lambda x: x[1])  # ascending
-        indices = [i for i,_ in sorted_pairs]
-        values = [v for _,v in sorted_pairs]
-        if mode == 'k':
-            # keep highest unless mode_arg starts with 'l'
-            if mode_arg and mode_arg.startswith('l'):
-                n = 1
-                tail = mode_arg[1:]
-                if tail.isdigit():
-                    n = int(tail)
-                kept_indices = indices[:n]
-            elif mode_arg and mode_arg.startswith('h'):
-                n = 1
-                tail = mode_arg[1:]
-                if tail.isdigit(): n = int(tail)
-                kept_indices = indices[-n:]
-            elif mode_arg and mode_arg.isdigit():
-                n = int(mode_arg)
-                kept_indices = indices[-n:]
-            else:
-                kept_indices = indices[-1:]
-            kept_set = set(kept_indices)
-            kept = [rolls[i] for i in range(len(rolls)) if i in kept_set]
-            dropped = [rolls[i] for i in range(len(rolls)) if i not in kept_set]
-            return kept, dropped
-        if mode == 'dl':
-            # drop lowest N dice (default 1)
-            n = int(mode_arg) if (mode_arg and mode_arg.isdigit()) else 1
-            if n >= len(rolls):  # avoid dropping all; keep at least one
-                n = len(rolls) - 1
-            drop_indices = indices[:n]
-            drop_set = set(drop_indices)
-            kept = [rolls[i] for i in range(len(rolls)) if i not in drop_set]
-            dropped = [rolls[i] for i in range(len(rolls)) if i in drop_set]
-            return kept, dropped
-        return rolls, []
+        return apply_keep(rolls, mode, mode_arg)
 
     def format_segment(self, expr: str, original: List[int], kept: List[int], dropped: List[int], subtotal: int, sides: int, original_sides: int) -> str:
         chain_note = ""
@@ -226,11 +181,14 @@ class DiceCog(commands.Cog):
             "3d6+d (step up once along chain)",
             "d16-d2 (step down 2)",
             "4d8+d3dl1 (step to d20 then drop lowest)",
+            "3d6! (exploding d6)",
             "occupation (roll an occupation on the 1-100 table)",
+            "stats 1d20+5 >=15 (exact odds, no roll)",
         ]
         notation = (
-            "Syntax: [N]d[S][step adjustments][mode][modifier]\n"
+            "Syntax: [N]d[S][step adjustments][!explode][mode][modifier]\n"
             "Step: +d / +d2 / -d / -d2 (chain d3>d4>d5>d6>d7>d8>d10>d12>d14>d16>d20>d24>d30)\n"
+            "Explode: ! rerolls and adds on the max face (!N on N or higher)\n"
             "Mode: kN keep highest N | klN keep lowest N | dlN drop lowest N (dl defaults to 1)\n"
             "Modifier: +N or -N applied after keep/drop\n"
             "Multiple: separate expressions with space or comma."
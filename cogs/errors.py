@@ -5,7 +5,6 @@ from discord.ext import commands
 from discord import app_commands
 
 from core import embeds  # type: ignore
-from core.helpers import is_owner  # type: ignore
 
 logger = logging.getLogger('errors')
 
@@ -29,7 +28,7 @@ class ErrorHandlerCog(commands.Cog):
             return
         # Unexpected
         logger.exception('Unhandled command error: %s', orig)
-        if await is_owner(ctx):
+        if await self.bot.is_owner(ctx.author):
             tb = ''.join(traceback.format_exception(type(orig), orig, orig.__traceback__))
             await ctx.reply(embed=embeds.error('Unexpected error occurred.'), mention_author=False)
             # Owner DM attempt
@@ -42,7 +41,14 @@ class ErrorHandlerCog(commands.Cog):
 
     @commands.Cog.listener()
     async def on_app_command_completion(self, interaction: discord.Interaction, command: app_commands.Command):
-        logger.info('Slash command completed: /%s by %s', command.name, interaction.user)
+        req = interaction.extras.get('metrics')
+        if req is not None:
+            ttfr = req.first_response_ms()
+            logger.info('Slash command completed: /%s by %s in %.0f ms (first response %s, storage %.0f ms)',
+                        command.qualified_name, interaction.user, req.elapsed_ms(),
+                        f"{ttfr:.0f} ms" if ttfr is not None else 'n/a', req.storage_ms)
+        else:
+            logger.info('Slash command completed: /%s by %s', command.name, interaction.user)
 
     @commands.Cog.listener()
     async def on_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
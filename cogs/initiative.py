@@ -1,42 +1,103 @@
-import os, json, re, random
+import re, random
 from typing import Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
-from modules import initiative as init_mod  # type: ignore
+from storage.repository import get_repository, CommitError  # type: ignore
+from storage.index import get_index  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from modules.initiative import encounter_for  # type: ignore
+from modules.mob import resolve_mob_attack  # type: ignore
+from modules.party import split_xp, unique_records  # type: ignore
 from modules.utils import effective_initiative_die  # type: ignore
-from utils.dice import roll_dice  # type: ignore
+from utils.dice import roll_dice, roll_many  # type: ignore
 from modules.data_constants import WEAPON_TABLE  # type: ignore
 
 
+MOB_ROWS_PER_PAGE = 10
+
+
+def _display_name(key: str) -> str:
+    entry = get_index().get(key)
+    return entry.display if entry is not None else key.replace('_', ' ')
+
+
+def _mob_attack_pages(group_label: str, target: str, result, applied: str) -> list[discord.Embed]:
+    """One embed per page of attack rows; the summary repeats on every page."""
+    rows: list[str] = []
+    for a in result.attacks:
+        who = f"{a.name} [{a.abbr}]" if a.abbr else a.name
+        outcome = '' if a.hit is None else (' **HIT**' if a.hit else ' miss')
+        nat = ' — Critical!' if a.crit else (' — Fumble!' if a.fumble else '')
+        dmg = f" → {a.damage} dmg" if (a.hit or a.hit is None) else ''
+        line = f"{who}: {a.attack} {a.nat} on {a.die} = {a.total}{outcome}{dmg}{nat}"
+        for extra in (a.crit_text, a.fumble_text):
+            if extra:
+                line += f"\n  ↳ {extra}"
+        rows.append(line)
+    ac_text = f"AC {result.target_ac}" if result.target_ac is not None else "AC unknown"
+    summary = f"{len(result.attacks)} attacks, {result.hits} hits, {result.crits} crits, {result.fumbles} fumbles"
+    if result.target_ac is not None:
+        summary += f"; **{result.damage_total}** damage"
+    if applied:
+        summary += f"\n{applied}"
+    if result.skipped:
+        summary += f"\nSkipped: {', '.join(result.skipped)}"[:900]
+    color = 0x2ECC71 if result.hits else (0x95A5A6 if result.target_ac is None else 0xE67E22)
+    pages: list[discord.Embed] = []
+    chunks = [rows[i:i + MOB_ROWS_PER_PAGE] for i in range(0, len(rows), MOB_ROWS_PER_PAGE)] or [[]]
+    for n, chunk in enumerate(chunks, start=1):
+        emb = discord.Embed(title=f"{group_label} attacks {target} ({ac_text})", description="\n".join(chunk)[:4000], color=color)
+        emb.add_field(name="Result", value=summary[:1024], inline=False)
+        if len(chunks) > 1:
+            emb.set_footer(text=f"Page {n}/{len(chunks)}")
+        pages.append(emb)
+    return pages
+
+
+class _PagedEmbeds(discord.ui.View):
+    def __init__(self, pages: list[discord.Embed], timeout: Optional[float] = 600):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.index = 0
+
+    async def _show(self, interaction: discord.Interaction, step: int):
+        self.index = (self.index + step) % len(self.pages)
+        await interaction.response.edit_message(embed=self.pages[self.index], view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, -1)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, 1)
+
+
 class InitiativeCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
     # Helpers
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.lower().strip().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_record(self, name: str, data: dict) -> bool:
-        safe = name.lower().strip().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            return True
-        except Exception:
-            return False
+        return await get_repository().save(name, data)
+
+    async def _damage_record(self, name: str, dmg: int) -> Optional[tuple[int, int]]:
+        """Subtract dmg from the saved record's current HP under its lock; returns (before, after)."""
+        async with get_repository().transaction(name) as (rec,):
+            if rec is None:
+                return None
+            hp = rec.get('hp', {}) if isinstance(rec.get('hp'), dict) else {}
+            cur = int(hp.get('current', 0) or 0)
+            new_cur = max(0, cur - int(dmg))
+            hp['current'] = int(new_cur)
+            rec['hp'] = hp
+        return cur, new_cur
 
     def _ability_mod(self, data: dict, key: str) -> int:
         try:
@@ -53,16 +114,15 @@ class InitiativeCog(commands.Cog):
 
     @init.command(name="start", description="Start initiative and allow players to join")
     async def init_start(self, interaction: discord.Interaction):
-        init_mod.INITIATIVE_OPEN = True
-        init_mod.INITIATIVE_ORDER = []
-        init_mod.CURRENT_TURN_INDEX = None
-        init_mod.COMBAT_ROUND = 1
+        enc = await encounter_for(interaction)
+        enc.start()
         await interaction.response.send_message("🧭 Initiative is open (Round 1). Players may join with /init join name.")
 
     @init.command(name="join", description="Join initiative with a character name")
     @app_commands.describe(name="Character name to join initiative")
     async def init_join(self, interaction: discord.Interaction, name: str):
-        if not init_mod.INITIATIVE_OPEN:
+        enc = await encounter_for(interaction)
+        if not enc.open:
             await interaction.response.send_message("⚠️ Initiative is not open. Start it with /init start.", ephemeral=True)
             return
         rec = await self._load_record(name)
@@ -70,17 +130,15 @@ class InitiativeCog(commands.Cog):
             await interaction.response.send_message(f"❌ Character '{name}' not found.", ephemeral=True)
             return
         # Prevent duplicates
-        for e in init_mod.INITIATIVE_ORDER:
-            if str(e.get('name','')).lower() == name.lower():
-                await interaction.response.send_message(f"⚠️ '{name}' is already in initiative.", ephemeral=True)
-                return
+        if enc.find_name(name) is not None:
+            await interaction.response.send_message(f"⚠️ '{name}' is already in initiative.", ephemeral=True)
+            return
         # Determine initiative modifier: prefer character 'initiative' field; fallback to AGI mod
         try:
             init_mod_val = int(rec.get('initiative'))
         except Exception:
             init_mod_val = self._ability_mod(rec, 'AGI')
         die = effective_initiative_die(rec)
-        import random
         roll = random.randint(1, int(die))
         total = int(roll) + int(init_mod_val)
         entry = {
@@ -89,28 +147,21 @@ class InitiativeCog(commands.Cog):
             'roll': int(total),
             'owner': rec.get('owner'),
         }
-        init_mod.INITIATIVE_ORDER.append(entry)
-        init_mod.INITIATIVE_ORDER.sort(key=lambda x: x.get('roll',0), reverse=True)
+        enc.add(entry)
         await interaction.response.send_message(f"✅ '{name}' joined: rolled {roll} + {init_mod_val:+} = **{total}**. Use /init next to advance.")
 
     @init.command(name="next", description="Advance to next turn and ping the actor")
     async def init_next(self, interaction: discord.Interaction):
-        if not init_mod.INITIATIVE_ORDER:
+        enc = await encounter_for(interaction)
+        if not enc:
             await interaction.response.send_message("⚠️ No participants in initiative.", ephemeral=True)
             return
-        if init_mod.CURRENT_TURN_INDEX is None:
-            init_mod.CURRENT_TURN_INDEX = 0
-        else:
-            init_mod.CURRENT_TURN_INDEX += 1
-            if init_mod.CURRENT_TURN_INDEX >= len(init_mod.INITIATIVE_ORDER):
-                init_mod.CURRENT_TURN_INDEX = 0
-                init_mod.COMBAT_ROUND = int(init_mod.COMBAT_ROUND or 1) + 1
+        current = enc.advance()
         # Build view
-        lines = [f"__Initiative Order — Round {init_mod.COMBAT_ROUND}:__"]
-        for i, e in enumerate(init_mod.INITIATIVE_ORDER):
-            marker = "➡️" if i == init_mod.CURRENT_TURN_INDEX else "  "
+        lines = [f"__Initiative Order — Round {enc.round}:__"]
+        for i, e in enumerate(enc.entries):
+            marker = "➡️" if i == enc.current_index else "  "
             lines.append(f"{marker} {e.get('display') or e.get('name')}")
-        current = init_mod.INITIATIVE_ORDER[init_mod.CURRENT_TURN_INDEX]
         mention = None
         owner_id = current.get('owner')
         if owner_id:
@@ -120,10 +171,10 @@ class InitiativeCog(commands.Cog):
 
     @init.command(name="end", description="End initiative and clear state")
     async def init_end(self, interaction: discord.Interaction):
-        init_mod.INITIATIVE_OPEN = False
-        init_mod.INITIATIVE_ORDER = []
-        init_mod.CURRENT_TURN_INDEX = None
-        init_mod.COMBAT_ROUND = 0
+        enc = await encounter_for(interaction)
+        enc.close(clear=True)
+        # Encounter over: write out any buffered combat saves now
+        await get_repository().flush()
         await interaction.response.send_message("🛑 Initiative closed and cleared.")
 
     @init.command(name="attack", description="Make an attack roll for the current actor in initiative")
@@ -140,10 +191,11 @@ class InitiativeCog(commands.Cog):
         app_commands.Choice(name="missile (AGI)", value="missile"),
     ])
     async def init_attack(self, interaction: discord.Interaction, target: str | None = None, target_ac: int | None = None, attack: str | None = None, force: int | None = None, mode: app_commands.Choice[str] | None = None, weapon: str | None = None):
-        if not init_mod.INITIATIVE_ORDER or init_mod.CURRENT_TURN_INDEX is None:
+        enc = await encounter_for(interaction)
+        actor = enc.current()
+        if actor is None:
             await interaction.response.send_message("⚠️ No active turn. Use /init next to start.", ephemeral=True)
             return
-        actor = init_mod.INITIATIVE_ORDER[init_mod.CURRENT_TURN_INDEX]
         name = actor.get('name') or 'Unknown'
         # Try as character
         char = await self._load_record(name)
@@ -175,17 +227,12 @@ class InitiativeCog(commands.Cog):
                         tac = None
                 else:
                     # Try initiative entry by name or abbr
-                    tq = target.strip().lower()
-                    for e in init_mod.INITIATIVE_ORDER:
-                        nm = str(e.get('name','')).strip().lower()
-                        abbr = str(e.get('abbr','')).strip().lower()
-                        if tq == nm or tq == abbr:
-                            defender_entry = e
-                            try:
-                                tac = int(e.get('ac')) if e.get('ac') is not None else None
-                            except Exception:
-                                tac = None
-                            break
+                    defender_entry = enc.find(target)
+                    if defender_entry is not None:
+                        try:
+                            tac = int(defender_entry.get('ac')) if defender_entry.get('ac') is not None else None
+                        except Exception:
+                            tac = None
             try:
                 tac = int(target_ac) if target_ac is not None else None
             except Exception:
@@ -240,14 +287,13 @@ class InitiativeCog(commands.Cog):
             did_hit = (tac is not None and total >= tac)
             if did_hit and (defender_data is not None or defender_entry is not None):
                 if defender_data is not None:
+                    dlabel = defender_data.get('name') or target
                     try:
-                        hp = defender_data.get('hp', {}) if isinstance(defender_data.get('hp'), dict) else {}
-                        cur = int(hp.get('current', 0) or 0)
-                        new_cur = max(0, cur - int(dmg_final))
-                        hp['current'] = int(new_cur)
-                        defender_data['hp'] = hp
-                        await self._save_record(defender_data.get('name') or target, defender_data)
-                        apply_text = f"\n• {defender_data.get('name') or target} HP: {cur} → {new_cur}"
+                        res = await self._damage_record(target, dmg_final)
+                        if res is not None:
+                            apply_text = f"\n• {dlabel} HP: {res[0]} → {res[1]}"
+                    except CommitError:
+                        apply_text = f"\n⚠️ {dlabel} HP change could not be saved"
                     except Exception:
                         apply_text = ''
                 elif defender_entry is not None and defender_entry.get('hp') is not None:
@@ -257,6 +303,7 @@ class InitiativeCog(commands.Cog):
                         cur = 0
                     new_cur = max(0, cur - int(dmg_final))
                     defender_entry['hp'] = int(new_cur)
+                    enc.touch()
                     apply_text = f"\n• {defender_entry.get('name')} HP: {cur} → {new_cur}"
 
             title_weapon = f" with {chosen_label}" if chosen_label else ""
@@ -334,14 +381,12 @@ class InitiativeCog(commands.Cog):
                 except Exception:
                     tac = None
             else:
-                tq = tname.lower()
-                for e in init_mod.INITIATIVE_ORDER:
-                    if tq == str(e.get('name','')).strip().lower() or tq == str(e.get('abbr','')).strip().lower():
-                        try:
-                            tac = int(e.get('ac')) if e.get('ac') is not None else None
-                        except Exception:
-                            tac = None
-                        break
+                e = enc.find(tname)
+                if e is not None:
+                    try:
+                        tac = int(e.get('ac')) if e.get('ac') is not None else None
+                    except Exception:
+                        tac = None
             if tac is not None:
                 outcome = f" vs AC {tac} " + ('HIT' if total >= tac else 'MISS')
         if target and tac is not None and total >= tac:
@@ -349,22 +394,17 @@ class InitiativeCog(commands.Cog):
             tname = target.strip()
             tchar = await self._load_record(tname)
             if tchar:
+                tlabel = tchar.get('name') or tname
                 try:
-                    hp = tchar.get('hp', {}) if isinstance(tchar.get('hp'), dict) else {}
-                    cur = int(hp.get('current', 0) or 0)
-                    new_cur = max(0, cur - int(dmg_final))
-                    hp['current'] = int(new_cur)
-                    tchar['hp'] = hp
-                    await self._save_record(tchar.get('name') or tname, tchar)
-                    apply_text = f"\n• {tchar.get('name') or tname} HP: {cur} → {new_cur}"
+                    res = await self._damage_record(tname, dmg_final)
+                    if res is not None:
+                        apply_text = f"\n• {tlabel} HP: {res[0]} → {res[1]}"
+                except CommitError:
+                    apply_text = f"\n⚠️ {tlabel} HP change could not be saved"
                 except Exception:
                     apply_text = ''
             else:
-                tq = tname.lower()
-                tgt = None
-                for e in init_mod.INITIATIVE_ORDER:
-                    if tq == str(e.get('name','')).strip().lower() or tq == str(e.get('abbr','')).strip().lower():
-                        tgt = e; break
+                tgt = enc.find(tname)
                 if tgt is not None and tgt.get('hp') is not None:
                     try:
                         cur = int(tgt.get('hp') or 0)
@@ -372,6 +412,7 @@ class InitiativeCog(commands.Cog):
                         cur = 0
                     new_cur = max(0, cur - int(dmg_final))
                     tgt['hp'] = int(new_cur)
+                    enc.touch()
                     apply_text = f"\n• {tgt.get('name')} HP: {cur} → {new_cur}"
 
         emb = discord.Embed(title=f"{name} attacks", description=f"{choice.get('display')}")
@@ -386,9 +427,10 @@ class InitiativeCog(commands.Cog):
     async def init_attack_weapon_ac(self, interaction: discord.Interaction, current: str):
         # Only offer when current actor is a character
         choices: list[app_commands.Choice[str]] = []
-        if not (init_mod.INITIATIVE_ORDER and init_mod.CURRENT_TURN_INDEX is not None):
+        enc = await encounter_for(interaction, create=False)
+        actor = enc.current() if enc is not None else None
+        if actor is None:
             return choices
-        actor = init_mod.INITIATIVE_ORDER[init_mod.CURRENT_TURN_INDEX]
         nm = actor.get('name') or ''
         char = await self._load_record(nm)
         if not char:
@@ -442,7 +484,8 @@ class InitiativeCog(commands.Cog):
         q = (current or '').strip().lower()
         choices: list[app_commands.Choice[str]] = []
         # Initiative entries first
-        for e in init_mod.INITIATIVE_ORDER:
+        enc = await encounter_for(interaction, create=False)
+        for e in (enc.entries if enc is not None else ()):
             disp = e.get('name') or e.get('display') or ''
             ab = e.get('abbr') or ''
             show = f"{disp} [{ab}]" if ab else str(disp)
@@ -453,15 +496,8 @@ class InitiativeCog(commands.Cog):
                 break
         # Character files
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5]
-                if q and q not in nm.lower():
-                    continue
-                choices.append(app_commands.Choice(name=nm, value=nm))
-                if len(choices) >= 25:
-                    break
+            for e in get_index().search(q, limit=25 - len(choices)):
+                choices.append(app_commands.Choice(name=e.key, value=e.key))
         except Exception:
             pass
         return choices
@@ -471,12 +507,8 @@ class InitiativeCog(commands.Cog):
         # Suggest attacks from the current actor's saved 'atk' field
         q = (current or '').strip().lower()
         choices: list[app_commands.Choice[str]] = []
-        actor = None
-        if init_mod.INITIATIVE_ORDER and init_mod.CURRENT_TURN_INDEX is not None:
-            try:
-                actor = init_mod.INITIATIVE_ORDER[init_mod.CURRENT_TURN_INDEX]
-            except Exception:
-                actor = None
+        enc = await encounter_for(interaction, create=False)
+        actor = enc.current() if enc is not None else None
         if actor and actor.get('atk'):
             chunks = [c.strip() for c in re.split(r"[;,]", str(actor.get('atk'))) if c.strip()]
             for c in chunks:
@@ -495,13 +527,8 @@ class InitiativeCog(commands.Cog):
     )
     async def init_hp(self, interaction: discord.Interaction, name: str, value: int, add: bool = False):
         # Find entry
-        q = (name or '').strip().lower()
-        target = None
-        for e in init_mod.INITIATIVE_ORDER:
-            nm = str(e.get('name','')).strip().lower()
-            ab = str(e.get('abbr','')).strip().lower()
-            if q == nm or q == ab:
-                target = e; break
+        enc = await encounter_for(interaction)
+        target = enc.find(name)
         if not target:
             await interaction.response.send_message(f"'{name}' not found in initiative.", ephemeral=True)
             return
@@ -514,13 +541,15 @@ class InitiativeCog(commands.Cog):
         else:
             new_val = max(0, int(value))
         target['hp'] = int(new_val)
+        enc.touch()
         await interaction.response.send_message(f"🩸 {target.get('name')} HP: {cur} → {new_val}")
 
     @init_hp.autocomplete('name')
     async def init_hp_name_ac(self, interaction: discord.Interaction, current: str):
         q = (current or '').strip().lower()
         items = []
-        for e in init_mod.INITIATIVE_ORDER:
+        enc = await encounter_for(interaction, create=False)
+        for e in (enc.entries if enc is not None else ()):
             disp = e.get('name') or e.get('display')
             ab = e.get('abbr')
             show = f"{disp} [{ab}]" if ab else str(disp)
@@ -539,13 +568,8 @@ class InitiativeCog(commands.Cog):
         add="If true, adds value as a delta instead of setting absolute"
     )
     async def init_ac(self, interaction: discord.Interaction, name: str, value: int, add: bool = False):
-        q = (name or '').strip().lower()
-        target = None
-        for e in init_mod.INITIATIVE_ORDER:
-            nm = str(e.get('name','')).strip().lower()
-            ab = str(e.get('abbr','')).strip().lower()
-            if q == nm or q == ab:
-                target = e; break
+        enc = await encounter_for(interaction)
+        target = enc.find(name)
         if not target:
             await interaction.response.send_message(f"'{name}' not found in initiative.", ephemeral=True)
             return
@@ -559,6 +583,7 @@ class InitiativeCog(commands.Cog):
         else:
             new_val = int(value)
         target['ac'] = int(new_val)
+        enc.touch()
         if cur is None:
             await interaction.response.send_message(f"🛡️ {target.get('name')} AC set to {new_val}")
         else:
@@ -570,12 +595,13 @@ class InitiativeCog(commands.Cog):
 
     @init.command(name="list", description="Show current initiative order")
     async def init_list(self, interaction: discord.Interaction):
-        order = init_mod.INITIATIVE_ORDER
-        if not order:
+        enc = await encounter_for(interaction, create=False)
+        if not enc:
             await interaction.response.send_message("⚠️ No participants in initiative.", ephemeral=True)
             return
-        rnd = int(init_mod.COMBAT_ROUND or 0) or 1
-        idx = init_mod.CURRENT_TURN_INDEX
+        order = enc.entries
+        rnd = int(enc.round or 0) or 1
+        idx = enc.current_index
         lines: list[str] = [f"__Initiative Order — Round {rnd}:__"]
         for i, e in enumerate(order):
             marker = "➡️" if (idx is not None and i == idx) else "  "
@@ -621,15 +647,15 @@ class InitiativeCog(commands.Cog):
     @app_commands.describe(amount="Total XP to split evenly among characters", note="Optional note recorded to each character")
     async def init_xp(self, interaction: discord.Interaction, amount: int, note: str | None = None):
         # Collect characters currently in initiative
-        from modules import initiative as init_mod
-        chars: list[dict] = []
-        names: list[str] = []
-        for e in init_mod.INITIATIVE_ORDER:
-            rec = await self._load_record(e.get('name') or '')
-            if rec:
-                chars.append(rec)
-                names.append(rec.get('name') or str(e.get('name')))
-        if not chars:
+        enc = await encounter_for(interaction)
+        entry_names = [str(e.get('name') or '') for e in enc.entries if e.get('name')]
+        # Permission: allow admins to award to all; otherwise restrict to awarding only to characters owned by issuer.
+        # Decided from the owner index, so characters the issuer may not award are never loaded.
+        member = interaction.guild and interaction.guild.get_member(interaction.user.id)
+        is_admin = bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
+        allowed, refused = get_owner_index().partition(entry_names, interaction.user.id, is_admin)
+        count = len(allowed) + len(refused)
+        if not count:
             await interaction.response.send_message("No characters in initiative to award XP.", ephemeral=True)
             return
         # Compute split (integer division), ignore remainder
@@ -638,37 +664,22 @@ class InitiativeCog(commands.Cog):
         except Exception:
             await interaction.response.send_message("Amount must be an integer.", ephemeral=True)
             return
-        each = max(0, total // len(chars))
-        if each <= 0:
-            await interaction.response.send_message(f"Amount {amount} too small to split among {len(chars)} characters.", ephemeral=True)
+        if total // count <= 0:
+            await interaction.response.send_message(f"Amount {amount} too small to split among {count} characters.", ephemeral=True)
             return
-        # Permission: allow admins to award to all; otherwise restrict to awarding only to characters owned by issuer
-        member = interaction.guild and interaction.guild.get_member(interaction.user.id)
-        is_admin = bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
-        awarded: list[str] = []
-        skipped: list[str] = []
-        for data in chars:
-            if not is_admin and str(data.get('owner')) != str(interaction.user.id):
-                skipped.append(data.get('name') or 'Unknown')
-                continue
-            try:
-                cur = int(data.get('xp', 0) or 0)
-            except Exception:
-                cur = 0
-            new_val = max(0, cur + each)
-            data['xp'] = int(new_val)
-            if note:
-                notes = data.setdefault('notes', {})
-                log = notes.setdefault('xp_log', [])
-                if isinstance(log, list):
-                    log.append({'delta': int(each), 'share_of': int(total), 'by': int(interaction.user.id), 'note': note})
-            await self._save_record(data.get('name') or 'unknown', data)
-            awarded.append(f"{data.get('name')} +{each} (now {new_val})")
+        # Awarded characters are loaded concurrently, then committed together after the split is applied
+        try:
+            async with get_repository().transaction(*allowed) as recs:
+                split = split_xp(unique_records(recs), total, shares=count, by=interaction.user.id, note=note)
+        except CommitError:
+            await interaction.response.send_message("Failed to save the XP award.", ephemeral=True)
+            return
+        skipped = [_display_name(k) for k in refused]
         # Build summary
-        lines = [f"XP distribution: total {total}, {len(chars)} characters, each +{each}."]
-        if awarded:
+        lines = [f"XP distribution: total {total}, {count} characters, each +{split.each}."]
+        if split.awarded:
             lines.append("Awarded:")
-            lines.extend([f"• {t}" for t in awarded])
+            lines.extend([f"• {n} +{split.each} (now {xp})" for n, xp in split.awarded])
         if skipped:
             lines.append("Skipped (not owner; admin required):")
             lines.extend([f"• {n}" for n in skipped])
@@ -719,17 +730,17 @@ class InitiativeCog(commands.Cog):
             parts = [p.strip() for p in tags.split(',') if p.strip()]
             tags_list = [p.lower() for p in parts]
 
-        # HD roller
-        def roll_hd(hd_expr: str) -> int | None:
-            if not hd_expr:
-                return None
-            s = hd_expr.strip().lower()
-            m = re.search(r"(\d+)d(\d+)([+-]\d+)?", s)
+        # HD and initiative for the whole group in one batch each
+        def roll_hd(hd_expr: str, n_rolls: int) -> list[int | None]:
+            m = re.search(r"(\d+)d(\d+)([+-]\d+)?", (hd_expr or '').strip().lower())
             if not m:
-                return None
-            n = int(m.group(1)); sides = int(m.group(2)); mod = int(m.group(3) or 0)
-            total = sum(random.randint(1, sides) for _ in range(max(1, n))) + mod
-            return max(1, int(total))
+                return [None] * n_rolls
+            n = max(1, int(m.group(1))); sides = int(m.group(2)); mod = int(m.group(3) or 0)
+            expr = f"{n}d{sides}{mod:+d}" if mod else f"{n}d{sides}"
+            return [max(1, int(total)) for total, _ in roll_many(expr, n_rolls)]
+
+        hp_rolls = roll_hd(hd, count)
+        init_rolls = roll_many('1d20', count)
 
         # Parse attacks: split by ';' or ',', trim, and validate each chunk as 'Name [+/-N] (NdX[+/-N])'
         atk_list: list[str] = []
@@ -751,11 +762,12 @@ class InitiativeCog(commands.Cog):
             atk_list = norm
 
         # Build entries
+        enc = await encounter_for(interaction)
         added = []
         base_name = name.strip()
         for i in range(1, count + 1):
             inst_name = base_name if count == 1 else f"{base_name} #{i}"
-            roll_total = random.randint(1, 20) + int(init_bonus)
+            roll_total = init_rolls[i - 1][0] + int(init_bonus)
             display = f"{inst_name} ({roll_total})"
             # Abbreviation
             words = re.findall(r"[A-Za-z0-9]+", base_name)
@@ -764,7 +776,7 @@ class InitiativeCog(commands.Cog):
                 initials = (base_name[:1] or 'X').upper()
             abbr = f"{initials}{i if count>1 else ''}"
             # HP
-            hp_value = roll_hd(hd) if hd else None
+            hp_value = hp_rolls[i - 1]
             entry = {
                 'name': inst_name,
                 'abbr': abbr,
@@ -796,39 +808,133 @@ class InitiativeCog(commands.Cog):
                 except Exception:
                     w = "—"
                 entry['sv'] = f"{r}/{f}/{w}"
-            init_mod.INITIATIVE_ORDER.append(entry)
+            enc.add(entry)
             added.append(entry)
-        init_mod.INITIATIVE_ORDER.sort(key=lambda x: x.get('roll', 0), reverse=True)
         if added:
-            names = ', '.join([f"{a.get('display')} [{a.get('abbr','')}]" for a in added])
+            names = ', '.join([f"{a.get('display')} [{a.get('abbr','')}]" for a in added[:20]])
+            if len(added) > 20:
+                names += f" … and {len(added) - 20} more (see /init list)"
             await interaction.response.send_message(f"✅ Added to initiative: {names}")
         else:
             await interaction.response.send_message("⚠️ Nothing was added.", ephemeral=True)
 
+    @init.command(name="mob_attack", description="Every member of a monster group attacks one target")
+    @app_commands.describe(
+        group="Monster group (e.g. Goblin for Goblin #1..#N) or any member's name/abbreviation",
+        target="Target character or initiative entry",
+        target_ac="Override the target's AC",
+        attack="Which saved attack to use (name contains)",
+        crit_table="Roll natural crits on this crit table (default: banner only)",
+        crit_die="Crit die for the crit table (default 1d4)",
+        fumble_die="Roll natural 1s on the fumble table with this die (e.g. 1d4)",
+    )
+    @app_commands.choices(crit_table=[
+        app_commands.Choice(name=f"Crit Table {r}", value=f"CRIT_{r}") for r in ('I', 'II', 'III', 'IV', 'V')
+    ])
+    async def init_mob_attack(self, interaction: discord.Interaction, group: str, target: str, target_ac: int | None = None, attack: str | None = None, crit_table: app_commands.Choice[str] | None = None, crit_die: str | None = None, fumble_die: str | None = None):
+        enc = await encounter_for(interaction)
+        members = enc.group(group)
+        if not members:
+            await interaction.response.send_message(f"No monster group '{group}' in initiative.", ephemeral=True)
+            return
+        # Resolve the target once: character record first, then initiative entry
+        tname = target.strip()
+        tchar = await self._load_record(tname)
+        tentry = None if tchar else enc.find(tname)
+        if tchar is None and tentry is None:
+            await interaction.response.send_message(f"Target '{target}' not found (no character or initiative entry).", ephemeral=True)
+            return
+        tac = target_ac
+        if tac is None:
+            try:
+                if tchar is not None:
+                    tac = int(tchar.get('ac', 10) or 10)
+                elif tentry.get('ac') is not None:
+                    tac = int(tentry.get('ac'))
+            except Exception:
+                tac = None
+        label = (tchar or tentry).get('name') or tname
+        result = resolve_mob_attack(
+            members, target_ac=tac, attack=attack,
+            crit_table=crit_table.value if isinstance(crit_table, app_commands.Choice) else None,
+            crit_die=crit_die or '1d4', fumble_die=fumble_die,
+        )
+        if not result.attacks:
+            await interaction.response.send_message(f"Nobody in '{group}' can attack: {', '.join(result.skipped)}", ephemeral=True)
+            return
+        # One write for the whole mob
+        applied = ''
+        dmg = result.damage_total
+        if dmg and tac is not None:
+            if tchar is not None:
+                try:
+                    async with get_repository().transaction(tname) as (rec,):
+                        if rec is not None:
+                            hp = rec.get('hp', {}) if isinstance(rec.get('hp'), dict) else {}
+                            cur = int(hp.get('current', 0) or 0)
+                            new_cur = max(0, cur - int(dmg))
+                            hp['current'] = int(new_cur)
+                            rec['hp'] = hp
+                            applied = f"{label} HP: {cur} → {new_cur}"
+                except CommitError:
+                    applied = f"⚠️ {label} HP change could not be saved"
+            elif tentry.get('hp') is not None:
+                try:
+                    cur = int(tentry.get('hp') or 0)
+                except Exception:
+                    cur = 0
+                new_cur = max(0, cur - int(dmg))
+                tentry['hp'] = int(new_cur)
+                enc.touch()
+                applied = f"{label} HP: {cur} → {new_cur}"
+        pages = _mob_attack_pages(group_label=members[0].get('name') if len(members) == 1 else group, target=label, result=result, applied=applied)
+        view = _PagedEmbeds(pages) if len(pages) > 1 else None
+        if view is not None:
+            await interaction.response.send_message(embed=pages[0], view=view)
+        else:
+            await interaction.response.send_message(embed=pages[0])
+
+    @init_mob_attack.autocomplete('group')
+    async def init_mob_group_ac(self, interaction: discord.Interaction, current: str):
+        q = (current or '').strip().lower()
+        enc = await encounter_for(interaction, create=False)
+        items: list[app_commands.Choice[str]] = []
+        for g, n in (enc.groups() if enc is not None else ()):
+            if q and q not in g.lower():
+                continue
+            items.append(app_commands.Choice(name=f"{g} ({n})", value=g))
+            if len(items) >= 25:
+                break
+        return items
+
+    @init_mob_attack.autocomplete('target')
+    async def init_mob_target_ac(self, interaction: discord.Interaction, current: str):
+        return await self.init_attack_target_ac(interaction, current)
+
+    @init_mob_attack.autocomplete('attack')
+    async def init_mob_attack_ac(self, interaction: discord.Interaction, current: str):
+        q = (current or '').strip().lower()
+        gname = str(getattr(interaction.namespace, 'group', '') or '')
+        enc = await encounter_for(interaction, create=False)
+        members = enc.group(gname) if enc is not None else []
+        choices: list[app_commands.Choice[str]] = []
+        if members and members[0].get('atk'):
+            for c in [c.strip() for c in re.split(r"[;,]", str(members[0].get('atk'))) if c.strip()]:
+                if q and q not in c.lower():
+                    continue
+                choices.append(app_commands.Choice(name=c[:100], value=c[:100]))
+                if len(choices) >= 25:
+                    break
+        return choices
+
     # Autocomplete for names
     @init_join.autocomplete('name')
     async def init_join_name_ac(self, interaction: discord.Interaction, current: str):
         cur = (current or '').lower()
         items = []
         try:
-            for fname in os.listdir(SAVE_FOLDER):
-                if not fname.endswith('.json'):
-                    continue
-                path = os.path.join(SAVE_FOLDER, fname)
-                disp = None
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        disp = str(data.get('name') or '')
-                except Exception:
-                    disp = None
-                if not disp:
-                    disp = fname[:-5].replace('_', ' ')
-                if cur and cur not in disp.lower():
-                    continue
+            for disp in get_index().names(cur):
                 items.append(app_commands.Choice(name=disp, value=disp))
-                if len(items) >= 25:
-                    break
         except Exception:
             pass
         return items
@@ -1,6 +1,5 @@
 from __future__ import annotations
 import os
-import json
 import random
 from typing import List, Optional
 
@@ -9,6 +8,7 @@ from discord import app_commands
 from discord.ext import commands
 
 from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository  # type: ignore
 from modules.data_constants import (
     DWARF_LANGUAGE_TABLE,
     ELF_LANGUAGE_TABLE,
@@ -153,19 +153,10 @@ class LanguagesCog(commands.Cog):
             await interaction.response.send_message(f"📘 {data.get('name', name)} already knows all possible languages from this table.", ephemeral=True)
 
     async def _load_character(self, name: str) -> Optional[dict]:
-        path = _char_path(name)
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_character(self, name: str, data: dict) -> None:
-        path = _char_path(name)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        await get_repository().save(name, data)
 
     @app_commands.command(name="lang", description="Learn or modify languages for a character")
     @app_commands.describe(name="Character name, e.g., Char1", op="Optional: +elvish to add, -elvish to remove")
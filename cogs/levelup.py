@@ -1,5 +1,4 @@
 import os
-import json
 import random
 from typing import Optional, Iterable
 
@@ -7,9 +6,13 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from modules.spellbook import spell_ref  # type: ignore
+from modules.reference import reference  # type: ignore
 from modules.data_constants import WIZARD_LANGUAGE_TABLE, WEAPON_TABLE, DWARF_LANGUAGE_TABLE, ELF_LANGUAGE_TABLE, HALFLING_LANGUAGE_TABLE  # type: ignore
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository, record_key  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from storage.index import get_index  # type: ignore
 
 # XP thresholds from DCC table (level -> required XP)
 LEVEL_THRESHOLDS = [0, 10, 50, 110, 190, 290, 410, 550, 710, 890, 1090]
@@ -141,25 +144,10 @@ class LevelUpCog(commands.Cog):
         return (chosen[0] if chosen else None)
 
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     async def _save_record(self, name: str, data: dict) -> bool:
-        safe = (data.get('name') or name).strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            return True
-        except Exception:
-            return False
+        return await get_repository().save(data.get('name') or name, data)
 
     def _get_sta_mod(self, data: dict) -> int:
         try:
@@ -261,12 +249,8 @@ class LevelUpCog(commands.Cog):
 
     # ---- spells helpers ----
     def _load_spells_data(self) -> dict:
-        try:
-            path = os.path.join(self._root_dir(), 'Spells.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        # Shared, read-only parse of Spells.json (reloaded when the file changes)
+        return reference('Spells.json', {})
 
     def _cleric_spell_names(self, spells_data: dict, lvl: int) -> list[str]:
         # Spells.json structure: { "spells": { "Cleric Spells": { "level 1": { ... } } } }
@@ -276,10 +260,8 @@ class LevelUpCog(commands.Cog):
         return []
 
     def _spell_payload(self, spells_data: dict, lvl: int, name: str) -> dict:
-        data = spells_data.get('spells', {}).get('Cleric Spells', {}).get(f'level {lvl}', {}).get(name, {})
-        if isinstance(data, dict):
-            return {'name': name, **data}
-        return {'name': name}
+        # Records keep a reference only; the payload is hydrated from Spells.json when needed
+        return spell_ref(name, lvl)
 
     # Wizard spell helpers (arcane)
     def _wizard_spell_names(self, spells_data: dict, lvl: int) -> list[str]:
@@ -289,10 +271,7 @@ class LevelUpCog(commands.Cog):
         return []
 
     def _wizard_spell_payload(self, spells_data: dict, lvl: int, name: str) -> dict:
-        data = spells_data.get('spells', {}).get('Wizard Spells', {}).get(f'level {lvl}', {}).get(name, {})
-        if isinstance(data, dict):
-            return {'name': name, **data}
-        return {'name': name}
+        return spell_ref(name, lvl)
 
     def _mercurial_effect(self, spells_data: dict, roll: int) -> str:
         """Resolve a d100 roll on MercurialMagicTable in Spells.json and return the effect text."""
@@ -452,12 +431,7 @@ class LevelUpCog(commands.Cog):
     # ---- wizard patrons ----
     def _load_patrons_data(self) -> dict:
         """Load wizard patrons JSON from data/wizard_patrons.json."""
-        try:
-            path = os.path.join(self._root_dir(), 'data', 'wizard_patrons.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        return reference('data/wizard_patrons.json', {})
 
     def _patron_names(self, patrons_data: dict) -> list[str]:
         """Return all patron names present in the JSON, preserving file order.
@@ -517,25 +491,20 @@ class LevelUpCog(commands.Cog):
             return []
 
     def _patron_spell_payload(self, patrons_data: dict, patron_name: str, lvl: int, spell_name: str) -> dict:
-        """Return a deep-ish copy of the patron spell entry payload for attaching to a character record."""
-        import copy
+        """Return the patron spell reference to attach to a character record (payload hydrates from wizard_patrons.json)."""
         try:
             entry = self._find_patron_entry(patrons_data, patron_name)
-            if not isinstance(entry, dict):
-                return {'name': spell_name}
-            spells = entry.get('spells')
-            key = f'level_{int(lvl)}'
-            arr = spells.get(key) if isinstance(spells, dict) else None
+            if isinstance(entry, dict) and entry.get('name'):
+                patron_name = entry.get('name')
+            spells = entry.get('spells') if isinstance(entry, dict) else None
+            arr = spells.get(f'level_{int(lvl)}') if isinstance(spells, dict) else None
             if isinstance(arr, list):
                 for s in arr:
                     if isinstance(s, dict) and str(s.get('name','')).strip().lower() == spell_name.strip().lower():
-                        payload = copy.deepcopy(s)
-                        payload['source'] = 'patron'
-                        payload['patron'] = entry.get('name')
-                        return payload
+                        return spell_ref(s.get('name') or spell_name, lvl, source='patron', patron=patron_name)
         except Exception:
             pass
-        return {'name': spell_name, 'source': 'patron', 'patron': patron_name}
+        return spell_ref(spell_name, lvl, source='patron', patron=patron_name)
 
     def _grant_patron_spells(self, data: dict, allowed_levels: list[int]) -> list[str]:
         """Grant patron-specific spells up to allowed_levels. Returns summary strings per level.
@@ -720,13 +689,30 @@ class LevelUpCog(commands.Cog):
             return random.choice(deity_list)
         return selected[0] if selected else None
 
-    async def _do_level_up(self, interaction: discord.Interaction, data: dict, class_key: str, note: Optional[str]):
-        # Permissions: owner or admin
+    async def _load_owned(self, interaction: discord.Interaction, name: str) -> Optional[dict]:
+        """Load a character to level up, after an owner-or-admin check on the owner index.
+
+        Replies and returns None when the character is missing or not the caller's;
+        a refused caller never causes the record to be read.
+        """
+        key = record_key(name)
+        owners = get_owner_index()
+        if not owners.exists(key):
+            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+            return None
         member = interaction.guild and interaction.guild.get_member(interaction.user.id)
         is_admin = bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
-        if not is_admin and str(data.get('owner')) != str(interaction.user.id):
+        if not is_admin and owners.owner_of(key) != str(interaction.user.id):
             await interaction.response.send_message("You do not own this character.", ephemeral=True)
-            return
+            return None
+        data = await self._load_record(name)
+        if not data:
+            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+            return None
+        return data
+
+    async def _do_level_up(self, interaction: discord.Interaction, data: dict, class_key: str, note: Optional[str]):
+        # Permissions (owner or admin) are checked by _load_owned before the record is loaded
 
         # Disallow multiclassing: if character already has a non-0-level class different from the requested one, block
         def _canon_class(s: str) -> str:
@@ -870,9 +856,8 @@ class LevelUpCog(commands.Cog):
         randomize: bool | None = False,
         choose_deity: bool | None = False,
     ):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         # First perform the base level-up (HP, level, log)
         await self._do_level_up(interaction, data, 'cleric', note)
@@ -1035,9 +1020,8 @@ class LevelUpCog(commands.Cog):
 
     @levelup.command(name="warrior", description="Level up a Warrior")
     async def levelup_warrior(self, interaction: discord.Interaction, name: str, note: str | None = None):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         # Base level-up (HP, level, log)
         await self._do_level_up(interaction, data, 'warrior', note)
@@ -1170,9 +1154,8 @@ class LevelUpCog(commands.Cog):
 
     # Internal implementation for Wizard level-up (formerly exposed as 'mage')
     async def _levelup_mage_impl(self, interaction: discord.Interaction, name: str, note: str | None = None, randomize: bool | None = False):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         await self._do_level_up(interaction, data, 'mage', note)
         # Apply Wizard progression per level (from provided CSV)
@@ -1563,9 +1546,8 @@ class LevelUpCog(commands.Cog):
 
     @levelup.command(name="thief", description="Level up a Thief")
     async def levelup_thief(self, interaction: discord.Interaction, name: str, note: str | None = None):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         # Base level-up (HP, level, log)
         await self._do_level_up(interaction, data, 'thief', note)
@@ -1716,9 +1698,8 @@ class LevelUpCog(commands.Cog):
 
     @levelup.command(name="dwarf", description="Level up a Dwarf")
     async def levelup_dwarf(self, interaction: discord.Interaction, name: str, note: str | None = None):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         # Base level-up (HP, level, log)
         await self._do_level_up(interaction, data, 'dwarf', note)
@@ -1895,9 +1876,8 @@ class LevelUpCog(commands.Cog):
 
     @levelup.command(name="elf", description="Level up an Elf")
     async def levelup_elf(self, interaction: discord.Interaction, name: str, note: str | None = None, randomize: bool | None = False):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         await self._do_level_up(interaction, data, 'elf', note)
         # Apply Elf progression (attack, crit, action dice, saves) and caster flow (patron, spells)
@@ -2302,9 +2282,8 @@ class LevelUpCog(commands.Cog):
 
     @levelup.command(name="halfling", description="Level up a Halfling")
     async def levelup_halfling(self, interaction: discord.Interaction, name: str, note: str | None = None):
-        data = await self._load_record(name)
-        if not data:
-            await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
+        data = await self._load_owned(interaction, name)
+        if data is None:
             return
         await self._do_level_up(interaction, data, 'halfling', note)
         # Apply Halfling progression (attack, crit, action dice, saves, luck die)
@@ -2559,15 +2538,8 @@ class LevelUpCog(commands.Cog):
         q = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5]
-                if q and q not in nm.lower():
-                    continue
-                items.append(app_commands.Choice(name=nm, value=nm))
-                if len(items) >= 25:
-                    break
+            for e in get_index().search(q):
+                items.append(app_commands.Choice(name=e.key, value=e.key))
         except Exception:
             pass
         return items
@@ -1,12 +1,12 @@
-import os
-import json
 from typing import Optional, List
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.index import get_index, normalize_name  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from storage.repository import get_repository, record_key  # type: ignore
 
 
 # Slash command group: /list ...
@@ -18,21 +18,7 @@ list_group = app_commands.Group(name="list", description="List various things (c
 async def list_characters(interaction: discord.Interaction, user: Optional[discord.User] = None):
     target = user or interaction.user
     # Scan character files owned by target
-    names: List[str] = []
-    try:
-        for entry in os.scandir(SAVE_FOLDER):
-            if not entry.is_file() or not entry.name.lower().endswith('.json'):
-                continue
-            try:
-                with open(entry.path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if str(data.get('owner')) == str(target.id):
-                    nm = data.get('name') or os.path.splitext(entry.name)[0]
-                    names.append(str(nm))
-            except Exception:
-                continue
-    except FileNotFoundError:
-        pass
+    names: List[str] = [e.display for e in get_index().owned_by(target.id)]
 
     if not names:
         await interaction.response.send_message(f"No characters found for {target.mention}.", ephemeral=True)
@@ -62,49 +48,47 @@ async def list_characters(interaction: discord.Interaction, user: Optional[disco
             await interaction.followup.send("```\n" + ''.join(chunk) + "```", ephemeral=True)
 
 
+def _resolve_character(name: str) -> tuple[Optional[str], str]:
+    """(record key, display name) by file name or case-insensitive 'name' field.
+
+    Answered from the owner and character indexes; no record is read.
+    """
+    owners = get_owner_index()
+    key = record_key(name)
+    if owners.exists(key):
+        e = get_index().get(key)
+        return key, (e.display if e is not None else name)
+    want = normalize_name(name)
+    for e in get_index().search(name):
+        if normalize_name(e.display) == want and owners.exists(e.key):
+            return e.key, e.display
+    return None, name
+
+
+def _may_delete(key: str, user: discord.abc.User, is_admin: bool) -> bool:
+    return is_admin or get_owner_index().owner_of(key) == str(user.id)
+
+
 @list_group.command(name="delete", description="Delete a character you own (admins can delete any)")
 @app_commands.describe(name="Character name to delete")
 async def delete_character_slash(interaction: discord.Interaction, name: str):
     # Only owner or guild admin can delete
-    # Resolve file path by direct name or by scanning the folder for matching 'name'
-    direct = os.path.join(SAVE_FOLDER, f"{name}.json")
-    path = direct if os.path.exists(direct) else None
-    if not path:
-        # try case-insensitive match on the 'name' field
-        try:
-            for entry in os.scandir(SAVE_FOLDER):
-                if not entry.is_file() or not entry.name.lower().endswith('.json'):
-                    continue
-                try:
-                    with open(entry.path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    if str(data.get('name','')).strip().lower() == name.strip().lower():
-                        path = entry.path
-                        break
-                except Exception:
-                    continue
-        except FileNotFoundError:
-            pass
-    if not path or not os.path.exists(path):
+    key, display = _resolve_character(name)
+    if not key:
         await interaction.response.send_message(f"Character '{name}' not found.", ephemeral=True)
         return
 
     # Permission check
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except Exception as e:
-        await interaction.response.send_message(f"Could not read file: {e}", ephemeral=True)
-        return
     member = interaction.guild and interaction.guild.get_member(interaction.user.id)
     is_admin = bool(member and member.guild_permissions.administrator)
-    if not is_admin and str(data.get('owner')) != str(interaction.user.id):
+    if not _may_delete(key, interaction.user, is_admin):
         await interaction.response.send_message("You do not own this character.", ephemeral=True)
         return
 
     try:
-        os.remove(path)
-        await interaction.response.send_message(f"Deleted '{data.get('name', name)}'.", ephemeral=True)
+        if not await get_repository().delete(key):
+            raise OSError('file not found')
+        await interaction.response.send_message(f"Deleted '{display}'.", ephemeral=True)
     except Exception as e:
         await interaction.response.send_message(f"Delete failed: {e}", ephemeral=True)
 
@@ -178,21 +162,7 @@ class ListCog(commands.Cog):
     @commands.command(name="listchars", help="List your characters or another member's characters")
     async def listchars_prefix(self, ctx: commands.Context, member: Optional[discord.Member] = None):
         target = member or ctx.author
-        names: List[str] = []
-        try:
-            for entry in os.scandir(SAVE_FOLDER):
-                if not entry.is_file() or not entry.name.lower().endswith('.json'):
-                    continue
-                try:
-                    with open(entry.path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    if str(data.get('owner')) == str(target.id):
-                        nm = data.get('name') or os.path.splitext(entry.name)[0]
-                        names.append(str(nm))
-                except Exception:
-                    continue
-        except FileNotFoundError:
-            pass
+        names: List[str] = [e.display for e in get_index().owned_by(target.id)]
 
         if not names:
             await ctx.send(f"No characters found for {target.mention}.")
@@ -210,42 +180,21 @@ class ListCog(commands.Cog):
     @commands.command(name="deletechar", help="Delete a character you own (admins can delete any)")
     @commands.guild_only()
     async def deletechar_prefix(self, ctx: commands.Context, *, name: str):
-        # resolve path
-        direct = os.path.join(SAVE_FOLDER, f"{name}.json")
-        path = direct if os.path.exists(direct) else None
-        if not path:
-            try:
-                for entry in os.scandir(SAVE_FOLDER):
-                    if not entry.is_file() or not entry.name.lower().endswith('.json'):
-                        continue
-                    try:
-                        with open(entry.path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        if str(data.get('name','')).strip().lower() == name.strip().lower():
-                            path = entry.path
-                            break
-                    except Exception:
-                        continue
-            except FileNotFoundError:
-                pass
-        if not path or not os.path.exists(path):
+        # resolve record (indexes only)
+        key, display = _resolve_character(name)
+        if not key:
             await ctx.send(f"Character '{name}' not found.")
             return
 
         # permission: owner or admin
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            await ctx.send(f"Could not read file: {e}")
-            return
         is_admin = bool(ctx.author.guild_permissions and ctx.author.guild_permissions.administrator)
-        if not is_admin and str(data.get('owner')) != str(ctx.author.id):
+        if not _may_delete(key, ctx.author, is_admin):
             await ctx.send("You do not own this character.")
             return
         try:
-            os.remove(path)
-            await ctx.send(f"Deleted '{data.get('name', name)}'.")
+            if not await get_repository().delete(key):
+                raise OSError('file not found')
+            await ctx.send(f"Deleted '{display}'.")
         except Exception as e:
             await ctx.send(f"Delete failed: {e}")
 
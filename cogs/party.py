@@ -0,0 +1,294 @@
+from typing import List, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from storage.repository import get_repository, CommitError  # type: ignore
+from storage.index import get_index  # type: ignore
+from storage.parties import get_party_store  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from modules.party import SAVE_LABELS, roll_saves, split_xp, unique_records  # type: ignore
+from modules.rest import rest_record  # type: ignore
+import logging
+logger = logging.getLogger('dccbot')
+
+# Every group command (/party xp|rest|save) opens ONE repository transaction
+# over all members: the records are loaded concurrently, the results are
+# computed in a single pass, changed records are written together in one batch,
+# and the reply is a single summary embed.
+
+SAVE_CHOICES = [app_commands.Choice(name=label, value=key) for key, label in SAVE_LABELS.items()]
+
+
+def _guild_id(interaction: discord.Interaction) -> int:
+    return int(interaction.guild_id or 0)
+
+
+def _is_manager(interaction: discord.Interaction) -> bool:
+    member = interaction.guild and interaction.guild.get_member(interaction.user.id)
+    return bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
+
+
+def _can_edit(interaction: discord.Interaction, party: dict) -> bool:
+    return _is_manager(interaction) or str(party.get('owner')) == str(interaction.user.id)
+
+
+def _display(key: str) -> str:
+    entry = get_index().get(key)
+    return entry.display if entry is not None else key.replace('_', ' ')
+
+
+def _summary(title: str, lines: List[str], footer: Optional[str] = None, color: int = 0x3498DB) -> discord.Embed:
+    text = "\n".join(lines) or "—"
+    if len(text) > 4000:
+        text = text[:3997] + '…'
+    emb = discord.Embed(title=title, description=text, color=color)
+    if footer:
+        emb.set_footer(text=footer)
+    return emb
+
+
+class PartyCog(commands.Cog):
+    """Named groups of characters with batched XP, rest and saves."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    party = app_commands.Group(name="party", description="Parties: group XP, rest and saves")
+
+    async def _get_party(self, interaction: discord.Interaction, name: str) -> Optional[dict]:
+        party = await get_party_store().get(_guild_id(interaction), name)
+        if party is None:
+            await interaction.response.send_message(f"Party '{name}' not found.", ephemeral=True)
+        elif not party.get('members'):
+            await interaction.response.send_message(f"Party '{party.get('name')}' has no members.", ephemeral=True)
+            return None
+        return party
+
+    # ---- membership ----
+    @party.command(name="create", description="Create a party")
+    @app_commands.describe(name="Party name", members="Comma-separated character names (optional)")
+    async def party_create(self, interaction: discord.Interaction, name: str, members: Optional[str] = None):
+        names = [m.strip() for m in (members or '').split(',') if m.strip()]
+        repo = get_repository()
+        missing = [n for n in names if not await repo.exists_async(n)]
+        if missing:
+            await interaction.response.send_message(f"Character(s) not found: {', '.join(missing)}", ephemeral=True)
+            return
+        ok = await get_party_store().create(_guild_id(interaction), name, interaction.user.id, names)
+        if not ok:
+            await interaction.response.send_message(f"Party '{name}' already exists.", ephemeral=True)
+            return
+        await interaction.response.send_message(f"Created party **{name.strip()}** with {len(names)} member(s).")
+
+    @party.command(name="add", description="Add a character to a party (party owner or admin)")
+    @app_commands.describe(party="Party name", character="Character name")
+    async def party_add(self, interaction: discord.Interaction, party: str, character: str):
+        store = get_party_store()
+        rec = await store.get(_guild_id(interaction), party)
+        if rec is None:
+            await interaction.response.send_message(f"Party '{party}' not found.", ephemeral=True)
+            return
+        if not _can_edit(interaction, rec):
+            await interaction.response.send_message("Only the party's creator or an admin can change its members.", ephemeral=True)
+            return
+        if not await get_repository().exists_async(character):
+            await interaction.response.send_message(f"Character '{character}' not found.", ephemeral=True)
+            return
+        members = await store.update_members(_guild_id(interaction), party, add=[character])
+        await interaction.response.send_message(f"Added {character} to **{rec.get('name')}** ({len(members or [])} members).")
+
+    @party.command(name="remove", description="Remove a character from a party (party owner or admin)")
+    @app_commands.describe(party="Party name", character="Character name")
+    async def party_remove(self, interaction: discord.Interaction, party: str, character: str):
+        store = get_party_store()
+        rec = await store.get(_guild_id(interaction), party)
+        if rec is None:
+            await interaction.response.send_message(f"Party '{party}' not found.", ephemeral=True)
+            return
+        if not _can_edit(interaction, rec):
+            await interaction.response.send_message("Only the party's creator or an admin can change its members.", ephemeral=True)
+            return
+        members = await store.update_members(_guild_id(interaction), party, remove=[character])
+        await interaction.response.send_message(f"Removed {character} from **{rec.get('name')}** ({len(members or [])} members).")
+
+    @party.command(name="delete", description="Delete a party (party owner or admin)")
+    @app_commands.describe(party="Party name")
+    async def party_delete(self, interaction: discord.Interaction, party: str):
+        store = get_party_store()
+        rec = await store.get(_guild_id(interaction), party)
+        if rec is None:
+            await interaction.response.send_message(f"Party '{party}' not found.", ephemeral=True)
+            return
+        if not _can_edit(interaction, rec):
+            await interaction.response.send_message("Only the party's creator or an admin can delete it.", ephemeral=True)
+            return
+        await store.delete(_guild_id(interaction), party)
+        await interaction.response.send_message(f"Deleted party **{rec.get('name')}**.")
+
+    @party.command(name="show", description="Show a party's members")
+    @app_commands.describe(party="Party name")
+    async def party_show(self, interaction: discord.Interaction, party: str):
+        rec = await get_party_store().get(_guild_id(interaction), party)
+        if rec is None:
+            await interaction.response.send_message(f"Party '{party}' not found.", ephemeral=True)
+            return
+        lines = []
+        for key in rec['members']:
+            e = get_index().get(key)
+            if e is None:
+                lines.append(f"• {key.replace('_', ' ')} (missing)")
+            else:
+                lines.append(f"• {e.display} — {f'Level {e.level} {e.char_class}'.strip()}" + (" 💀" if e.dead else ""))
+        await interaction.response.send_message(embed=_summary(f"Party: {rec.get('name')}", lines, f"{len(lines)} member(s)"))
+
+    @party.command(name="list", description="List this server's parties")
+    async def party_list(self, interaction: discord.Interaction):
+        names = await get_party_store().names(_guild_id(interaction))
+        if not names:
+            await interaction.response.send_message("No parties yet. Create one with /party create.", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=_summary("Parties", [f"• {n}" for n in names]))
+
+    # ---- group actions ----
+    @party.command(name="xp", description="Split XP evenly among a party's members")
+    @app_commands.describe(party="Party name", amount="Total XP to split evenly", note="Optional note recorded to each character")
+    async def party_xp(self, interaction: discord.Interaction, party: str, amount: int, note: Optional[str] = None):
+        rec = await self._get_party(interaction, party)
+        if rec is None:
+            return
+        # Same permission rule as /init xp: admins award to all, others only to their own characters
+        allowed, refused = get_owner_index().partition(rec['members'], interaction.user.id, _is_manager(interaction))
+        count = len(allowed) + len(refused)
+        if not count:
+            await interaction.response.send_message("None of the party's characters were found.", ephemeral=True)
+            return
+        if int(amount) // count <= 0:
+            await interaction.response.send_message(f"Amount {amount} too small to split among {count} characters.", ephemeral=True)
+            return
+        try:
+            async with get_repository().transaction(*allowed) as recs:
+                split = split_xp(unique_records(recs), int(amount), shares=count, by=interaction.user.id, note=note)
+        except CommitError:
+            await interaction.response.send_message("Failed to save the XP award.", ephemeral=True)
+            return
+        split.skipped = [_display(k) for k in refused]
+        lines = [f"• {n} +{split.each} (now {xp})" for n, xp in split.awarded]
+        if split.skipped:
+            lines.append("Skipped (not owner; admin required): " + ", ".join(split.skipped))
+        footer = f"Total {split.total}, {count} characters, each +{split.each}" + (f" — {note}" if note else "")
+        await interaction.response.send_message(embed=_summary(f"{rec.get('name')}: XP awarded", lines, footer, 0xF1C40F))
+
+    @party.command(name="rest", description="Rest every party member N day(s)")
+    @app_commands.describe(
+        party="Party name",
+        days="Number of days to rest (>=1)",
+        bed_rest="Bed rest (2 HP and 2 ability per day instead of 1)",
+        recover_luck="Recover Luck per day if class allows",
+        reset_disapproval="Reset Cleric disapproval to 1 at dawn",
+    )
+    async def party_rest(self, interaction: discord.Interaction, party: str, days: int = 1, bed_rest: bool = False,
+                         recover_luck: bool = True, reset_disapproval: bool = True):
+        rec = await self._get_party(interaction, party)
+        if rec is None:
+            return
+        try:
+            async with get_repository().transaction(*rec['members']) as recs:
+                chars = unique_records(recs)
+                results = [rest_record(c, days, bed_rest=bed_rest, luck=recover_luck, reset_disapproval=reset_disapproval) for c in chars]
+        except CommitError:
+            await interaction.response.send_message("Failed to save the rest.", ephemeral=True)
+            return
+        if not results:
+            await interaction.response.send_message("None of the party's characters were found.", ephemeral=True)
+            return
+        lines = []
+        for r in results:
+            bits = [f"HP +{r.healed}"]
+            ab = [f"{k} +{v}" for k, v in r.abilities.items() if v]
+            if ab:
+                bits.append(", ".join(ab))
+            if r.luck:
+                bits.append(f"Luck +{r.luck}")
+            if r.disapproval_reset:
+                bits.append("disapproval reset")
+            if r.spells_refreshed:
+                bits.append("spells refreshed")
+            if r.stabilized:
+                bits.append("⚠️ STA -1 (lasting injury)")
+            lines.append(f"• **{r.name}**: " + "; ".join(bits))
+        d = results[0].days
+        footer = f"{len(results)} character(s), {d} day(s)" + (" of bed rest" if bed_rest else "") + f", up to {results[0].hp_possible} HP each"
+        await interaction.response.send_message(embed=_summary(f"🛌 {rec.get('name')} rests", lines, footer, 0x2ECC71))
+
+    @party.command(name="save", description="Roll the same saving throw for every party member")
+    @app_commands.describe(party="Party name", save="Saving throw", dc="Optional DC to compare against", bonus="Flat bonus for everyone (optional)")
+    @app_commands.choices(save=SAVE_CHOICES)
+    async def party_save(self, interaction: discord.Interaction, party: str, save: app_commands.Choice[str],
+                         dc: Optional[int] = None, bonus: Optional[int] = 0):
+        rec = await self._get_party(interaction, party)
+        if rec is None:
+            return
+        # Saves change nothing, so the transaction commits no writes; it still loads every member concurrently
+        async with get_repository().transaction(*rec['members']) as recs:
+            chars = unique_records(recs)
+        if not chars:
+            await interaction.response.send_message("None of the party's characters were found.", ephemeral=True)
+            return
+        rolls = roll_saves(chars, save.value, dc, int(bonus or 0))
+        lines = []
+        for r in rolls:
+            mark = '' if r.passed is None else (" ✅" if r.passed else " ❌")
+            extra = f" {r.penalty:+} ({'; '.join(r.notes)})" if r.penalty else ''
+            bonus_txt = f" {int(bonus):+}" if bonus else ''
+            lines.append(f"• **{r.name}**: {r.roll} {r.modifier:+}{bonus_txt}{extra} = **{r.total}**{mark}")
+        title = f"🛡️ {rec.get('name')}: {SAVE_LABELS[save.value]} save" + (f" vs DC {dc}" if isinstance(dc, int) and dc > 0 else "")
+        footer = None
+        color = 0x3498DB
+        if isinstance(dc, int) and dc > 0:
+            passed = sum(1 for r in rolls if r.passed)
+            footer = f"{passed}/{len(rolls)} succeeded"
+            color = 0x2ECC71 if passed == len(rolls) else (0xE74C3C if passed == 0 else 0xE67E22)
+        await interaction.response.send_message(embed=_summary(title, lines, footer, color))
+
+    # ---- autocomplete ----
+    @party_add.autocomplete('party')
+    @party_remove.autocomplete('party')
+    @party_delete.autocomplete('party')
+    @party_show.autocomplete('party')
+    @party_xp.autocomplete('party')
+    @party_rest.autocomplete('party')
+    @party_save.autocomplete('party')
+    async def party_name_ac(self, interaction: discord.Interaction, current: str):
+        q = (current or '').strip().lower()
+        try:
+            names = await get_party_store().names(_guild_id(interaction))
+        except Exception:
+            return []
+        return [app_commands.Choice(name=n, value=n) for n in names if q in n.lower()][:25]
+
+    @party_add.autocomplete('character')
+    async def party_add_character_ac(self, interaction: discord.Interaction, current: str):
+        try:
+            return [app_commands.Choice(name=e.label, value=e.label) for e in get_index().search(current or '')]
+        except Exception:
+            return []
+
+    @party_remove.autocomplete('character')
+    async def party_remove_character_ac(self, interaction: discord.Interaction, current: str):
+        q = (current or '').strip().lower()
+        try:
+            rec = await get_party_store().get(_guild_id(interaction), str(getattr(interaction.namespace, 'party', '') or ''))
+        except Exception:
+            rec = None
+        out = []
+        for key in (rec or {}).get('members') or []:
+            label = _display(key)
+            if q in label.lower():
+                out.append(app_commands.Choice(name=label, value=key))
+        return out[:25]
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(PartyCog(bot))
@@ -0,0 +1,147 @@
+import time
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core.perf import get_monitor  # type: ignore
+from core.metrics import METRICS  # type: ignore
+from core.hooks import HOOKS  # type: ignore
+import logging
+logger = logging.getLogger('dccbot')
+
+
+def _is_admin(interaction: discord.Interaction) -> bool:
+    member = interaction.guild and interaction.guild.get_member(interaction.user.id)
+    return bool(member and member.guild_permissions.administrator)
+
+
+def _size(n: float) -> str:
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f}M"
+    if n >= 1024:
+        return f"{n / 1024:.0f}K"
+    return f"{n:.0f}B"
+
+
+def _ago(ts: float) -> str:
+    s = max(0, int(time.time() - ts))
+    if s < 60:
+        return f"{s}s ago"
+    if s < 3600:
+        return f"{s // 60}m ago"
+    return f"{s // 3600}h{(s % 3600) // 60:02d}m ago"
+
+
+class PerfCog(commands.Cog):
+    """Admin performance diagnostics."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    perf = app_commands.Group(name="perf", description="Admin: bot performance diagnostics")
+
+    @perf.command(name="loop", description="Admin: event-loop lag percentiles and recent stalls")
+    async def perf_loop(self, interaction: discord.Interaction):
+        if not _is_admin(interaction):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+        mon = get_monitor()
+        if mon.started_at is None:
+            await interaction.response.send_message("Loop monitor is not running.", ephemeral=True)
+            return
+        lag = mon.lag_stats()
+        lines = [
+            f"Lag over last {lag['window_s']:.0f}s ({lag['samples']} samples, every {mon.interval * 1000:.0f} ms):",
+            f"  p50 {lag['p50_ms']:.1f} ms | p95 {lag['p95_ms']:.1f} ms | p99 {lag['p99_ms']:.1f} ms | max {lag['max_ms']:.1f} ms",
+            f"Stalls >= {mon.slow * 1000:.0f} ms since start: {sum(mon.by_label.values())}"
+            + (" (asyncio debug on)" if mon.asyncio_debug else ""),
+        ]
+        top = mon.top_offenders(5)
+        if top:
+            lines.append("Top offenders:")
+            for label, count, ms in top:
+                lines.append(f"  {label}: {count}x, {ms:.0f} ms total")
+        recent = mon.recent_stalls(5)
+        if recent:
+            lines.append("Recent stalls:")
+            for st in recent:
+                where = f" at {st['site']}" if st.get('site') else ""
+                lines.append(f"  {_ago(st['at'])}: {st['ms']:.0f} ms in {st.get('label') or 'unknown'}{where}")
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1897] + '…'
+        await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
+    @perf.command(name="top", description="Admin: slowest commands by p95 latency")
+    @app_commands.describe(
+        by="Rank by total handler time (default), time to first response, or storage time",
+        kind="Only app commands, autocompletes or prefix commands",
+        limit="Rows to show (default 10)",
+    )
+    @app_commands.choices(
+        by=[
+            app_commands.Choice(name="handler time", value="handler_seconds"),
+            app_commands.Choice(name="first response", value="first_response_seconds"),
+            app_commands.Choice(name="storage time", value="storage_seconds"),
+        ],
+        kind=[
+            app_commands.Choice(name="app commands", value="app"),
+            app_commands.Choice(name="autocomplete", value="autocomplete"),
+            app_commands.Choice(name="prefix commands", value="prefix"),
+        ],
+    )
+    async def perf_top(self, interaction: discord.Interaction, by: app_commands.Choice[str] = None, kind: app_commands.Choice[str] = None, limit: int = 10):
+        if not _is_admin(interaction):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+        series = by.value if isinstance(by, app_commands.Choice) else 'handler_seconds'
+        rows = METRICS.top(series, limit=max(1, min(int(limit or 10), 25)),
+                           kind=kind.value if isinstance(kind, app_commands.Choice) else None)
+        if not rows:
+            await interaction.response.send_message("No command timings recorded yet.", ephemeral=True)
+            return
+        title = {'handler_seconds': 'handler', 'first_response_seconds': 'first response', 'storage_seconds': 'storage'}[series]
+        lines = [f"Slowest by {title} p95 (ms):", f"{'command':<28} {'n':>5} {'p50':>7} {'p95':>7} {'max':>7} {'1st p95':>7} {'io':>6} {'rd/wr':>11}"]
+        for r in rows:
+            ttfr = f"{r['ttfr_p95']:.0f}" if r['ttfr_p95'] is not None else '-'
+            name = r['command'] + (' [ac]' if r['kind'] == 'autocomplete' else '')
+            if r['errors']:
+                name += f" ({r['errors']} err)"
+            lines.append(
+                f"{name[:28]:<28} {r['count']:>5} {r['p50']:>7.0f} {r['p95']:>7.0f} {r['max']:>7.0f} {ttfr:>7} "
+                f"{r['storage_mean']:>6.0f} {_size(r['read_mean']) + '/' + _size(r['written_mean']):>11}"
+            )
+        lines.append("io = mean storage ms; rd/wr = mean bytes per call")
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1897] + '…'
+        await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
+    @perf.command(name="hooks", description="Admin: hook event and listener counters")
+    async def perf_hooks(self, interaction: discord.Interaction):
+        if not _is_admin(interaction):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+        stats = HOOKS.stats()
+        if not stats:
+            await interaction.response.send_message("No hook events emitted yet.", ephemeral=True)
+            return
+        lines = [f"Queued now: {HOOKS.pending()}"]
+        for event, st in stats.items():
+            avg = st['total_ms'] / st['calls'] if st['calls'] else 0.0
+            lines.append(
+                f"{event}: {st['emits']} emits ({st['queued']} queued, {st['dropped']} dropped), "
+                f"{st['calls']} calls, {st['failures']} failed ({st['timeouts']} timeouts), avg {avg:.1f} ms"
+            )
+            for name, ls in st['listeners'].items():
+                lavg = ls['total_ms'] / ls['calls'] if ls['calls'] else 0.0
+                lines.append(f"  {name}: {ls['calls']} calls, {ls['failures']} failed, avg {lavg:.1f} ms, max {ls['max_ms']:.0f} ms")
+        text = "\n".join(lines)
+        if len(text) > 1900:
+            text = text[:1897] + '…'
+        await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(PerfCog(bot))
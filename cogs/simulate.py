@@ -0,0 +1,138 @@
+import time
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from modules.initiative import encounter_for  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
+from modules.simulate import (  # type: ignore
+    MAX_TRIALS, build_character_profile, build_monster_profile, run_simulation,
+)
+from modules.attack import AttackError  # type: ignore
+import logging
+logger = logging.getLogger('dccbot')
+
+
+class SimulateCog(commands.Cog):
+    """Monte Carlo what-ifs for the judge (hit chances, damage per round)."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    simulate = app_commands.Group(name="simulate", description="Simulate many rolls to estimate odds")
+
+    async def _find_monster(self, interaction: discord.Interaction, name: str) -> Optional[dict]:
+        enc = await encounter_for(interaction, create=False)
+        return enc.find(name) if enc is not None else None
+
+    @simulate.command(name="attack", description="Simulate N attacks against an AC (hit rate, crits, damage per round)")
+    @app_commands.describe(
+        name="Attacker: character name or initiative monster name/abbr",
+        target_ac="Target AC",
+        trials="Number of simulated attack rounds (default 10,000; up to 1,000,000)",
+        weapon="Override weapon (characters only)",
+        offhand="Off-hand weapon (two-weapon fighting)",
+        range="Range band (thrown: Strength to damage only at close)",
+        deed="Warrior/Dwarf Mighty Deed (always rolled for Warrior/Dwarf melee, as in /attack)",
+        backstab="Backstab attempt (thief only): adds backstab bonus; on hit, auto-crit",
+        charge="Mounted charge (lance/spear doubles damage dice)",
+        mounted="Are you mounted?",
+        target_mounted="Is the target mounted?",
+        attack="For initiative monsters: which saved attack to use",
+        die="Action die to use (e.g., 1d20, 1d16); default first",
+    )
+    @app_commands.choices(range=[
+        app_commands.Choice(name="close", value="close"),
+        app_commands.Choice(name="medium", value="medium"),
+        app_commands.Choice(name="long", value="long"),
+    ])
+    async def simulate_attack(self, interaction: discord.Interaction, name: str, target_ac: int, trials: Optional[int] = 10000, weapon: Optional[str] = None, offhand: Optional[str] = None, range: Optional[app_commands.Choice[str]] = None, deed: Optional[bool] = False, backstab: Optional[bool] = False, charge: Optional[bool] = False, mounted: Optional[bool] = False, target_mounted: Optional[bool] = False, attack: Optional[str] = None, die: Optional[str] = None):
+        try:
+            n = max(1, min(int(trials or 10000), MAX_TRIALS))
+        except Exception:
+            n = 10000
+        data = await get_repository().load(name)
+        try:
+            if data:
+                profile = build_character_profile(
+                    data, weapon=weapon, offhand=offhand,
+                    range=(range.value if isinstance(range, app_commands.Choice) else None),
+                    deed=bool(deed), backstab=bool(backstab), mounted=bool(mounted),
+                    target_mounted=bool(target_mounted), charge=bool(charge), die=die,
+                )
+            else:
+                monster = await self._find_monster(interaction, name)
+                if monster is None:
+                    await interaction.response.send_message(f"Attacker '{name}' not found (no character or initiative entry).", ephemeral=True)
+                    return
+                profile = build_monster_profile(monster, attack=attack, die=die)
+        except AttackError as e:
+            # Same message /attack would give
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+        # Large runs take a moment in the process pool; acknowledge first
+        await interaction.response.defer(thinking=True)
+        t0 = time.perf_counter()
+        try:
+            res = await run_simulation(profile, int(target_ac), n)
+        except Exception as e:
+            logger.exception("/simulate attack failed: %s", e)
+            await interaction.followup.send("Sorry, the simulation failed.", ephemeral=True)
+            return
+        elapsed = time.perf_counter() - t0
+
+        emb = discord.Embed(
+            title=f"Simulated {res.trials:,} attacks vs AC {int(target_ac)}",
+            description=f"{profile.label}: {profile.action_die} {profile.attack_mod:+}, damage {profile.damage} {profile.damage_mod:+}"
+            + (f", deed d{profile.deed_sides}" if profile.deed_sides else ''),
+            color=0x3498DB,
+        )
+        emb.add_field(name="Hit rate", value=f"{res.hit_rate * 100:.2f}%", inline=True)
+        emb.add_field(name="Crit rate", value=f"{res.crit_rate * 100:.2f}% ({res.crit_hits / res.trials * 100:.2f}% crit hits)", inline=True)
+        emb.add_field(name="Fumble rate", value=f"{res.fumble_rate * 100:.2f}%", inline=True)
+        dmg_line = f"**{res.expected_damage:.2f}** expected per round"
+        if res.hits:
+            dmg_line += (
+                f"\nOn a hit: median {res.damage_percentile(50, hits_only=True)}, "
+                f"90th pct {res.damage_percentile(90, hits_only=True)}, max {max(res.damage)}"
+            )
+        emb.add_field(name="Damage", value=dmg_line, inline=False)
+        if profile.offhand is not None:
+            emb.add_field(name="Off-hand", value=f"{profile.offhand.action_die} {profile.offhand.attack_mod:+}: hits {res.offhand_hits / res.trials * 100:.2f}%", inline=False)
+        if res.crit_results:
+            top = ", ".join(f"{k} ({v / max(1, res.crit_hits) * 100:.0f}%)" for k, v in res.crit_results.most_common(3))
+            emb.add_field(name=f"Top crits [{profile.crit_table}]", value=top[:1024], inline=False)
+        if res.fumble_results:
+            top = ", ".join(f"{k} ({v / max(1, res.fumbles) * 100:.0f}%)" for k, v in res.fumble_results.most_common(3))
+            emb.add_field(name="Top fumbles", value=top[:1024], inline=False)
+        notes = list(profile.notes) + ["no Luck burn"]
+        emb.set_footer(text=f"{'; '.join(notes)} • {elapsed:.2f}s")
+        await interaction.followup.send(embed=emb)
+
+    @simulate_attack.autocomplete('name')
+    async def ac_simulate_name(self, interaction: discord.Interaction, current: str):
+        q = (current or '').strip().lower()
+        choices: list[app_commands.Choice[str]] = []
+        enc = await encounter_for(interaction, create=False)
+        for e in (enc.entries if enc is not None else ()):
+            disp = str(e.get('name') or '')
+            if disp and (not q or q in disp.lower() or q in str(e.get('abbr') or '').lower()):
+                choices.append(app_commands.Choice(name=disp, value=disp))
+            if len(choices) >= 10:
+                break
+        try:
+            for e in get_index().search(q, limit=25 - len(choices)):
+                choices.append(app_commands.Choice(name=e.key, value=e.key))
+        except Exception:
+            pass
+        return choices[:25]
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(SimulateCog(bot))
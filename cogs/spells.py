@@ -1,11 +1,12 @@
 import os
-import json
 from typing import Optional, List, Tuple
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
+from modules.reference import reference  # type: ignore
+
 
 class SpellResultsView(discord.ui.View):
     """Button view to toggle spell results between summary and full text."""
@@ -84,12 +85,8 @@ class SpellsCog(commands.Cog):
         return os.path.dirname(os.path.dirname(__file__))
 
     def _load_spells(self) -> dict:
-        try:
-            path = os.path.join(self._root_dir(), 'Spells.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        # Shared, read-only parse of Spells.json (reloaded when the file changes)
+        return reference('Spells.json', {})
 
     def _bucket_for_class(self, klass: str) -> Optional[str]:
         k = (klass or '').strip().lower()
@@ -1,14 +1,13 @@
-import os
-import json
 from typing import Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from core.config import SAVE_FOLDER  # type: ignore
+from storage.repository import get_repository  # type: ignore
+from storage.index import get_index  # type: ignore
 from utils.dice import roll_dice  # type: ignore
-from modules.utils import get_luck_current, consume_luck_and_save, get_modifier  # type: ignore
+from modules.utils import get_luck_current, burn_luck, get_modifier  # type: ignore
 
 
 class ThiefCog(commands.Cog):
@@ -17,15 +16,7 @@ class ThiefCog(commands.Cog):
 
     # ---- helpers ----
     async def _load_record(self, name: str) -> Optional[dict]:
-        safe = name.strip().lower().replace(' ', '_')
-        path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        return await get_repository().load(name)
 
     def _ability_mod(self, data: dict, key: str) -> int:
         try:
@@ -230,9 +221,7 @@ class ThiefCog(commands.Cog):
         luck_bonus = 0
         luck_rolls: list[int] = []
         if isinstance(burn, int) and burn and burn > 0:
-            safe = name.strip().lower().replace(' ', '_')
-            path = os.path.join(SAVE_FOLDER, f"{safe}.json")
-            burn_used = int(consume_luck_and_save(data, int(burn), filename=path) or 0)
+            burn_used = int(await burn_luck(name, int(burn), mirror=data) or 0)
             if burn_used > 0:
                 luck_die = str(data.get('luck_die') or 'd3')
                 expr = f"{burn_used}{luck_die}"
@@ -303,23 +292,9 @@ class ThiefCog(commands.Cog):
         q = (current or '').strip().lower()
         items: list[app_commands.Choice[str]] = []
         try:
-            for fn in os.listdir(SAVE_FOLDER):
-                if not fn.endswith('.json'):
-                    continue
-                nm = fn[:-5]
-                if q and q not in nm.lower():
-                    continue
-                # Prioritize thieves
-                try:
-                    with open(os.path.join(SAVE_FOLDER, fn), 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    if str(data.get('class', '')).strip().lower() != 'thief':
-                        continue
-                except Exception:
-                    continue
-                items.append(app_commands.Choice(name=nm, value=nm))
-                if len(items) >= 25:
-                    break
+            # Only thieves
+            for e in get_index().search(q, where=lambda e: e.char_class.lower() == 'thief'):
+                items.append(app_commands.Choice(name=e.key, value=e.key))
         except Exception:
             pass
         return items
@@ -0,0 +1,136 @@
+from typing import List, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from storage.repository import get_repository, record_key  # type: ignore
+from storage.index import get_index  # type: ignore
+from storage.owners import get_owner_index  # type: ignore
+from storage.journal import changed_keys  # type: ignore
+from storage.backup import parse_point  # type: ignore
+
+# /undo and /history over the per-record mutation journal (storage/journal.py).
+# Every save is journaled as a small patch, so a character can be put back to
+# how it was N changes ago (or at a given time) as long as the journal still
+# holds that far back (JOURNAL_KEEP_ENTRIES after compaction). An undo is
+# itself a saved change: it shows up in /history and can be undone again.
+
+HISTORY_LINES = 10
+_JOURNAL_OFF = "Change history is off on this bot (set `CHAR_JOURNAL=1` to record it)."
+
+
+def _is_manager(interaction: discord.Interaction) -> bool:
+    member = interaction.guild and interaction.guild.get_member(interaction.user.id)
+    return bool(member and (member.guild_permissions.administrator or member.guild_permissions.manage_guild))
+
+
+def _describe(entry: dict) -> str:
+    when = f"<t:{int(entry.get('ts', 0))}:R>"
+    if entry.get('undo_to') is not None:
+        what = f"undo → #{entry['undo_to']}"
+    else:
+        what = f"`/{entry['cmd']}`" if entry.get('cmd') else "change"
+    fields = ", ".join(changed_keys(entry)[:6])
+    return f"#{entry['seq']} {when} {what}" + (f" — {fields}" if fields else "")
+
+
+class UndoCog(commands.Cog):
+    """Undo recent changes to a character and show its change history."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    def _allowed(self, interaction: discord.Interaction, key: str, log, seq: Optional[int]) -> bool:
+        """Managers, or the character's owner; characters without an owner are managers-only."""
+        if _is_manager(interaction):
+            return True
+        owners = get_owner_index()
+        if owners.exists(key):
+            return owners.is_owned_by(key, interaction.user.id)
+        # Deleted character: judge by the owner of version ``seq``
+        state = log.state_at_seq(seq) if seq is not None else None
+        owner = state.get('owner') if state else None
+        return owner is not None and str(owner) == str(interaction.user.id)
+
+    @app_commands.command(name="undo", description="Undo the last change(s) to a character")
+    @app_commands.describe(
+        name="Character name",
+        steps="How many changes to undo (default 1)",
+        at="Instead restore the character as it was at this UTC time (YYYY-MM-DD HH:MM)",
+    )
+    async def undo(self, interaction: discord.Interaction, name: str,
+                   steps: app_commands.Range[int, 1, 50] = 1, at: Optional[str] = None):
+        repo = get_repository()
+        key = record_key(name)
+        when = None
+        if at:
+            point = parse_point(at)
+            if point is None:
+                await interaction.response.send_message("Time must look like `2026-10-17 19:30` (UTC).", ephemeral=True)
+                return
+            when = point.timestamp()
+        if repo.journal is None:
+            await interaction.response.send_message(_JOURNAL_OFF, ephemeral=True)
+            return
+        log = await repo.history(key)
+        if log is None or not log.entries:
+            await interaction.response.send_message(f"No recorded changes for '{name}'.", ephemeral=True)
+            return
+        # A deleted character is judged by the owner of the version being restored
+        if not self._allowed(interaction, key, log, log.seq_at(when) if when is not None else log.undo_seq(steps)):
+            await interaction.response.send_message("You do not own this character.", ephemeral=True)
+            return
+        state, log, seq = await repo.revert(key, steps, when)
+        if state is None:
+            if seq is None:
+                reason = "the journal does not go back that far"
+            else:
+                reason = "the character did not exist at that point"
+            await interaction.response.send_message(f"Can't undo '{name}': {reason}.", ephemeral=True)
+            return
+        undone = [e for e in log.entries if e['seq'] > seq and e.get('undo_to') is None]
+        title = f"at {at} UTC" if at else f"before {len(undone) if undone else steps} change(s)"
+        lines = [f"↩️ **{state.get('name', name)}** restored to its state {title} (#{seq})."]
+        lines.extend(f"• {_describe(e)}" for e in undone[-5:][::-1])
+        if len(undone) > 5:
+            lines.append(f"• … and {len(undone) - 5} more")
+        await interaction.response.send_message("\n".join(lines))
+
+    @app_commands.command(name="history", description="Show the recent changes to a character")
+    @app_commands.describe(name="Character name")
+    async def history(self, interaction: discord.Interaction, name: str):
+        key = record_key(name)
+        repo = get_repository()
+        if repo.journal is None:
+            await interaction.response.send_message(_JOURNAL_OFF, ephemeral=True)
+            return
+        log = await repo.history(key)
+        if log is None or not log.entries:
+            await interaction.response.send_message(f"No recorded changes for '{name}'.", ephemeral=True)
+            return
+        # A deleted character is judged by the owner of its last version
+        last = next((e['seq'] for e in reversed(log.entries) if not e.get('deleted')), log.base_seq)
+        if not self._allowed(interaction, key, log, last):
+            await interaction.response.send_message("You do not own this character.", ephemeral=True)
+            return
+        recent = log.entries[-HISTORY_LINES:][::-1]
+        emb = discord.Embed(title=f"History: {name}", description="\n".join(_describe(e) for e in recent))
+        emb.set_footer(text=f"{len(log.entries)} change(s) kept; /undo name:{name} steps:<n> reverts them")
+        await interaction.response.send_message(embed=emb, ephemeral=True)
+
+    @undo.autocomplete('name')
+    @history.autocomplete('name')
+    async def name_ac(self, interaction: discord.Interaction, current: str):
+        cur = (current or '').lower()
+        items: List[app_commands.Choice[str]] = []
+        try:
+            for e in get_index().search(cur):
+                items.append(app_commands.Choice(name=e.label, value=e.label))
+        except Exception:
+            pass
+        return items
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(UndoCog(bot))
@@ -1,17 +1,59 @@
-import os, json
-from typing import Any
+import os
+from typing import Optional
 from discord.ext import commands
-from core.config import SAVE_FOLDER
+from discord.ext.commands.view import StringView
 
-async def is_owner(ctx: commands.Context, filename: str) -> bool:
-    if not os.path.exists(filename):
-        await ctx.send("❌ Character not found.")
-        return False
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if ctx.author.guild_permissions.administrator:
+
+# Prefix commands that name a character, and which argument does:
+# 'rest' = the whole argument string, 'first' = the first (quoted) word
+_CHARACTER_ARGS = {
+    'delete': 'rest',
+    'sheet': 'rest',
+    'ijoin': 'rest',
+    'ijoin_mounted': 'first',
+    'ispook': 'first',
+}
+
+
+def _target_key(ctx: commands.Context, filename: Optional[str]) -> Optional[str]:
+    """Record key for an explicit name/path, else for the character the command names (None if it names none)."""
+    from storage.repository import record_key  # lazy: storage imports core
+    if filename:
+        base = os.path.basename(str(filename))
+        return record_key(base[:-5] if base.lower().endswith('.json') else base)
+    mode = _CHARACTER_ARGS.get(getattr(ctx.command, 'name', None) or '')
+    if mode is None:
+        return None
+    # Global check: checks run before argument parsing, so read the raw remainder
+    try:
+        rest = ctx.view.buffer[ctx.view.index:].strip()
+        if mode == 'first' and rest:
+            rest = (StringView(rest).get_quoted_word() or '').strip()
+    except Exception:
+        rest = ''
+    return record_key(rest) if rest else None
+
+
+async def is_owner(ctx: commands.Context, filename: Optional[str] = None) -> bool:
+    """Owner-or-admin check for a character, answered from the owner index (no record read).
+
+    With ``filename`` (a character name or its JSON path) the character must
+    exist. Without it, only commands listed in _CHARACTER_ARGS are checked,
+    against the character they name; an unknown name is left to the command
+    to report. Records without an owner are open to admins only.
+    """
+    from storage.owners import get_owner_index  # lazy: storage imports core
+    owners = get_owner_index()
+    key = _target_key(ctx, filename)
+    if not key or not owners.exists(key):
+        if filename:
+            await ctx.send("❌ Character not found.")
+            return False
+        return True
+    perms = getattr(ctx.author, 'guild_permissions', None)
+    if perms is not None and perms.administrator:
         return True
-    if str(data.get("owner")) != str(ctx.author.id):
+    if not owners.is_owned_by(key, ctx.author.id):
         await ctx.send("🚫 You do not own this character.")
         return False
     return True
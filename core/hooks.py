@@ -1,24 +1,102 @@
 from __future__ import annotations
+import os
+import time
 import asyncio
+import logging
 from collections import defaultdict
-from typing import Awaitable, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 Listener = Callable[..., Awaitable[None]]
 
+# Event hooks.
+#
+# Three ways to emit:
+#   emit()            awaits listeners one at a time in priority order (historic behaviour)
+#   emit_concurrent() runs each priority tier's listeners concurrently, tiers in order
+#   emit_nowait()     enqueues the event for a background worker and returns at once,
+#                     so listeners never add latency to the command that fired it
+# A listener registered with a timeout is cancelled when it runs past it. The
+# concurrent and queued paths also bound every other listener by HOOK_TIMEOUT_S
+# (default 5s); emit() keeps its historic unbounded awaits. Failures and
+# timeouts are logged and counted instead of being silently dropped;
+# per-event and per-listener counters back /perf hooks.
+
+logger = logging.getLogger('dccbot.hooks')
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+@dataclass
+class _Registration:
+    fn: Listener
+    priority: int = 0
+    timeout: Optional[float] = None
+    name: str = ''
+
+
+@dataclass
+class HookStats:
+    calls: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, ms: float, failed: bool = False, timed_out: bool = False) -> None:
+        self.calls += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if failed:
+            self.failures += 1
+        if timed_out:
+            self.timeouts += 1
+
+
+@dataclass
+class _EventStats(HookStats):
+    emits: int = 0
+    queued: int = 0
+    dropped: int = 0
+    listeners: Dict[str, HookStats] = field(default_factory=dict)
+
+
+def _listener_name(fn: Callable) -> str:
+    mod = getattr(fn, '__module__', None) or '?'
+    return f"{mod}.{getattr(fn, '__qualname__', None) or getattr(fn, '__name__', repr(fn))}"
+
+
 class HookRegistry:
-    def __init__(self):
-        self._listeners: Dict[str, List[Listener]] = defaultdict(list)
+    def __init__(self, default_timeout: Optional[float] = 5.0, queue_size: int = 1000):
+        self._listeners: Dict[str, List[_Registration]] = defaultdict(list)
+        self.default_timeout = default_timeout
+        self.queue_size = max(1, int(queue_size))
+        self._stats: Dict[str, _EventStats] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
 
-    def on(self, event: str, listener: Listener) -> None:
-        self._listeners[event].append(listener)
+    def on(self, event: str, listener: Listener, *, priority: int = 0, timeout: Optional[float] = None) -> None:
+        """Register ``listener``; higher ``priority`` runs first (ties keep registration order)."""
+        reg = _Registration(listener, int(priority), timeout, _listener_name(listener))
+        lst = self._listeners[event]
+        lst.append(reg)
+        lst.sort(key=lambda r: -r.priority)  # stable
 
-    def once(self, event: str, listener: Listener) -> None:
+    def once(self, event: str, listener: Listener, *, priority: int = 0, timeout: Optional[float] = None) -> None:
         async def wrapper(*args, **kwargs):
             try:
                 await listener(*args, **kwargs)
             finally:
                 self.off(event, wrapper)
-        self.on(event, wrapper)
+        wrapper.__qualname__ = getattr(listener, '__qualname__', 'once')
+        wrapper.__module__ = getattr(listener, '__module__', None)
+        self.on(event, wrapper, priority=priority, timeout=timeout)
 
     def off(self, event: str, listener: Optional[Listener] = None) -> None:
         if listener is None:
@@ -27,27 +105,155 @@ class HookRegistry:
             lst = self._listeners.get(event)
             if not lst:
                 return
-            try:
-                lst.remove(listener)
-            except ValueError:
-                pass
+            for reg in list(lst):
+                if reg.fn is listener:
+                    lst.remove(reg)
+                    break
+
+    # ---- dispatch ----
+    def _event_stats(self, event: str) -> _EventStats:
+        st = self._stats.get(event)
+        if st is None:
+            st = self._stats[event] = _EventStats()
+        return st
+
+    async def _call(self, event: str, reg: _Registration, args: tuple, kwargs: dict,
+                    default_timeout: Optional[float] = None) -> None:
+        timeout = reg.timeout if reg.timeout is not None else default_timeout
+        t0 = time.perf_counter()
+        failed = timed_out = False
+        try:
+            if timeout:
+                await asyncio.wait_for(reg.fn(*args, **kwargs), timeout)
+            else:
+                await reg.fn(*args, **kwargs)
+        except asyncio.TimeoutError:
+            failed = timed_out = True
+            logger.warning('Hook %s for %s timed out after %.1fs', reg.name, event, timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            failed = True
+            logger.exception('Hook %s for %s failed', reg.name, event)
+        ms = (time.perf_counter() - t0) * 1000.0
+        st = self._event_stats(event)
+        st.add(ms, failed, timed_out)
+        per = st.listeners.get(reg.name)
+        if per is None:
+            per = st.listeners[reg.name] = HookStats()
+        per.add(ms, failed, timed_out)
 
     async def emit(self, event: str, *args, **kwargs) -> None:
+        """Await listeners one at a time, highest priority first. Never raises.
+
+        Only a listener's own timeout applies; the registry default does not.
+        """
         # Copy listeners to avoid modification during iteration
-        for listener in list(self._listeners.get(event, [])):
+        regs = list(self._listeners.get(event, []))
+        self._event_stats(event).emits += 1
+        for reg in regs:
+            await self._call(event, reg, args, kwargs)
+
+    async def emit_concurrent(self, event: str, *args, **kwargs) -> None:
+        """Run each priority tier's listeners concurrently; tiers run highest first. Never raises."""
+        regs = list(self._listeners.get(event, []))
+        self._event_stats(event).emits += 1
+        tier: List[_Registration] = []
+        for reg in regs + [None]:  # sentinel flushes the last tier
+            if tier and (reg is None or reg.priority != tier[0].priority):
+                if len(tier) == 1:
+                    await self._call(event, tier[0], args, kwargs, self.default_timeout)
+                else:
+                    await asyncio.gather(*(self._call(event, r, args, kwargs, self.default_timeout) for r in tier))
+                tier = []
+            if reg is not None:
+                tier.append(reg)
+
+    def emit_nowait(self, event: str, *args, **kwargs) -> bool:
+        """Queue the event for the background worker (concurrent dispatch) and return immediately.
+
+        Returns False (and counts a drop) when the queue is full or there is no
+        running loop. Events with no listeners are skipped without queuing.
+        """
+        if not self._listeners.get(event):
+            return True
+        st = self._event_stats(event)
+        try:
+            queue = self._ensure_worker()
+        except RuntimeError:
+            st.dropped += 1
+            return False
+        try:
+            queue.put_nowait((event, args, kwargs))
+        except asyncio.QueueFull:
+            st.dropped += 1
+            logger.warning('Hook queue full; dropped %s', event)
+            return False
+        st.queued += 1
+        return True
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()  # RuntimeError outside a loop
+        if self._queue is None or self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._worker = loop.create_task(self._work(self._queue), name='hooks-worker')
+        return self._queue
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            event, args, kwargs = await queue.get()
             try:
-                await listener(*args, **kwargs)
+                await self.emit_concurrent(event, *args, **kwargs)
             except Exception:
-                # Swallow to avoid breaking emit chain; real consumers can add logging
-                pass
+                logger.exception('Hook worker failed on %s', event)
+            finally:
+                queue.task_done()
+
+    async def drain(self, timeout: float = 5.0) -> None:
+        """Wait (bounded) for queued events, then stop the worker. Used at shutdown."""
+        queue, worker = self._queue, self._worker
+        if queue is not None and worker is not None and not worker.done():
+            try:
+                await asyncio.wait_for(queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning('Hook queue drain timed out with %d event(s) left', queue.qsize())
+            worker.cancel()
+        self._queue = self._worker = None
+
+    # ---- introspection ----
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-event counters with a nested per-listener breakdown."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for event, st in sorted(self._stats.items()):
+            out[event] = {
+                'emits': st.emits, 'queued': st.queued, 'dropped': st.dropped,
+                'calls': st.calls, 'failures': st.failures, 'timeouts': st.timeouts,
+                'total_ms': st.total_ms, 'max_ms': st.max_ms,
+                'listeners': {
+                    name: {'calls': ls.calls, 'failures': ls.failures, 'timeouts': ls.timeouts,
+                           'total_ms': ls.total_ms, 'max_ms': ls.max_ms}
+                    for name, ls in sorted(st.listeners.items())
+                },
+            }
+        return out
+
+    def listeners(self) -> List[Tuple[str, str, int]]:
+        """(event, listener name, priority) for everything registered."""
+        return [(e, r.name, r.priority) for e, regs in sorted(self._listeners.items()) for r in regs]
 
 
-# Global registry instance
-HOOKS = HookRegistry()
+# Global registry instance (HOOK_TIMEOUT_S: listener default for emit_concurrent/emit_nowait, 0 disables; HOOK_QUEUE_SIZE)
+HOOKS = HookRegistry(
+    default_timeout=_env_float('HOOK_TIMEOUT_S', 5.0) or None,
+    queue_size=int(_env_float('HOOK_QUEUE_SIZE', 1000)),
+)
 
-def hook(event: str):
+def hook(event: str, *, priority: int = 0, timeout: Optional[float] = None):
     """Decorator for registering an async listener function to an event."""
     def deco(fn: Listener) -> Listener:
-        HOOKS.on(event, fn)
+        HOOKS.on(event, fn, priority=priority, timeout=timeout)
         return fn
     return deco
@@ -0,0 +1,329 @@
+from __future__ import annotations
+import os
+import time
+import logging
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Per-command latency histograms and a Prometheus text exporter.
+#
+# Each app command, autocomplete and prefix command runs with a RequestMetrics
+# object in a context variable (set by core.perf). The storage layer adds its
+# time and byte counts to whatever request is current, so one handler's record
+# carries time-to-first-response, total handler time, storage ms and bytes
+# read/written. On completion the values go into fixed-bucket histograms keyed
+# by (command, kind); these are cheap to update and export directly in the
+# Prometheus text format. No third-party metrics library is needed.
+
+logger = logging.getLogger('dccbot.metrics')
+
+MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, bucket bounds, unit divisor for export)
+_SERIES: Dict[str, Tuple[str, Tuple[int, ...], float]] = {
+    'first_response_seconds': ('Time from dispatch to the first interaction response (defer counts)', MS_BUCKETS, 1000.0),
+    'handler_seconds': ('Total handler time', MS_BUCKETS, 1000.0),
+    'storage_seconds': ('Time spent awaiting storage I/O per handler', MS_BUCKETS, 1000.0),
+    'read_bytes': ('Bytes read from disk per handler', BYTE_BUCKETS, 1.0),
+    'written_bytes': ('Bytes written to disk per handler', BYTE_BUCKETS, 1.0),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (values in ms or bytes); ``counts[i]`` is non-cumulative."""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count', 'max')
+
+    def __init__(self, bounds: Tuple[int, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        v = max(0.0, float(value))
+        i = 0
+        for b in self.bounds:
+            if v <= b:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.total += v
+        self.count += 1
+        if v > self.max:
+            self.max = v
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the p-th observation."""
+        if not self.count:
+            return 0.0
+        want = max(0.0, min(100.0, p)) / 100.0 * self.count
+        cum = 0
+        lo = 0.0
+        for i, c in enumerate(self.counts):
+            hi = float(self.bounds[i]) if i < len(self.bounds) else self.max
+            if c and cum + c >= want:
+                return min(self.max, lo + (hi - lo) * ((want - cum) / c))
+            cum += c
+            lo = hi
+        return self.max
+
+
+@dataclass
+class RequestMetrics:
+    """Measurements for one handler invocation (mutated from the loop and storage threads)."""
+    command: str
+    kind: str  # 'app' | 'autocomplete' | 'prefix'
+    started: float = field(default_factory=time.perf_counter)
+    first_response: Optional[float] = None
+    storage_ms: float = 0.0
+    read_bytes: int = 0
+    written_bytes: int = 0
+
+    def mark_response(self) -> None:
+        if self.first_response is None:
+            self.first_response = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def first_response_ms(self) -> Optional[float]:
+        if self.first_response is None:
+            return None
+        return (self.first_response - self.started) * 1000.0
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar('dccbot_request_metrics', default=None)
+
+
+def begin_request(command: str, kind: str) -> RequestMetrics:
+    """Start measuring the current task; storage calls made from it are attributed to it."""
+    req = RequestMetrics(command, kind)
+    _current.set(req)
+    return req
+
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def note_storage(ms: float = 0.0, read: int = 0, written: int = 0) -> None:
+    """Add storage time/bytes to the current request (no-op outside a handler)."""
+    req = _current.get()
+    if req is None:
+        return
+    req.storage_ms += ms
+    req.read_bytes += read
+    req.written_bytes += written
+
+
+class MetricsRegistry:
+    """Histograms per (series, command, kind)."""
+
+    def __init__(self):
+        self._hists: Dict[Tuple[str, str, str], Histogram] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def _hist(self, series: str, command: str, kind: str) -> Histogram:
+        key = (series, command, kind)
+        h = self._hists.get(key)
+        if h is None:
+            h = self._hists[key] = Histogram(_SERIES[series][1])
+        return h
+
+    def finish(self, req: RequestMetrics, failed: bool = False) -> None:
+        """Fold a finished request into the histograms."""
+        ttfr = req.first_response_ms()
+        with self._lock:
+            self._hist('handler_seconds', req.command, req.kind).observe(req.elapsed_ms())
+            if ttfr is not None:
+                self._hist('first_response_seconds', req.command, req.kind).observe(ttfr)
+            self._hist('storage_seconds', req.command, req.kind).observe(req.storage_ms)
+            self._hist('read_bytes', req.command, req.kind).observe(req.read_bytes)
+            self._hist('written_bytes', req.command, req.kind).observe(req.written_bytes)
+            if failed:
+                k = (req.command, req.kind)
+                self._errors[k] = self._errors.get(k, 0) + 1
+
+    def add_collector(self, fn: Callable[[], Iterable[str]]) -> None:
+        """Extra exposition lines (e.g. loop lag gauges) appended to every export."""
+        self._collectors.append(fn)
+
+    def top(self, series: str = 'handler_seconds', limit: int = 10, kind: Optional[str] = None) -> List[Dict[str, float]]:
+        """Commands ordered by p95 of ``series`` (slowest first)."""
+        rows = []
+        with self._lock:
+            for (s, cmd, k), h in self._hists.items():
+                if s != series or not h.count or (kind and k != kind):
+                    continue
+                ttfr = self._hists.get(('first_response_seconds', cmd, k))
+                store = self._hists.get(('storage_seconds', cmd, k))
+                rd = self._hists.get(('read_bytes', cmd, k))
+                wr = self._hists.get(('written_bytes', cmd, k))
+                rows.append({
+                    'command': cmd,
+                    'kind': k,
+                    'count': h.count,
+                    'p50': h.percentile(50),
+                    'p95': h.percentile(95),
+                    'max': h.max,
+                    'ttfr_p95': ttfr.percentile(95) if ttfr and ttfr.count else None,
+                    'storage_mean': store.mean if store else 0.0,
+                    'read_mean': rd.mean if rd else 0.0,
+                    'written_mean': wr.mean if wr else 0.0,
+                    'errors': self._errors.get((cmd, k), 0),
+                })
+        rows.sort(key=lambda r: r['p95'], reverse=True)
+        return rows[:limit]
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition (format 0.0.4)."""
+        out: List[str] = []
+        with self._lock:
+            items = sorted(self._hists.items())
+            errors = sorted(self._errors.items())
+        by_series: Dict[str, List[Tuple[str, str, Histogram]]] = {}
+        for (series, cmd, kind), h in items:
+            by_series.setdefault(series, []).append((cmd, kind, h))
+        for series, (help_text, bounds, div) in _SERIES.items():
+            rows = by_series.get(series)
+            if not rows:
+                continue
+            name = f"dccbot_command_{series}"
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} histogram")
+            for cmd, kind, h in rows:
+                labels = f'command="{_escape(cmd)}",kind="{kind}"'
+                cum = 0
+                for b, c in zip(bounds, h.counts):
+                    cum += c
+                    out.append(f'{name}_bucket{{{labels},le="{_num(b / div)}"}} {cum}')
+                out.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                out.append(f"{name}_sum{{{labels}}} {_num(h.total / div)}")
+                out.append(f"{name}_count{{{labels}}} {h.count}")
+        if errors:
+            out.append("# HELP dccbot_command_errors_total Handlers that raised or reported failure")
+            out.append("# TYPE dccbot_command_errors_total counter")
+            for (cmd, kind), n in errors:
+                out.append(f'dccbot_command_errors_total{{command="{_escape(cmd)}",kind="{kind}"}} {n}')
+        for fn in list(self._collectors):
+            try:
+                out.extend(fn())
+            except Exception as e:
+                logger.debug('Metrics collector failed: %s', e)
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _num(v: float) -> str:
+    return repr(float(v))
+
+
+METRICS = MetricsRegistry()
+
+
+# ---- exporters ----
+async def _file_exporter(path: str, interval: float) -> None:
+    import asyncio
+    from storage.files import run_io  # lazy: storage imports this module
+
+    def _write(text: str) -> None:
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_io(_write, METRICS.render_prometheus())
+        except Exception as e:
+            logger.warning('Writing metrics to %s failed: %s', path, e)
+
+
+async def _start_http_exporter(host: str, port: int):
+    from aiohttp import web  # discord.py depends on aiohttp
+
+    async def _handle(request):
+        return web.Response(text=METRICS.render_prometheus(), content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    app = web.Application()
+    app.router.add_get('/metrics', _handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
+
+
+_exporter_tasks: List = []
+_http_runner = None
+
+
+async def start_exporters() -> None:
+    """Start the optional exporters from env.
+
+    METRICS_FILE: write the exposition to this path every METRICS_INTERVAL_S
+    seconds (default 15), e.g. for node_exporter's textfile collector.
+    METRICS_PORT: serve GET /metrics on METRICS_HOST (default 127.0.0.1).
+    """
+    import asyncio
+    global _http_runner
+    path = os.getenv('METRICS_FILE')
+    if path:
+        try:
+            interval = max(1.0, float(os.getenv('METRICS_INTERVAL_S', '15')))
+        except ValueError:
+            interval = 15.0
+        _exporter_tasks.append(asyncio.get_running_loop().create_task(_file_exporter(path, interval), name='metrics-file'))
+        logger.info('Writing metrics to %s every %.0fs', path, interval)
+    port = os.getenv('METRICS_PORT')
+    if port and _http_runner is None:
+        host = os.getenv('METRICS_HOST', '127.0.0.1')
+        try:
+            _http_runner = await _start_http_exporter(host, int(port))
+            logger.info('Serving metrics on http://%s:%s/metrics', host, port)
+        except Exception as e:
+            logger.warning('Metrics HTTP exporter failed to start: %s', e)
+
+
+async def stop_exporters() -> None:
+    global _http_runner
+    for task in _exporter_tasks:
+        task.cancel()
+    _exporter_tasks.clear()
+    if _http_runner is not None:
+        try:
+            await _http_runner.cleanup()
+        except Exception:
+            pass
+        _http_runner = None
+
+
+__all__ = [
+    "Histogram",
+    "RequestMetrics",
+    "MetricsRegistry",
+    "METRICS",
+    "begin_request",
+    "current_request",
+    "note_storage",
+    "start_exporters",
+    "stop_exporters",
+]
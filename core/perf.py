@@ -0,0 +1,389 @@
+from __future__ import annotations
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import threading
+import weakref
+import functools
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core.metrics import METRICS, begin_request, current_request
+
+# Event-loop health monitoring.
+#
+# A heartbeat task sleeps for a fixed interval and records how late it woke up
+# (scheduling lag); a rolling window of those samples gives p50/p95/p99 lag.
+# A watchdog thread watches the heartbeat: when the loop has not ticked for
+# longer than the slow threshold it samples the loop thread's stack and the
+# label of the app command / autocomplete / prefix command whose task is
+# running, so a stall is attributed while it is still happening rather than
+# guessed at afterwards.
+#
+# LOOP_ASYNCIO_DEBUG=1 additionally turns on asyncio debug mode with
+# slow_callback_duration set to the same threshold and attributes its
+# "Executing ... took" reports the same way. Debug mode captures a traceback
+# for every scheduled callback, so it is opt-in rather than always on.
+#
+# Env: LOOP_LAG_INTERVAL_MS (default 100), LOOP_SLOW_MS (default 250),
+# LOOP_LAG_WINDOW (samples kept, default 3000 = 5 minutes at 100 ms).
+
+logger = logging.getLogger('dccbot.perf')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# task -> "/command", "/command [autocomplete]" or "!command"
+_activity: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+
+def track_activity(label: str, task: Optional[asyncio.Task] = None) -> None:
+    """Label the current (or given) task so stalls it causes can be attributed."""
+    try:
+        task = task or asyncio.current_task()
+    except RuntimeError:
+        return
+    if task is not None:
+        _activity[task] = label
+
+
+def activity_for(task: Optional[asyncio.Task]) -> Optional[str]:
+    if task is None:
+        return None
+    try:
+        return _activity.get(task)
+    except Exception:
+        return None
+
+
+def interaction_label(interaction: discord.Interaction) -> str:
+    """'/init join' for commands, '/init join [autocomplete]' for autocomplete requests."""
+    cmd = interaction.command
+    name = getattr(cmd, 'qualified_name', None) or str((interaction.data or {}).get('name') or '?')
+    label = f"/{name}"
+    if interaction.type is discord.InteractionType.autocomplete:
+        label += " [autocomplete]"
+    return label
+
+
+def _percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class LoopMonitor:
+    """Heartbeat lag sampler plus stall watchdog for one event loop."""
+
+    def __init__(self, interval: float = 0.1, slow: float = 0.25, window: int = 3000, max_stalls: int = 50):
+        self.interval = max(0.01, float(interval))
+        self.slow = max(0.01, float(slow))
+        self.samples: Deque[float] = deque(maxlen=max(10, int(window)))
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(max_stalls)))
+        self.by_label: Counter = Counter()      # stall count per command label
+        self.ms_by_label: Counter = Counter()   # stalled milliseconds per command label
+        self.started_at: Optional[float] = None
+        self.asyncio_debug = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._beat = time.monotonic()
+        self._open_stall: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- lifecycle ----
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None, asyncio_debug: bool = False) -> None:
+        """Start the heartbeat and watchdog (call from the loop thread)."""
+        if self._task is not None:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name='loop-monitor')
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        if asyncio_debug:
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = self.slow
+            logging.getLogger('asyncio').addFilter(_SlowCallbackFilter(self))
+            self.asyncio_debug = True
+        logger.info('Loop monitor started (interval %.0f ms, slow threshold %.0f ms%s)',
+                    self.interval * 1000, self.slow * 1000, ', asyncio debug' if asyncio_debug else '')
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - t0 - self.interval)
+            self.samples.append(lag)
+            self._beat = now
+            with self._lock:
+                stall, self._open_stall = self._open_stall, None
+            if stall is not None:
+                # The watchdog saw it start; the heartbeat knows how long it really was
+                stall['ms'] = round(max(stall['ms'], lag * 1000.0), 1)
+                self._record(stall)
+            elif lag >= self.slow and not (self.stalls and self.stalls[-1]['at'] >= time.time() - lag - self.interval):
+                # Shorter than a watchdog poll (and not already reported by asyncio debug):
+                # duration known, culprit already gone
+                self._record({'at': time.time() - lag, 'ms': round(lag * 1000.0, 1), 'label': None, 'site': None, 'source': 'lag'})
+
+    def _watch(self) -> None:
+        poll = max(0.01, self.slow / 2.0)
+        while not self._stop.wait(poll):
+            loop = self._loop
+            if loop is None or not loop.is_running():
+                continue
+            behind = time.monotonic() - self._beat - self.interval
+            if behind < self.slow:
+                continue
+            with self._lock:
+                if self._open_stall is not None:
+                    self._open_stall['ms'] = round(behind * 1000.0, 1)
+                    continue
+            label = site = None
+            try:
+                label = activity_for(asyncio.current_task(loop))
+            except Exception:
+                pass
+            try:
+                frame = sys._current_frames().get(self._thread_id)
+                site = _project_site(frame)
+            except Exception:
+                pass
+            with self._lock:
+                self._open_stall = {'at': time.time() - behind, 'ms': round(behind * 1000.0, 1), 'label': label, 'site': site, 'source': 'watchdog'}
+            logger.warning('Event loop stalled %.0f ms in %s at %s', behind * 1000.0, label or 'unknown handler', site or '?')
+
+    def _record(self, stall: Dict[str, Any]) -> None:
+        self.stalls.append(stall)
+        key = stall.get('label') or '(unattributed)'
+        self.by_label[key] += 1
+        self.ms_by_label[key] += float(stall.get('ms') or 0.0)
+
+    def _record_slow_callback(self, dt: float, label: Optional[str]) -> None:
+        # The watchdog usually caught the same stall already; only fill in its label
+        with self._lock:
+            same = self._open_stall
+        if same is None and self.stalls and self.stalls[-1]['at'] >= time.time() - dt - self.interval:
+            same = self.stalls[-1]
+        if same is not None:
+            if label and not same.get('label'):
+                same['label'] = label
+            return
+        self._record({'at': time.time() - dt, 'ms': round(dt * 1000.0, 1), 'label': label, 'site': None, 'source': 'asyncio'})
+
+    def prometheus_lines(self) -> List[str]:
+        """Loop lag quantiles and stall totals as Prometheus gauges/counters."""
+        if self.started_at is None:
+            return []
+        lag = self.lag_stats()
+        out = [
+            "# HELP dccbot_loop_lag_seconds Event-loop scheduling lag over the rolling window",
+            "# TYPE dccbot_loop_lag_seconds gauge",
+        ]
+        for q, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms'), ('1', 'max_ms')):
+            out.append(f'dccbot_loop_lag_seconds{{quantile="{q}"}} {lag[key] / 1000.0!r}')
+        out.append("# HELP dccbot_loop_stalls_total Event-loop stalls longer than the slow threshold")
+        out.append("# TYPE dccbot_loop_stalls_total counter")
+        out.append(f"dccbot_loop_stalls_total {sum(self.by_label.values())}")
+        return out
+
+    # ---- reporting ----
+    def lag_stats(self) -> Dict[str, float]:
+        vals = sorted(self.samples)
+        return {
+            'samples': len(vals),
+            'window_s': len(vals) * self.interval,
+            'p50_ms': _percentile(vals, 50) * 1000.0,
+            'p95_ms': _percentile(vals, 95) * 1000.0,
+            'p99_ms': _percentile(vals, 99) * 1000.0,
+            'max_ms': (vals[-1] * 1000.0) if vals else 0.0,
+        }
+
+    def top_offenders(self, limit: int = 5) -> List[tuple]:
+        """[(label, stalls, total ms)] by total stalled time."""
+        return [(k, self.by_label[k], self.ms_by_label[k]) for k, _ in self.ms_by_label.most_common(limit)]
+
+    def recent_stalls(self, limit: int = 5) -> List[Dict[str, Any]]:
+        return list(self.stalls)[-limit:][::-1]
+
+
+class _SlowCallbackFilter(logging.Filter):
+    """Attributes asyncio debug-mode 'Executing <handle> took N seconds' warnings."""
+
+    def __init__(self, monitor: LoopMonitor):
+        super().__init__()
+        self.monitor = monitor
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        try:
+            if record.msg == 'Executing %s took %.3f seconds' and record.args:
+                # asyncio passes the handle pre-formatted; a task step shows "<Task ... name='...'>"
+                text, dt = str(record.args[0]), float(record.args[1])
+                m = _TASK_NAME.search(text)
+                label = _label_by_task_name(m.group(1)) if m else None
+                self.monitor._record_slow_callback(dt, label)
+                if label:
+                    record.msg = 'Executing %s took %.3f seconds (%s)'
+                    record.args = (text, dt, label)
+        except Exception:
+            pass
+        return True
+
+
+_TASK_NAME = re.compile(r"name='([^']+)'")
+
+
+def _label_by_task_name(name: str) -> Optional[str]:
+    try:
+        for task, label in list(_activity.items()):
+            if task.get_name() == name:
+                return label
+    except Exception:
+        pass
+    return None
+
+
+def _project_site(frame) -> Optional[str]:
+    """Innermost frame inside the project (not this module) as 'path:line in func'."""
+    here = os.path.abspath(__file__)
+    while frame is not None:
+        fname = os.path.abspath(frame.f_code.co_filename)
+        if fname.startswith(_ROOT) and fname != here:
+            return f"{os.path.relpath(fname, _ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class TrackedCommandTree(app_commands.CommandTree):
+    """Command tree that labels and times each interaction's task.
+
+    ``interaction_check`` runs first in the task discord.py creates for every
+    app command and autocomplete, so it is where the per-request metrics start;
+    the task's done callback folds them into the histograms.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        label = interaction_label(interaction)
+        track_activity(label)
+        kind = 'autocomplete' if interaction.type is discord.InteractionType.autocomplete else 'app'
+        command = label[:-len(' [autocomplete]')] if kind == 'autocomplete' else label
+        req = begin_request(command, kind)
+        try:
+            interaction.extras['metrics'] = req
+        except Exception:
+            pass
+        task = asyncio.current_task()
+        if task is not None:
+            task.add_done_callback(lambda t: METRICS.finish(req, failed=bool(interaction.command_failed or _task_failed(t))))
+        return True
+
+
+def _task_failed(task: asyncio.Task) -> bool:
+    if task.cancelled():
+        return True
+    return task.exception() is not None
+
+
+_RESPONSE_METHODS = ('send_message', 'defer', 'edit_message', 'send_modal', 'autocomplete', 'pong', 'launch_activity')
+
+
+def _timed_response(orig):
+    @functools.wraps(orig)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await orig(self, *args, **kwargs)
+        finally:
+            parent = getattr(self, '_parent', None)
+            req = getattr(parent, 'extras', {}).get('metrics') if parent is not None else None
+            req = req or current_request()
+            if req is not None:
+                req.mark_response()
+    wrapper._dccbot_timed = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_responses() -> None:
+    """Time the first interaction response (any of send_message/defer/... ) per request. Idempotent."""
+    for name in _RESPONSE_METHODS:
+        orig = getattr(discord.InteractionResponse, name, None)
+        if orig is None or getattr(orig, '_dccbot_timed', False):
+            continue
+        setattr(discord.InteractionResponse, name, _timed_response(orig))
+
+
+async def before_prefix_command(ctx: commands.Context) -> None:
+    # Prefix commands run in the message task; label and time it like app commands
+    label = f"!{ctx.command.qualified_name}" if ctx.command else "!?"
+    track_activity(label)
+    begin_request(label, 'prefix')
+
+
+async def after_prefix_command(ctx: commands.Context) -> None:
+    req = current_request()
+    if req is not None and req.kind == 'prefix':
+        METRICS.finish(req, failed=bool(ctx.command_failed))
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_monitor() -> LoopMonitor:
+    """Process-wide loop monitor (configured from env; not started until ``start_loop_monitor``)."""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor(
+            interval=_env_int('LOOP_LAG_INTERVAL_MS', 100) / 1000.0,
+            slow=_env_int('LOOP_SLOW_MS', 250) / 1000.0,
+            window=_env_int('LOOP_LAG_WINDOW', 3000),
+        )
+    return _monitor
+
+
+def start_loop_monitor(loop: Optional[asyncio.AbstractEventLoop] = None) -> LoopMonitor:
+    mon = get_monitor()
+    debug = str(os.getenv('LOOP_ASYNCIO_DEBUG', '0')).strip().lower() in ('1', 'true', 'yes', 'on')
+    if mon.started_at is None:
+        METRICS.add_collector(mon.prometheus_lines)
+    mon.start(loop, asyncio_debug=debug)
+    return mon
+
+
+__all__ = [
+    "LoopMonitor",
+    "TrackedCommandTree",
+    "instrument_responses",
+    "before_prefix_command",
+    "after_prefix_command",
+    "get_monitor",
+    "start_loop_monitor",
+    "track_activity",
+    "activity_for",
+    "interaction_label",
+]
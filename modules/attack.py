@@ -0,0 +1,441 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from modules.utils import (
+    get_modifier, dcc_dice_chain_step, is_weapon_trained, get_max_luck_mod,
+    double_damage_dice_expr, get_global_roll_penalty, two_weapon_die_steps,
+)
+from modules.data_constants import WEAPON_TABLE
+
+# Character attack rules shared by /attack (cogs/combat.py) and /simulate attack
+# (modules/simulate.py).
+#
+# resolve_weapons() looks up and validates the weapon (and off-hand weapon) a
+# character attacks with. plan_attack() then works out every part of the
+# attack that comes from the sheet: action die (training, two-weapon steps,
+# shield bash), attack bonus and ability, roll penalties, Mighty Deed die, Luck
+# weapon, backstab, birth augur, mounted bonus, damage dice and damage
+# modifiers. Nothing is rolled here: /attack rolls against the plan and shows
+# each part, and the simulator sums it into an AttackProfile.
+
+SPELL_DIE_CLASSES = {'wizard', 'mage', 'elf'}
+LV0_CLASSES = ('lv0', '0', 'level 0', 'level-0')
+UNARMED_WEAPONS = ('unarmed', 'fist', 'fists', 'punch', 'kick')
+ABILITY_KEYS = ('STR', 'AGI', 'STA', 'INT', 'PER', 'LCK')
+
+
+class AttackError(ValueError):
+    """The attack is not allowed; the message is meant for the user."""
+
+
+def ability_mod(data: dict, key: str) -> int:
+    try:
+        v = data.get('abilities', {}).get(key, {})
+        if isinstance(v, dict):
+            return int(v.get('mod', 0))
+        return int(get_modifier(int(v)))
+    except Exception:
+        return 0
+
+
+def _class(data: dict) -> str:
+    return str(data.get('class', '') or '').strip().lower()
+
+
+def _int(value, default: int = 0) -> int:
+    try:
+        return int(value or 0)
+    except Exception:
+        return default
+
+
+def weapon_entry(data: dict, wkey: str) -> Tuple[Optional[dict], Optional[dict]]:
+    """(weapon entry, custom weapon meta) for a WEAPON_TABLE key or an inventory custom weapon."""
+    wentry = WEAPON_TABLE.get(wkey)
+    if isinstance(wentry, dict):
+        return wentry, None
+    for it in data.get('inventory') or []:
+        if isinstance(it, dict) and str(it.get('name') or it.get('item') or '').strip().lower() == wkey and isinstance(it.get('weapon'), dict):
+            meta = dict(it['weapon'])
+            tags = list(meta.get('tags') or [])
+            return {
+                'damage': meta.get('damage') or '1d2',
+                'type': 'missile' if any(str(t).lower() == 'missile' for t in tags) else 'melee',
+                'tags': tags,
+            }, meta
+    return None, None
+
+
+def has_item(data: dict, wkey: str) -> bool:
+    for it in data.get('inventory') or []:
+        if isinstance(it, dict):
+            try:
+                if str(it.get('name') or it.get('item') or '').strip().lower() == wkey and int(it.get('qty', 1) or 1) > 0:
+                    return True
+            except Exception:
+                continue
+        elif str(it).strip().lower() == wkey:
+            return True
+    return False
+
+
+def weapon_ability(meta: Optional[dict], default: str) -> Tuple[Optional[str], bool]:
+    """(ability used, no ability mod?) honouring a custom weapon's 'ability' field."""
+    if not meta:
+        return default, False
+    ca_raw = str(meta.get('ability') or '').strip().upper()
+    if ca_raw in ABILITY_KEYS:
+        return ca_raw, False
+    if ca_raw in ('', 'NONE'):
+        return None, True
+    return default, False
+
+
+def weapon_bonus(meta: Optional[dict]) -> int:
+    return _int((meta or {}).get('attack_bonus'))
+
+
+def action_dice(data: dict) -> List[str]:
+    """Action dice from 'action_dice' (e.g. '1d20+1d14'), falling back to 'action_die'."""
+    try:
+        raw = str(data.get('action_dice') or data.get('action_die') or '1d20')
+    except Exception:
+        raw = '1d20'
+    parts = [p.strip() for p in raw.replace(',', '+').split('+') if p.strip()]
+    return parts if parts else ['1d20']
+
+
+def action_die_index(parts: List[str], die: Optional[str], cls: str = '') -> int:
+    """Which action die ``die`` names ('1d16', or 'second'/'third'); wizards attack with the first."""
+    idx = 0
+    if die:
+        s = str(die).strip().lower()
+        for i, d in enumerate(parts):
+            if str(d).strip().lower() == s:
+                idx = i
+                break
+        if idx == 0 and s in {"second", "2", "#2", "die2"} and len(parts) >= 2:
+            idx = 1
+        elif idx == 0 and s in {"third", "3", "#3", "die3"} and len(parts) >= 3:
+            idx = 2
+    # Wizards' additional action dice are for spell checks only
+    if idx > 0 and cls in SPELL_DIE_CLASSES:
+        idx = 0
+    return idx
+
+
+@dataclass
+class Weapons:
+    key: str
+    entry: dict
+    meta: Optional[dict] = None
+    shield_bash: bool = False
+    off_key: str = ''
+    off_entry: Optional[dict] = None
+    off_meta: Optional[dict] = None
+
+
+def resolve_weapons(data: dict, weapon: Optional[str] = None, offhand: Optional[str] = None) -> Weapons:
+    """Look up and validate the attacking weapon(s). Raises AttackError when /attack would refuse."""
+    wkey = (weapon or data.get('weapon') or '').strip().lower()
+    if not wkey:
+        raise AttackError("No weapon equipped. Use /equip weapon or specify a weapon.")
+    if wkey == 'shield':
+        # Dwarf shield bash
+        if _class(data) != 'dwarf':
+            raise AttackError("❌ Shield bash is a Dwarf feature.")
+        if not bool(data.get('shield')):
+            raise AttackError("❌ You must have a shield equipped to use shield bash.")
+        out = Weapons(wkey, {'damage': '1d3', 'type': 'melee', 'tags': ['melee', 'shield', 'bash']}, shield_bash=True)
+    else:
+        wentry, meta = weapon_entry(data, wkey)
+        if wentry is None:
+            raise AttackError(f"❌ Unknown weapon '{wkey}'.")
+        out = Weapons(wkey, wentry, meta)
+    if not has_item(data, wkey):
+        raise AttackError(f"❌ You don't have a {wkey} in your inventory.")
+    off_key = str(offhand or '').strip().lower()
+    if off_key:
+        if bool(data.get('shield')):
+            raise AttackError("❌ Two-weapon fighting can't be used while a shield is equipped. Toggle your shield off first.")
+        if str(out.entry.get('type', 'melee')).lower() != 'melee':
+            raise AttackError("❌ Two-weapon fighting is melee-only; your primary weapon isn't melee.")
+        if bool(out.entry.get('two_handed')):
+            raise AttackError("❌ Primary weapon must be one-handed for two-weapon fighting.")
+        off_entry, off_meta = weapon_entry(data, off_key)
+        if off_entry is None:
+            raise AttackError(f"❌ Unknown off-hand weapon '{off_key}'.")
+        if not has_item(data, off_key):
+            raise AttackError(f"❌ You don't have an off-hand {off_key} in your inventory.")
+        if str(off_entry.get('type', 'melee')).lower() != 'melee':
+            raise AttackError("❌ Two-weapon fighting is melee-only.")
+        if bool(off_entry.get('two_handed')):
+            raise AttackError("❌ Off-hand weapon must be one-handed.")
+        out.off_key, out.off_entry, out.off_meta = off_key, off_entry, off_meta
+    return out
+
+
+@dataclass
+class OffhandPlan:
+    key: str
+    action_die: str
+    weapon_bonus: int
+    ability: Optional[str]
+    no_ability_mod: bool
+    ability_mod: int
+    damage: str
+    damage_mod: int      # Strength
+    augur_damage: int
+
+
+@dataclass
+class AttackPlan:
+    weapon: str
+    cls: str
+    base_die: str
+    action_die: str
+    trained: bool
+    is_lv0: bool
+    wtype: str
+    tags: List[str]
+    is_throwing: bool
+    attack_bonus: int
+    weapon_bonus: int
+    ability: Optional[str]
+    no_ability_mod: bool
+    ability_mod: int
+    penalty: int
+    penalty_notes: List[str]
+    deed_sides: int                 # 0 = no Mighty Deed
+    deed_plus: int
+    deed_die: str
+    luck_weapon_mod: int
+    backstab: bool                  # thief backstab with a weapon that allows it
+    backstab_bonus: int
+    augur: str
+    max_luck_mod: int
+    augur_attack: List[Tuple[str, int]]   # (note, bonus)
+    mounted_bonus: int
+    damage: str
+    damage_mod: int                 # Strength, when it applies
+    augur_damage: int
+    luck_mod: int
+    crit_die: str
+    fumble_die: str
+    offhand: Optional[OffhandPlan] = None
+    notes: List[str] = field(default_factory=list)   # in /attack's order, after the deed roll
+
+    @property
+    def attack_mod(self) -> int:
+        """Flat attack modifier (everything but the deed roll and Luck burns)."""
+        return (self.attack_bonus + self.weapon_bonus + self.ability_mod + self.penalty + self.luck_weapon_mod
+                + self.backstab_bonus + sum(v for _, v in self.augur_attack) + self.mounted_bonus)
+
+    @property
+    def offhand_attack_mod(self) -> int:
+        off = self.offhand
+        return (self.attack_bonus + off.weapon_bonus + off.ability_mod + self.penalty) if off else 0
+
+    @property
+    def crit_mod(self) -> int:
+        return self.luck_mod + (self.max_luck_mod if self.augur == 'Critical hit tables' else 0)
+
+    @property
+    def fumble_mod(self) -> int:
+        # Luck applies inversely on fumbles
+        return -self.luck_mod + (self.max_luck_mod if self.augur == 'Fumbles' else 0)
+
+
+def plan_attack(data: dict, weapons: Weapons, base_die: str, *, range: Optional[str] = None, deed: bool = False,
+                backstab: bool = False, mounted: bool = False, target_mounted: bool = False,
+                charge: bool = False) -> AttackPlan:
+    """Everything /attack derives from the sheet for ``weapons`` rolled on ``base_die``.
+
+    ``range`` is None when no range band was given: thrown-capable melee
+    weapons then attack in melee.
+    """
+    cls = _class(data)
+    wkey, wentry, meta = weapons.key, weapons.entry, weapons.meta
+    notes: List[str] = []
+
+    trained = is_weapon_trained(data, wkey)
+    # Lv0 are untrained but do not suffer the untrained die penalty
+    is_lv0 = cls in LV0_CLASSES
+    action_die = base_die if (trained or is_lv0) else dcc_dice_chain_step(base_die, -1)
+    if weapons.shield_bash:
+        # Dwarf shield bash uses a d14 instead of a d20
+        action_die = '1d14'
+
+    wtype = str(wentry.get('type', 'melee'))
+    tags_l = [str(t).lower() for t in (wentry.get('tags') or [])]
+    # Thrown/missile only for ranged weapons, or thrown-capable ones when a range band was given
+    is_throwing = bool(wtype != 'melee' or ('thrown' in tags_l and range is not None))
+    rng = range or 'close'
+
+    offhand = None
+    if weapons.off_key:
+        agi_mod = ability_mod(data, 'AGI')
+        # Halfling: treat AGI as at least 16 (modifier floor +2) when dual-wielding
+        if cls == 'halfling':
+            agi_mod = max(int(agi_mod), 2)
+        prim_step, off_step = two_weapon_die_steps(agi_mod)
+        off_trained = is_weapon_trained(data, weapons.off_key)
+        off_base = base_die if (off_trained or is_lv0) else dcc_dice_chain_step(base_die, -1)
+        action_die = dcc_dice_chain_step(action_die, prim_step)
+        off_ability, off_no_mod = weapon_ability(weapons.off_meta, 'STR')
+        offhand = OffhandPlan(
+            key=weapons.off_key,
+            action_die=dcc_dice_chain_step(off_base, off_step),
+            weapon_bonus=weapon_bonus(weapons.off_meta),
+            ability=off_ability,
+            no_ability_mod=off_no_mod,
+            ability_mod=0 if off_no_mod else ability_mod(data, off_ability or 'STR'),
+            damage=str((weapons.off_entry or {}).get('damage') or '1d2'),
+            damage_mod=ability_mod(data, 'STR'),
+            augur_damage=0,
+        )
+
+    used_ability, no_ability_mod = weapon_ability(meta, 'AGI' if is_throwing else 'STR')
+    try:
+        penalty, penalty_notes = get_global_roll_penalty(data)
+    except Exception:
+        penalty, penalty_notes = 0, []
+
+    # Mighty Deed: Warriors and Dwarves roll a deed on every melee attack
+    deed_sides = deed_plus = 0
+    deed_die = ''
+    if cls in {'warrior', 'dwarf'} and wtype.lower() == 'melee':
+        deed_die = str(data.get('deed_die') or '').strip().lower() or 'd3'
+        m = re.match(r"^d(\d+)(?:\+(\d+))?$", deed_die)
+        deed_sides, deed_plus = (int(m.group(1)), int(m.group(2) or 0)) if m else (3, 0)
+    elif deed:
+        notes.append("deed ignored (requires Warrior/Dwarf melee)")
+
+    # Warrior/Dwarf Luck weapon: fixed Luck modifier on one chosen weapon
+    luck_weapon_mod = 0
+    if cls in {'warrior', 'dwarf'}:
+        lw = str(data.get(f'{cls}_luck_weapon') or '').strip().lower()
+        if lw and wkey == lw:
+            luck_weapon_mod = _int(data.get(f'{cls}_luck_weapon_mod'))
+            if luck_weapon_mod:
+                notes.append(f"luck weapon {lw} {luck_weapon_mod:+}")
+
+    # Thief backstab: skill bonus to attack (the auto-crit on a hit is applied when rolling)
+    can_backstab = 'backstab' in tags_l
+    backstab_on = bool(backstab) and cls == 'thief' and can_backstab
+    backstab_bonus = 0
+    if backstab and not can_backstab:
+        notes.append("backstab not supported by this weapon")
+    if backstab_on:
+        try:
+            backstab_bonus = int(((data.get('thief_skills') or {}).get('skills') or {}).get('backstab', 0) or 0)
+        except Exception:
+            backstab_bonus = 0
+        notes.append(f"backstab +{backstab_bonus} to attack" if backstab_bonus else "backstab attempt")
+
+    # Birth augur (static max Luck modifier)
+    try:
+        aug = str((data.get('birth_augur') or {}).get('effect') or '').strip()
+        mlm = int(get_max_luck_mod(data) or 0)
+    except Exception:
+        aug, mlm = '', 0
+    is_melee_like = (wtype == 'melee' and not is_throwing)
+    is_missile_like = bool(is_throwing or wtype != 'melee')
+    start_w = str(data.get('weapon') or '').strip().lower()
+    pack_hunter = aug == 'Attack and damage rolls for 0-level starting weapon' and bool(start_w) and wkey == start_w
+    augur_attack: List[Tuple[str, int]] = []
+    augur_damage = 0
+    if mlm:
+        if aug == 'All attack rolls':
+            augur_attack.append((f"augur: all attacks {mlm:+}", mlm))
+        if aug == 'Melee attack rolls' and is_melee_like:
+            augur_attack.append((f"augur: melee attack {mlm:+}", mlm))
+        if aug == 'Missile fire attack rolls' and is_missile_like:
+            augur_attack.append((f"augur: missile attack {mlm:+}", mlm))
+        if aug == 'Unarmed attack rolls' and (wkey in UNARMED_WEAPONS or 'unarmed' in tags_l):
+            augur_attack.append((f"augur: unarmed attack {mlm:+}", mlm))
+        if aug == 'Mounted attack rolls' and bool(mounted):
+            augur_attack.append((f"augur: mounted attack {mlm:+}", mlm))
+        if pack_hunter:
+            augur_attack.append((f"augur: pack hunter attack {mlm:+}", mlm))
+        if aug == 'Damage rolls' or (aug == 'Melee damage rolls' and is_melee_like) \
+                or (aug == 'Missile fire damage rolls' and is_missile_like) or pack_hunter:
+            augur_damage = mlm
+        if offhand is not None and aug in ('Damage rolls', 'Melee damage rolls'):
+            offhand.augur_damage = mlm
+    notes.extend(n for n, _ in augur_attack)
+
+    # Mounted combat: higher ground +1; a mounted charge doubles lance/spear damage dice
+    dmg_expr = str(wentry.get('damage') or '1d2')
+    mounted_bonus = 0
+    if mounted and not target_mounted:
+        mounted_bonus = 1
+        notes.append('mounted:higher_ground +1')
+    if mounted and charge and 'mounted' in tags_l:
+        dmg_expr = double_damage_dice_expr(dmg_expr)
+        notes.append('mounted:charge double damage dice')
+    # Strength to damage in melee, and for thrown weapons at close range
+    damage_mod = 0
+    if (not is_throwing and wtype == 'melee') or (is_throwing and rng == 'close'):
+        damage_mod = ability_mod(data, 'STR')
+    if augur_damage:
+        notes.append(f"augur: damage {augur_damage:+}")
+
+    crit_die = str(data.get('crit_die') or '1d4').strip()
+    if not crit_die or 'd' not in crit_die:
+        crit_die = '1d4'
+
+    return AttackPlan(
+        weapon=wkey,
+        cls=cls,
+        base_die=base_die,
+        action_die=action_die,
+        trained=trained,
+        is_lv0=is_lv0,
+        wtype=wtype,
+        tags=tags_l,
+        is_throwing=is_throwing,
+        attack_bonus=_int(data.get('attack_bonus', data.get('attack', 0))),
+        weapon_bonus=weapon_bonus(meta),
+        ability=used_ability,
+        no_ability_mod=no_ability_mod,
+        ability_mod=0 if no_ability_mod else ability_mod(data, used_ability or 'STR'),
+        penalty=int(penalty or 0),
+        penalty_notes=list(penalty_notes or []),
+        deed_sides=deed_sides,
+        deed_plus=deed_plus,
+        deed_die=deed_die,
+        luck_weapon_mod=luck_weapon_mod,
+        backstab=backstab_on,
+        backstab_bonus=backstab_bonus,
+        augur=aug,
+        max_luck_mod=mlm,
+        augur_attack=augur_attack,
+        mounted_bonus=mounted_bonus,
+        damage=dmg_expr,
+        damage_mod=damage_mod,
+        augur_damage=augur_damage,
+        luck_mod=ability_mod(data, 'LCK'),
+        crit_die=crit_die,
+        fumble_die=str(data.get('fumble_die') or 'd4'),
+        offhand=offhand,
+        notes=notes,
+    )
+
+
+__all__ = [
+    'AttackError',
+    'AttackPlan',
+    'OffhandPlan',
+    'Weapons',
+    'ability_mod',
+    'action_dice',
+    'action_die_index',
+    'has_item',
+    'plan_attack',
+    'resolve_weapons',
+    'weapon_ability',
+    'weapon_entry',
+]
@@ -1,16 +1,14 @@
-import os, json, random
+import os, random
 from typing import Dict, Any, Tuple
 
 from utils.dice import roll_dice
+from modules.reference import reference
+from storage.migrations import LATEST_SCHEMA_VERSION  # type: ignore
 
 FAMILIARS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'familiars.json')
 
 def _load_config() -> Dict[str, Any]:
-    try:
-        with open(FAMILIARS_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    return reference('data/familiars.json', {})
 
 def _hp_from_formula(expr: str) -> int:
     """Parse simple NdS+K style like '1d4+2'."""
@@ -125,7 +123,7 @@ def generate_familiar_record(wizard: Dict[str, Any], spell_check: int) -> Dict[s
         'ac': ac_total,
         'attack_bonus': f"+{atk_bonus}",
         'notes': notes,
-        'schema_version': 1,
+        'schema_version': LATEST_SCHEMA_VERSION,
     }
     # Add attack damage if present
     dmg = type_meta.get('attack_damage')
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.dice import DiceExpr
+from modules.reference import reference
+from modules.utils import get_modifier
+from storage.migrations import LATEST_SCHEMA_VERSION  # type: ignore
+
+# Level 0 character generation (/create, funnel batches).
+#
+# FunnelTables snapshots the occupation and augur tables once per batch, and the
+# ability expression is compiled once by the caller, so generating N characters
+# costs N passes over in-memory data. Nothing here touches storage: names are
+# reserved and records written by the caller.
+
+ABILITIES = ["STR", "AGI", "STA", "INT", "PER", "LCK"]
+KNOWN_LANGUAGES = ["Elvish", "Dwarvish", "Halfling", "Draconic", "Infernal", "Celestial", "Goblin", "Orc"]
+
+
+@dataclass
+class FunnelTables:
+    occupations: Dict[str, Any] = field(default_factory=dict)   # "1".."100" -> occupation
+    auguries: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def load_funnel_tables() -> FunnelTables:
+    """Occupation and augur tables from the reference registry (parsed once, shared)."""
+    occ = reference('occupations_full.json', {}) or {}
+    aug = reference('auguries.json', {}) or {}
+    return FunnelTables(occupations=occ, auguries=list(aug.items()))
+
+
+@dataclass
+class Lv0Character:
+    record: Dict[str, Any]
+    stats: Dict[str, int]
+    mods: Dict[str, int]
+    rolls: Dict[str, Dict[str, List[int]]]  # ability -> {'kept': [...], 'dropped': [...]}
+    weapon: str                             # occupation weapon with its damage die, e.g. 'club (1d4)'
+
+
+def roll_lv0(name: str, owner: Optional[int], dice: DiceExpr, tables: FunnelTables,
+             rng: Optional[random.Random] = None) -> Lv0Character:
+    """Roll one level 0 character named ``name`` using the ability expression ``dice``."""
+    rng = rng or random  # module-level generator unless a seeded one is given
+    stats: Dict[str, int] = {}
+    mods: Dict[str, int] = {}
+    rolls: Dict[str, Dict[str, List[int]]] = {}
+    for ab in ABILITIES:
+        res = dice.roll(rnd=rng.random)
+        stats[ab] = int(res.total)
+        mods[ab] = int(get_modifier(res.total))
+        rolls[ab] = {"kept": res.kept, "dropped": res.dropped}
+    max_luck_mod = mods["LCK"]
+    # Occupation (d100)
+    if tables.occupations:
+        occ = tables.occupations.get(str(rng.randint(1, 100)), {})
+        occupation = occ.get('name', 'Gongfarmer')
+        weapon = occ.get('weapon', 'club (1d4)')
+        goods = occ.get('goods', 'sack of night soil')
+    else:
+        occupation = 'Gongfarmer'
+        weapon = 'trowel (1d4)'
+        goods = 'sack of night soil'
+    weapon_name = weapon.split(' (')[0] if isinstance(weapon, str) else str(weapon)
+    inventory = [weapon_name, goods]
+    # Augur
+    if tables.auguries:
+        sign, effect = rng.choice(tables.auguries)
+    else:
+        sign, effect = ("Harsh winter", "All attack rolls")
+    # Base derived
+    hp = max(1, rng.randint(1, 4) + mods["STA"])  # d4 + STA
+    ac = 10 + mods["AGI"]
+    reflex = mods["AGI"]
+    fort = mods["STA"]
+    will = mods["PER"]
+    initiative = mods["AGI"]
+    speed = 30
+    attack = 0
+    # Apply augur via luck mod
+    if effect in ["Harsh winter", "Pack hunter"]:
+        attack += max_luck_mod
+    if effect == "Lucky sign":
+        reflex += max_luck_mod; fort += max_luck_mod; will += max_luck_mod
+    if effect == "Struck by lightning":
+        reflex += max_luck_mod
+    if effect == "Lived through famine":
+        fort += max_luck_mod
+    if effect == "Resisted temptation":
+        will += max_luck_mod
+    if effect == "Charmed house":
+        ac += max_luck_mod
+    if effect == "Speed of the cobra":
+        initiative += max_luck_mod
+    if effect == "Bountiful harvest":
+        hp += max_luck_mod
+    if effect == "Wild child":
+        speed += max_luck_mod * 5
+    extra_langs = max_luck_mod if effect == "Birdsong" else 0
+    # Languages
+    languages: List[str] = []
+    if extra_langs > 0:
+        pick = max(0, min(len(KNOWN_LANGUAGES), extra_langs))
+        if pick:
+            languages = rng.sample(KNOWN_LANGUAGES, pick)
+    # Coin
+    cp = sum(rng.randint(1, 12) for _ in range(5))
+    alignment = rng.choice(["Lawful", "Neutral", "Chaotic"])
+    # Full record (raw JSON to preserve wider schema)
+    record = {
+        "name": name,
+        "alignment": alignment,
+        "class": "Lv0",
+        "level": 0,
+        "owner": owner,
+        "occupation": occupation,
+        "weapon": weapon_name,
+        "inventory": inventory,
+        "birth_augur": {"sign": sign, "effect": effect},
+        "max_luck_mod": max_luck_mod,
+        "hp": {"current": hp, "max": hp},
+        "luck": {"current": int(stats.get("LCK", 0)), "max": int(stats.get("LCK", 0))},
+        "ac": ac,
+        "saves": {"reflex": reflex, "fortitude": fort, "will": will},
+        "initiative": initiative,
+        "speed": speed,
+        "attack": attack,
+        "attack_bonus": 0,
+        "cp": cp,
+        "abilities": {k: {"max": int(stats[k]), "current": int(stats[k]), "mod": int(mods[k])} for k in stats},
+        "armor": "unarmored",
+        "shield": False,
+        "fumble_die": "d4",
+        "action_die": "1d20",
+        "crit_die": "1d4",
+        "crit_table": "I",
+        "languages": languages,
+        "schema_version": LATEST_SCHEMA_VERSION,
+    }
+    return Lv0Character(record=record, stats=stats, mods=mods, rolls=rolls, weapon=str(weapon))
+
+
+def roll_funnel(names: List[str], owner: Optional[int], dice: DiceExpr,
+                tables: Optional[FunnelTables] = None, rng: Optional[random.Random] = None) -> List[Lv0Character]:
+    """Roll one character per name in a single pass over preloaded tables."""
+    tables = tables if tables is not None else load_funnel_tables()
+    return [roll_lv0(n, owner, dice, tables, rng) for n in names]
+
+
+__all__ = [
+    "ABILITIES",
+    "FunnelTables",
+    "Lv0Character",
+    "load_funnel_tables",
+    "roll_funnel",
+    "roll_lv0",
+]
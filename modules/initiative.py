@@ -1,19 +1,349 @@
-import os, json, random, re
+import random, re
+import asyncio
+import logging
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import discord
 from discord.ext import commands
 from modules.utils import get_modifier, roll_dice, effective_initiative_die
+from storage.repository import get_repository
+from storage.encounters import ENCOUNTER_STORE, EncounterStore
 
-# Public state (kept simple for now; future: per-guild dict)
-INITIATIVE_OPEN = False
-INITIATIVE_ORDER = []  # list of dicts {name, display, roll, owner, hp?, ac?}
-CURRENT_TURN_INDEX = None
-COMBAT_ROUND = 0
-SAVE_FOLDER = 'characters'
+# Initiative state lives in one Encounter per (guild, channel), so tables in
+# different guilds or channels no longer share a turn order. Each encounter
+# keeps its entries sorted by roll (highest first) with a parallel key list:
+# joining is a bisect insertion instead of a full re-sort, and equal rolls keep
+# join order as the old stable sort did. Lookups by name or abbreviation go
+# through lowercase dict indexes rather than scanning the order.
+#
+# Every mutation calls touch(), which queues a snapshot with the encounter
+# store (storage/encounters.py) so a restart mid-combat resumes where it left
+# off. Code that edits an entry dict in place (hp, ac) must call touch() itself.
+# Snapshots are read lazily: encounter_for() loads a channel's snapshot on
+# first access, so it is async.
+SNAPSHOT_VERSION = 1
+
+logger = logging.getLogger('dccbot.initiative')
 
 __all__ = [
-    'INITIATIVE_OPEN','INITIATIVE_ORDER','CURRENT_TURN_INDEX','COMBAT_ROUND','register'
+    'Encounter', 'EncounterManager', 'ENCOUNTERS', 'encounter_for', 'group_name', 'register'
 ]
 
+
+def _norm(value) -> str:
+    return str(value or '').strip().lower()
+
+
+_MEMBER_SUFFIX = re.compile(r"\s*#\d+$")
+
+
+def group_name(name) -> str:
+    """Monster group of an entry name: 'Goblin #3' -> 'Goblin' (names without a number are their own group)."""
+    return _MEMBER_SUFFIX.sub('', str(name or '').strip())
+
+
+class Encounter:
+    """One channel's initiative: open flag, round, turn pointer and the sorted order."""
+
+    def __init__(self, guild_id: int = 0, channel_id: int = 0):
+        self.guild_id = int(guild_id or 0)
+        self.channel_id = int(channel_id or 0)
+        self.open = False
+        self.round = 0
+        self.current_index: Optional[int] = None
+        self._entries: List[dict] = []  # entry dicts {name, display, roll, owner, abbr?, hp?, ac?, ...}
+        self._keys: List[int] = []      # -roll for each entry, ascending
+        self._by_name: Dict[str, dict] = {}
+        self._by_abbr: Dict[str, dict] = {}
+        self._by_group: Dict[str, List[dict]] = {}
+        self._on_change: Optional[Callable[['Encounter'], None]] = None
+
+    # ---- read access ----
+    @property
+    def key(self) -> Tuple[int, int]:
+        return (self.guild_id, self.channel_id)
+
+    @property
+    def entries(self) -> List[dict]:
+        """The turn order, highest roll first. Treat as read-only; use add/remove."""
+        return self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(list(self._entries))
+
+    def find(self, name_or_abbr: Optional[str]) -> Optional[dict]:
+        """Entry whose name (preferred) or abbreviation matches, case-insensitively."""
+        q = _norm(name_or_abbr)
+        if not q:
+            return None
+        return self._by_name.get(q) or self._by_abbr.get(q)
+
+    def find_name(self, name: Optional[str]) -> Optional[dict]:
+        """Entry with exactly this name (case-insensitive); abbreviations are ignored."""
+        return self._by_name.get(_norm(name))
+
+    def group(self, name: Optional[str]) -> List[dict]:
+        """Members of a monster group ('Goblin' finds 'Goblin #1'..'Goblin #N'), in join order.
+
+        A member's own name or abbreviation resolves to its whole group.
+        """
+        members = self._by_group.get(_norm(name))
+        if not members:
+            one = self.find(name)
+            members = self._by_group.get(_norm(group_name(one.get('name')))) if one is not None else None
+        return list(members or ())
+
+    def groups(self) -> List[Tuple[str, int]]:
+        """(group name, member count) in turn order of each group's first member."""
+        out: List[Tuple[str, int]] = []
+        seen = set()
+        for e in self._entries:
+            g = group_name(e.get('name'))
+            k = _norm(g)
+            if k and k not in seen:
+                seen.add(k)
+                out.append((g, len(self._by_group.get(k, ()))))
+        return out
+
+    def current(self) -> Optional[dict]:
+        if self.current_index is None:
+            return None
+        try:
+            return self._entries[self.current_index]
+        except IndexError:
+            return None
+
+    # ---- mutation ----
+    def add(self, entry: dict) -> int:
+        """Insert ``entry`` in roll order and index it; returns its position.
+
+        An insertion at or before the active turn shifts the pointer so the
+        same combatant keeps the turn.
+        """
+        try:
+            k = -int(entry.get('roll', 0) or 0)
+        except Exception:
+            k = 0
+        i = bisect_right(self._keys, k)
+        self._keys.insert(i, k)
+        self._entries.insert(i, entry)
+        self._index(entry)
+        if self.current_index is not None and i <= self.current_index:
+            self.current_index += 1
+        self.touch()
+        return i
+
+    def remove(self, entry: dict) -> bool:
+        for i, e in enumerate(self._entries):
+            if e is entry:
+                break
+        else:
+            return False
+        del self._entries[i]
+        del self._keys[i]
+        self._unindex(entry)
+        if self.current_index is not None:
+            if i < self.current_index:
+                self.current_index -= 1
+            if not self._entries:
+                self.current_index = None
+            elif self.current_index >= len(self._entries):
+                self.current_index = 0
+        self.touch()
+        return True
+
+    def advance(self) -> dict:
+        """Move to the next turn (starting at the top, wrapping into a new round)."""
+        if not self._entries:
+            raise IndexError('no participants in initiative')
+        if self.current_index is None:
+            self.current_index = 0
+        else:
+            self.current_index += 1
+            if self.current_index >= len(self._entries):
+                self.current_index = 0
+                self.round = int(self.round or 1) + 1
+        self.touch()
+        return self._entries[self.current_index]
+
+    def start(self) -> None:
+        self.clear()
+        self.open = True
+        self.round = 1
+        self.touch()
+
+    def close(self, clear: bool = False) -> None:
+        self.open = False
+        if clear:
+            self.clear()
+        self.touch()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+        self._by_name.clear()
+        self._by_abbr.clear()
+        self._by_group.clear()
+        self.current_index = None
+        self.round = 0
+        self.touch()
+
+    def touch(self) -> None:
+        """Record that the encounter changed so its snapshot is rewritten."""
+        if self._on_change is not None:
+            try:
+                self._on_change(self)
+            except Exception as e:
+                logger.warning('Encounter snapshot scheduling failed: %s', e)
+
+    # ---- persistence ----
+    def to_snapshot(self) -> Optional[dict]:
+        """Compact snapshot; None when there is nothing worth keeping (closed and empty)."""
+        if not self._entries and not self.open:
+            return None
+        return {
+            'v': SNAPSHOT_VERSION,
+            'g': self.guild_id,
+            'c': self.channel_id,
+            'o': 1 if self.open else 0,
+            'r': int(self.round or 0),
+            'i': self.current_index,
+            # None-valued fields are dropped; readers use .get() throughout
+            'e': [{k: v for k, v in e.items() if v is not None} for e in self._entries],
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> 'Encounter':
+        enc = cls(data.get('g', 0), data.get('c', 0))
+        enc.open = bool(data.get('o'))
+        enc.round = int(data.get('r') or 0)
+        for e in data.get('e') or []:
+            if isinstance(e, dict):
+                enc.add(e)
+        idx = data.get('i')
+        if isinstance(idx, int) and 0 <= idx < len(enc._entries):
+            enc.current_index = idx
+        return enc
+
+    def _index(self, entry: dict) -> None:
+        nm = _norm(entry.get('name'))
+        if nm:
+            self._by_name.setdefault(nm, entry)
+        ab = _norm(entry.get('abbr'))
+        if ab:
+            self._by_abbr.setdefault(ab, entry)
+        g = _norm(group_name(entry.get('name')))
+        if g:
+            self._by_group.setdefault(g, []).append(entry)
+
+    def _unindex(self, entry: dict) -> None:
+        for index, field in ((self._by_name, 'name'), (self._by_abbr, 'abbr')):
+            k = _norm(entry.get(field))
+            if k and index.get(k) is entry:
+                del index[k]
+                # Fall back to the next entry sharing the key, in turn order
+                for e in self._entries:
+                    if _norm(e.get(field)) == k:
+                        index[k] = e
+                        break
+        g = _norm(group_name(entry.get('name')))
+        members = self._by_group.get(g)
+        if members:
+            self._by_group[g] = [e for e in members if e is not entry]
+            if not self._by_group[g]:
+                del self._by_group[g]
+
+
+class EncounterManager:
+    """Encounters keyed by (guild_id, channel_id); DMs use guild 0."""
+
+    def __init__(self, store: Optional[EncounterStore] = None):
+        self._encounters: Dict[Tuple[int, int], Encounter] = {}
+        self._store = store
+        self._loading: Dict[Tuple[int, int], asyncio.Task] = {}
+
+    def get(self, guild_id: int, channel_id: int, create: bool = True) -> Optional[Encounter]:
+        """Resident encounter only (no snapshot load); prefer ``load``/``encounter_for``."""
+        key = (int(guild_id or 0), int(channel_id or 0))
+        enc = self._encounters.get(key)
+        if enc is None and create:
+            enc = self._encounters[key] = self._attach(Encounter(*key))
+        return enc
+
+    async def load(self, guild_id: int, channel_id: int, create: bool = True) -> Optional[Encounter]:
+        """Resident encounter, else its snapshot (read once), else a new one when ``create``."""
+        key = (int(guild_id or 0), int(channel_id or 0))
+        enc = self._encounters.get(key)
+        if enc is not None or self._store is None:
+            return self.get(*key, create=create)
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.get_running_loop().create_task(self._restore_one(key))
+            task.add_done_callback(lambda _t, k=key: self._loading.pop(k, None))
+        await task
+        return self.get(*key, create=create)
+
+    async def _restore_one(self, key: Tuple[int, int]) -> None:
+        try:
+            data = await self._store.load(key)
+            if data is None or key in self._encounters:
+                return
+            enc = Encounter.from_snapshot(data)
+            enc.guild_id, enc.channel_id = key
+            self._encounters[key] = self._attach(enc)
+        except Exception as e:
+            logger.warning('Restoring encounter %s failed: %s', key, e)
+
+    def _attach(self, enc: Encounter) -> Encounter:
+        if self._store is not None:
+            store = self._store
+            enc._on_change = lambda e: store.mark_dirty(e.key, e.to_snapshot)
+        return enc
+
+    async def restore(self) -> int:
+        """Find saved encounters (listing only); each is parsed on first access."""
+        if self._store is None:
+            return 0
+        return await self._store.restore()
+
+    async def flush(self) -> int:
+        return await self._store.flush() if self._store is not None else 0
+
+    def discard(self, guild_id: int, channel_id: int) -> None:
+        self._encounters.pop((int(guild_id or 0), int(channel_id or 0)), None)
+
+    def all(self) -> List[Encounter]:
+        return list(self._encounters.values())
+
+
+def _context_key(source) -> Tuple[int, int]:
+    guild_id = getattr(source, 'guild_id', None)
+    if guild_id is None:
+        guild = getattr(source, 'guild', None)
+        guild_id = getattr(guild, 'id', None)
+    channel_id = getattr(source, 'channel_id', None)
+    if channel_id is None:
+        channel = getattr(source, 'channel', None)
+        channel_id = getattr(channel, 'id', None)
+    return int(guild_id or 0), int(channel_id or 0)
+
+
+ENCOUNTERS = EncounterManager(ENCOUNTER_STORE)
+
+
+async def encounter_for(source, create: bool = True) -> Optional[Encounter]:
+    """Encounter for an Interaction or commands.Context (its guild and channel).
+
+    ``create=False`` returns None when the channel has no encounter.
+    """
+    return await ENCOUNTERS.load(*_context_key(source), create=create)
+
 def _ability_mod_from_char(char, key):
     try:
         abil = char.get('abilities', {})
@@ -25,31 +355,30 @@ def _ability_mod_from_char(char, key):
         return 0
 
 async def _load_character(name):
-    path = os.path.join(SAVE_FOLDER, f"{name}.json")
-    if not os.path.exists(path):
-        return None
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return None
+    return await get_repository().load(name)
+
+def _order_lines(enc: Encounter) -> List[str]:
+    lines = [f"__Initiative Order — Round {enc.round}:__"]
+    for i,e in enumerate(enc.entries):
+        marker = "➡️" if i == enc.current_index else "   "
+        ab = e.get('abbr')
+        ab_text = f" [{ab}]" if ab else ""
+        lines.append(f"{marker} {i+1}. {e.get('display', e.get('name','Unknown'))}{ab_text}")
+    return lines
 
 # Command registration
 
 def register(bot: commands.Bot):
     @bot.command(name='init')
     async def init_open(ctx):
-        global INITIATIVE_OPEN, INITIATIVE_ORDER, CURRENT_TURN_INDEX, COMBAT_ROUND
-        INITIATIVE_OPEN = True
-        INITIATIVE_ORDER = []
-        CURRENT_TURN_INDEX = None
-        COMBAT_ROUND = 1
+        enc = await encounter_for(ctx)
+        enc.start()
         await ctx.send("🧭 Initiative is open (Round 1). Players may join with `!ijoin <CharacterName>` (roll: 1d20+AGI, or 1d16+AGI if holding a two-handed weapon).")
 
     @bot.command(name='ijoin')
     async def ijoin(ctx, *, char_name: str = None):
-        global INITIATIVE_OPEN, INITIATIVE_ORDER
-        if not INITIATIVE_OPEN:
+        enc = await encounter_for(ctx)
+        if not enc.open:
             await ctx.send("⚠️ Initiative is not open. Start it with `!init`.")
             return
         if not char_name or not char_name.strip():
@@ -61,19 +390,12 @@ def register(bot: commands.Bot):
             except Exception:
                 await ctx.send("⏳ Timeout. Join cancelled.")
                 return
-        filename = os.path.join(SAVE_FOLDER, f"{char_name}.json")
-        if not os.path.exists(filename):
+        character = await get_repository().load(char_name)
+        if not isinstance(character, dict):
             await ctx.send(f"❌ Character `{char_name}` not found.")
             return
-        for e in INITIATIVE_ORDER:
-            if str(e.get('name','')).lower() == char_name.lower():
-                await ctx.send(f"⚠️ `{char_name}` is already in initiative.")
-                return
-        try:
-            with open(filename,'r', encoding='utf-8') as f:
-                character = json.load(f)
-        except Exception as e:
-            await ctx.send(f"⚠️ Failed to load character: {e}")
+        if enc.find_name(char_name) is not None:
+            await ctx.send(f"⚠️ `{char_name}` is already in initiative.")
             return
         agi_mod = 0
         try:
@@ -88,36 +410,27 @@ def register(bot: commands.Bot):
         roll = random.randint(1, die)
         total = roll + agi_mod
         entry = {"name": char_name, "display": f"{char_name} ({total})", "roll": int(total), "owner": character.get('owner')}
-        INITIATIVE_ORDER.append(entry)
-        INITIATIVE_ORDER.sort(key=lambda x: x.get('roll',0), reverse=True)
+        enc.add(entry)
         await ctx.send(f"✅ `{char_name}` joined initiative: rolled {roll} + {agi_mod} = **{total}**. Use `!inext` to begin/advance turns.")
 
     @bot.command(name='ijoin_mounted')
     async def ijoin_mounted(ctx, rider_name: str = None, mount_name: str = None):
         """Join initiative as a mounted pair using the worse AGI modifier; die based on rider's equipment."""
-        global INITIATIVE_OPEN, INITIATIVE_ORDER
-        if not INITIATIVE_OPEN:
+        enc = await encounter_for(ctx)
+        if not enc.open:
             await ctx.send("⚠️ Initiative is not open. Start it with `!init`.")
             return
         if not rider_name or not mount_name:
             await ctx.send("Usage: `!ijoin_mounted <RiderName> <MountName>`")
             return
-        rider_file = os.path.join(SAVE_FOLDER, f"{rider_name}.json")
-        mount_file = os.path.join(SAVE_FOLDER, f"{mount_name}.json")
-        if not os.path.exists(rider_file):
+        rider = await get_repository().load(rider_name)
+        if not isinstance(rider, dict):
             await ctx.send(f"❌ Rider `{rider_name}` not found.")
             return
-        if not os.path.exists(mount_file):
+        mount = await get_repository().load(mount_name)
+        if not isinstance(mount, dict):
             await ctx.send(f"❌ Mount `{mount_name}` not found.")
             return
-        try:
-            with open(rider_file,'r', encoding='utf-8') as f:
-                rider = json.load(f)
-            with open(mount_file,'r', encoding='utf-8') as f:
-                mount = json.load(f)
-        except Exception as e:
-            await ctx.send(f"⚠️ Failed to load records: {e}")
-            return
         # Compute worse AGI modifier
         r_agi = _ability_mod_from_char(rider, 'AGI')
         m_agi = _ability_mod_from_char(mount, 'AGI')
@@ -127,8 +440,7 @@ def register(bot: commands.Bot):
         total = roll + worse_mod
         display = f"{rider_name} mounted on {mount_name} ({total})"
         entry = {"name": f"{rider_name} (mounted)", "display": display, "roll": int(total), "owner": rider.get('owner')}
-        INITIATIVE_ORDER.append(entry)
-        INITIATIVE_ORDER.sort(key=lambda x: x.get('roll',0), reverse=True)
+        enc.add(entry)
         await ctx.send(f"✅ `{rider_name}` (mounted on {mount_name}) joined initiative: rolled {roll} + {worse_mod} = **{total}**. Use `!inext` to begin/advance turns.")
 
     @bot.command(name='ispook')
@@ -137,16 +449,10 @@ def register(bot: commands.Bot):
         if not rider_name:
             await ctx.send("Usage: `!ispook <RiderName> [training_bonus] [dc]`")
             return
-        rider_file = os.path.join(SAVE_FOLDER, f"{rider_name}.json")
-        if not os.path.exists(rider_file):
+        rider = await get_repository().load(rider_name)
+        if not isinstance(rider, dict):
             await ctx.send(f"❌ Rider `{rider_name}` not found.")
             return
-        try:
-            with open(rider_file,'r', encoding='utf-8') as f:
-                rider = json.load(f)
-        except Exception as e:
-            await ctx.send(f"⚠️ Failed to load rider: {e}")
-            return
         try:
             training_bonus = int(training_bonus)
         except Exception:
@@ -163,82 +469,74 @@ def register(bot: commands.Bot):
 
     @bot.command(name='inext')
     async def inext(ctx):
-        global INITIATIVE_ORDER, CURRENT_TURN_INDEX, COMBAT_ROUND
-        if not INITIATIVE_ORDER:
+        enc = await encounter_for(ctx)
+        if not enc:
             await ctx.send("⚠️ No participants in initiative.")
             return
-        if CURRENT_TURN_INDEX is None:
-            CURRENT_TURN_INDEX = 0
-        else:
-            CURRENT_TURN_INDEX += 1
-            if CURRENT_TURN_INDEX >= len(INITIATIVE_ORDER):
-                CURRENT_TURN_INDEX = 0
-                COMBAT_ROUND += 1
-        # Dying system turn tick: decrement remaining_turns for current combatant if dying
+        cur_entry = enc.advance()
+        # Dying system turn tick: decrement remaining_turns for current combatant if dying.
+        # Only a dying combatant can change here, so everyone else is checked on the
+        # cached copy and never locked or rewritten; a dying one is ticked under the
+        # record lock (the transaction writes only when the tick changed something)
+        # and the note is sent once the lock is released.
+        note = None
         try:
-            cur_entry = INITIATIVE_ORDER[CURRENT_TURN_INDEX]
             cname = str(cur_entry.get('name') or '').strip().lower()
-            path = os.path.join(SAVE_FOLDER, f"{cname}.json")
-            if os.path.exists(path):
-                with open(path,'r',encoding='utf-8') as f:
-                    rec = json.load(f)
-                hp_block = rec.get('hp') if isinstance(rec.get('hp'), dict) else {}
-                cur_hp = int(hp_block.get('current', 0) or 0)
-                dying = rec.get('dying') if isinstance(rec.get('dying'), dict) else None
-                if cur_hp == 0 and not rec.get('dead') and dying and 'remaining_turns' in dying:
-                    dying['remaining_turns'] = max(0, int(dying.get('remaining_turns',0)) - 1)
-                    if dying['remaining_turns'] <= 0:
-                        # Death occurs now
-                        rec['dead'] = True
-                        try:
-                            import time as _t
-                            rec['time_of_death'] = int(_t.time())
-                        except Exception:
-                            pass
-                        rec.pop('dying', None)
-                        await ctx.send(f"☠️ {cur_entry.get('name')} has succumbed (no healing received in time).")
-                    else:
-                        await ctx.send(f"💀 {cur_entry.get('name')} is DYING — {dying['remaining_turns']} turn(s) remain to receive healing.")
-                elif cur_hp > 0 and dying:
-                    # Stabilized implicitly by HP restore — apply permanent -1 STA, then clear dying
-                    try:
-                        abl = rec.setdefault('abilities', {})
-                        sta = abl.setdefault('STA', {})
-                        try:
-                            mx = int(sta.get('max', sta.get('current', sta.get('score', 1)) or 1))
-                        except Exception:
-                            mx = 1
-                        try:
-                            cur_sta = int(sta.get('current', mx) or mx)
-                        except Exception:
-                            cur_sta = mx
-                        new_max = max(1, mx - 1)
-                        new_cur = max(1, min(new_max, cur_sta - 1))
-                        sta['max'] = int(new_max)
-                        sta['current'] = int(new_cur)
-                        try:
-                            from modules.utils import get_modifier
-                            sta['mod'] = int(get_modifier(int(new_cur)))
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
-                    rec.pop('dying', None)
-                    await ctx.send(f"🩹 {cur_entry.get('name')} is no longer dying (HP restored). ⚠️ Lasting injury: STA -1 (permanent)")
-                # Persist any changes
-                with open(path,'w',encoding='utf-8') as f:
-                    json.dump(rec, f, indent=2)
+            repo = get_repository()
+            peek = await repo.load(cname) if cname else None
+            if peek is not None and isinstance(peek.get('dying'), dict):
+                async with repo.transaction(cname) as (rec,):
+                    if rec is not None:
+                        hp_block = rec.get('hp') if isinstance(rec.get('hp'), dict) else {}
+                        cur_hp = int(hp_block.get('current', 0) or 0)
+                        dying = rec.get('dying') if isinstance(rec.get('dying'), dict) else None
+                        if cur_hp == 0 and not rec.get('dead') and dying and 'remaining_turns' in dying:
+                            dying['remaining_turns'] = max(0, int(dying.get('remaining_turns',0)) - 1)
+                            if dying['remaining_turns'] <= 0:
+                                # Death occurs now
+                                rec['dead'] = True
+                                try:
+                                    import time as _t
+                                    rec['time_of_death'] = int(_t.time())
+                                except Exception:
+                                    pass
+                                rec.pop('dying', None)
+                                note = f"☠️ {cur_entry.get('name')} has succumbed (no healing received in time)."
+                            else:
+                                note = f"💀 {cur_entry.get('name')} is DYING — {dying['remaining_turns']} turn(s) remain to receive healing."
+                        elif cur_hp > 0 and dying:
+                            # Stabilized implicitly by HP restore — apply permanent -1 STA, then clear dying
+                            try:
+                                abl = rec.setdefault('abilities', {})
+                                sta = abl.setdefault('STA', {})
+                                try:
+                                    mx = int(sta.get('max', sta.get('current', sta.get('score', 1)) or 1))
+                                except Exception:
+                                    mx = 1
+                                try:
+                                    cur_sta = int(sta.get('current', mx) or mx)
+                                except Exception:
+                                    cur_sta = mx
+                                new_max = max(1, mx - 1)
+                                new_cur = max(1, min(new_max, cur_sta - 1))
+                                sta['max'] = int(new_max)
+                                sta['current'] = int(new_cur)
+                                try:
+                                    from modules.utils import get_modifier
+                                    sta['mod'] = int(get_modifier(int(new_cur)))
+                                except Exception:
+                                    pass
+                            except Exception:
+                                pass
+                            rec.pop('dying', None)
+                            note = f"🩹 {cur_entry.get('name')} is no longer dying (HP restored). ⚠️ Lasting injury: STA -1 (permanent)"
         except Exception:
-            pass
-        lines = [f"__Initiative Order — Round {COMBAT_ROUND}:__"]
-        for i,e in enumerate(INITIATIVE_ORDER):
-            marker = "➡️" if i == CURRENT_TURN_INDEX else "   "
-            ab = e.get('abbr')
-            ab_text = f" [{ab}]" if ab else ""
-            lines.append(f"{marker} {i+1}. {e.get('display', e.get('name','Unknown'))}{ab_text}")
-        await ctx.send("\n".join(lines))
-        current = INITIATIVE_ORDER[CURRENT_TURN_INDEX]
-        turn_msg = f"**It's now {current.get('display', current.get('name','Unknown'))}'s turn. (Round {COMBAT_ROUND})**"
+            note = None
+        if note:
+            await ctx.send(note)
+        await ctx.send("\n".join(_order_lines(enc)))
+        current = cur_entry
+        turn_msg = f"**It's now {current.get('display', current.get('name','Unknown'))}'s turn. (Round {enc.round})**"
         await ctx.send(turn_msg)
         if current.get('owner'):
             try:
@@ -249,39 +547,31 @@ def register(bot: commands.Bot):
 
     @bot.command(name='ilist')
     async def ilist(ctx):
-        if not INITIATIVE_ORDER:
+        enc = await encounter_for(ctx, create=False)
+        if not enc:
             await ctx.send("⚠️ No participants in initiative.")
             return
-        lines = [f"__Initiative Order — Round {COMBAT_ROUND}:__"]
-        for i,e in enumerate(INITIATIVE_ORDER):
-            marker = "➡️" if i == CURRENT_TURN_INDEX else "   "
-            ab = e.get('abbr')
-            ab_text = f" [{ab}]" if ab else ""
-            lines.append(f"{marker} {i+1}. {e.get('display', e.get('name','Unknown'))}{ab_text}")
-        await ctx.send("\n".join(lines))
+        await ctx.send("\n".join(_order_lines(enc)))
 
     @bot.command(name='iend')
     async def iend(ctx, option: str = None):
-        global INITIATIVE_OPEN, INITIATIVE_ORDER, CURRENT_TURN_INDEX, COMBAT_ROUND
         perms = getattr(ctx.author, 'guild_permissions', None)
         if not perms or not (perms.manage_guild or perms.administrator):
             await ctx.send("⛔ You don't have permission to end initiative (GM-only).")
             return
-        INITIATIVE_OPEN = False
-        cleared = False
+        enc = await encounter_for(ctx)
+        enc.close()
+        # Encounter over: write out any buffered combat saves now
+        await get_repository().flush()
         if option and option.lower() in ('clear','reset','yes'):
-            INITIATIVE_ORDER = []
-            CURRENT_TURN_INDEX = None
-            cleared = True
-        if cleared:
+            enc.close(clear=True)
             await ctx.send("🛑 Initiative closed and cleared.")
-            COMBAT_ROUND = 0
         else:
             await ctx.send("🛑 Initiative closed (order preserved). Use `!ilist` to view the order or `!iend clear` to clear it.")
 
     @bot.command(name='iadd')
     async def iadd(ctx, *, text: str = None):
-        global INITIATIVE_ORDER
+        enc = await encounter_for(ctx)
         if not text:
             await ctx.send("Paste the monster line(s) to add. Reply now.")
             def check(m): return m.author == ctx.author and m.channel == ctx.channel
@@ -354,9 +644,8 @@ def register(bot: commands.Bot):
                     except Exception:
                         hp_value = None
                 entry = { 'name':inst_name,'abbr':abbr,'display':display,'roll':int(roll),'owner':getattr(ctx.author,'id',None),'ac':parsed.get('ac'),'hd':parsed.get('hd'),'hp':hp_value,'mv':parsed.get('mv'),'act':parsed.get('act'),'atk':parsed.get('atk'),'sp':parsed.get('sp'),'sv':parsed.get('sv'),'al':parsed.get('al') }
-                INITIATIVE_ORDER.append(entry)
+                enc.add(entry)
                 added.append(entry)
-        INITIATIVE_ORDER.sort(key=lambda x: x.get('roll',0), reverse=True)
         if added:
             names = ', '.join([f"{a.get('display')} [{a.get('abbr','')}]" for a in added])
             await ctx.send(f"✅ Added to initiative: {names}")
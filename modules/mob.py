@@ -0,0 +1,168 @@
+from __future__ import annotations
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.dice import roll_dice, roll_many
+from modules.utils import lookup_crit_entry, lookup_fumble_entry, resolve_crit_damage_bonus
+from modules.simulate import AttackProfile, build_monster_profile, _die_sides
+
+# Mob attacks (/init mob_attack).
+#
+# Every standing member of a monster group attacks one target in a single
+# interaction. Members with the same saved attack line share one AttackProfile
+# (built by build_monster_profile, the same selection rules as /attack and
+# /simulate), so a profile's action dice are rolled in one roll_many batch and
+# its hits' damage in a second. Natural crits and fumbles can be looked up on
+# the compiled crit/fumble tables; each distinct table roll is resolved once
+# per mob. Nothing here touches storage: the caller applies the mob's total
+# damage to the target in one write.
+
+
+@dataclass
+class MemberAttack:
+    name: str
+    abbr: str
+    attack: str
+    die: str
+    nat: int
+    total: int
+    hit: Optional[bool]       # None when the target AC is unknown
+    damage: int = 0           # rolled damage (counts toward the total only on a hit)
+    crit: bool = False
+    fumble: bool = False
+    crit_text: str = ''
+    fumble_text: str = ''
+
+
+@dataclass
+class MobResult:
+    attacks: List[MemberAttack] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)  # down, or no usable attack
+    target_ac: Optional[int] = None
+
+    @property
+    def hits(self) -> int:
+        return sum(1 for a in self.attacks if a.hit)
+
+    @property
+    def crits(self) -> int:
+        return sum(1 for a in self.attacks if a.crit)
+
+    @property
+    def fumbles(self) -> int:
+        return sum(1 for a in self.attacks if a.fumble)
+
+    @property
+    def damage_total(self) -> int:
+        return sum(a.damage for a in self.attacks if a.hit)
+
+
+def _is_down(entry: dict) -> bool:
+    hp = entry.get('hp')
+    if hp is None:
+        return False
+    try:
+        return int(hp) <= 0
+    except Exception:
+        return False
+
+
+def _crit_lookup(table: str, roll: int, cache: Dict[int, Tuple[str, List[str]]]) -> Tuple[str, List[str]]:
+    hit = cache.get(roll)
+    if hit is None:
+        entry = lookup_crit_entry(table, int(roll))
+        extra = resolve_crit_damage_bonus(entry, attacker=None, defender=None, context={})
+        label = str(entry.get('title') or entry.get('effect') or f'roll {roll}').strip()
+        dice = [p.lstrip('+').strip() for p in str(extra.get('dice') or '').split(',') if p.strip()]
+        hit = cache[roll] = (label, dice)
+    return hit
+
+
+def _fumble_lookup(roll: int, cache: Dict[int, str]) -> str:
+    label = cache.get(roll)
+    if label is None:
+        entry = lookup_fumble_entry('FUMBLES', int(roll)) or {}
+        label = cache[roll] = str(entry.get('title') or entry.get('effect') or f'roll {roll}').strip()
+    return label
+
+
+def resolve_mob_attack(
+    members: List[dict],
+    *,
+    target_ac: Optional[int] = None,
+    attack: Optional[str] = None,
+    die: Optional[str] = None,
+    crit_table: Optional[str] = None,
+    crit_die: str = '1d4',
+    fumble_die: Optional[str] = None,
+    rnd: Optional[Callable[[], float]] = None,
+) -> MobResult:
+    """Roll one attack for each standing member against ``target_ac``.
+
+    ``crit_table`` (e.g. 'CRIT_III') rolls ``crit_die`` on that table for a
+    natural max and adds any extra damage dice on a hit; ``fumble_die`` rolls
+    on the fumble table for a natural 1. Without them crits and fumbles are
+    reported as banners only, as the /attack monster path does.
+    """
+    rnd = rnd or random.random
+    res = MobResult(target_ac=target_ac)
+    batches: Dict[Tuple[str, str], Tuple[AttackProfile, List[dict]]] = {}
+    for m in members:
+        if _is_down(m):
+            res.skipped.append(f"{m.get('name')} (down)")
+            continue
+        key = (str(m.get('atk') or ''), str(m.get('act') or ''))
+        batch = batches.get(key)
+        if batch is None:
+            try:
+                profile = build_monster_profile(m, attack=attack, die=die)
+            except ValueError:
+                res.skipped.append(f"{m.get('name')} (no attacks)")
+                continue
+            batch = batches[key] = (profile, [])
+        batch[1].append(m)
+
+    crit_cache: Dict[int, Tuple[str, List[str]]] = {}
+    fumble_cache: Dict[int, str] = {}
+    for profile, group in batches.values():
+        sides = _die_sides(profile.action_die)
+        rolls = roll_many(profile.action_die, len(group), rnd)
+        attacks: List[MemberAttack] = []
+        for m, (total, nat) in zip(group, rolls):
+            total += profile.attack_mod
+            hit = None if target_ac is None else total >= int(target_ac)
+            fumble = sides > 0 and nat == 1
+            crit = sides > 0 and not fumble and nat == sides
+            attacks.append(MemberAttack(
+                name=str(m.get('name') or 'Monster'), abbr=str(m.get('abbr') or ''),
+                attack=profile.label.split(': ', 1)[-1], die=profile.action_die,
+                nat=int(nat), total=int(total), hit=hit, crit=crit, fumble=fumble,
+            ))
+        # Damage for every attack that can land (all of them when the AC is unknown)
+        landing = [a for a in attacks if a.hit is not False]
+        for a, (dmg, _) in zip(landing, roll_many(profile.damage, len(landing), rnd)):
+            a.damage = max(1, int(dmg) + profile.damage_mod)
+        for a in attacks:
+            if a.crit and crit_table:
+                croll = roll_dice(crit_die or '1d4')[0]
+                label, dice = _crit_lookup(crit_table, int(croll), crit_cache)
+                a.crit_text = f"{crit_table} {croll}: {label}"
+                if a.hit is not False:
+                    for d in dice:
+                        a.damage += int(roll_dice(d)[0])
+            if a.fumble and fumble_die:
+                froll = roll_dice(fumble_die)[0]
+                a.fumble_text = f"fumble {froll}: {_fumble_lookup(int(froll), fumble_cache)}"
+        res.attacks.extend(attacks)
+    # Report in the members' order, not batch order
+    position = {str(m.get('name') or 'Monster'): i for i, m in enumerate(members)}
+    res.attacks.sort(key=lambda a: position.get(a.name, 0))
+    return res
+
+
+__all__ = [
+    "MemberAttack",
+    "MobResult",
+    "resolve_mob_attack",
+]
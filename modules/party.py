@@ -0,0 +1,103 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from utils.dice import roll_many
+from modules.utils import save_modifier, get_global_roll_penalty
+
+# Group operations over several character records at once.
+#
+# Used by /party xp|rest|save and /init xp. Each function takes records that
+# the caller has already loaded (normally one repository transaction over every
+# member, so they are read concurrently and committed in one batch), computes
+# every result in a single pass and mutates the dicts in place where the
+# operation changes state. Nothing here touches storage or Discord.
+
+SAVE_LABELS = {'will': 'Will', 'fortitude': 'Fortitude', 'reflex': 'Reflex'}
+
+
+def unique_records(records: Iterable[Optional[dict]]) -> List[dict]:
+    """Drop missing records and repeats (a transaction yields the same dict for duplicate names)."""
+    out: List[dict] = []
+    seen: set[int] = set()
+    for rec in records:
+        if rec and id(rec) not in seen:
+            seen.add(id(rec))
+            out.append(rec)
+    return out
+
+
+@dataclass
+class XpSplit:
+    total: int
+    each: int
+    awarded: List[Tuple[str, int]] = field(default_factory=list)  # (name, new xp)
+    skipped: List[str] = field(default_factory=list)
+
+
+def split_xp(records: List[dict], total: int, *, by: int, note: Optional[str] = None,
+             shares: Optional[int] = None) -> XpSplit:
+    """Split ``total`` XP evenly (remainder dropped) into ``shares`` parts and award one to each record.
+
+    ``shares`` defaults to ``len(records)``; callers that skip characters the
+    issuer may not award (without loading them) pass the full participant
+    count so skipped characters still count toward the split. ``note`` is
+    appended to each recipient's notes.xp_log.
+    """
+    shares = len(records) if shares is None else int(shares)
+    res = XpSplit(total=int(total), each=max(0, int(total) // shares) if shares > 0 else 0)
+    if res.each <= 0:
+        return res
+    for data in records:
+        try:
+            cur = int(data.get('xp', 0) or 0)
+        except Exception:
+            cur = 0
+        new_val = max(0, cur + res.each)
+        data['xp'] = int(new_val)
+        if note:
+            notes = data.setdefault('notes', {})
+            log = notes.setdefault('xp_log', [])
+            if isinstance(log, list):
+                log.append({'delta': int(res.each), 'share_of': int(total), 'by': int(by), 'note': note})
+        res.awarded.append((str(data.get('name') or 'Unknown'), int(new_val)))
+    return res
+
+
+@dataclass
+class SaveRoll:
+    name: str
+    roll: int
+    modifier: int
+    penalty: int
+    total: int
+    passed: Optional[bool]    # None without a DC
+    notes: List[str] = field(default_factory=list)
+
+
+def roll_saves(records: List[dict], save_key: str, dc: Optional[int] = None, bonus: int = 0,
+               rnd: Optional[Callable[[], float]] = None) -> List[SaveRoll]:
+    """Roll one ``save_key`` save per record (all d20s in one batch). Records are not modified."""
+    rolls = roll_many('1d20', len(records), rnd)
+    out: List[SaveRoll] = []
+    for data, (roll, _) in zip(records, rolls):
+        mod = save_modifier(data, save_key)
+        pen, notes = get_global_roll_penalty(data)
+        total = int(roll) + int(mod) + int(bonus or 0) + int(pen)
+        out.append(SaveRoll(
+            name=str(data.get('name') or 'Unknown'), roll=int(roll), modifier=int(mod),
+            penalty=int(pen), total=total,
+            passed=(total >= int(dc)) if isinstance(dc, int) and dc > 0 else None,
+            notes=list(notes),
+        ))
+    return out
+
+
+__all__ = [
+    "SAVE_LABELS",
+    "SaveRoll",
+    "XpSplit",
+    "roll_saves",
+    "split_xp",
+    "unique_records",
+]
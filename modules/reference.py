@@ -0,0 +1,247 @@
+from __future__ import annotations
+import os
+import json
+import time
+import logging
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+# Process-wide registry for static game data (Spells.json, occupations, auguries,
+# data/*.json).
+#
+# Cogs used to json.load these files on every command and autocomplete keystroke
+# (Spells.json alone is ~880KB). The registry parses each file once, freezes the
+# result so cogs can share it safely, and swaps in a fresh copy when the file's
+# mtime changes, so edits to the data files still apply without a restart.
+# Readers always see either the old or the new structure, never a partial one.
+# A reload noticed on the event loop thread is done on the storage I/O pool while
+# the loop keeps serving the previous copy; only the very first load of a file
+# is synchronous (bot.setup_hook preloads the big ones off the loop).
+
+logger = logging.getLogger('dccbot.reference')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FrozenDict(dict):
+    """Read-only dict. Still ``isinstance(x, dict)``; copies/pickles come back as plain dicts."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('reference data is read-only; copy.deepcopy() it first')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly  # type: ignore[assignment]
+    clear = pop = popitem = setdefault = update = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class FrozenList(list):
+    """Read-only list. Still ``isinstance(x, list)``; copies/pickles come back as plain lists."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('reference data is read-only; copy.deepcopy() it first')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly  # type: ignore[assignment]
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly  # type: ignore[assignment]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Mutable deep copy of frozen (or plain) JSON data."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def _on_event_loop() -> bool:
+    try:
+        return asyncio.get_running_loop().is_running()
+    except RuntimeError:
+        return False
+
+
+@dataclass
+class _Loaded:
+    data: Any
+    mtime_ns: int
+    size: int
+    load_ms: float
+    loads: int
+    checked_at: float
+
+
+class ReferenceData:
+    """Loads each reference file once and shares the frozen result across cogs.
+
+    ``get('Spells.json')`` / ``get('data/familiars.json')`` take paths relative
+    to the repo root. The file is re-stat'ed at most every ``check_interval``
+    seconds and reloaded when its mtime or size changes.
+    """
+
+    def __init__(self, root: Optional[str] = None, check_interval: float = 2.0):
+        self.root = root or ROOT_DIR
+        self.check_interval = max(0.0, float(check_interval))
+        self._files: Dict[str, _Loaded] = {}
+        self._transforms: Dict[str, Callable[[Any], Any]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._pending: set = set()
+
+    def path_for(self, name: str) -> str:
+        return name if os.path.isabs(name) else os.path.join(self.root, name)
+
+    def get(self, name: str, default: Any = None, transform: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Return the frozen parsed contents of ``name`` (``default`` when missing/unparseable).
+
+        ``transform`` (applied once per load, before freezing) normalizes the raw
+        JSON; the first transform registered for a file is kept for reloads.
+        """
+        if transform is not None:
+            self._transforms.setdefault(name, transform)
+        now = time.monotonic()
+        cur = self._files.get(name)
+        if cur is not None and now - cur.checked_at < self.check_interval:
+            return cur.data if cur.data is not None else default
+        path = self.path_for(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return cur.data if (cur is not None and cur.data is not None) else default
+        if cur is not None and cur.mtime_ns == st.st_mtime_ns and cur.size == st.st_size:
+            cur.checked_at = now
+            return cur.data if cur.data is not None else default
+        if cur is not None and _on_event_loop():
+            # Stale-while-revalidate: never parse a changed file on the loop thread
+            cur.checked_at = now
+            self._reload_in_background(name, path)
+            return cur.data if cur.data is not None else default
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            cur = self._files.get(name)
+            if cur is None or cur.mtime_ns != st.st_mtime_ns or cur.size != st.st_size:
+                cur = self._load(name, path, st, cur)
+        return cur.data if cur.data is not None else default
+
+    def _reload_in_background(self, name: str, path: str) -> None:
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        def _run() -> None:
+            try:
+                st = os.stat(path)
+                with load_lock:
+                    cur = self._files.get(name)
+                    if cur is None or cur.mtime_ns != st.st_mtime_ns or cur.size != st.st_size:
+                        self._load(name, path, st, cur)
+            except Exception as e:
+                logger.warning('Background reload of %s failed: %s', name, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(name)
+
+        try:
+            from storage.files import io_pool  # lazy: storage imports core/models
+            io_pool().submit(_run)
+        except Exception:
+            with self._lock:
+                self._pending.discard(name)
+
+    def _load(self, name: str, path: str, st: os.stat_result, prev: Optional[_Loaded]) -> _Loaded:
+        t0 = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            fn = self._transforms.get(name)
+            if fn is not None:
+                raw = fn(raw)
+            data = freeze(raw)
+        except Exception as e:
+            logger.warning('Reference file %s failed to load: %s', name, e)
+            # Keep serving the previous good copy if there is one
+            data = prev.data if prev is not None else None
+        ms = (time.perf_counter() - t0) * 1000.0
+        loaded = _Loaded(data, st.st_mtime_ns, st.st_size, ms, (prev.loads if prev else 0) + 1, time.monotonic())
+        self._files[name] = loaded  # single reference swap; readers never see a partial structure
+        logger.info('%s reference file %s (%d bytes) in %.1f ms', 'Reloaded' if prev else 'Loaded', name, st.st_size, ms)
+        return loaded
+
+    def reload(self, name: Optional[str] = None) -> None:
+        """Force a reload on next access (one file or all)."""
+        with self._lock:
+            for key in ([name] if name else list(self._files)):
+                cur = self._files.get(key)
+                if cur is not None:
+                    cur.mtime_ns = -1
+                    cur.checked_at = 0.0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-file load timings: {name: {bytes, load_ms, loads}}."""
+        return {
+            name: {'bytes': f.size, 'load_ms': round(f.load_ms, 2), 'loads': f.loads}
+            for name, f in sorted(self._files.items())
+        }
+
+
+_reference: ReferenceData | None = None
+
+
+def get_reference_data() -> ReferenceData:
+    global _reference
+    if _reference is None:
+        try:
+            interval = float(os.getenv('REFERENCE_CHECK_SECONDS', '2'))
+        except ValueError:
+            interval = 2.0
+        _reference = ReferenceData(check_interval=interval)
+    return _reference
+
+
+def reference(name: str, default: Any = None) -> Any:
+    """Shortcut for ``get_reference_data().get(name, default)``."""
+    return get_reference_data().get(name, default)
+
+
+__all__ = [
+    'ReferenceData',
+    'FrozenDict',
+    'FrozenList',
+    'freeze',
+    'thaw',
+    'get_reference_data',
+    'reference',
+]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from modules.utils import get_modifier
+
+# Overnight rest applied to one character record.
+#
+# Shared by /rest day (one character) and /party rest (every member in one
+# transaction). rest_record() only mutates the dict it is given and reports
+# what changed; the caller owns loading and saving.
+
+ARCANE_CLASSES = {'wizard', 'mage', 'elf'}
+
+
+@dataclass
+class RestResult:
+    name: str
+    days: int
+    hp_possible: int
+    healed: int = 0
+    stabilized: bool = False          # healed from 0 while dying: permanent STA -1
+    abilities: Dict[str, int] = field(default_factory=dict)
+    luck: int = 0
+    disapproval_reset: bool = False
+    disapproval_before: Optional[int] = None
+    spells_refreshed: bool = False
+
+
+def heal_hp(data: dict, amount: int) -> int:
+    """Heal up to 'amount' HP, returns actual healed."""
+    if amount <= 0:
+        return 0
+    hp = data.get('hp')
+    if not isinstance(hp, dict):
+        # Initialize if missing
+        cur = int(hp or 0)
+        data['hp'] = {'current': int(cur), 'max': int(cur)}
+        hp = data['hp']
+    try:
+        cur = int(hp.get('current', 0) or 0)
+        mx = int(hp.get('max', cur) or cur)
+    except Exception:
+        cur, mx = 0, 0
+    new_cur = min(mx, cur + int(amount))
+    healed = max(0, new_cur - cur)
+    data['hp'] = {'current': int(new_cur), 'max': int(mx)}
+    return healed
+
+
+def recover_luck(data: dict, amount: int) -> int:
+    """Recover up to 'amount' Luck if model supports it, returns actual recovered."""
+    if amount <= 0:
+        return 0
+    # Preferred: abilities.LCK.current/max
+    abl = data.get('abilities') if isinstance(data.get('abilities'), dict) else None
+    if isinstance(abl, dict) and isinstance(abl.get('LCK'), dict):
+        lck = abl['LCK']
+    else:
+        # Legacy: data.luck.current/max
+        lck = data.get('luck') if isinstance(data.get('luck'), dict) else None
+    if not isinstance(lck, dict):
+        return 0
+    try:
+        cur = int(lck.get('current', lck.get('max', 0)) or 0)
+        mx = int(lck.get('max', cur) or cur)
+    except Exception:
+        cur = int(lck.get('current', 0) or 0)
+        mx = int(lck.get('max', cur) or cur)
+    new_cur = min(mx, cur + int(amount))
+    rec = max(0, new_cur - cur)
+    lck['current'] = int(new_cur)
+    return rec
+
+
+def recover_ability_scores(data: dict, per_day: int, days: int) -> Dict[str, int]:
+    """Recover ability score loss (except Luck) at the same rate as HP: 1 per night or 2 per bed rest, per day.
+
+    Returns a dict of ability: recovered_points.
+    """
+    recovered: Dict[str, int] = {}
+    if per_day <= 0 or days <= 0:
+        return recovered
+    total = int(per_day) * int(days)
+    abl = data.get('abilities') if isinstance(data.get('abilities'), dict) else None
+    if not isinstance(abl, dict):
+        return recovered
+    for key, blk in abl.items():
+        if key == 'LCK':
+            continue  # Luck does not naturally heal
+        try:
+            if isinstance(blk, dict):
+                cur = int(blk.get('current', blk.get('score', blk.get('max', 0)) or 0))
+                cap = blk.get('max', blk.get('score', cur))
+                cap = int(cap if cap is not None else cur)
+                if cur < cap:
+                    new_cur = min(cap, cur + total)
+                    got = max(0, new_cur - cur)
+                    blk['current'] = int(new_cur)
+                    recovered[key] = got
+            # Numeric-only representation: treat as both current and cap and do nothing
+        except Exception:
+            continue
+    return recovered
+
+
+def _stabilize(data: dict) -> None:
+    """Apply the lasting injury for surviving dying: permanent -1 STA (floor 1) and clear 'dying'."""
+    abl = data.setdefault('abilities', {})
+    sta = abl.setdefault('STA', {})
+    try:
+        mx = int(sta.get('max', sta.get('current', sta.get('score', 1)) or 1))
+    except Exception:
+        mx = 1
+    try:
+        cur = int(sta.get('current', mx) or mx)
+    except Exception:
+        cur = mx
+    new_max = max(1, mx - 1)
+    new_cur = max(1, min(new_max, cur - 1))
+    sta['max'] = int(new_max)
+    sta['current'] = int(new_cur)
+    try:
+        sta['mod'] = int(get_modifier(int(new_cur)))
+    except Exception:
+        pass
+    data.pop('dying', None)
+
+
+def rest_record(data: dict, days: int = 1, bed_rest: bool = False,
+                luck: bool = True, reset_disapproval: bool = True) -> RestResult:
+    """Rest ``data`` for ``days`` day(s) in place and report what changed."""
+    d = max(1, int(days))
+    # HP recovery model: base 1 HP/day; if bed rest, 2 HP/day
+    per_day = 2 if bed_rest else 1
+    res = RestResult(name=str(data.get('name') or ''), days=d, hp_possible=per_day * d)
+    cls = str(data.get('class') or '').strip().lower()
+
+    # Track pre-heal state for dying stabilization check
+    try:
+        hpblk = data.get('hp') if isinstance(data.get('hp'), dict) else {}
+        pre_cur_hp = int(hpblk.get('current', 0) or 0)
+    except Exception:
+        pre_cur_hp = 0
+    res.healed = heal_hp(data, res.hp_possible)
+    try:
+        post_cur_hp = int((data.get('hp') or {}).get('current', 0) or 0)
+        if pre_cur_hp == 0 and post_cur_hp > 0 and isinstance(data.get('dying'), dict):
+            _stabilize(data)
+            res.stabilized = True
+    except Exception:
+        pass
+
+    # Ability score recovery (except Luck) at same rate
+    res.abilities = recover_ability_scores(data, per_day, d)
+
+    # Thieves and halflings recover Luck equal to level per night (up to max)
+    if luck and cls in ('thief', 'halfling'):
+        try:
+            lvl = int(data.get('level', 1) or 1)
+        except Exception:
+            lvl = 1
+        res.luck = recover_luck(data, lvl * d)
+
+    # Reset Cleric disapproval at dawn/new day
+    if reset_disapproval and cls == 'cleric':
+        res.disapproval_before = data.get('disapproval_range')
+        data['disapproval_range'] = 1
+        res.disapproval_reset = True
+
+    # Clear arcane 'lost' flags on rest (spells are refreshed after a new day)
+    if cls in ARCANE_CLASSES:
+        res.spells_refreshed = True
+        try:
+            spells = data.get('spells') if isinstance(data.get('spells'), dict) else None
+            if isinstance(spells, dict):
+                for lvl in (1, 2, 3, 4, 5):
+                    arr = spells.get(f'level_{lvl}')
+                    if not isinstance(arr, list):
+                        continue
+                    for entry in arr:
+                        if isinstance(entry, dict) and entry.get('lost'):
+                            entry['lost'] = False
+        except Exception:
+            pass
+    return res
+
+
+__all__ = [
+    "RestResult",
+    "heal_hp",
+    "recover_luck",
+    "recover_ability_scores",
+    "rest_record",
+]
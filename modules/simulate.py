@@ -0,0 +1,382 @@
+from __future__ import annotations
+import os
+import re
+import random
+import asyncio
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.dice import compile_dice
+from modules.utils import (
+    crit_threat_min, select_crit_table_for_character, lookup_crit_entry, lookup_fumble_entry,
+    resolve_crit_damage_bonus,
+)
+from modules.attack import action_dice, action_die_index, plan_attack, resolve_weapons
+
+# Monte Carlo attack simulator (/simulate attack).
+#
+# An attack is reduced to a picklable AttackProfile: the flat modifiers are
+# worked out once from the character sheet by modules.attack, the same rules
+# /attack applies, so each trial is only die rolls plus table lookups. Crit and
+# fumble entries come from lookup_crit_entry / lookup_fumble_entry and
+# resolve_crit_damage_bonus, evaluated once per distinct table roll in each
+# worker. Large runs are split across a process pool so the event loop (and the
+# gateway heartbeat) never waits on the simulation.
+
+logger = logging.getLogger('dccbot.simulate')
+
+MAX_TRIALS = int(os.getenv('SIM_MAX_TRIALS', '1000000'))
+# Runs up to this size stay in a worker thread; larger ones go to the process pool
+INLINE_TRIALS = int(os.getenv('SIM_INLINE_TRIALS', '50000'))
+
+_MONSTER_ATTACK = re.compile(r"^(.+?)\s*([+-]\d+)?\s*\(([^)]+)\)\s*$")
+
+
+@dataclass(frozen=True)
+class AttackProfile:
+    """Everything one simulated attack needs; modifiers are pre-summed flat values."""
+    label: str
+    action_die: str
+    attack_mod: int = 0
+    damage: str = '1d2'
+    damage_mod: int = 0
+    deed_sides: int = 0              # Mighty Deed die rolled per attack (0 = none)
+    deed_plus: int = 0
+    threat_min: Optional[int] = None  # class crit threat range on a d20 (e.g. 19)
+    crit_die: str = ''               # '' = crits are a banner only (monsters, off-hand)
+    crit_mod: int = 0
+    crit_table: str = ''
+    fumble_die: str = ''             # '' = fumbles are a banner only
+    fumble_mod: int = 0
+    backstab: bool = False           # auto-crit on a hit that is not a fumble
+    offhand: Optional['AttackProfile'] = None
+    notes: Tuple[str, ...] = ()
+
+
+@dataclass
+class SimResult:
+    trials: int = 0
+    hits: int = 0
+    crits: int = 0          # natural crits (or backstab auto-crits), hit or not
+    crit_hits: int = 0
+    fumbles: int = 0
+    offhand_hits: int = 0
+    damage_total: int = 0
+    damage: Counter = field(default_factory=Counter)         # damage per round -> rounds
+    crit_results: Counter = field(default_factory=Counter)   # crit table result -> count
+    fumble_results: Counter = field(default_factory=Counter)
+
+    def merge(self, other: 'SimResult') -> 'SimResult':
+        self.trials += other.trials
+        self.hits += other.hits
+        self.crits += other.crits
+        self.crit_hits += other.crit_hits
+        self.fumbles += other.fumbles
+        self.offhand_hits += other.offhand_hits
+        self.damage_total += other.damage_total
+        self.damage.update(other.damage)
+        self.crit_results.update(other.crit_results)
+        self.fumble_results.update(other.fumble_results)
+        return self
+
+    def _rate(self, n: int) -> float:
+        return n / self.trials if self.trials else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self._rate(self.hits)
+
+    @property
+    def crit_rate(self) -> float:
+        return self._rate(self.crits)
+
+    @property
+    def fumble_rate(self) -> float:
+        return self._rate(self.fumbles)
+
+    @property
+    def expected_damage(self) -> float:
+        """Mean damage per round (misses count as 0; includes the off-hand attack)."""
+        return self._rate(self.damage_total)
+
+    def damage_percentile(self, p: float, hits_only: bool = False) -> int:
+        items = sorted((d, c) for d, c in self.damage.items() if d > 0 or not hits_only)
+        total = sum(c for _, c in items)
+        if not total:
+            return 0
+        want = max(0.0, min(100.0, float(p))) * total / 100.0
+        cum = 0
+        for d, c in items:
+            cum += c
+            if cum >= want:
+                return d
+        return items[-1][0]
+
+
+# ---- building profiles ----
+
+def _die_sides(expr: str) -> int:
+    try:
+        return int(str(expr).split('d', 1)[1]) if 'd' in str(expr) else 0
+    except Exception:
+        return 0
+
+
+def build_character_profile(data: dict, *, weapon: Optional[str] = None, offhand: Optional[str] = None,
+                            range: Optional[str] = None, deed: bool = False, backstab: bool = False,
+                            mounted: bool = False, target_mounted: bool = False, charge: bool = False,
+                            die: Optional[str] = None) -> AttackProfile:
+    """Reduce a character's attack to an AttackProfile with the rules /attack uses (modules.attack).
+
+    Luck burns, the interactive action-die prompt and defender-dependent crit
+    riders (no weapon / no shield) are not modelled. Raises AttackError (a
+    ValueError) with /attack's message when /attack would refuse the attack.
+    """
+    weapons = resolve_weapons(data, weapon, offhand)
+    parts = action_dice(data)
+    base_die = parts[action_die_index(parts, die, str(data.get('class', '') or '').strip().lower())]
+    # Charge implies mounted, as /charge does
+    plan = plan_attack(data, weapons, base_die, range=range, deed=deed, backstab=backstab,
+                       mounted=bool(mounted or charge), target_mounted=target_mounted, charge=charge)
+    notes = list(plan.notes)
+    if not (plan.trained or plan.is_lv0):
+        notes.insert(0, 'untrained: action die stepped down')
+
+    off_profile = None
+    if plan.offhand is not None:
+        off = plan.offhand
+        off_profile = AttackProfile(
+            label=f"{data.get('name', '?')} (off-hand {off.key})",
+            action_die=off.action_die,
+            attack_mod=plan.offhand_attack_mod,
+            damage=off.damage,
+            damage_mod=off.damage_mod + off.augur_damage,
+        )
+
+    return AttackProfile(
+        label=f"{data.get('name', '?')} ({plan.weapon})",
+        action_die=plan.action_die,
+        attack_mod=plan.attack_mod,
+        damage=plan.damage,
+        damage_mod=plan.damage_mod + plan.augur_damage,
+        deed_sides=plan.deed_sides,
+        deed_plus=plan.deed_plus,
+        threat_min=crit_threat_min(data, _die_sides(plan.action_die)),
+        crit_die=plan.crit_die,
+        crit_mod=plan.crit_mod,
+        crit_table=select_crit_table_for_character(data),
+        fumble_die=plan.fumble_die,
+        fumble_mod=plan.fumble_mod,
+        backstab=plan.backstab,
+        offhand=off_profile,
+        notes=tuple(notes),
+    )
+
+
+def parse_monster_attacks(atk_field: str) -> List[dict]:
+    """Split an initiative 'atk' field ('bite +3 (1d6); claw +1 (1d4)') into {name, mod, dmg, display}."""
+    out: List[dict] = []
+    for c in [c.strip() for c in re.split(r"[;,]", str(atk_field or '')) if c.strip()]:
+        m = _MONSTER_ATTACK.match(c)
+        if m:
+            nm = m.group(1).strip()
+            try:
+                md = int(m.group(2) or 0)
+            except Exception:
+                md = 0
+            dmg = m.group(3).strip()
+            out.append({'name': nm, 'mod': md, 'dmg': dmg, 'display': f"{nm} {md:+} ({dmg})"})
+        else:
+            out.append({'name': c, 'mod': 0, 'dmg': None, 'display': c})
+    return out
+
+
+def build_monster_profile(entry: dict, attack: Optional[str] = None, die: Optional[str] = None) -> AttackProfile:
+    """Profile for an initiative monster's saved attack (same selection rules as /attack)."""
+    parsed = parse_monster_attacks(str(entry.get('atk') or ''))
+    if not parsed:
+        raise ValueError(f"No saved attacks found for '{entry.get('name')}'.")
+    choice = parsed[0]
+    if attack:
+        aq = attack.strip().lower()
+        for a in parsed:
+            if aq in a['display'].lower() or aq in a['name'].lower():
+                choice = a
+                break
+    act_parts = [p.strip() for p in str(entry.get('act') or '1d20').replace(',', '+').split('+') if p.strip()] or ['1d20']
+    idx = 0
+    if die:
+        s = str(die).strip().lower()
+        for i, d in enumerate(act_parts):
+            if d.lower() == s:
+                idx = i
+                break
+    return AttackProfile(
+        label=f"{entry.get('name', 'Monster')}: {choice['display']}",
+        action_die=act_parts[idx],
+        attack_mod=int(choice.get('mod') or 0),
+        damage=choice.get('dmg') or '1d2',
+    )
+
+
+# ---- running trials ----
+
+def _sampler(expr: str, rnd: Callable[[], float]) -> Callable[[], Tuple[int, int]]:
+    """Fast roller returning (total, first die) with utils.dice.roll_dice semantics."""
+    c = compile_dice(str(expr).strip())
+    if c is None:
+        try:
+            v = int(str(expr).strip())
+            return lambda: (v, v)
+        except Exception:
+            # roll_dice falls back to a d20 for unparseable input
+            def d20() -> Tuple[int, int]:
+                r = int(rnd() * 20) + 1
+                return r, r
+            return d20
+    if c.count == 1 and not c.mode and c.explode is None:
+        s, mod = c.sides, c.modifier
+
+        def one() -> Tuple[int, int]:
+            r = int(rnd() * s) + 1
+            return r + mod, r
+        return one
+
+    def many() -> Tuple[int, int]:
+        res = c.roll(rnd=rnd)
+        return res.total, (res.rolls[0] if res.rolls else 0)
+    return many
+
+
+def _crit_outcome(profile: AttackProfile, roll: int) -> Tuple[str, List[str]]:
+    """(result label, extra damage dice) for a crit table roll; no defender, so conditional riders don't apply."""
+    entry = lookup_crit_entry(profile.crit_table, int(roll))
+    extra = resolve_crit_damage_bonus(entry, attacker=None, defender=None, context={})
+    label = str(entry.get('title') or entry.get('effect') or f'roll {roll}').strip()
+    return label, [p.lstrip('+').strip() for p in str(extra.get('dice') or '').split(',') if p.strip()]
+
+
+def simulate(profile: AttackProfile, target_ac: int, trials: int, seed: Optional[int] = None) -> SimResult:
+    """Run ``trials`` attack rounds (primary plus any off-hand attack) against ``target_ac``."""
+    rng = random.Random(seed)
+    rnd = rng.random
+    res = SimResult(trials=int(trials))
+    ac = int(target_ac)
+
+    atk = _sampler(profile.action_die, rnd)
+    dmg = _sampler(profile.damage, rnd)
+    sides = _die_sides(profile.action_die)
+    threat = profile.threat_min
+    crit_roll = _sampler(profile.crit_die, rnd) if profile.crit_die else None
+    fumble_roll = _sampler(profile.fumble_die, rnd) if profile.fumble_die else None
+    crit_cache: Dict[int, Tuple[str, List[Callable[[], Tuple[int, int]]]]] = {}
+    fumble_cache: Dict[int, str] = {}
+    off = profile.offhand
+    off_atk = _sampler(off.action_die, rnd) if off else None
+    off_dmg = _sampler(off.damage, rnd) if off else None
+    deed_sides, deed_plus = profile.deed_sides, profile.deed_plus
+    damage_counts = res.damage
+
+    for _ in range(res.trials):
+        total, nat = atk()
+        deed_val = (int(rnd() * deed_sides) + 1 + deed_plus) if deed_sides else 0
+        hit = total + profile.attack_mod + deed_val >= ac
+        fumble = sides > 0 and nat == 1
+        crit = sides > 0 and not fumble and (nat == sides or (threat is not None and nat >= threat))
+        if profile.backstab and hit and not fumble:
+            crit = True
+        round_dmg = 0
+        if crit:
+            res.crits += 1
+        if fumble:
+            res.fumbles += 1
+            if fumble_roll is not None:
+                froll = fumble_roll()[0] + profile.fumble_mod
+                label = fumble_cache.get(froll)
+                if label is None:
+                    fentry = lookup_fumble_entry('FUMBLES', int(froll))
+                    label = str((fentry or {}).get('title') or (fentry or {}).get('effect') or f'roll {froll}').strip()
+                    fumble_cache[froll] = label
+                res.fumble_results[label] += 1
+        if hit:
+            res.hits += 1
+            round_dmg = max(1, dmg()[0] + profile.damage_mod + deed_val)
+            if crit:
+                res.crit_hits += 1
+                if crit_roll is not None:
+                    croll = crit_roll()[0] + profile.crit_mod
+                    cached = crit_cache.get(croll)
+                    if cached is None:
+                        label, dice = _crit_outcome(profile, croll)
+                        cached = (label, [_sampler(d, rnd) for d in dice])
+                        crit_cache[croll] = cached
+                    res.crit_results[cached[0]] += 1
+                    for extra in cached[1]:
+                        round_dmg += extra()[0]
+        if off is not None:
+            o_total, _ = off_atk()
+            if o_total + off.attack_mod + deed_val >= ac:
+                res.offhand_hits += 1
+                round_dmg += max(1, off_dmg()[0] + off.damage_mod + deed_val)
+        res.damage_total += round_dmg
+        damage_counts[round_dmg] += 1
+    return res
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _workers() -> int:
+    try:
+        return max(1, int(os.getenv('SIM_WORKERS', '0')) or min(4, os.cpu_count() or 1))
+    except ValueError:
+        return min(4, os.cpu_count() or 1)
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: never fork the bot process (it owns sockets and background threads)
+        _pool = ProcessPoolExecutor(max_workers=_workers(), mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_simulation(profile: AttackProfile, target_ac: int, trials: int, seed: Optional[int] = None) -> SimResult:
+    """Simulate off the event loop: a thread for small runs, the process pool for large ones."""
+    trials = max(1, min(int(trials), MAX_TRIALS))
+    if trials <= INLINE_TRIALS:
+        return await asyncio.to_thread(simulate, profile, target_ac, trials, seed)
+    loop = asyncio.get_running_loop()
+    workers = _workers()
+    chunks = workers * 2
+    base = random.Random(seed).getrandbits(32) if seed is not None else random.getrandbits(32)
+    sizes = [trials // chunks + (1 if i < trials % chunks else 0) for i in range(chunks)]
+    futs = [loop.run_in_executor(get_pool(), simulate, profile, target_ac, n, base + i) for i, n in enumerate(sizes) if n]
+    out = SimResult()
+    for part in await asyncio.gather(*futs):
+        out.merge(part)
+    return out
+
+
+__all__ = [
+    'AttackProfile',
+    'SimResult',
+    'MAX_TRIALS',
+    'build_character_profile',
+    'build_monster_profile',
+    'parse_monster_attacks',
+    'simulate',
+    'run_simulation',
+    'shutdown_pool',
+]
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.reference import reference
+
+# Spell references for character records.
+#
+# Character sheets used to embed full copies of Spells.json entries (description,
+# manifestation, corruption, misfire and results tables) in every known spell,
+# which made caster records 80-150KB. Records now store only a small reference
+#   {"name", "level", "lost"?, "mercurial"?}  (+ "source"/"patron" for patron spells)
+# and the static payload is hydrated from the shared catalog when /cast or the
+# sheet needs it.
+
+# Registry keys (paths relative to the repo root)
+SPELLS_FILE = 'Spells.json'
+PATRONS_FILE = 'data/wizard_patrons.json'
+
+# Per-character state kept in a reference; everything else comes from the catalog
+REF_KEYS = ('name', 'level', 'lost', 'mercurial', 'source', 'patron')
+BUCKETS = ('Wizard Spells', 'Cleric Spells')
+
+
+def spell_catalog() -> dict:
+    """Shared parsed Spells.json (treat as read-only)."""
+    data = reference(SPELLS_FILE, {})
+    return data if isinstance(data, dict) else {}
+
+
+def _patron_catalog() -> dict:
+    data = reference(PATRONS_FILE, {})
+    return data if isinstance(data, dict) else {}
+
+
+def find_spell(name: str, bucket: Optional[str] = None, level: Optional[int] = None) -> Tuple[Optional[str], Optional[int], dict]:
+    """Locate a core spell by name (case-insensitive). Returns (bucket, level, payload) or (None, None, {})."""
+    target = str(name or '').strip().lower()
+    if not target:
+        return None, None, {}
+    spells = spell_catalog().get('spells', {})
+    if not isinstance(spells, dict):
+        return None, None, {}
+    order = [bucket] if bucket in BUCKETS else []
+    order += [b for b in BUCKETS if b not in order]
+    for b in order:
+        container = spells.get(b, {})
+        if not isinstance(container, dict):
+            continue
+        levels = [int(level)] if (bucket == b and level in (1, 2, 3, 4, 5)) else []
+        levels += [lv for lv in (1, 2, 3, 4, 5) if lv not in levels]
+        for lv in levels:
+            pool = container.get(f'level {lv}', {})
+            if not isinstance(pool, dict):
+                continue
+            blob = pool.get(name)
+            if isinstance(blob, dict):
+                return b, lv, blob
+            for nm, blob in pool.items():
+                if str(nm).strip().lower() == target and isinstance(blob, dict):
+                    return b, lv, blob
+    return None, None, {}
+
+
+def find_patron_spell(patron: str, name: str) -> dict:
+    """Return a patron spell entry from data/wizard_patrons.json, or {}."""
+    arr = _patron_catalog().get('patrons')
+    if not isinstance(arr, list):
+        return {}
+    p_lo = str(patron or '').strip().lower()
+    n_lo = str(name or '').strip().lower()
+    for p in arr:
+        if not isinstance(p, dict) or str(p.get('name') or '').strip().lower() != p_lo:
+            continue
+        spells = p.get('spells')
+        if not isinstance(spells, dict):
+            return {}
+        for arr_lv in spells.values():
+            if not isinstance(arr_lv, list):
+                continue
+            for s in arr_lv:
+                if isinstance(s, dict) and str(s.get('name') or '').strip().lower() == n_lo:
+                    return s
+    return {}
+
+
+def spell_ref(name: str, level: int, *, source: Optional[str] = None, patron: Optional[str] = None) -> Dict[str, Any]:
+    """Build the reference stored on a character for a newly learned spell."""
+    ref: Dict[str, Any] = {'name': str(name), 'level': int(level)}
+    if source:
+        ref['source'] = source
+    if patron:
+        ref['patron'] = patron
+    return ref
+
+
+def _payload_for(entry: dict, bucket: Optional[str] = None, level: Optional[int] = None) -> dict:
+    if str(entry.get('source') or '').lower() == 'patron':
+        blob = find_patron_spell(str(entry.get('patron') or ''), str(entry.get('name') or ''))
+        if blob:
+            return blob
+    return find_spell(str(entry.get('name') or ''), bucket, level)[2]
+
+
+def shrink_spell_entry(entry: Any, level: Optional[int] = None) -> Any:
+    """Reduce an embedded spell payload to a reference.
+
+    Entries whose name cannot be resolved in either catalog are returned
+    unchanged so hand-written or homebrew data is never lost.
+    """
+    if not isinstance(entry, dict) or not entry.get('name'):
+        return entry
+    if set(entry) <= set(REF_KEYS):
+        return entry
+    if not _payload_for(entry, None, level):
+        return entry
+    ref = {k: entry[k] for k in REF_KEYS if k in entry}
+    if not ref.get('level') and level:
+        ref['level'] = int(level)
+    return ref
+
+
+def shrink_spells(data: Dict[str, Any]) -> bool:
+    """Shrink every embedded spell on a record in place. Returns True when anything changed."""
+    spells = data.get('spells')
+    if not isinstance(spells, dict):
+        return False
+    changed = False
+    for key, arr in spells.items():
+        if not isinstance(arr, list):
+            continue
+        try:
+            lvl: Optional[int] = int(str(key).rsplit('_', 1)[-1])
+        except Exception:
+            lvl = None
+        new_arr = [shrink_spell_entry(e, lvl) for e in arr]
+        if any(a is not b for a, b in zip(arr, new_arr)):
+            spells[key] = new_arr
+            changed = True
+    return changed
+
+
+def hydrate_spell(entry: dict, bucket: Optional[str] = None, level: Optional[int] = None) -> Dict[str, Any]:
+    """Return a new dict: catalog payload overlaid with the character's reference fields."""
+    if not isinstance(entry, dict):
+        return {}
+    blob = _payload_for(entry, bucket, level)
+    out = dict(blob) if blob else {}
+    out.update(entry)
+    return out
+
+
+def known_spells(data: Dict[str, Any], level: int, *, hydrate: bool = False) -> List[Dict[str, Any]]:
+    """Known spells at ``level`` (references by default, hydrated on request)."""
+    spells = data.get('spells') if isinstance(data, dict) else None
+    arr = spells.get(f'level_{int(level)}') if isinstance(spells, dict) else None
+    if not isinstance(arr, list):
+        return []
+    entries = [e for e in arr if isinstance(e, dict)]
+    if not hydrate:
+        return entries
+    return [hydrate_spell(e, None, level) for e in entries]
+
+
+__all__ = [
+    'REF_KEYS',
+    'spell_catalog',
+    'find_spell',
+    'find_patron_spell',
+    'spell_ref',
+    'shrink_spell_entry',
+    'shrink_spells',
+    'hydrate_spell',
+    'known_spells',
+]
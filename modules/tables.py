@@ -0,0 +1,244 @@
+from __future__ import annotations
+import re
+import bisect
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.reference import FrozenDict
+
+# Compiled interval tables for d-roll lookups (crit, fumble, spell results,
+# corruption, disapproval, ...).
+#
+# The raw JSON tables key entries by strings such as '1', '2-11', '32+',
+# '1 or lower' or '0-'. Matching used to re-parse (and re-sort) every key on
+# every roll. A table is now compiled once into disjoint [start, next start)
+# segments: the original matching rule is evaluated once per segment between
+# consecutive key boundaries, so the compiled lookup is a single bisect and
+# returns exactly what the old scan returned for every integer roll.
+
+_NEG_INF = -10 ** 9
+_POS_INF = 10 ** 9
+
+_OR_LOWER = re.compile(r"^(-?\d+)\s*or\s*lower$", re.I)
+_PLUS = re.compile(r"^(-?\d+)\+$")
+_RANGE = re.compile(r"^(-?\d+)\s*-\s*(-?\d+)$")
+
+
+@lru_cache(maxsize=4096)
+def parse_result_key(key: str) -> Tuple[Optional[int], Optional[int], str]:
+    """Parse a Spells.json results key into an inclusive (low, high, label); None means open-ended.
+
+    Supports '1', '2-11', '32+', '1 or lower'. Unparseable keys give (None, None, label).
+    """
+    s = str(key).strip()
+    m = _OR_LOWER.match(s)
+    if m:
+        return None, int(m.group(1)), s
+    m = _PLUS.match(s)
+    if m:
+        return int(m.group(1)), None, s
+    m = _RANGE.match(s)
+    if m:
+        a, b = int(m.group(1)), int(m.group(2))
+        return (a, b, s) if a <= b else (b, a, s)
+    try:
+        n = int(s)
+        return n, n, s
+    except Exception:
+        return None, None, s
+
+
+@lru_cache(maxsize=4096)
+def parse_roll_key(key: str) -> Tuple[Optional[int], Optional[int], bool]:
+    """Parse a crit/fumble key ('5', '2-3', '20+', '0-', '-4') into (low, high, valid).
+
+    Mirrors the historical ``_match_roll_key`` rules, including '-N' meaning "N or less".
+    """
+    k = str(key).strip()
+    if k.endswith('+'):
+        try:
+            return int(k[:-1]), None, True
+        except Exception:
+            return None, None, False
+    if '-' in k:
+        lo, hi = k.split('-', 1)
+        lo = lo.strip()
+        hi = hi.strip()
+        try:
+            if lo == '0' and hi == '':
+                return None, 0, True
+            lo_v = int(lo) if lo else None
+            hi_v = int(hi) if hi else None
+        except Exception:
+            return None, None, False
+        if lo_v is None and hi_v is None:
+            return None, None, False
+        return lo_v, hi_v, True
+    try:
+        n = int(k)
+        return n, n, True
+    except Exception:
+        return None, None, False
+
+
+def _in_range(lo: Optional[int], hi: Optional[int], x: int) -> bool:
+    return (lo is None or x >= lo) and (hi is None or x <= hi)
+
+
+class IntervalTable:
+    """A table compiled to sorted segment starts; ``lookup(roll)`` is one bisect.
+
+    ``keys[i]`` is the original table key that wins for rolls in
+    ``[starts[i], starts[i+1])`` (None where nothing matches).
+    """
+
+    __slots__ = ('starts', 'keys', 'source')
+
+    def __init__(self, starts: List[int], keys: List[Optional[str]], source: Optional[dict] = None):
+        self.starts = starts
+        self.keys = keys
+        self.source = source
+
+    def lookup(self, roll: int) -> Optional[str]:
+        """Winning key for ``roll`` (None when no entry matches)."""
+        i = bisect.bisect_right(self.starts, int(roll)) - 1
+        return self.keys[i] if i >= 0 else None
+
+    def get(self, roll: int, default: Any = None) -> Any:
+        """Value of the winning entry in the source table."""
+        k = self.lookup(roll)
+        if k is None or self.source is None:
+            return default
+        return self.source.get(k, default)
+
+    @property
+    def bounds(self) -> Tuple[int, int]:
+        """Smallest and largest finite boundary (handy for exhaustive checks)."""
+        finite = [s for s in self.starts if _NEG_INF < s < _POS_INF]
+        if not finite:
+            return (0, 0)
+        return (min(finite), max(finite))
+
+
+def _compile(points: List[int], winner: Callable[[int], Optional[str]], source: Optional[dict]) -> IntervalTable:
+    """Evaluate ``winner`` once per elementary segment and merge equal neighbours."""
+    pts = sorted(set(p for p in points if _NEG_INF < p < _POS_INF))
+    reps = [(_NEG_INF, (pts[0] - 1) if pts else 0)] + [(p, p) for p in pts]
+    starts: List[int] = []
+    keys: List[Optional[str]] = []
+    for start, rep in reps:
+        k = winner(rep)
+        if keys and keys[-1] == k:
+            continue
+        starts.append(start)
+        keys.append(k)
+    return IntervalTable(starts, keys, source)
+
+
+def compile_result_table(table: Dict[str, Any]) -> IntervalTable:
+    """Spells.json-style table: ranges sorted by (low, high), first containing range wins."""
+    parsed = []
+    for k in table.keys():
+        lo, hi, _ = parse_result_key(k)
+        if lo is None and hi is None:
+            continue
+        parsed.append((lo, hi, k))
+    parsed.sort(key=lambda x: (x[0] if x[0] is not None else _NEG_INF, x[1] if x[1] is not None else _POS_INF))
+    points: List[int] = []
+    for lo, hi, _ in parsed:
+        if lo is not None:
+            points.append(lo)
+        if hi is not None:
+            points.append(hi + 1)
+
+    def winner(x: int) -> Optional[str]:
+        for lo, hi, k in parsed:
+            if _in_range(lo, hi, x):
+                return k
+        return None
+
+    return _compile(points, winner, table)
+
+
+def compile_roll_table(entries: Dict[str, Any]) -> IntervalTable:
+    """Crit/fumble-style table: exact ``str(roll)`` key first, then the first matching key in file order."""
+    parsed = []
+    points: List[int] = []
+    for k in entries.keys():
+        if k == '0-':
+            parsed.append((None, 0, k))
+            points.append(1)
+            continue
+        lo, hi, ok = parse_roll_key(k)
+        if not ok:
+            continue
+        parsed.append((lo, hi, k))
+        if lo is not None:
+            points.append(lo)
+        if hi is not None:
+            points.append(hi + 1)
+    exact = set()
+    for k in entries.keys():
+        try:
+            n = int(k)
+        except Exception:
+            continue
+        if str(n) == k:
+            exact.add(k)
+            points.extend((n, n + 1))
+
+    def winner(x: int) -> Optional[str]:
+        s = str(x)
+        if s in exact:
+            return s
+        for lo, hi, k in parsed:
+            if _in_range(lo, hi, x):
+                return k
+        return None
+
+    return _compile(points, winner, entries)
+
+
+_cache: Dict[Tuple[int, str], Tuple[Any, IntervalTable]] = {}
+_cache_lock = threading.Lock()
+_CACHE_MAX = 4096
+
+
+def _compiled(table: Dict[str, Any], kind: str, build: Callable[[Dict[str, Any]], IntervalTable]) -> IntervalTable:
+    # Shared reference data is read-only, so its compiled form is memoized by identity
+    # (the cache holds a strong reference, so an id is never reused while cached).
+    # Plain dicts may be mutated by the caller and are compiled fresh each time.
+    if not isinstance(table, FrozenDict):
+        return build(table)
+    key = (id(table), kind)
+    hit = _cache.get(key)
+    if hit is not None and hit[0] is table:
+        return hit[1]
+    compiled = build(table)
+    with _cache_lock:
+        if len(_cache) >= _CACHE_MAX:
+            _cache.clear()
+        _cache[key] = (table, compiled)
+    return compiled
+
+
+def result_table(table: Dict[str, Any]) -> IntervalTable:
+    """Compiled form of a Spells.json-style results table (memoized for reference data)."""
+    return _compiled(table, 'result', compile_result_table)
+
+
+def roll_table(entries: Dict[str, Any]) -> IntervalTable:
+    """Compiled form of a crit/fumble entries table (memoized for reference data)."""
+    return _compiled(entries, 'roll', compile_roll_table)
+
+
+__all__ = [
+    'IntervalTable',
+    'parse_result_key',
+    'parse_roll_key',
+    'compile_result_table',
+    'compile_roll_table',
+    'result_table',
+    'roll_table',
+]
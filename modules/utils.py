@@ -1,6 +1,8 @@
-import random, re, json, os
+import random, re
 from typing import Tuple, List, Iterable
 from utils.dice import roll_dice
+from modules.reference import get_reference_data
+from modules.tables import roll_table
 
 # Ability score rolling
 
@@ -138,7 +140,11 @@ def get_luck_current(char: dict) -> int:
         return int(explicit)
     return int(lck_val)
 
-def consume_luck_and_save(char: dict, pts: int, filename: str=None) -> int:
+def consume_luck_and_save(char: dict, pts: int) -> int:
+    """Spend up to `pts` Luck on `char` in place and return the points spent.
+
+    Nothing is written here; burn_luck commits the change under the record lock.
+    """
     try:
         cur = get_luck_current(char)
         use = min(cur, max(0, int(pts)))
@@ -176,18 +182,40 @@ def consume_luck_and_save(char: dict, pts: int, filename: str=None) -> int:
                 lck['mod'] = int(lck.get('mod', 0))
         except Exception:
             pass
-        if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(char, f, indent=2)
-            except Exception:
-                pass
         return use
     except Exception:
         return 0
 
+async def burn_luck(name: str, pts: int, mirror: dict = None) -> int:
+    """Burn Luck from a saved character under its record lock.
+
+    The burn is applied to the freshest saved copy and committed in one locked
+    read-modify-write, so two concurrent burns cannot both spend the same point.
+    `mirror` (the caller's already-loaded dict) receives the resulting Luck fields
+    so anything the caller displays or saves later agrees with disk.
+    Returns the points actually burned (0 when the burn could not be saved).
+    """
+    from storage.repository import get_repository, CommitError  # lazy: storage imports core
+    try:
+        async with get_repository().transaction(name) as (rec,):
+            if rec is None:
+                return int(consume_luck_and_save(mirror, pts) or 0) if mirror is not None else 0
+            used = int(consume_luck_and_save(rec, pts) or 0)
+    except CommitError:
+        return 0
+    if mirror is not None and used:
+        try:
+            if isinstance(rec.get('luck'), dict):
+                mirror['luck'] = dict(rec['luck'])
+            lck = (rec.get('abilities') or {}).get('LCK')
+            if isinstance(lck, dict):
+                mirror.setdefault('abilities', {})['LCK'] = dict(lck)
+        except Exception:
+            pass
+    return used
+
 __all__ = [
-    'roll_ability','get_modifier','roll_dice','get_luck_current','consume_luck_and_save','get_max_luck_mod',
+    'roll_ability','get_modifier','roll_dice','get_luck_current','consume_luck_and_save','burn_luck','get_max_luck_mod',
     'get_equipped_weapons','is_dual_wielding','has_two_handed_equipped','effective_initiative_die',
     'dcc_dice_chain_step','is_weapon_trained','character_trained_weapons',
     'ABILITY_INFO','ABILITY_ORDER','ability_name','ability_emoji',
@@ -195,7 +223,7 @@ __all__ = [
     'load_fumble_tables','lookup_fumble_entry','load_conditions','tags_to_conditions',
     'load_attack_modifiers','compute_attack_roll_adjustments',
     'double_damage_dice_expr','resolve_crit_damage_bonus','has_weapon_equipped','has_shield_equipped',
-    'select_crit_table_for_character','roll_multiple_dice_expr','get_global_roll_penalty',
+    'select_crit_table_for_character','roll_multiple_dice_expr','get_global_roll_penalty','save_modifier',
     'apply_targeted_effects_from_tags','apply_targeted_effects_from_entry',
     'get_hp_current','set_hp_current','has_helm_equipped'
 ]
@@ -304,6 +332,33 @@ def dcc_dice_chain_step(die_expr: str, steps: int = -1) -> str:
     except Exception:
         return die_expr
 
+def two_weapon_die_steps(agi_mod: int) -> tuple[int, int]:
+    """Dice-chain steps (primary, off-hand) for two-weapon fighting by Agility modifier."""
+    if agi_mod <= -3:
+        return (-1, -4)
+    if agi_mod == -2:
+        return (-1, -3)
+    if agi_mod == -1:
+        return (-1, -2)
+    if agi_mod == 0:
+        return (0, -2)
+    if agi_mod == 1:
+        return (0, -1)
+    return (0, 0)
+
+def crit_threat_min(char: dict, die_sides: int) -> int | None:
+    """Lowest natural roll that crits from the class threat range ('19-20', '20'); d20 action dice only."""
+    if die_sides != 20:
+        return None
+    try:
+        thr = str((char or {}).get('crit_threat') or '').strip()
+        if '-' in thr:
+            return int(thr.split('-', 1)[0])
+        # Support single value like '20' if present
+        return int(thr) if thr.isdigit() else None
+    except Exception:
+        return None
+
 def character_trained_weapons(char: dict) -> set:
     """Return the set of weapon keys this character is trained with.
     Unions multiple sources:
@@ -389,89 +444,40 @@ def double_damage_dice_expr(expr: str) -> str:
         return expr
 
 # --- Crit tables loader ---
-
-_CRIT_TABLES_CACHE = None
-_FUMBLE_TABLES_CACHE = None
-_FUMBLE_TABLES_MTIME = None
-_CONDITIONS_CACHE = None
-_ATTACK_MODIFIERS_CACHE = None
+# Table files are shared through the reference registry (parsed once, reloaded on mtime change).
 
 def load_crit_tables(path: str = None) -> dict:
-    """Load crit tables JSON once and cache.
+    """Load crit tables JSON (shared, read-only).
     Path defaults to data/crit_tables.json adjacent to repo root.
     """
-    global _CRIT_TABLES_CACHE
-    if _CRIT_TABLES_CACHE is not None:
-        return _CRIT_TABLES_CACHE
-    try:
-        # Try repo-relative data path
-        base = os.path.dirname(os.path.dirname(__file__))  # modules/ -> repo root
-        p = path or os.path.join(base, 'data', 'crit_tables.json')
-        with open(p, 'r', encoding='utf-8') as f:
-            _CRIT_TABLES_CACHE = json.load(f)
-    except Exception:
-        _CRIT_TABLES_CACHE = {"version": 1, "tables": {}}
-    return _CRIT_TABLES_CACHE
+    return get_reference_data().get(path or 'data/crit_tables.json', {"version": 1, "tables": {}})
+
+def _normalize_fumble_tables(data):
+    # Normalize alternate schema where tables are top-level keys (e.g., {"FUMBLES": {...}})
+    if isinstance(data, dict) and 'tables' not in data:
+        tables = {}
+        for k, v in list(data.items()):
+            if isinstance(v, dict) and ('entries' in v):
+                tables[k] = v
+        if tables:
+            data = {'version': int(data.get('version', 1)) if isinstance(data.get('version', 1), (int, float, str)) else 1,
+                    'tables': tables}
+    return data
 
 def load_fumble_tables(path: str = None) -> dict:
-    """Load fumble tables JSON once and cache.
+    """Load fumble tables JSON (shared, read-only; reloaded when the file changes).
     Path defaults to data/fumble_tables.json adjacent to repo root.
     """
-    global _FUMBLE_TABLES_CACHE, _FUMBLE_TABLES_MTIME
-    try:
-        base = os.path.dirname(os.path.dirname(__file__))
-        p = path or os.path.join(base, 'data', 'fumble_tables.json')
-        # If cached and file unchanged, return cache
-        try:
-            mtime = os.path.getmtime(p)
-        except Exception:
-            mtime = None
-        if _FUMBLE_TABLES_CACHE is not None and _FUMBLE_TABLES_MTIME is not None and mtime is not None and mtime == _FUMBLE_TABLES_MTIME:
-            return _FUMBLE_TABLES_CACHE
-        with open(p, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # Normalize alternate schema where tables are top-level keys (e.g., {"FUMBLES": {...}})
-        if isinstance(data, dict) and 'tables' not in data:
-            tables = {}
-            for k, v in list(data.items()):
-                if isinstance(v, dict) and ('entries' in v):
-                    tables[k] = v
-            if tables:
-                data = {'version': int(data.get('version', 1)) if isinstance(data.get('version', 1), (int, float, str)) else 1,
-                        'tables': tables}
-        _FUMBLE_TABLES_CACHE = data
-        _FUMBLE_TABLES_MTIME = mtime
-    except Exception:
-        _FUMBLE_TABLES_CACHE = {"version": 1, "tables": {}}
-    return _FUMBLE_TABLES_CACHE
+    return get_reference_data().get(path or 'data/fumble_tables.json', {"version": 1, "tables": {}},
+                                    transform=_normalize_fumble_tables)
 
 def load_conditions(path: str = None) -> dict:
-    """Load conditions registry from data/conditions.json and cache."""
-    global _CONDITIONS_CACHE
-    if _CONDITIONS_CACHE is not None:
-        return _CONDITIONS_CACHE
-    try:
-        base = os.path.dirname(os.path.dirname(__file__))
-        p = path or os.path.join(base, 'data', 'conditions.json')
-        with open(p, 'r', encoding='utf-8') as f:
-            _CONDITIONS_CACHE = json.load(f)
-    except Exception:
-        _CONDITIONS_CACHE = {"version": 1, "conditions": {}}
-    return _CONDITIONS_CACHE
+    """Load conditions registry from data/conditions.json (shared, read-only)."""
+    return get_reference_data().get(path or 'data/conditions.json', {"version": 1, "conditions": {}})
 
 def load_attack_modifiers(path: str = None) -> dict:
-    """Load Table 4-1 attack modifiers from data/attack_modifiers.json."""
-    global _ATTACK_MODIFIERS_CACHE
-    if _ATTACK_MODIFIERS_CACHE is not None:
-        return _ATTACK_MODIFIERS_CACHE
-    try:
-        base = os.path.dirname(os.path.dirname(__file__))
-        p = path or os.path.join(base, 'data', 'attack_modifiers.json')
-        with open(p, 'r', encoding='utf-8') as f:
-            _ATTACK_MODIFIERS_CACHE = json.load(f)
-    except Exception:
-        _ATTACK_MODIFIERS_CACHE = {"version": 1, "modifiers": {}}
-    return _ATTACK_MODIFIERS_CACHE
+    """Load Table 4-1 attack modifiers from data/attack_modifiers.json (shared, read-only)."""
+    return get_reference_data().get(path or 'data/attack_modifiers.json', {"version": 1, "modifiers": {}})
 
 def compute_attack_roll_adjustments(kind: str, factors: dict) -> dict:
     """Compute die chain steps and flat bonuses for an attack.
@@ -641,6 +647,30 @@ def get_global_roll_penalty(char: dict) -> tuple[int, list[str]]:
     except Exception:
         return (0, [])
 
+SAVE_ABILITY = {'reflex': 'AGI', 'fortitude': 'STA', 'will': 'PER'}
+
+def save_modifier(char: dict, save_key: str) -> int:
+    """Saving throw modifier ('reflex'/'fortitude'/'will').
+    Prefers the stored total in saves[save_key]; falls back to the save's ability
+    modifier (AGI/STA/PER) plus class_saves[save_key].
+    """
+    try:
+        stored = int(((char or {}).get('saves') or {}).get(save_key, 0) or 0)
+    except Exception:
+        stored = 0
+    if stored:
+        return stored
+    try:
+        v = ((char or {}).get('abilities') or {}).get(SAVE_ABILITY.get(save_key, 'STA'), {})
+        amod = int(v.get('mod', 0)) if isinstance(v, dict) else int(get_modifier(int(v)))
+    except Exception:
+        amod = 0
+    try:
+        class_bonus = int(((char or {}).get('class_saves') or {}).get(save_key, 0) or 0)
+    except Exception:
+        class_bonus = 0
+    return amod + class_bonus
+
 def resolve_crit_damage_bonus(entry: dict, attacker: dict | None = None, defender: dict | None = None, context: dict | None = None) -> dict:
     """Evaluate conditional damage/save fields on a crit entry.
     Returns: { 'dice': '+NdX'|None, 'save': {...}|None, 'notes': [..] }
@@ -927,35 +957,6 @@ def tags_to_conditions(tags: list) -> list:
                 pass
     return out
 
-def _match_roll_key(key: str, roll: int) -> bool:
-    key = str(key).strip()
-    if key.endswith('+'):
-        try:
-            val = int(key[:-1])
-            return roll >= val
-        except Exception:
-            return False
-    if '-' in key:
-        lo, hi = key.split('-', 1)
-        lo = lo.strip()
-        hi = hi.strip()
-        try:
-            if lo == '0' and hi == '':
-                return roll <= 0
-            lo_v = int(lo) if lo else None
-            hi_v = int(hi) if hi else None
-            if lo_v is None and hi_v is not None:
-                return roll <= hi_v
-            if lo_v is not None and hi_v is None:
-                return roll >= lo_v
-            return lo_v <= roll <= hi_v
-        except Exception:
-            return False
-    try:
-        return int(key) == int(roll)
-    except Exception:
-        return False
-
 def lookup_crit_entry(table: str, roll: int) -> dict:
     """Return the crit entry dict for a given table name and roll.
     Table is the key under data. Supports exact numbers, ranges like '2-3', and '20+'.
@@ -965,17 +966,8 @@ def lookup_crit_entry(table: str, roll: int) -> dict:
     t = data.get('tables', {}).get(table)
     if not t:
         return {}
-    entries = t.get('entries', {})
-    # Prefer exact match first
-    if str(roll) in entries:
-        return entries.get(str(roll), {})
-    # Then ranges/suffixes
-    for k, v in entries.items():
-        if k == '0-' and roll <= 0:
-            return v
-        if _match_roll_key(k, roll):
-            return v
-    return {}
+    # Exact key first, then ranges/suffixes in file order (compiled once per table)
+    return roll_table(t.get('entries', {})).get(int(roll), {})
 
 def lookup_fumble_entry(table: str, roll: int) -> dict:
     """Return the fumble entry dict for a given table name and roll.
@@ -985,12 +977,4 @@ def lookup_fumble_entry(table: str, roll: int) -> dict:
     t = data.get('tables', {}).get(table)
     if not t:
         return {}
-    entries = t.get('entries', {})
-    if str(roll) in entries:
-        return entries.get(str(roll), {})
-    for k, v in entries.items():
-        if k == '0-' and roll <= 0:
-            return v
-        if _match_roll_key(k, roll):
-            return v
-    return {}
+    return roll_table(t.get('entries', {})).get(int(roll), {})
@@ -0,0 +1,93 @@
+"""
+Incremental character backups from the command line (same store as /backup and the nightly task).
+
+Run:
+  python scripts/backup.py create                 # snapshot now, then apply retention
+  python scripts/backup.py list
+  python scripts/backup.py prune [--dry-run] [--daily 7] [--weekly 4] [--monthly 12]
+  python scripts/backup.py restore [AT] [--name Char1 ...] [--dest DIR]
+
+AT is a snapshot id or a UTC time (YYYY-MM-DD or 'YYYY-MM-DD HH:MM'); the newest
+snapshot taken at or before it is restored (default: the latest). Restoring into
+the save folder writes files back byte-for-byte, so stop the bot first or use
+--dest to unpack somewhere else.
+"""
+from __future__ import annotations
+import os, sys, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # SAVE_FOLDER is relative to the repo
+
+from storage import backup  # type: ignore
+from storage.repository import record_key  # type: ignore
+
+
+def _progress(done: int, total: int) -> None:
+    print(f"\r  {done}/{total} files", end='' if done < total else '\n', flush=True)
+
+
+def cmd_create(args) -> int:
+    info = backup.create_snapshot(_progress)
+    print(f"snapshot {info.id}: {info.files} files ({info.bytes_total / 1024:.1f} KB), {info.hashed} hashed, "
+          f"{info.new_blobs} new blobs ({info.bytes_stored / 1024:.1f} KB stored) in {info.elapsed_ms:.0f} ms")
+    if not args.no_prune:
+        return cmd_prune(args)
+    return 0
+
+
+def cmd_list(args) -> int:
+    ids = backup.list_snapshots()
+    for sid in ids:
+        print(sid)
+    print(f"{len(ids)} snapshot(s)")
+    return 0
+
+
+def cmd_prune(args) -> int:
+    res = backup.prune_snapshots(args.daily, args.weekly, args.monthly, dry_run=args.dry_run)
+    verb = 'would remove' if args.dry_run else 'removed'
+    print(f"kept {len(res.kept)}, {verb} {len(res.removed)} snapshot(s) and {res.blobs_removed} blob(s) "
+          f"({res.bytes_freed / 1024:.1f} KB)")
+    for sid in res.removed:
+        print(f"  - {sid}")
+    return 0
+
+
+def cmd_restore(args) -> int:
+    paths = [f"{record_key(n)}.json" for n in args.name] if args.name else None
+    try:
+        res = backup.restore_snapshot(args.at, paths, dest=args.dest, progress=_progress)
+    except OSError as e:
+        print(f"Restore failed: {e}")
+        return 1
+    print(f"restored {len(res.restored)} file(s) from {res.snapshot} into {args.dest or backup.SAVE_FOLDER}")
+    for rel in res.missing:
+        print(f"  not in snapshot: {rel}")
+    return 1 if res.missing else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Incremental character backups")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    for name in ('create', 'prune'):
+        p = sub.add_parser(name)
+        p.add_argument('--daily', type=int, default=None, help='Days to keep (default BACKUP_KEEP_DAILY or 7)')
+        p.add_argument('--weekly', type=int, default=None, help='Weeks to keep (default BACKUP_KEEP_WEEKLY or 4)')
+        p.add_argument('--monthly', type=int, default=None, help='Months to keep (default BACKUP_KEEP_MONTHLY or 12)')
+        p.add_argument('--dry-run', action='store_true', help='Report what retention would remove')
+        if name == 'create':
+            p.add_argument('--no-prune', action='store_true', help='Skip retention after the snapshot')
+    sub.add_parser('list')
+    p = sub.add_parser('restore')
+    p.add_argument('at', nargs='?', default=None, help='Snapshot id or UTC time (default: latest)')
+    p.add_argument('--name', action='append', default=[], help='Restore only this character (repeatable)')
+    p.add_argument('--dest', default=None, help='Folder to restore into (default: the save folder)')
+    args = ap.parse_args()
+    return {'create': cmd_create, 'list': cmd_list, 'prune': cmd_prune, 'restore': cmd_restore}[args.cmd](args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark level 0 character generation: one-at-a-time /create vs a funnel batch.
+
+Run:
+  python scripts/bench_funnel.py [--count 1000] [--batch 40] [--expr 3d6] [--workers 4]
+
+Both paths write into a throwaway folder (nothing under characters/ is touched):
+  sequential  per character: list the folder for the next CharN, roll, save (the old /create)
+  batched     per batch: reserve names from the counter, roll every character, save_batch
+Prints wall time, per-character cost and files/s for each, and checks that no name was reused.
+"""
+from __future__ import annotations
+import os, re, sys, time, asyncio, argparse, tempfile, shutil
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)  # reference data paths are relative to the repo
+
+from storage.repository import CharacterRepository  # type: ignore
+from storage.counters import CounterStore, reserve_char_names_sync  # type: ignore
+from storage import files  # type: ignore
+from modules.funnel import load_funnel_tables, roll_funnel, roll_lv0  # type: ignore
+from utils.dice import compile_dice  # type: ignore
+
+_CHAR = re.compile(r"^char(\d+)\.json$", re.IGNORECASE)
+
+
+def _listdir_next_name(folder: str) -> str:
+    """The old /create naming: scan the folder for the highest CharN."""
+    used = [int(m.group(1)) for m in map(_CHAR.match, os.listdir(folder)) if m]
+    return f"Char{max(used, default=0) + 1}"
+
+
+async def bench_sequential(folder: str, count: int, expr: str) -> float:
+    repo = CharacterRepository(folder=folder)
+    dice = compile_dice(expr)
+    t0 = time.perf_counter()
+    for _ in range(count):
+        name = await files.run_io(_listdir_next_name, folder)
+        char = roll_lv0(name, 0, dice, load_funnel_tables())
+        await repo.save(name, char.record)
+    return time.perf_counter() - t0
+
+
+async def bench_batched(folder: str, count: int, batch: int, expr: str) -> float:
+    repo = CharacterRepository(folder=folder)
+    counters = CounterStore(os.path.join(folder, '..', 'counters.json'))
+    dice = compile_dice(expr)
+    t0 = time.perf_counter()
+    done = 0
+    while done < count:
+        n = min(batch, count - done)
+        names = await files.run_io(reserve_char_names_sync, n, folder, counters)
+        chars = roll_funnel(names, 0, dice, load_funnel_tables())
+        await repo.save_batch([(c.record['name'], c.record) for c in chars])
+        done += n
+    return time.perf_counter() - t0
+
+
+def _report(label: str, folder: str, count: int, elapsed: float) -> None:
+    names = [f for f in os.listdir(folder) if _CHAR.match(f)]
+    size = sum(os.path.getsize(os.path.join(folder, f)) for f in names)
+    status = 'ok' if len(names) == count else f'EXPECTED {count} FILES, GOT {len(names)}'
+    print(f"{label:<11} {elapsed * 1000:9.1f} ms  {elapsed * 1e6 / max(1, count):8.1f} us/char  "
+          f"{count / elapsed if elapsed else 0:8.0f} chars/s  {size / 1024:8.0f} KB  {status}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark funnel character generation")
+    ap.add_argument('--count', type=int, default=1000, help='Characters to generate per path (default 1000)')
+    ap.add_argument('--batch', type=int, default=40, help='Characters per /create call in the batched path (default 40)')
+    ap.add_argument('--expr', default='3d6', help='Ability roll expression (default 3d6)')
+    ap.add_argument('--workers', type=int, default=None, help='STORAGE_IO_WORKERS for this run')
+    args = ap.parse_args()
+    if args.workers:
+        os.environ['STORAGE_IO_WORKERS'] = str(args.workers)
+    if compile_dice(args.expr) is None:
+        print(f"Invalid expression: {args.expr}")
+        return 2
+
+    load_funnel_tables()  # warm the reference registry so neither path pays the first parse
+    tmp = tempfile.mkdtemp(prefix='bench_funnel_')
+    try:
+        seq_dir = os.path.join(tmp, 'sequential', 'characters')
+        bat_dir = os.path.join(tmp, 'batched', 'characters')
+        os.makedirs(seq_dir)
+        os.makedirs(bat_dir)
+        print(f"{args.count} characters, expr {args.expr}, batch {args.batch}, {files._io_workers()} I/O workers")
+        seq = asyncio.run(bench_sequential(seq_dir, args.count, args.expr))
+        _report('sequential', seq_dir, args.count, seq)
+        bat = asyncio.run(bench_batched(bat_dir, args.count, args.batch, args.expr))
+        _report('batched', bat_dir, args.count, bat)
+        if bat:
+            print(f"speedup     {seq / bat:.1f}x")
+    finally:
+        files.shutdown_io_pool()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark record encodings: save/load latency and disk footprint per serializer setting.
+
+Run:
+  python scripts/bench_serializer.py [--folder characters] [--rounds 200] [--gzip-min 16384] [--no-large]
+
+Uses the sample characters in --folder plus, unless --no-large, a large caster
+(the sample with the most known spells, with each spell's Spells.json payload
+embedded again: the ~130KB pre-v2 wizard layout). Each storage.files.Serializer
+setting writes every record --rounds times into a throwaway folder the way the
+repository does (encode, temp file, atomic rename) and reads it back (read,
+auto-detect, parse):
+  json/pretty       stdlib, indent 2 (the historic format)
+  json/compact      stdlib, no whitespace
+  orjson/pretty     orjson, indent 2 (when orjson is installed)
+  orjson/compact    orjson, no whitespace
+  orjson/compact/gzip>=N   ... gzipped when the encoding is at least N bytes
+Prints mean save/load time per record for the samples and for the large sheet,
+and bytes on disk. Nothing under characters/ is modified.
+"""
+from __future__ import annotations
+import os, sys, time, json, argparse, tempfile, shutil
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage import files  # type: ignore
+from storage.files import Serializer  # type: ignore
+
+
+def _samples(folder: str, large: bool) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, dict]]]:
+    small = []
+    for fn in sorted(os.listdir(folder)):
+        if fn.lower().endswith('.json') and not fn.startswith('.'):
+            data = files._read_json(os.path.join(folder, fn))
+            if isinstance(data, dict):
+                small.append((fn[:-5], data))
+    big = []
+    def known(d: dict) -> int:
+        spells = d.get('spells')
+        return sum(len(a) for a in spells.values() if isinstance(a, list)) if isinstance(spells, dict) else 0
+
+    wizard = max((d for _, d in small), key=known, default=None)
+    if large and wizard is not None and known(wizard):
+        from modules.spellbook import hydrate_spell  # type: ignore
+        heavy = json.loads(json.dumps(wizard))
+        for bucket, arr in (heavy.get('spells') or {}).items():
+            if isinstance(arr, list):
+                level = int(bucket.split('_')[-1]) if bucket.split('_')[-1].isdigit() else None
+                heavy['spells'][bucket] = [hydrate_spell(e, None, level) for e in arr]
+        big.append(('caster_embedded', heavy))
+    return small, big
+
+
+def _save(ser: Serializer, folder: str, key: str, data: dict) -> None:
+    raw = ser.encode(data)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix='.json')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp, os.path.join(folder, f'{key}.json'))
+
+
+def _bench(ser: Serializer, folder: str, records: List[Tuple[str, dict]], rounds: int) -> Dict[str, float]:
+    if not records:
+        return {'save_us': 0.0, 'load_us': 0.0, 'bytes': 0}
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for key, data in records:
+            _save(ser, folder, key, data)
+    save = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for key, data in records:
+            loaded = ser.read(os.path.join(folder, f'{key}.json'))
+    load = time.perf_counter() - t0
+    if loaded != records[-1][1]:
+        raise SystemExit(f"{ser.name}: round trip changed {records[-1][0]}")
+    size = sum(os.path.getsize(os.path.join(folder, f'{k}.json')) for k, _ in records)
+    n = rounds * len(records)
+    return {'save_us': save * 1e6 / n, 'load_us': load * 1e6 / n, 'bytes': size}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark record serializers")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Folder with sample character JSON files')
+    ap.add_argument('--rounds', type=int, default=200, help='Writes and reads per record per setting (default 200)')
+    ap.add_argument('--gzip-min', type=int, default=16384, help='Gzip threshold for the gzip setting (default 16384)')
+    ap.add_argument('--no-large', action='store_true', help='Skip the large embedded-spells caster')
+    args = ap.parse_args()
+
+    small, big = _samples(args.folder, not args.no_large)
+    if not small:
+        print(f"No sample records in {args.folder}")
+        return 2
+    settings = [Serializer('pretty', 'json'), Serializer('compact', 'json')]
+    if files.orjson is not None:
+        settings += [Serializer('pretty'), Serializer('compact')]
+    else:
+        print("orjson not installed: stdlib settings only (pip install orjson)")
+    settings.append(Serializer('compact', gzip_min=args.gzip_min))
+
+    print(f"{len(small)} sample record(s)" + (f", large sheet {len(json.dumps(big[0][1], indent=2)) / 1024:.0f} KB pretty" if big else "")
+          + f", {args.rounds} rounds")
+    print(f"{'setting':<28} {'save us':>9} {'load us':>9} {'disk KB':>8}   {'large save us':>13} {'large load us':>13} {'large KB':>9}")
+    tmp = tempfile.mkdtemp(prefix='bench_serializer_')
+    try:
+        for ser in settings:
+            folder = tempfile.mkdtemp(dir=tmp)
+            s = _bench(ser, folder, small, args.rounds)
+            b = _bench(ser, folder, big, max(1, args.rounds // 4))
+            print(f"{ser.name:<28} {s['save_us']:9.1f} {s['load_us']:9.1f} {s['bytes'] / 1024:8.1f}   "
+                  f"{b['save_us']:13.1f} {b['load_us']:13.1f} {b['bytes'] / 1024:9.1f}")
+        if big:
+            print(f"(first row is the historic format; large sheet rounds: {max(1, args.rounds // 4)})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
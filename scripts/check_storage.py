@@ -0,0 +1,173 @@
+"""
+Self-check for the storage layer (storage.migrations, storage.repository).
+
+Everything runs on copies in a temporary folder; the save folder is only read.
+  - migrations: every record in the save folder plus a few synthetic ones is
+    migrated twice with migrate_file. The second run must report 'current' and
+    leave the bytes alone. Re-running the whole chain on an already migrated
+    body (version reset to where it started) must not change it either, which
+    is what keeps records fixed by hand-run scripts safe.
+  - transactions: many concurrent read-modify-write transactions on the same
+    records (single and multi-record, locks requested in opposite orders) must
+    not lose an update or deadlock, with and without write-behind, and a
+    transaction that changes nothing must not write.
+
+Run:
+  python scripts/check_storage.py [--folder characters] [--tasks 200]
+
+Exits non-zero when any check fails (all failures are listed).
+"""
+from __future__ import annotations
+import os, sys, copy, json, shutil, asyncio, argparse, tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage import files  # type: ignore
+from storage.migrations import (  # type: ignore
+    LATEST_SCHEMA_VERSION, PACK_HUNTER, migrate_character_dict, migrate_file, record_paths, schema_version,
+)
+from storage.repository import CharacterRepository  # type: ignore
+
+
+SYNTHETIC: Dict[str, Dict[str, Any]] = {
+    # Pack hunter bonus still baked into 'attack' (v2 -> v3 subtracts it)
+    'pack_hunter_bugged': {'name': 'Pack Hunter Bugged', 'schema_version': 2, 'level': 0, 'attack': 2,
+                           'max_luck_mod': 2, 'birth_augur': {'effect': PACK_HUNTER}},
+    # Already fixed by scripts/fix_pack_hunter.py but still below v3
+    'pack_hunter_fixed': {'name': 'Pack Hunter Fixed', 'schema_version': 2, 'level': 0, 'attack': 0,
+                          'max_luck_mod': 2, 'birth_augur': {'effect': PACK_HUNTER}},
+    # No max_luck_mod: falls back to the Luck score (16 -> +2)
+    'pack_hunter_score': {'name': 'Pack Hunter Score', 'level': 0, 'attack': 2,
+                          'abilities': {'LCK': {'max': 16, 'current': 16}}, 'birth_augur': {'effect': PACK_HUNTER}},
+    'unversioned': {'name': 'Unversioned', 'hp': {'current': 4, 'max': 4}},
+}
+EXPECTED_ATTACK = {'pack_hunter_bugged': 0, 'pack_hunter_fixed': 0, 'pack_hunter_score': 0}
+
+
+# ---- migrations ----
+def check_migrations(source: str, work: str) -> List[str]:
+    failures: List[str] = []
+    for path in record_paths(source):
+        shutil.copy2(path, os.path.join(work, os.path.basename(path)))
+    for key, data in SYNTHETIC.items():
+        files._write_json(os.path.join(work, f"{key}.json"), data)
+    checked = 0
+    for path in sorted(record_paths(work)):
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            start = files.decode(f.read())
+        if not isinstance(start, dict):
+            continue
+        checked += 1
+        first = migrate_file(path)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data = files.decode(raw)
+        if schema_version(data) != LATEST_SCHEMA_VERSION:
+            failures.append(f"{name}: at v{schema_version(data)} after migrating, expected v{LATEST_SCHEMA_VERSION}")
+        second = migrate_file(path)
+        with open(path, 'rb') as f:
+            if second['status'] != 'current' or f.read() != raw:
+                failures.append(f"{name}: second migrate_file run was '{second['status']}', expected 'current' and no rewrite")
+        # Steps must be no-ops on a body they already fixed
+        again = copy.deepcopy(data)
+        again['schema_version'] = first['from_version']
+        again = migrate_character_dict(again)
+        if json.dumps(again, sort_keys=True) != json.dumps(data, sort_keys=True):
+            failures.append(f"{name}: re-running the chain from v{first['from_version']} changed the migrated record")
+        want = EXPECTED_ATTACK.get(name[:-5])
+        if want is not None and data.get('attack') != want:
+            failures.append(f"{name}: attack {data.get('attack')!r} after migrating, expected {want}")
+    print(f"Migrated {checked} record(s) twice")
+    return failures
+
+
+# ---- transactions ----
+async def _transactions(folder: str, tasks: int, write_behind: bool) -> List[str]:
+    label = 'write-behind' if write_behind else 'write-through'
+    failures: List[str] = []
+    repo = CharacterRepository(folder=folder, write_behind=write_behind, flush_window=0.01)
+    for name in ('Alpha', 'Beta'):
+        repo.save_sync(name, {'name': name, 'hp': {'current': tasks * 2, 'max': tasks * 2}, 'hits': 0})
+
+    async def hit(name: str) -> None:
+        async with repo.transaction(name) as (rec,):
+            cur = rec['hp']['current']
+            await asyncio.sleep(0)  # let the other tasks run between read and write
+            rec['hp']['current'] = cur - 1
+            rec['hits'] += 1
+
+    async def swap(first: str, second: str) -> None:
+        async with repo.transaction(first, second) as (a, b):
+            await asyncio.sleep(0)
+            a['hp']['current'] -= 1
+            b['hp']['current'] += 1
+
+    jobs = []
+    for i in range(tasks):
+        jobs.append(hit('Alpha' if i % 2 else 'Beta'))
+        jobs.append(swap('Alpha', 'Beta') if i % 2 else swap('beta', 'alpha'))
+    try:
+        await asyncio.wait_for(asyncio.gather(*jobs), 60)
+    except asyncio.TimeoutError:
+        return [f"{label}: transactions did not finish (deadlock?)"]
+    writes = repo.writes
+    async with repo.transaction('Alpha') as (rec,):
+        rec['hp']['current'] = rec['hp']['current']
+    if not write_behind and repo.writes != writes:
+        failures.append(f"{label}: a transaction that changed nothing wrote the record")
+    await repo.flush()
+    repo.invalidate()
+    saved = {n: files._read_json(os.path.join(folder, f"{n}.json")) for n in ('alpha', 'beta')}
+    for name, hits in (('alpha', tasks // 2), ('beta', tasks - tasks // 2)):
+        data = saved[name]
+        if not isinstance(data, dict):
+            failures.append(f"{label}: {name} missing on disk")
+        elif data.get('hits') != hits:
+            failures.append(f"{label}: {name} has {data.get('hits')} hit(s), expected {hits} (lost updates)")
+    # Every hit takes 1 HP; the swaps move 1 HP each way and cancel out
+    total = sum(d.get('hp', {}).get('current', 0) for d in saved.values() if isinstance(d, dict))
+    if total != tasks * 4 - tasks:
+        failures.append(f"{label}: total HP {total}, expected {tasks * 4 - tasks} (lost updates)")
+    print(f"Ran {len(jobs) + 1} concurrent transaction(s) ({label})")
+    return failures
+
+
+def check_transactions(work: str, tasks: int) -> List[str]:
+    failures: List[str] = []
+    for write_behind in (False, True):
+        folder = os.path.join(work, 'wb' if write_behind else 'wt')
+        os.makedirs(folder, exist_ok=True)
+        failures += asyncio.run(_transactions(folder, tasks, write_behind))
+    return failures
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Check migrations are idempotent and transactions lose no updates")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Save folder whose records are migrated (on copies)')
+    ap.add_argument('--tasks', type=int, default=200, help='Concurrent transactions per record kind')
+    args = ap.parse_args()
+
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory(prefix='check_storage_') as tmp:
+        work = os.path.join(tmp, 'records')
+        os.makedirs(work)
+        failures += check_migrations(args.folder, work)
+        failures += check_transactions(tmp, max(2, args.tasks))
+        files.shutdown_io_pool()
+
+    if failures:
+        for line in failures[:50]:
+            print("FAIL", line)
+        print(f"{len(failures)} failure(s)")
+        return 1
+    print("OK: migrations are idempotent and concurrent transactions lost no updates")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
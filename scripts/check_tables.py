@@ -0,0 +1,223 @@
+"""
+Regression check for the compiled interval tables (modules/tables.py).
+
+Compares the compiled bisect lookups against the original scan-and-match
+implementations for every table we ship and every integer roll across each
+table's range (with margin on both sides):
+  - every spell `results` table in Spells.json plus every `{die, table}` section
+    (corruption, misfire, disapproval, ...), using the casting/cleric rules
+  - every entries table in data/crit_tables.json and data/fumble_tables.json
+Optionally fuzzes random synthetic tables with overlapping/odd keys.
+
+Run:
+  python scripts/check_tables.py [--margin 25] [--fuzz 2000] [--seed 1]
+
+Exits non-zero on the first mismatch category found (all mismatches are listed).
+"""
+from __future__ import annotations
+import re, sys, random, argparse
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from modules.reference import reference  # type: ignore
+from modules.utils import load_crit_tables, load_fumble_tables  # type: ignore
+from modules.tables import compile_result_table, compile_roll_table  # type: ignore
+
+
+# ---- legacy implementations (verbatim logic prior to compilation) ----
+def legacy_parse_result_key(key: str) -> Tuple[Optional[int], Optional[int], str]:
+    s = str(key).strip()
+    lab = s
+    m = re.match(r"^(-?\d+)\s*or\s*lower$", s, re.I)
+    if m:
+        return None, int(m.group(1)), lab
+    m = re.match(r"^(-?\d+)\+$", s)
+    if m:
+        return int(m.group(1)), None, lab
+    m = re.match(r"^(-?\d+)\s*-\s*(-?\d+)$", s)
+    if m:
+        a, b = int(m.group(1)), int(m.group(2))
+        return (a, b, lab) if a <= b else (b, a, lab)
+    try:
+        n = int(s)
+        return n, n, lab
+    except Exception:
+        return None, None, lab
+
+
+def legacy_result_label(table: dict, total: int) -> Optional[str]:
+    """CastingCog._match_result / _roll_subtable / _roll_corruption / _roll_disapproval."""
+    ranges = [legacy_parse_result_key(k) for k in table.keys()]
+    ranges.sort(key=lambda x: (x[0] if x[0] is not None else -10**9, x[1] if x[1] is not None else 10**9))
+    for lo, hi, lab in ranges:
+        if lo is None and hi is None:
+            continue
+        if lo is None:
+            ok = total <= hi
+        elif hi is None:
+            ok = total >= lo
+        else:
+            ok = lo <= total <= hi
+        if ok:
+            return lab
+    return None
+
+
+def legacy_match_roll_key(key: str, roll: int) -> bool:
+    key = str(key).strip()
+    if key.endswith('+'):
+        try:
+            return roll >= int(key[:-1])
+        except Exception:
+            return False
+    if '-' in key:
+        lo, hi = key.split('-', 1)
+        lo = lo.strip()
+        hi = hi.strip()
+        try:
+            if lo == '0' and hi == '':
+                return roll <= 0
+            lo_v = int(lo) if lo else None
+            hi_v = int(hi) if hi else None
+            if lo_v is None and hi_v is not None:
+                return roll <= hi_v
+            if lo_v is not None and hi_v is None:
+                return roll >= lo_v
+            return lo_v <= roll <= hi_v
+        except Exception:
+            return False
+    try:
+        return int(key) == int(roll)
+    except Exception:
+        return False
+
+
+def legacy_roll_lookup(entries: dict, roll: int) -> Any:
+    """modules.utils.lookup_crit_entry / lookup_fumble_entry."""
+    if str(roll) in entries:
+        return entries.get(str(roll), {})
+    for k, v in entries.items():
+        if k == '0-' and roll <= 0:
+            return v
+        if legacy_match_roll_key(k, roll):
+            return v
+    return {}
+
+
+# ---- table discovery ----
+def _result_tables(spells: dict) -> Iterator[Tuple[str, dict]]:
+    for bucket, levels in (spells.get('spells') or {}).items():
+        if not isinstance(levels, dict):
+            continue
+        for lvl, pool in levels.items():
+            if not isinstance(pool, dict):
+                continue
+            for name, blob in pool.items():
+                if isinstance(blob, dict) and isinstance(blob.get('results'), dict) and blob['results']:
+                    yield f"{bucket}/{lvl}/{name}/results", blob['results']
+
+    def walk(node: Any, path: str) -> Iterator[Tuple[str, dict]]:
+        if isinstance(node, dict):
+            if isinstance(node.get('table'), dict) and node['table']:
+                yield f"{path}/table", node['table']
+            for k, v in node.items():
+                if k != 'spells':
+                    yield from walk(v, f"{path}/{k}")
+
+    for k, v in spells.items():
+        if k != 'spells':
+            yield from walk(v, k)
+
+
+def _roll_tables() -> Iterator[Tuple[str, dict]]:
+    for label, data in (('crit', load_crit_tables()), ('fumble', load_fumble_tables())):
+        for name, t in (data.get('tables') or {}).items():
+            if isinstance(t, dict) and isinstance(t.get('entries'), dict):
+                yield f"{label}/{name}", t['entries']
+
+
+def _bounds(keys: List[str]) -> Tuple[int, int]:
+    nums = [int(n) for k in keys for n in re.findall(r"-?\d+", str(k))]
+    return (min(nums), max(nums)) if nums else (0, 0)
+
+
+# ---- checks ----
+def check_result_table(name: str, table: dict, margin: int) -> List[str]:
+    compiled = compile_result_table(table)
+    lo, hi = _bounds(list(table.keys()))
+    bad = []
+    for x in range(lo - margin, hi + margin + 1):
+        want = legacy_result_label(table, x)
+        got = compiled.lookup(x)
+        got = str(got).strip() if got is not None else None
+        if want != got:
+            bad.append(f"{name}: roll {x}: legacy={want!r} compiled={got!r}")
+    return bad
+
+
+def check_roll_table(name: str, entries: dict, margin: int) -> List[str]:
+    compiled = compile_roll_table(entries)
+    lo, hi = _bounds(list(entries.keys()))
+    bad = []
+    for x in range(lo - margin, hi + margin + 1):
+        want = legacy_roll_lookup(entries, x)
+        got = compiled.get(x, {})
+        if not (want is got or want == got):
+            bad.append(f"{name}: roll {x}: legacy={want!r} compiled={got!r}")
+    return bad
+
+
+def _random_key(rng: random.Random) -> str:
+    a, b = rng.randint(-5, 30), rng.randint(-5, 30)
+    return rng.choice([
+        str(a), f"{a}-{b}", f"{a}+", f"{a} or lower", f"{a} - {b}", f"-{abs(b)}", "0-", f" {a}", f"{a}-", "x", "",
+    ])
+
+
+def fuzz(n: int, seed: int, margin: int) -> List[str]:
+    rng = random.Random(seed)
+    bad: List[str] = []
+    for i in range(n):
+        keys = {_random_key(rng): f"v{j}" for j in range(rng.randint(1, 12))}
+        bad += check_result_table(f"fuzz#{i}/result {list(keys)}", keys, margin)
+        bad += check_roll_table(f"fuzz#{i}/roll {list(keys)}", keys, margin)
+        if bad:
+            break
+    return bad
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Verify compiled tables match the legacy lookups")
+    ap.add_argument('--margin', type=int, default=25, help='Rolls checked beyond each table bound')
+    ap.add_argument('--fuzz', type=int, default=2000, help='Random synthetic tables to check (0 to skip)')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+
+    spells = reference('Spells.json', {})
+    failures: List[str] = []
+    n_result = n_roll = 0
+    for name, table in _result_tables(spells):
+        n_result += 1
+        failures += check_result_table(name, table, args.margin)
+    for name, entries in _roll_tables():
+        n_roll += 1
+        failures += check_roll_table(name, entries, args.margin)
+    if args.fuzz:
+        failures += fuzz(args.fuzz, args.seed, args.margin)
+
+    print(f"Checked {n_result} result table(s), {n_roll} crit/fumble table(s), {args.fuzz} fuzz case(s)")
+    if failures:
+        for line in failures[:50]:
+            print("MISMATCH", line)
+        print(f"{len(failures)} mismatch(es)")
+        return 1
+    print("OK: compiled lookups match legacy lookups for every roll")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,84 +1,38 @@
-import os, json
-from core.config import SAVE_FOLDER  # type: ignore
-from modules.utils import get_modifier  # type: ignore
-
 """
-One-time migration helper:
-- For characters with birth augur effect "Attack and damage rolls for 0-level starting weapon"
-  created when Pack hunter was mistakenly applied as a global attack bonus at creation time,
-  subtract max Luck mod from the stored 'attack' field if numeric.
-- Skip records that use 'attack_bonus' (string like '+3' or int), as those are class-based.
-- Idempotent: will not reduce below the ability+class baseline; only touches a plain numeric 'attack'.
+Pack hunter fix (now schema migration v2 -> v3 in storage/migrations.py).
+
+Characters with the birth augur "Attack and damage rolls for 0-level starting weapon"
+created when Pack hunter was mistakenly applied as a global attack bonus carry the
+Luck mod in their stored 'attack'. The bot now corrects such records when it reads
+them; this runs the whole migration chain over the save folder, which is the
+version-gated (idempotent) replacement for the old one-off rewrite.
 
 Run:
-  python scripts/fix_pack_hunter.py
+  python scripts/fix_pack_hunter.py [--dry-run]
+(equivalent to: python scripts/migrate.py)
 """
+from __future__ import annotations
+import sys, argparse
+from pathlib import Path
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-def _parse_int(val, default=0):
-    try:
-        if isinstance(val, (int, float)):
-            return int(val)
-        s = str(val).strip()
-        return int(s)
-    except Exception:
-        return int(default)
+from storage.migrations import migrate_folder  # type: ignore
+from storage import files  # type: ignore
 
 
-def main():
-    changed = 0
-    for fn in os.listdir(SAVE_FOLDER):
-        if not fn.lower().endswith('.json'):
-            continue
-        path = os.path.join(SAVE_FOLDER, fn)
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception:
-            continue
-        aug_eff = str((data.get('birth_augur') or {}).get('effect') or '').strip()
-        if aug_eff != 'Attack and damage rolls for 0-level starting weapon':
-            continue
-        # If character uses attack_bonus (leveled class), don't touch it
-        if 'attack_bonus' in data:
-            continue
-        atk = data.get('attack', None)
-        if atk is None:
-            continue
-        try:
-            max_luck_mod = int(data.get('max_luck_mod', 0) or 0)
-        except Exception:
-            max_luck_mod = 0
-        if not max_luck_mod:
-            # Fallback best-effort: compute from LCK max/current
-            try:
-                abil = (data.get('abilities') or {}).get('LCK') or {}
-                lck_max = _parse_int(abil.get('max', abil.get('current', abil.get('score', 0))), 0)
-                from modules.utils import get_modifier  # late import to avoid cycles
-                max_luck_mod = int(get_modifier(lck_max))
-            except Exception:
-                max_luck_mod = 0
-        if max_luck_mod == 0:
-            continue
-        try:
-            atk_val = _parse_int(atk, None)
-        except Exception:
-            atk_val = None
-        if atk_val is None:
-            continue
-        # Subtract once
-        new_val = atk_val - max_luck_mod
-        if new_val == atk_val:
-            continue
-        data['attack'] = int(new_val)
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            changed += 1
-        except Exception:
-            continue
-    print(f"Pack hunter migration complete. Updated {changed} character(s).")
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Apply the Pack hunter fix (runs every pending migration)")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Folder containing character JSON files')
+    ap.add_argument('--dry-run', action='store_true', help='Report without writing files')
+    args = ap.parse_args()
+    r = migrate_folder(args.folder, dry_run=args.dry_run)
+    verb = 'Would update' if args.dry_run else 'Updated'
+    print(f"Pack hunter migration complete. {verb} {r['migrated']}/{r['scanned']} character(s).")
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    raise SystemExit(main())
@@ -13,7 +13,7 @@ Outputs a summary; with --json emits machine-readable JSON.
 Exit code: 0 unless --strict given and any failures occur.
 """
 from __future__ import annotations
-import os, json, sys, argparse, importlib, traceback
+import os, gzip, json, sys, argparse, importlib, traceback
 from pathlib import Path
 from typing import Any, Dict
 
@@ -34,8 +34,10 @@ def _load_json(path: Path) -> tuple[bool, Any, str]:
     if not path.exists():
         return False, None, 'missing'
     try:
-        with path.open('r', encoding='utf-8') as f:
-            return True, json.load(f), 'ok'
+        raw = path.read_bytes()
+        if raw[:2] == b'\x1f\x8b':  # gzipped record (STORAGE_GZIP_MIN_BYTES)
+            raw = gzip.decompress(raw)
+        return True, json.loads(raw), 'ok'
     except Exception as e:
         return False, None, f'parse error: {e}'
 
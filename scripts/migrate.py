@@ -0,0 +1,98 @@
+"""
+Bulk schema migration: stream every character record through the migration chain in parallel.
+
+Run:
+  python scripts/migrate.py [--folder characters] [--dry-run] [--diff] [--max-diffs 20] [--workers N] [--window 256]
+                            [--reencode]
+
+Records are read, upgraded to the latest schema_version (storage/migrations.py)
+and rewritten atomically by a pool of worker processes; at most --window files
+are in flight, so memory stays flat on large folders. --dry-run writes nothing;
+--diff (implies --dry-run) also prints a unified diff of each change. The report
+gives counts per source version, bytes before/after and records/s and MB/s.
+--reencode also rewrites current records into the configured storage encoding
+(STORAGE_JSON_STYLE / STORAGE_GZIP_MIN_BYTES), e.g. after switching to compact.
+
+The bot upgrades records lazily on read, so this is optional. Stop the bot first
+(or disable write-behind) so it does not overwrite the files with cached copies.
+"""
+from __future__ import annotations
+import os, sys, time, argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage.migrations import LATEST_SCHEMA_VERSION, migrate_file, record_paths  # type: ignore
+from storage import files  # type: ignore
+
+
+def _run(folder: str, workers: int, window: int, dry_run: bool, diff: bool, reencode: bool):
+    """Yield migrate_file results as workers finish, keeping at most ``window`` submitted."""
+    paths = record_paths(folder)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for path in paths:
+            pending.add(pool.submit(migrate_file, path, dry_run, diff, reencode))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        for fut in pending:
+            yield fut.result()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Migrate character records to the latest schema")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Folder containing character JSON files')
+    ap.add_argument('--dry-run', action='store_true', help='Report changes without writing files')
+    ap.add_argument('--diff', action='store_true', help='Print a unified diff per changed record (implies --dry-run)')
+    ap.add_argument('--max-diffs', type=int, default=20, help='Diffs to print with --diff (default 20, 0 = all)')
+    ap.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='Worker processes')
+    ap.add_argument('--window', type=int, default=256, help='Files in flight at once (default 256)')
+    ap.add_argument('--reencode', action='store_true', help='Also rewrite current records in the configured storage encoding')
+    args = ap.parse_args()
+    dry_run = args.dry_run or args.diff
+
+    status: Counter = Counter()
+    versions: Counter = Counter()
+    read = before = after = shown = 0
+    t0 = time.perf_counter()
+    for r in _run(args.folder, max(1, args.workers), max(1, args.window), dry_run, args.diff, args.reencode):
+        status[r['status']] += 1
+        read += r['bytes_before']
+        if r['status'] in ('migrated', 'reencoded'):
+            if r['status'] == 'migrated':
+                versions[r['from_version']] += 1
+            before += r['bytes_before']
+            after += r['bytes_after']
+            if r['diff'] and (args.max_diffs <= 0 or shown < args.max_diffs):
+                sys.stdout.write(r['diff'] if r['diff'].endswith('\n') else r['diff'] + '\n')
+                shown += 1
+        elif r['status'] == 'skipped':
+            print(f"skipped (unreadable or not a record): {r['path']}")
+    elapsed = time.perf_counter() - t0
+
+    total = sum(status.values())
+    verb = 'Would migrate' if dry_run else 'Migrated'
+    print(f"{verb} {status['migrated']}/{total} record(s) to schema v{LATEST_SCHEMA_VERSION}; "
+          f"{status['current']} already current, {status['skipped']} skipped")
+    if args.reencode:
+        print(f"  re-encoded {status['reencoded']} current record(s)")
+    for v, n in sorted(versions.items()):
+        print(f"  from v{v}: {n}")
+    if status['migrated'] or status['reencoded']:
+        print(f"  bytes {before:,} -> {after:,} ({before - after:,} saved)")
+    if args.diff and status['migrated'] > shown:
+        print(f"  ({status['migrated'] - shown} more diff(s) not shown; raise --max-diffs)")
+    rate = total / elapsed if elapsed else 0.0
+    print(f"{elapsed:.2f}s with {args.workers} worker(s): {rate:,.0f} records/s, "
+          f"{read / 1e6 / elapsed if elapsed else 0.0:.1f} MB/s read")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
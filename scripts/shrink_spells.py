@@ -0,0 +1,44 @@
+"""
+One-shot migration: replace embedded spell payloads in character records with references.
+
+Older records carry full Spells.json entries (description, manifestation, corruption,
+misfire, results) for every known spell. This rewrites each record to schema v2,
+keeping only {name, level, lost, mercurial} (+ source/patron for patron spells);
+the payload is hydrated from the catalog at runtime. Unresolvable spells are left as-is.
+
+Run:
+  python scripts/shrink_spells.py [--folder characters] [--dry-run]
+
+Idempotent: already-migrated records are skipped. Stop the bot first (or run with
+write-behind disabled) so it does not overwrite the files with cached copies.
+"""
+from __future__ import annotations
+import sys, time, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage.migrations import migrate_folder  # type: ignore
+from storage import files  # type: ignore
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Shrink embedded spell payloads to references")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Folder containing character JSON files')
+    ap.add_argument('--dry-run', action='store_true', help='Report savings without writing files')
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    r = migrate_folder(args.folder, dry_run=args.dry_run)
+    elapsed = time.perf_counter() - t0
+    saved = r['bytes_before'] - r['bytes_after']
+    verb = 'Would migrate' if args.dry_run else 'Migrated'
+    print(f"{verb} {r['migrated']}/{r['scanned']} record(s), skipped {r['skipped']}: "
+          f"{r['bytes_before']:,} -> {r['bytes_after']:,} bytes ({saved:,} saved) in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+"""
+Copy the JSON character folder into an offline SQLite snapshot (storage.sqlite_snapshot).
+
+Run:
+  python scripts/sqlite_import.py [--folder characters] [--db characters.db]
+
+The bot stores characters only as JSON files and never touches the database;
+it is a queryable copy for scripts and ad-hoc SQL. Re-run this to refresh it:
+rows are upserted by character key (the record's file name) and rows whose
+file is gone are removed.
+"""
+from __future__ import annotations
+import sys, time, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from storage.sqlite_snapshot import SqliteSnapshot  # type: ignore
+from storage import files  # type: ignore
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Import JSON characters into SQLite")
+    ap.add_argument('--folder', default=files.BASE_DIR, help='Folder containing character JSON files')
+    ap.add_argument('--db', default=None, help='SQLite database path (default: SQLITE_PATH or characters.db)')
+    args = ap.parse_args()
+
+    snap = SqliteSnapshot(args.db)
+    t0 = time.perf_counter()
+    result = snap.import_json_folder(args.folder)
+    elapsed = time.perf_counter() - t0
+    snap.close()
+    print(f"Imported {result['imported']} record(s), skipped {result['skipped']}, removed {result['removed']} "
+          f"in {snap.path} in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,2 +1,4 @@
 from .files import async_load_character, async_save_character, async_list_characters
-__all__ = ["async_load_character","async_save_character","async_list_characters"]
+from .repository import get_repository, record_key
+from .index import get_index
+__all__ = ["async_load_character","async_save_character","async_list_characters","get_repository","record_key","get_index"]
@@ -1,46 +1,433 @@
 from __future__ import annotations
 import os
-import zipfile
-from datetime import datetime, timezone
-from typing import Tuple
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.metrics import note_storage
+from . import files
 
 try:
     from core.config import SAVE_FOLDER  # typically 'characters'
 except Exception:
     SAVE_FOLDER = 'characters'
 
+# Incremental, content-addressed backups of the save folder.
+#
+# Every JSON file is stored once per distinct content as a gzipped blob under
+# backups/objects/<sha256[:2]>/<sha256>. A snapshot is a small manifest in
+# backups/snapshots/<id>.json mapping each file (relative to the save folder)
+# to its hash, size and mtime. A new snapshot only reads files whose size or
+# mtime changed since the previous manifest and only writes blobs that are not
+# stored yet, so a nightly run over an unchanged table costs one folder scan.
+#
+# Pruning keeps the newest snapshot of each of the last BACKUP_KEEP_DAILY days,
+# BACKUP_KEEP_WEEKLY ISO weeks and BACKUP_KEEP_MONTHLY months, then deletes the
+# blobs no remaining manifest references. Restores pick the newest snapshot
+# taken at or before a point in time. Everything here is blocking; the bot runs
+# it on the storage pool (``run_io``) and reports progress through a callback.
+
 BACKUPS_DIR = os.path.join(SAVE_FOLDER, 'backups')
+OBJECTS_DIR = os.path.join(BACKUPS_DIR, 'objects')
+SNAPSHOTS_DIR = os.path.join(BACKUPS_DIR, 'snapshots')
+_ID_FORMAT = '%Y%m%dT%H%M%SZ'
+
+# create/prune/restore never overlap (nightly task vs /backup vs /restore)
+_lock = threading.Lock()
+
+Progress = Callable[[int, int], None]  # (files done, files total), called from the worker thread
+
 
 def _timestamp() -> str:
     # Use UTC to avoid TZ ambiguity
-    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return datetime.now(timezone.utc).strftime(_ID_FORMAT)
 
 def _should_include(file_path: str) -> bool:
     # Only include JSON files by default
     return file_path.lower().endswith('.json')
 
-def create_backup() -> Tuple[str, int]:
-    """Create a zip backup of the SAVE_FOLDER into SAVE_FOLDER/backups.
 
-    Returns (zip_path, file_count).
+def _keep_setting(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+@dataclass
+class SnapshotInfo:
+    id: str
+    path: str
+    files: int
+    new_blobs: int
+    bytes_total: int     # size of every file in the snapshot
+    bytes_stored: int    # compressed bytes written for new blobs
+    hashed: int          # files read and hashed (the rest were unchanged)
+    elapsed_ms: float
+
+
+@dataclass
+class PruneResult:
+    kept: List[str]
+    removed: List[str]
+    blobs_removed: int
+    bytes_freed: int
+
+
+@dataclass
+class RestoreResult:
+    snapshot: str
+    restored: List[str]   # relative paths
+    missing: List[str]    # requested names absent from the snapshot
+
+
+# ---- blobs ----
+def _blob_path(digest: str) -> str:
+    return os.path.join(OBJECTS_DIR, digest[:2], digest)
+
+
+def _put_blob(digest: str, raw: bytes) -> int:
+    """Store ``raw`` under its hash unless already present; returns compressed bytes written."""
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return 0
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    packed = gzip.compress(raw, compresslevel=6, mtime=0)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(packed)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    note_storage(written=len(packed))
+    return len(packed)
+
+
+def read_blob(digest: str) -> bytes:
+    """Original bytes for a content hash. Raises OSError when missing or corrupt."""
+    with open(_blob_path(digest), 'rb') as f:
+        packed = f.read()
+    note_storage(read=len(packed))
+    raw = gzip.decompress(packed)
+    if hashlib.sha256(raw).hexdigest() != digest:
+        raise OSError(f'backup blob {digest} is corrupt')
+    return raw
+
+
+# ---- manifests ----
+def _scan(folder: str) -> List[Tuple[str, str, os.stat_result]]:
+    """(relative path, absolute path, stat) for every JSON file outside backups/."""
+    out: List[Tuple[str, str, os.stat_result]] = []
+    skip = os.path.normpath(BACKUPS_DIR)
+    for root, dirs, names in os.walk(folder):
+        if os.path.normpath(root).startswith(skip):
+            dirs[:] = []
+            continue
+        for fname in names:
+            fpath = os.path.join(root, fname)
+            if fname.startswith('.') or not _should_include(fpath):
+                continue
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                continue
+            out.append((os.path.relpath(fpath, folder).replace(os.sep, '/'), fpath, st))
+    out.sort()
+    return out
+
+
+def _read_manifest(snapshot_id: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(SNAPSHOTS_DIR, f'{snapshot_id}.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('v') != 1 or not isinstance(data.get('records'), dict):
+        return None
+    return data
+
+
+def snapshot_time(snapshot_id: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(snapshot_id[:16], _ID_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _sort_key(snapshot_id: str) -> Tuple[str, int]:
+    base, _, n = snapshot_id.partition('-')
+    return base, int(n) if n.isdigit() else 0
+
+
+def list_snapshots() -> List[str]:
+    """Snapshot ids, oldest first."""
+    try:
+        names = os.listdir(SNAPSHOTS_DIR)
+    except OSError:
+        return []
+    ids = [n[:-5] for n in names if n.endswith('.json') and not n.startswith('.')]
+    return sorted((i for i in ids if snapshot_time(i) is not None), key=_sort_key)
+
+
+def create_snapshot(progress: Optional[Progress] = None) -> SnapshotInfo:
+    """Take an incremental snapshot of the save folder. Blocking."""
+    with _lock:
+        t0 = time.perf_counter()
+        ids = list_snapshots()
+        prev = _read_manifest(ids[-1]) if ids else None
+        known: Dict[str, list] = prev['records'] if prev else {}
+        entries = _scan(SAVE_FOLDER)
+        total = len(entries)
+        if progress:
+            progress(0, total)
+        records: Dict[str, list] = {}
+        new_blobs = hashed = bytes_total = bytes_stored = 0
+        seen: Set[str] = set()
+        for i, (rel, path, st) in enumerate(entries, 1):
+            old = known.get(rel)
+            if (old and len(old) == 3 and old[1] == st.st_size and old[2] == st.st_mtime_ns
+                    and os.path.exists(_blob_path(old[0]))):
+                records[rel] = old
+            else:
+                try:
+                    with open(path, 'rb') as f:
+                        raw = f.read()
+                except OSError:
+                    continue  # deleted while scanning
+                note_storage(read=len(raw))
+                hashed += 1
+                digest = hashlib.sha256(raw).hexdigest()
+                if digest not in seen:
+                    written = _put_blob(digest, raw)
+                    if written:
+                        new_blobs += 1
+                        bytes_stored += written
+                seen.add(digest)
+                records[rel] = [digest, len(raw), st.st_mtime_ns]
+            bytes_total += records[rel][1]
+            if progress and (i % 50 == 0 or i == total):
+                progress(i, total)
+        snapshot_id = _timestamp()
+        if ids and snapshot_id <= ids[-1][:16]:
+            # Same second (or the clock went back): suffix so ids stay ordered
+            last = _sort_key(ids[-1])
+            snapshot_id = f'{last[0]}-{last[1] + 1}'
+        path = os.path.join(SNAPSHOTS_DIR, f'{snapshot_id}.json')
+        # Manifest last: a crash before this leaves only unreferenced blobs for the next prune
+        files._write_json(path, {
+            'v': 1,
+            'id': snapshot_id,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'parent': prev.get('id') if prev else None,
+            'records': records,
+        }, indent=None)
+        return SnapshotInfo(
+            id=snapshot_id, path=path, files=len(records), new_blobs=new_blobs,
+            bytes_total=bytes_total, bytes_stored=bytes_stored, hashed=hashed,
+            elapsed_ms=(time.perf_counter() - t0) * 1000.0,
+        )
+
+
+def create_backup(progress: Optional[Progress] = None) -> Tuple[str, int]:
+    """Take an incremental snapshot of the SAVE_FOLDER into SAVE_FOLDER/backups.
+
+    Returns (manifest_path, file_count).
+    """
+    info = create_snapshot(progress)
+    return info.path, info.files
+
+
+# ---- retention ----
+def select_retained(ids: Iterable[str], daily: int, weekly: int, monthly: int) -> Set[str]:
+    """Snapshot ids kept by a daily/weekly/monthly policy (newest per period; the newest overall always)."""
+    dated = sorted(((snapshot_time(i), i) for i in ids if snapshot_time(i) is not None), reverse=True)
+    keep: Set[str] = {dated[0][1]} if dated else set()
+    for count, period in (
+        (daily, lambda t: t.date()),
+        (weekly, lambda t: t.isocalendar()[:2]),
+        (monthly, lambda t: (t.year, t.month)),
+    ):
+        periods: Set[object] = set()
+        for ts, sid in dated:
+            if len(periods) >= count:
+                break
+            p = period(ts)
+            if p not in periods:
+                periods.add(p)
+                keep.add(sid)
+    return keep
+
+
+def prune_snapshots(daily: Optional[int] = None, weekly: Optional[int] = None, monthly: Optional[int] = None,
+                    dry_run: bool = False) -> PruneResult:
+    """Drop snapshots outside the retention policy and the blobs only they referenced. Blocking.
+
+    Counts default to BACKUP_KEEP_DAILY (7), BACKUP_KEEP_WEEKLY (4) and
+    BACKUP_KEEP_MONTHLY (12).
     """
-    os.makedirs(BACKUPS_DIR, exist_ok=True)
-    ts = _timestamp()
-    zip_name = f"characters_backup_{ts}.zip"
-    zip_path = os.path.join(BACKUPS_DIR, zip_name)
-
-    count = 0
-    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(SAVE_FOLDER):
-            # Skip the backups directory itself
-            if os.path.normpath(root).startswith(os.path.normpath(BACKUPS_DIR)):
+    daily = _keep_setting('BACKUP_KEEP_DAILY', 7) if daily is None else daily
+    weekly = _keep_setting('BACKUP_KEEP_WEEKLY', 4) if weekly is None else weekly
+    monthly = _keep_setting('BACKUP_KEEP_MONTHLY', 12) if monthly is None else monthly
+    with _lock:
+        ids = list_snapshots()
+        keep = select_retained(ids, daily, weekly, monthly)
+        removed = [i for i in ids if i not in keep]
+        live: Set[str] = set()
+        for sid in keep:
+            manifest = _read_manifest(sid)
+            if manifest is None:
+                return PruneResult(sorted(keep), [], 0, 0)  # never collect blobs on a partial view
+            live.update(row[0] for row in manifest['records'].values())
+        blobs = freed = 0
+        if not dry_run:
+            for sid in removed:
+                try:
+                    os.remove(os.path.join(SNAPSHOTS_DIR, f'{sid}.json'))
+                except OSError:
+                    pass
+        try:
+            buckets = os.listdir(OBJECTS_DIR)
+        except OSError:
+            buckets = []
+        for bucket in buckets:
+            bdir = os.path.join(OBJECTS_DIR, bucket)
+            try:
+                names = os.listdir(bdir)
+            except OSError:
                 continue
-            for fname in files:
-                fpath = os.path.join(root, fname)
-                if not _should_include(fpath):
+            for name in names:
+                if name in live:
                     continue
-                # Store paths relative to SAVE_FOLDER in the zip
-                rel = os.path.relpath(fpath, SAVE_FOLDER)
-                zf.write(fpath, arcname=rel)
-                count += 1
-    return zip_path, count
+                path = os.path.join(bdir, name)
+                try:
+                    size = os.path.getsize(path)
+                    if not dry_run:
+                        os.remove(path)
+                except OSError:
+                    continue
+                blobs += 1
+                freed += size
+        return PruneResult(sorted(keep), removed, blobs, freed)
+
+
+# ---- restore ----
+def parse_point(text: str) -> Optional[datetime]:
+    """A point in time: a snapshot id, 'YYYY-MM-DD' (end of that day) or 'YYYY-MM-DD HH:MM[:SS]', in UTC."""
+    text = (text or '').strip()
+    ts = snapshot_time(text)
+    if ts is not None:
+        return ts
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M'):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    try:
+        day = datetime.strptime(text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return day + timedelta(days=1) - timedelta(seconds=1)
+
+
+def find_snapshot(at: Optional[str] = None) -> Optional[str]:
+    """The snapshot id named by ``at``, else the newest one taken at or before it (latest when None)."""
+    ids = list_snapshots()
+    if not at:
+        return ids[-1] if ids else None
+    if at in ids:
+        return at
+    point = parse_point(at)
+    if point is None:
+        return None
+    found = None
+    for sid in ids:
+        ts = snapshot_time(sid)
+        if ts is not None and ts <= point:
+            found = sid
+    return found
+
+
+def read_snapshot(snapshot_id: str, paths: Optional[Iterable[str]] = None) -> Tuple[Dict[str, bytes], List[str]]:
+    """File contents of a snapshot: ({relative path: bytes}, requested paths it does not contain). Blocking."""
+    manifest = _read_manifest(snapshot_id)
+    if manifest is None:
+        raise OSError(f'snapshot {snapshot_id} not found')
+    records = manifest['records']
+    wanted = list(records) if paths is None else list(paths)
+    out: Dict[str, bytes] = {}
+    missing: List[str] = []
+    for rel in wanted:
+        row = records.get(rel)
+        if row is None:
+            missing.append(rel)
+            continue
+        out[rel] = read_blob(row[0])
+    return out, missing
+
+
+def restore_snapshot(at: Optional[str] = None, paths: Optional[Iterable[str]] = None,
+                     dest: Optional[str] = None, progress: Optional[Progress] = None) -> RestoreResult:
+    """Write a snapshot's files back byte-for-byte into ``dest`` (default: the save folder). Blocking.
+
+    Files created after the snapshot are left alone. Use this with the bot
+    stopped (or into another folder); the running bot restores through the
+    repository instead so its caches and indexes stay current.
+    """
+    with _lock:
+        snapshot_id = find_snapshot(at)
+        if snapshot_id is None:
+            raise OSError(f'no snapshot at or before {at!r}')
+        blobs, missing = read_snapshot(snapshot_id, paths)
+        dest = dest or SAVE_FOLDER
+        restored: List[str] = []
+        for i, (rel, raw) in enumerate(sorted(blobs.items()), 1):
+            target = os.path.join(dest, *rel.split('/'))
+            folder = os.path.dirname(target)
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix='.json')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(raw)
+                os.replace(tmp_path, target)
+            finally:
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+            note_storage(written=len(raw))
+            restored.append(rel)
+            if progress:
+                progress(i, len(blobs))
+        return RestoreResult(snapshot_id, restored, missing)
+
+
+__all__ = [
+    "BACKUPS_DIR",
+    "PruneResult",
+    "RestoreResult",
+    "SnapshotInfo",
+    "create_backup",
+    "create_snapshot",
+    "find_snapshot",
+    "list_snapshots",
+    "parse_point",
+    "prune_snapshots",
+    "read_blob",
+    "read_snapshot",
+    "restore_snapshot",
+    "select_retained",
+    "snapshot_time",
+]
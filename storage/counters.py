@@ -0,0 +1,110 @@
+from __future__ import annotations
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .files import BASE_DIR, run_io, _read_json, _write_json
+
+# Persistent monotonic counters (character name allocation).
+#
+# /create used to pick the next CharN by listing the whole save folder, so two
+# concurrent /create calls could choose the same name and one sheet would
+# overwrite the other. Names are now reserved from a counter kept in
+# COUNTER_FILE (default 'counters.json'): a reservation takes a thread lock,
+# bumps the counter by the batch size and rewrites the file atomically before
+# returning, so every caller in the process gets a disjoint range and numbers
+# are never reused after a restart. The first reservation of a counter seeds it
+# from what is already on disk.
+
+_CHAR_FILE = re.compile(r"^char(\d+)\.json$", re.IGNORECASE)
+
+
+class CounterStore:
+    def __init__(self, path: str = 'counters.json'):
+        self.path = path
+        self._values: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, int]:
+        if self._values is None:
+            data = _read_json(self.path, {})
+            self._values = {str(k): int(v) for k, v in (data or {}).items() if isinstance(v, int)} if isinstance(data, dict) else {}
+        return self._values
+
+    def peek(self, name: str) -> int:
+        with self._lock:
+            return int(self._load().get(name, 0))
+
+    def reserve_sync(self, name: str, n: int = 1, seed: Optional[Callable[[], int]] = None) -> int:
+        """Reserve ``n`` consecutive values of counter ``name``; returns the first one.
+
+        ``seed()`` supplies the last used value when the counter does not exist yet.
+        Blocking (writes the counter file); async callers use ``reserve``.
+        """
+        n = max(1, int(n))
+        with self._lock:
+            values = self._load()
+            last = values.get(name)
+            if last is None:
+                last = int(seed()) if seed is not None else 0
+            start = int(last) + 1
+            values[name] = start + n - 1
+            _write_json(self.path, values, indent=None)
+            return start
+
+    async def reserve(self, name: str, n: int = 1, seed: Optional[Callable[[], int]] = None) -> int:
+        return await run_io(self.reserve_sync, name, n, seed)
+
+
+def _highest_char_number(folder: str) -> int:
+    """Largest N among existing CharN.json files (blocking; only used to seed the counter)."""
+    best = 0
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return 0
+    for f in names:
+        m = _CHAR_FILE.match(f)
+        if m:
+            best = max(best, int(m.group(1)))
+    return best
+
+
+def reserve_char_names_sync(n: int, folder: Optional[str] = None, counters: Optional[CounterStore] = None) -> List[str]:
+    """Reserve ``n`` unused CharN names. Blocking."""
+    folder = folder or BASE_DIR
+    counters = counters or get_counters()
+    out: List[str] = []
+    while len(out) < n:
+        need = n - len(out)
+        start = counters.reserve_sync('char', need, seed=lambda: _highest_char_number(folder))
+        for i in range(start, start + need):
+            # Never hand out a name whose file appeared outside the counter (restores, manual copies)
+            if not os.path.exists(os.path.join(folder, f"char{i}.json")):
+                out.append(f"Char{i}")
+    return out
+
+
+async def reserve_char_names(n: int = 1) -> List[str]:
+    """Reserve ``n`` new CharN names atomically (safe against concurrent /create calls)."""
+    return await run_io(reserve_char_names_sync, int(n))
+
+
+_counters: Optional[CounterStore] = None
+
+
+def get_counters() -> CounterStore:
+    """Process-wide counter store (COUNTER_FILE, default 'counters.json')."""
+    global _counters
+    if _counters is None:
+        _counters = CounterStore(os.getenv('COUNTER_FILE', 'counters.json'))
+    return _counters
+
+
+__all__ = [
+    "CounterStore",
+    "get_counters",
+    "reserve_char_names",
+    "reserve_char_names_sync",
+]
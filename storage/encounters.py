@@ -0,0 +1,174 @@
+from __future__ import annotations
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .files import run_io, async_listdir, _read_json
+from core.metrics import note_storage
+
+# Initiative encounter snapshots.
+#
+# One small file per (guild, channel) under ENCOUNTER_FOLDER (default
+# 'encounters'), written as compact single-line JSON. Mutations only mark an
+# encounter dirty; a background task group-commits every dirty encounter in
+# one pool job, at most once per ENCOUNTER_SNAPSHOT_INTERVAL_S (default 1s),
+# so a burst of /init add or /init hp calls costs a single write per file.
+# Encounters that are closed and empty have their snapshot removed.
+#
+# restore() only lists the folder, so startup cost does not grow with the
+# number of idle encounters; each snapshot is parsed on first access to its
+# channel (load()).
+
+logger = logging.getLogger('dccbot.encounters')
+
+Key = Tuple[int, int]
+Snapshot = Callable[[], Optional[dict]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _file_name(key: Key) -> str:
+    return f"{int(key[0])}_{int(key[1])}.json"
+
+
+def _parse_name(name: str) -> Optional[Key]:
+    stem = name[:-5] if name.lower().endswith('.json') else name
+    try:
+        g, c = stem.split('_', 1)
+        return int(g), int(c)
+    except ValueError:
+        return None
+
+
+def _write_batch(items: List[Tuple[str, Optional[bytes]]]) -> int:
+    """Write (path, payload) pairs atomically; a None payload removes the file."""
+    written = 0
+    for path, payload in items:
+        try:
+            if payload is None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            folder = os.path.dirname(path) or '.'
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix='.json')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+            written += 1
+            note_storage(written=len(payload))
+        except OSError as e:
+            logger.warning('Encounter snapshot %s failed: %s', path, e)
+    return written
+
+
+class EncounterStore:
+    def __init__(self, folder: str = 'encounters', interval: float = 1.0):
+        self.folder = folder
+        self.interval = max(0.0, float(interval))
+        self._known: Optional[Set[Key]] = None  # keys with a snapshot on disk (None until restore())
+        self._dirty: Dict[Key, Snapshot] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._last = 0.0
+        self.commits = 0
+        self.files_written = 0
+
+    def path(self, key: Key) -> str:
+        return os.path.join(self.folder, _file_name(key))
+
+    async def restore(self) -> int:
+        """Record which encounters have snapshots without parsing them."""
+        names = await async_listdir(self.folder, '.json')
+        self._known = {k for k in map(_parse_name, names) if k is not None}
+        return len(self._known)
+
+    def known(self) -> List[Key]:
+        return sorted(self._known or ())
+
+    async def load(self, key: Key) -> Optional[dict]:
+        if self._known is not None and key not in self._known:
+            return None
+        data = await run_io(_read_json, self.path(key))
+        if not isinstance(data, dict):
+            return None
+        return data
+
+    def mark_dirty(self, key: Key, snapshot: Snapshot) -> None:
+        """Queue ``snapshot()`` to be written with the next group commit."""
+        self._dirty[key] = snapshot
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop: picked up by the next flush()
+        self._task = loop.create_task(self._commit_loop(), name='encounter-snapshots')
+
+    async def _commit_loop(self) -> None:
+        while self._dirty:
+            delay = self._last + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Encounter snapshot commit failed')
+
+    async def flush(self) -> int:
+        """Write every dirty encounter now in one pool job; returns files written."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            batch, self._dirty = self._dirty, {}
+            if not batch:
+                return 0
+            items: List[Tuple[str, Optional[bytes]]] = []
+            for key, snapshot in batch.items():
+                try:
+                    data: Any = snapshot()
+                except Exception:
+                    logger.exception('Encounter snapshot for %s failed', key)
+                    continue
+                payload = None if data is None else json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+                items.append((self.path(key), payload))
+                if self._known is not None:
+                    if payload is None:
+                        self._known.discard(key)
+                    else:
+                        self._known.add(key)
+            written = await run_io(_write_batch, items)
+            self._last = time.monotonic()
+            self.commits += 1
+            self.files_written += written
+            return written
+
+
+ENCOUNTER_STORE = EncounterStore(
+    folder=os.getenv('ENCOUNTER_FOLDER', 'encounters'),
+    interval=_env_float('ENCOUNTER_SNAPSHOT_INTERVAL_S', 1.0),
+)
+
+
+__all__ = [
+    "EncounterStore",
+    "ENCOUNTER_STORE",
+]
@@ -0,0 +1,219 @@
+from __future__ import annotations
+import os
+import bisect
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from . import files
+
+# In-memory character index.
+#
+# Autocompletes used to listdir the save folder and json.load every file on
+# every keystroke. The index is built once at startup (one pass over the
+# folder) and then kept current by the repository on save/delete, so lookups
+# by name prefix/substring, owner or class never touch disk.
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, trim and treat '_' like a space so 'char_1' and 'Char 1' match."""
+    return " ".join(str(name or '').replace('_', ' ').lower().split())
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    key: str
+    display: str
+    owner: Optional[str]
+    char_class: str
+    level: int
+    dead: bool
+
+    @property
+    def label(self) -> str:
+        """File key rendered with spaces (what several autocompletes historically showed)."""
+        return self.key.replace('_', ' ')
+
+
+def _entry_from_record(key: str, data: Dict[str, Any]) -> IndexEntry:
+    owner = data.get('owner')
+    try:
+        level = int(data.get('level', 0) or 0)
+    except Exception:
+        level = 0
+    return IndexEntry(
+        key=key,
+        display=str(data.get('name') or key.replace('_', ' ')),
+        owner=str(owner) if owner is not None else None,
+        char_class=str(data.get('class') or '').strip(),
+        level=level,
+        dead=bool(data.get('dead')),
+    )
+
+
+class CharacterIndex:
+    """Maps normalized names, display names and owners to record keys."""
+
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = folder or files.BASE_DIR
+        self._entries: Dict[str, IndexEntry] = {}
+        self._tokens: List[tuple[str, str]] = []  # sorted (normalized token, key)
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self.built = False
+
+    # ---- maintenance ----
+    @staticmethod
+    def _tokens_for(entry: IndexEntry) -> Set[str]:
+        return {t for t in (normalize_name(entry.display), normalize_name(entry.key)) if t}
+
+    def _insert(self, entry: IndexEntry) -> None:
+        self._entries[entry.key] = entry
+        for tok in self._tokens_for(entry):
+            bisect.insort(self._tokens, (tok, entry.key))
+        if entry.owner is not None:
+            self._by_owner.setdefault(entry.owner, set()).add(entry.key)
+
+    def _discard(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is None:
+            return
+        for tok in self._tokens_for(old):
+            i = bisect.bisect_left(self._tokens, (tok, key))
+            if i < len(self._tokens) and self._tokens[i] == (tok, key):
+                del self._tokens[i]
+        if old.owner is not None:
+            keys = self._by_owner.get(old.owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    self._by_owner.pop(old.owner, None)
+
+    def build(self) -> int:
+        """(Re)build from the save folder. Blocking; returns the number of records indexed."""
+        entries: List[IndexEntry] = []
+        try:
+            it = os.scandir(self.folder)
+        except OSError:
+            it = iter(())
+        for de in it:
+            # Dot-files are .tmp_ leftovers from interrupted saves, not records
+            if not de.is_file() or not de.name.lower().endswith('.json') or de.name.startswith('.'):
+                continue
+            key = de.name[:-5]
+            data = files._read_json(de.path, {})
+            if not isinstance(data, dict):
+                data = {}
+            entries.append(_entry_from_record(key, data))
+        with self._lock:
+            self._entries = {}
+            self._tokens = []
+            self._by_owner = {}
+            for e in entries:
+                self._entries[e.key] = e
+                if e.owner is not None:
+                    self._by_owner.setdefault(e.owner, set()).add(e.key)
+            self._tokens = sorted((tok, e.key) for e in entries for tok in self._tokens_for(e))
+            self.built = True
+        return len(entries)
+
+    def ensure_built(self) -> None:
+        if not self.built:
+            self.build()
+
+    def update(self, key: str, data: Dict[str, Any]) -> None:
+        entry = _entry_from_record(key, data)
+        with self._lock:
+            if self._entries.get(key) == entry:
+                return
+            self._discard(key)
+            self._insert(entry)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+
+    # ---- queries ----
+    def get(self, key: str) -> Optional[IndexEntry]:
+        self.ensure_built()
+        return self._entries.get(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def all(self) -> List[IndexEntry]:
+        self.ensure_built()
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: e.display.lower())
+
+    def owned_by(self, owner: int | str) -> List[IndexEntry]:
+        self.ensure_built()
+        with self._lock:
+            keys = list(self._by_owner.get(str(owner), ()))
+            out = [self._entries[k] for k in keys if k in self._entries]
+        out.sort(key=lambda e: e.display.lower())
+        return out
+
+    def search(
+        self,
+        query: str = '',
+        *,
+        limit: int = 25,
+        where: Optional[Callable[[IndexEntry], bool]] = None,
+    ) -> List[IndexEntry]:
+        """Prefix matches first (alphabetical), then substring matches; optional filter."""
+        self.ensure_built()
+        if limit <= 0:
+            return []
+        q = normalize_name(query)
+        out: List[IndexEntry] = []
+        seen: Set[str] = set()
+
+        def _take(keys: Iterable[str]) -> bool:
+            for k in keys:
+                if k in seen:
+                    continue
+                e = self._entries.get(k)
+                if e is None or (where is not None and not where(e)):
+                    continue
+                seen.add(k)
+                out.append(e)
+                if len(out) >= limit:
+                    return True
+            return False
+
+        with self._lock:
+            if not q:
+                _take(k for _, k in self._tokens)
+                return out
+            i = bisect.bisect_left(self._tokens, (q, ''))
+            prefix_keys = []
+            while i < len(self._tokens) and self._tokens[i][0].startswith(q):
+                prefix_keys.append(self._tokens[i][1])
+                i += 1
+            if _take(prefix_keys):
+                return out
+            _take(k for tok, k in self._tokens if q in tok)
+        return out
+
+    def names(self, query: str = '', *, limit: int = 25, where: Optional[Callable[[IndexEntry], bool]] = None) -> List[str]:
+        """Convenience: display names for autocomplete choices."""
+        return [e.display for e in self.search(query, limit=limit, where=where)]
+
+
+_index: CharacterIndex | None = None
+
+
+def get_index() -> CharacterIndex:
+    global _index
+    if _index is None:
+        _index = CharacterIndex()
+    return _index
+
+
+__all__ = [
+    "CharacterIndex",
+    "IndexEntry",
+    "get_index",
+    "normalize_name",
+]
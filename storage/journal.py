@@ -0,0 +1,333 @@
+from __future__ import annotations
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+import threading
+import contextlib
+import contextvars
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.metrics import note_storage, current_request
+
+# Append-only mutation journal, one file per record: JOURNAL_FOLDER/<key>.jsonl
+#
+#   {"base": <record or null>, "seq": 0, "ts": ...}          first line: state before entry 1
+#   {"seq": 1, "ts": ..., "cmd": "attack", "patch": [...]}    one line per save
+#   {"seq": 2, "ts": ..., "cmd": "deletechar", "deleted": true}
+#
+# Patches are RFC 6902 style (add/remove/replace with JSON pointers) from the
+# previous state to the new one, which keeps the history small (an HP hit is one
+# short line rather than a copy of the sheet). Replaying the
+# base plus a prefix of the entries gives the record at any retained point,
+# which /undo and /history use. When a journal exceeds JOURNAL_MAX_ENTRIES
+# (default 200) it is compacted: the oldest entries are folded into the base
+# and the newest JOURNAL_KEEP_ENTRIES (default 50) are kept.
+#
+# The journal is opt-in (CHAR_JOURNAL=1) and is not the write path: the
+# character file is still written whole on every save (the owner index, search
+# index, backups, migrations and scripts all read it directly), so each
+# journaled save costs a diff and an append on top of that. Write-behind
+# (CHAR_WRITE_BEHIND) is what coalesces the rewrites.
+
+logger = logging.getLogger('dccbot.journal')
+
+_EMPTY = object()
+_undo_to: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('dccbot_journal_undo_to', default=None)
+
+
+# ---- JSON patch ----
+def _escape(token) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def make_patch(old: Any, new: Any, path: str = '') -> List[Dict[str, Any]]:
+    """Operations turning ``old`` into ``new``. Dicts and equal-length lists are diffed per item."""
+    if old is _EMPTY:
+        return [{'op': 'add', 'path': path, 'value': new}]
+    if type(old) is type(new) and old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for k, v in old.items():
+            if k not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_escape(k)}'})
+            else:
+                ops.extend(make_patch(v, new[k], f'{path}/{_escape(k)}'))
+        for k, v in new.items():
+            if k not in old:
+                ops.append({'op': 'add', 'path': f'{path}/{_escape(k)}', 'value': v})
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(make_patch(a, b, f'{path}/{i}'))
+        return ops
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def apply_patch(doc: Any, patch: List[Dict[str, Any]]) -> Any:
+    """Apply ``patch`` to ``doc`` in place where possible; returns the (possibly new) document.
+
+    Values are copied in, so later patches never mutate the entries they came from.
+    """
+    for op in patch:
+        path = op.get('path', '')
+        value = copy.deepcopy(op.get('value'))
+        if path == '':
+            doc = None if op.get('op') == 'remove' else value
+            continue
+        *parents, last = [_unescape(t) for t in path[1:].split('/')]
+        try:
+            target = doc
+            for token in parents:
+                target = target[int(token)] if isinstance(target, list) else target[token]
+            if isinstance(target, list):
+                idx = len(target) if last == '-' else int(last)
+                if op['op'] == 'remove':
+                    del target[idx]
+                elif op['op'] == 'add':
+                    target.insert(idx, value)
+                else:
+                    target[idx] = value
+            elif op['op'] == 'remove':
+                target.pop(last, None)
+            else:
+                target[last] = value
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+            continue  # the file was edited outside the bot; keep replaying the rest
+    return doc
+
+
+def changed_keys(entry: Dict[str, Any]) -> List[str]:
+    """Top-level record fields an entry touched (for summaries)."""
+    if entry.get('deleted'):
+        return ['(deleted)']
+    keys: List[str] = []
+    for op in entry.get('patch') or []:
+        path = op.get('path', '')
+        key = _unescape(path[1:].split('/', 1)[0]) if path else '(record)'
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+@dataclass
+class JournalLog:
+    base: Optional[Dict[str, Any]]
+    base_seq: int
+    base_ts: float
+    entries: List[Dict[str, Any]]
+
+    def state_at_seq(self, seq: int) -> Optional[Dict[str, Any]]:
+        """Record after entry ``seq`` (None when deleted or not yet created). Needs base_seq <= seq."""
+        doc = copy.deepcopy(self.base)
+        for e in self.entries:
+            if e['seq'] > seq:
+                break
+            doc = None if e.get('deleted') else apply_patch(doc, e.get('patch') or [])
+        return doc
+
+    def seq_at(self, when: float) -> Optional[int]:
+        """Sequence of the last entry made at or before ``when``; None when older than the retained history."""
+        if when < self.base_ts:
+            return None
+        seq = self.base_seq
+        for e in self.entries:
+            if e['ts'] > when:
+                break
+            seq = e['seq']
+        return seq
+
+    def undo_seq(self, steps: int) -> Optional[int]:
+        """Sequence whose state is ``steps`` mutations before the current one.
+
+        Undo entries restore an earlier state, so they are followed back to the
+        state they restored: repeated undos keep walking back instead of
+        undoing the previous undo. None when that goes past the retained history.
+        """
+        by_seq = {e['seq']: e for e in self.entries}
+
+        def resolve(seq: Optional[int]) -> Optional[int]:
+            while seq is not None and seq > self.base_seq:
+                e = by_seq.get(seq)
+                if e is None or e.get('undo_to') is None:
+                    return seq
+                seq = int(e['undo_to'])
+            return seq if seq == self.base_seq else None
+
+        pos = resolve(self.entries[-1]['seq'] if self.entries else self.base_seq)
+        for _ in range(max(1, int(steps))):
+            if pos is None or pos <= self.base_seq:
+                return None
+            pos = resolve(pos - 1)
+        return pos
+
+
+class Journal:
+    """Per-record append-only delta logs (blocking; called from storage pool threads)."""
+
+    def __init__(self, folder: str = 'journal', max_entries: int = 200, keep: int = 50):
+        self.folder = folder
+        self.max_entries = max(2, int(max_entries))
+        self.keep = max(1, min(int(keep), self.max_entries - 1))
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Tuple[int, int]] = {}  # key -> (entries, last seq)
+        self.appends = 0
+        self.compactions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.folder, f'{key}.jsonl')
+
+    @contextlib.contextmanager
+    def undoing(self, seq: int) -> Iterator[None]:
+        """Mark saves made inside the block as undo entries restoring ``seq``."""
+        token = _undo_to.set(int(seq))
+        try:
+            yield
+        finally:
+            _undo_to.reset(token)
+
+    # ---- reading ----
+    def read(self, key: str) -> Optional[JournalLog]:
+        try:
+            with open(self.path_for(key), 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        note_storage(read=sum(len(x) for x in lines))
+        log: Optional[JournalLog] = None
+        for line in lines:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # torn last line after a crash
+            if log is None:
+                if 'base' not in row:
+                    return None
+                log = JournalLog(row.get('base'), int(row.get('seq', 0)), float(row.get('ts', 0)), [])
+            elif isinstance(row.get('seq'), int):
+                log.entries.append(row)
+        return log
+
+    def _count(self, key: str) -> Tuple[int, int]:
+        cached = self._counts.get(key)
+        if cached is None:
+            log = self.read(key)
+            if log is None:
+                cached = (-1, 0)
+            else:
+                cached = (len(log.entries), log.entries[-1]['seq'] if log.entries else log.base_seq)
+            self._counts[key] = cached
+        return cached
+
+    # ---- writing ----
+    def append(self, key: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> bool:
+        """Record one mutation of ``key`` (``new`` None for a delete). False when nothing changed."""
+        if new is not None and old is not None and old == new:
+            return False
+        req = current_request()
+        with self._lock:
+            count, seq = self._count(key)
+            lines: List[str] = []
+            if count < 0:
+                lines.append(json.dumps({'base': old, 'seq': 0, 'ts': time.time()}, separators=(',', ':')))
+                count, seq = 0, 0
+            entry: Dict[str, Any] = {'seq': seq + 1, 'ts': time.time(), 'cmd': req.command if req else None}
+            if new is None:
+                entry['deleted'] = True
+            else:
+                entry['patch'] = make_patch(old if old is not None else _EMPTY, new)
+            undo_to = _undo_to.get()
+            if undo_to is not None:
+                entry['undo_to'] = undo_to
+            lines.append(json.dumps(entry, separators=(',', ':')))
+            text = '\n'.join(lines) + '\n'
+            try:
+                os.makedirs(self.folder, exist_ok=True)
+                with open(self.path_for(key), 'a', encoding='utf-8') as f:
+                    f.write(text)
+            except OSError as e:
+                self._counts.pop(key, None)
+                logger.warning('Journal append for %s failed: %s', key, e)
+                return False
+            note_storage(written=len(text))
+            self.appends += 1
+            self._counts[key] = (count + 1, seq + 1)
+            if count + 1 > self.max_entries:
+                self._compact_locked(key)
+        return True
+
+    def compact(self, key: str, keep: Optional[int] = None) -> bool:
+        with self._lock:
+            return self._compact_locked(key, keep)
+
+    def _compact_locked(self, key: str, keep: Optional[int] = None) -> bool:
+        """Fold all but the newest ``keep`` entries into the base line (atomic rewrite)."""
+        log = self.read(key)
+        keep = self.keep if keep is None else max(0, int(keep))
+        if log is None or len(log.entries) <= keep:
+            return False
+        folded = log.entries[:len(log.entries) - keep]
+        kept = log.entries[len(folded):]
+        last = folded[-1]
+        base = log.state_at_seq(last['seq'])
+        lines = [json.dumps({'base': base, 'seq': last['seq'], 'ts': last['ts']}, separators=(',', ':'))]
+        lines.extend(json.dumps(e, separators=(',', ':')) for e in kept)
+        fd, tmp = tempfile.mkstemp(dir=self.folder, prefix='.tmp_', suffix='.jsonl')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+                note_storage(written=f.tell())
+            os.replace(tmp, self.path_for(key))
+        except OSError as e:
+            logger.warning('Journal compaction for %s failed: %s', key, e)
+            return False
+        finally:
+            if os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        self._counts[key] = (len(kept), kept[-1]['seq'] if kept else last['seq'])
+        self.compactions += 1
+        return True
+
+
+_journal: Optional[Journal] = None
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def get_journal() -> Optional[Journal]:
+    """Process-wide journal (JOURNAL_FOLDER, default 'journal'); None unless CHAR_JOURNAL=1."""
+    global _journal
+    if str(os.getenv('CHAR_JOURNAL', '0')).strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    if _journal is None:
+        _journal = Journal(os.getenv('JOURNAL_FOLDER', 'journal'),
+                           max_entries=_int_env('JOURNAL_MAX_ENTRIES', 200),
+                           keep=_int_env('JOURNAL_KEEP_ENTRIES', 50))
+    return _journal
+
+
+__all__ = [
+    "Journal",
+    "JournalLog",
+    "apply_patch",
+    "changed_keys",
+    "get_journal",
+    "make_patch",
+]
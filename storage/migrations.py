@@ -1,15 +1,216 @@
 from __future__ import annotations
-from typing import Dict, Any
+import os
+import json
+import difflib
+import tempfile
+from typing import Callable, Dict, Any, Optional
+
+from . import files
+
+# Versioned record migrations.
+#
+# Each record carries "schema_version". MIGRATIONS maps a version to the step
+# that upgrades a record from it to the next one; ``migrate_character_dict``
+# runs every step from the record's version up to LATEST_SCHEMA_VERSION.
+#
+# The repository upgrades records lazily when it reads them from disk and
+# caches the upgraded form (keyed by the file's mtime/size like any cache
+# entry), so cogs always see the current shape and a record is migrated at
+# most once per change on disk. The upgraded form reaches disk with the next
+# save, or in bulk with scripts/migrate.py.
+#
+# Steps must be idempotent and safe on records that already have the new shape:
+# records created without a schema_version are treated as version 1.
 
 # Migration handlers map old_version -> function(data_dict) -> new_data_dict
-MIGRATIONS = {}
-LATEST_SCHEMA_VERSION = 1
+MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+LATEST_SCHEMA_VERSION = 3
+
+PACK_HUNTER = 'Attack and damage rolls for 0-level starting weapon'
+
+
+def migration(from_version: int):
+    """Register the step upgrading records from ``from_version`` to the next version."""
+    def deco(fn: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        if from_version in MIGRATIONS:
+            raise ValueError(f"duplicate migration from schema v{from_version}")
+        MIGRATIONS[from_version] = fn
+        return fn
+    return deco
+
+
+@migration(1)
+def _v1_spell_references(data: Dict[str, Any]) -> Dict[str, Any]:
+    """v1 -> v2: replace embedded Spells.json payloads with {name, level, lost, mercurial} references."""
+    from modules.spellbook import shrink_spells  # type: ignore
+    shrink_spells(data)
+    return data
+
+
+@migration(2)
+def _v2_pack_hunter(data: Dict[str, Any]) -> Dict[str, Any]:
+    """v2 -> v3: drop the Pack hunter Luck bonus early creators baked into the global 'attack'.
+
+    The bonus applies only to the 0-level starting weapon (combat adds it there).
+    Like the old scripts/fix_pack_hunter.py, the max Luck mod (from 'max_luck_mod',
+    else the Luck score) is subtracted from a plain numeric 'attack' on records
+    without a class attack_bonus. Unlike the script, which was run by hand once,
+    the step must be safe on records that script already fixed (they are still
+    below v3), so it only subtracts while the bugged value is intact: a 0-level
+    base attack of 0 plus the bonus, i.e. attack == max Luck mod.
+    """
+    augur = data.get('birth_augur')
+    if not isinstance(augur, dict) or str(augur.get('effect') or '').strip() != PACK_HUNTER:
+        return data
+    if 'attack_bonus' in data or not isinstance(data.get('attack'), (int, str)):
+        return data
+    try:
+        attack = int(str(data['attack']).strip())
+        luck_mod = int(data.get('max_luck_mod', 0) or 0)
+    except (TypeError, ValueError):
+        return data
+    if not luck_mod:
+        lck = (data.get('abilities') or {}).get('LCK')
+        try:
+            if isinstance(lck, dict):
+                lck = lck.get('max', lck.get('current', lck.get('score', 0)))
+            from modules.utils import get_modifier  # lazy: modules imports storage
+            luck_mod = int(get_modifier(int(str(lck or 0).strip())))
+        except (TypeError, ValueError):
+            luck_mod = 0
+    if luck_mod and attack == luck_mod:
+        data['attack'] = attack - luck_mod
+    return data
+
+
+def schema_version(data: Dict[str, Any]) -> int:
+    try:
+        return int(data.get("schema_version") or data.get("schemaVersion") or 1)
+    except Exception:
+        return 1
+
+
+def needs_migration(data: Any) -> bool:
+    return isinstance(data, dict) and schema_version(data) < LATEST_SCHEMA_VERSION
+
 
 def migrate_character_dict(data: Dict[str, Any]) -> Dict[str, Any]:
-    version = int(data.get("schema_version") or data.get("schemaVersion") or 1)
-    # Future: while version < LATEST_SCHEMA_VERSION: apply MIGRATIONS[version](data); version += 1
-    if "schema_version" not in data:
-        data["schema_version"] = version
+    version = schema_version(data)
+    while version < LATEST_SCHEMA_VERSION:
+        step = MIGRATIONS.get(version)
+        if step is not None:
+            data = step(data)
+        version += 1
+    data["schema_version"] = max(version, schema_version(data))
     return data
 
-__all__ = ["migrate_character_dict", "LATEST_SCHEMA_VERSION"]
+
+def upgrade(data: Any) -> Any:
+    """Migrate a freshly read record when it is behind; anything else is returned unchanged."""
+    if needs_migration(data):
+        return migrate_character_dict(data)
+    return data
+
+
+def migrate_file(path: str, dry_run: bool = False, diff: bool = False, reencode: bool = False) -> Dict[str, Any]:
+    """Run one record file through the chain, rewriting it atomically when it changed.
+
+    The file is written in the configured storage encoding (storage.files
+    serializer); with ``reencode`` a current record is rewritten too when its
+    bytes differ from that encoding. Blocking and self-contained, so it can run
+    in worker processes. Returns {status: 'migrated'|'reencoded'|'current'|'skipped',
+    from_version, bytes_before, bytes_after, diff (unified diff text when requested)}.
+    """
+    out: Dict[str, Any] = {"path": path, "status": "skipped", "from_version": None,
+                           "bytes_before": 0, "bytes_after": 0, "diff": None}
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = files.decode(raw)
+    except Exception:
+        return out
+    if not isinstance(data, dict):
+        return out
+    out["from_version"] = schema_version(data)
+    out["bytes_before"] = out["bytes_after"] = len(raw)
+    before = json.dumps(data, sort_keys=True)
+    old_text = json.dumps(data, indent=2, sort_keys=True) if diff else None
+    data = migrate_character_dict(data)
+    changed = json.dumps(data, sort_keys=True) != before
+    if not changed and not reencode:
+        out["status"] = "current"
+        return out
+    encoded = files.get_serializer().encode(data)
+    if not changed and encoded == raw:
+        out["status"] = "current"
+        return out
+    out["status"] = "migrated" if changed else "reencoded"
+    out["bytes_after"] = len(encoded)
+    if diff and out["status"] == "migrated":
+        name = os.path.basename(path)
+        out["diff"] = "".join(difflib.unified_diff(
+            old_text.splitlines(True), json.dumps(data, indent=2, sort_keys=True).splitlines(True),
+            fromfile=f"{name} (v{out['from_version']})", tofile=f"{name} (v{schema_version(data)})", n=1,
+        ))
+    if dry_run:
+        return out
+    folder = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(encoded)
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        out["status"] = "skipped"
+    return out
+
+
+def record_paths(folder: Optional[str] = None):
+    """Yield record file paths in ``folder`` lazily (one directory scan, no reads)."""
+    folder = folder or files.BASE_DIR
+    if not os.path.isdir(folder):
+        return
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(".json") and not entry.name.startswith('.'):
+                yield entry.path
+
+
+def migrate_folder(folder: Optional[str] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Run every record in ``folder`` through the migration chain, rewriting changed files atomically.
+
+    Blocking. Returns counts: scanned, migrated, skipped, bytes_before, bytes_after.
+    """
+    out = {"scanned": 0, "migrated": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+    for path in record_paths(folder):
+        out["scanned"] += 1
+        r = migrate_file(path, dry_run=dry_run)
+        if r["status"] == "skipped":
+            out["skipped"] += 1
+        elif r["status"] == "migrated":
+            out["migrated"] += 1
+            out["bytes_before"] += r["bytes_before"]
+            out["bytes_after"] += r["bytes_after"]
+    return out
+
+
+__all__ = [
+    "LATEST_SCHEMA_VERSION",
+    "MIGRATIONS",
+    "migrate_character_dict",
+    "migrate_file",
+    "migrate_folder",
+    "migration",
+    "needs_migration",
+    "record_paths",
+    "schema_version",
+    "upgrade",
+]
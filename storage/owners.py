@@ -0,0 +1,77 @@
+from __future__ import annotations
+from typing import List, Optional, Set, Tuple
+
+from .index import CharacterIndex, get_index
+
+# Ownership checks over the character index.
+#
+# Permission checks (the global prefix-command check, deletes, level-ups, XP
+# awards) only need a record's 'owner', but used to open and parse the whole
+# character file for it. The character index (storage.index) already keeps
+# every record's owner, and owner -> records, current on each save, delete and
+# rename, so these checks are lookups on it that never touch the record.
+
+_MISSING = object()
+
+
+class OwnerIndex:
+    """Record key -> owner lookups without reading records (a view over CharacterIndex)."""
+
+    def __init__(self, index: Optional[CharacterIndex] = None):
+        self.index = index if index is not None else get_index()
+
+    # ---- queries (O(1)) ----
+    def exists(self, key: str) -> bool:
+        return self.index.get(key) is not None
+
+    def owner_of(self, key: str, default=None) -> Optional[str]:
+        """Owner id (as a string) for ``key``; None when unowned, ``default`` when unknown."""
+        entry = self.index.get(key)
+        return default if entry is None else entry.owner
+
+    def is_owned_by(self, key: str, user_id) -> bool:
+        owner = self.owner_of(key)
+        return owner is not None and owner == str(user_id)
+
+    def keys_for(self, user_id) -> List[str]:
+        return sorted(e.key for e in self.index.owned_by(user_id))
+
+    def partition(self, names, user_id, admin: bool = False) -> Tuple[List[str], List[str]]:
+        """Split character names into (allowed, refused) existing record keys, deduplicated.
+
+        Admins are allowed everything; others only the records they own.
+        """
+        from .repository import record_key  # lazy: repository imports the index
+        allowed: List[str] = []
+        refused: List[str] = []
+        seen: Set[str] = set()
+        for name in names:
+            key = record_key(name)
+            if not key or key in seen:
+                continue
+            owner = self.owner_of(key, _MISSING)
+            if owner is _MISSING:
+                continue
+            seen.add(key)
+            (allowed if admin or owner == str(user_id) else refused).append(key)
+        return allowed, refused
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+_owners: Optional[OwnerIndex] = None
+
+
+def get_owner_index() -> OwnerIndex:
+    """Process-wide ownership view over get_index()."""
+    global _owners
+    if _owners is None:
+        _owners = OwnerIndex()
+    return _owners
+
+
+__all__ = [
+    "OwnerIndex",
+    "get_owner_index",
+]
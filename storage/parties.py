@@ -0,0 +1,126 @@
+from __future__ import annotations
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from .files import async_read_json, async_write_json
+from .repository import record_key
+
+# Named parties of characters, per guild.
+#
+# One JSON file per guild under PARTY_FOLDER (default 'parties'):
+#   {"parties": {"<party key>": {"name": "Funnel", "owner": 123, "members": ["alice", ...]}}}
+# Members are stored as record keys so they resolve straight through the
+# character repository. A guild's file is read once and kept in memory; every
+# change rewrites that guild's file off the loop.
+
+logger = logging.getLogger('dccbot.parties')
+
+
+def party_key(name: str) -> str:
+    return str(name or '').strip().lower()
+
+
+class PartyStore:
+    def __init__(self, folder: str = 'parties'):
+        self.folder = folder
+        self._guilds: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def _path(self, guild_id: int) -> str:
+        return os.path.join(self.folder, f"{int(guild_id or 0)}.json")
+
+    def _lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    async def _parties(self, guild_id: int) -> Dict[str, Dict[str, Any]]:
+        guild_id = int(guild_id or 0)
+        parties = self._guilds.get(guild_id)
+        if parties is None:
+            data = await async_read_json(self._path(guild_id), {})
+            raw = data.get('parties') if isinstance(data, dict) else None
+            parties = {k: v for k, v in (raw or {}).items() if isinstance(v, dict)}
+            self._guilds[guild_id] = parties
+        return parties
+
+    async def _write(self, guild_id: int) -> None:
+        parties = self._guilds.get(int(guild_id or 0)) or {}
+        await async_write_json(self._path(guild_id), {'parties': parties}, indent=None)
+
+    # ---- reads ----
+    async def get(self, guild_id: int, name: str) -> Optional[Dict[str, Any]]:
+        party = (await self._parties(guild_id)).get(party_key(name))
+        return dict(party, members=list(party.get('members') or [])) if party else None
+
+    async def names(self, guild_id: int) -> List[str]:
+        return sorted(str(p.get('name') or k) for k, p in (await self._parties(guild_id)).items())
+
+    # ---- writes ----
+    async def create(self, guild_id: int, name: str, owner: Optional[int], members: List[str]) -> bool:
+        """False when a party with that name already exists."""
+        key = party_key(name)
+        if not key:
+            return False
+        async with self._lock(guild_id):
+            parties = await self._parties(guild_id)
+            if key in parties:
+                return False
+            parties[key] = {'name': name.strip(), 'owner': owner, 'members': _unique_keys(members)}
+            await self._write(guild_id)
+        return True
+
+    async def update_members(self, guild_id: int, name: str, add: List[str] = (), remove: List[str] = ()) -> Optional[List[str]]:
+        """Add/remove members; returns the new member list (None if the party does not exist)."""
+        key = party_key(name)
+        async with self._lock(guild_id):
+            parties = await self._parties(guild_id)
+            party = parties.get(key)
+            if party is None:
+                return None
+            drop = {record_key(m) for m in remove}
+            members = [m for m in _unique_keys(list(party.get('members') or []) + list(add)) if m not in drop]
+            party['members'] = members
+            await self._write(guild_id)
+        return list(members)
+
+    async def delete(self, guild_id: int, name: str) -> bool:
+        key = party_key(name)
+        async with self._lock(guild_id):
+            parties = await self._parties(guild_id)
+            if parties.pop(key, None) is None:
+                return False
+            await self._write(guild_id)
+        return True
+
+
+def _unique_keys(names: List[str]) -> List[str]:
+    out: List[str] = []
+    seen = set()
+    for n in names:
+        k = record_key(n)
+        if k and k not in seen:
+            seen.add(k)
+            out.append(k)
+    return out
+
+
+_store: Optional[PartyStore] = None
+
+
+def get_party_store() -> PartyStore:
+    """Process-wide party store (PARTY_FOLDER, default 'parties')."""
+    global _store
+    if _store is None:
+        _store = PartyStore(os.getenv('PARTY_FOLDER', 'parties'))
+    return _store
+
+
+__all__ = [
+    "PartyStore",
+    "get_party_store",
+    "party_key",
+]
@@ -0,0 +1,605 @@
+from __future__ import annotations
+import os
+import pickle
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+import atexit
+import contextlib
+import copy
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from core.metrics import note_storage
+from . import files
+from .migrations import needs_migration, upgrade
+from .index import CharacterIndex, get_index
+from .journal import Journal, JournalLog, get_journal
+
+# Shared character repository.
+#
+# Cogs historically each opened and parsed the character JSON on every call; a
+# single /attack could parse the attacker, target and a luck donor several
+# times. The repository keeps recently used records in a bounded LRU keyed by
+# record key. Each entry remembers the file's (mtime_ns, size) so edits made
+# outside the bot (scripts, manual fixes) are picked up on the next read.
+# Records on an older schema_version are upgraded on that read
+# (storage.migrations) and the upgraded form is what gets cached. Saves write
+# the current schema_version, so a new record is never re-migrated on a later
+# cache miss. With CHAR_JOURNAL=1, every save and delete is also appended as a
+# patch against the cached pre-image to the record's journal (storage.journal),
+# which backs /undo and /history.
+# Callers always receive a private copy, so mutating a loaded record without
+# saving never leaks into the cache.
+#
+# Read-modify-write sequences that must not lose concurrent updates (luck burns,
+# HP damage, rest, XP) use ``transaction()``, which holds a per-record asyncio
+# lock for the duration and commits every touched record on exit (raising
+# CommitError when the write fails).
+#
+# Optional write-behind (CHAR_WRITE_BEHIND=1): saves only update the cache and
+# mark the record dirty; a background flusher writes every dirty record once at
+# the end of a flush window (CHAR_FLUSH_WINDOW_MS, default 500), so bursts of
+# combat mutations on the same sheet coalesce into a single fsync'd write.
+# Dirty entries are never evicted and are flushed at shutdown and on /init end.
+#
+# The async API runs the sync methods on the storage I/O pool (storage.files.run_io),
+# so cache misses, writes and flushes never block the event loop. Commits hold
+# ``_io_lock`` so a rename and the cache entry recording its mtime stay paired.
+
+logger = logging.getLogger('dccbot.storage')
+
+
+def record_key(name: str) -> str:
+    """Normalize a character name to its file key (matches the cogs' historic naming)."""
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+class CommitError(RuntimeError):
+    """A transaction's records could not be written; raised when its block exits."""
+
+
+@dataclass
+class _Entry:
+    blob: bytes
+    mtime_ns: int
+    size: int
+    dirty: bool = False
+    version: int = 0
+
+
+class CharacterRepository:
+    """Read-through / write-through cache for character records (raw dicts)."""
+
+    def __init__(self, folder: Optional[str] = None, max_entries: int = 256, serializer: Optional[files.Serializer] = None,
+                 index: Optional[CharacterIndex] = None, write_behind: bool = False, flush_window: float = 0.5,
+                 journal: Optional[Journal] = None):
+        self.folder = folder or files.BASE_DIR
+        self.index = index
+        self.journal = journal
+        self.max_entries = max(1, int(max_entries))
+        self.serializer = serializer or files.get_serializer()
+        self.write_behind = bool(write_behind)
+        self.flush_window = max(0.0, float(flush_window))
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.coalesced = 0
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # write-behind state
+        self._io_lock = threading.Lock()  # serializes flushes against deletes
+        self._flush_cond = threading.Condition()
+        self._flush_deadline: Optional[float] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    # ---- paths ----
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.folder, f"{record_key(name)}.json")
+
+    def exists(self, name: str) -> bool:
+        """True when the record is on disk or saved but not yet flushed (write-behind)."""
+        with self._lock:
+            entry = self._cache.get(record_key(name))
+            if entry is not None and entry.dirty:
+                return True
+        return os.path.exists(self.path_for(name))
+
+    # ---- cache internals ----
+    def _put(self, key: str, data: Dict[str, Any], st: Optional[os.stat_result], dirty: bool = False) -> None:
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            prev = self._cache.get(key)
+            if dirty and prev is not None and prev.dirty:
+                self.coalesced += 1
+            entry = _Entry(
+                blob,
+                st.st_mtime_ns if st is not None else -1,
+                st.st_size if st is not None else -1,
+                dirty=dirty,
+                version=(prev.version + 1) if prev is not None else 0,
+            )
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_entries:
+                # Evict least recently used clean entries; dirty ones wait for the flusher
+                for old_key in [k for k, e in self._cache.items() if not e.dirty]:
+                    if len(self._cache) <= self.max_entries:
+                        break
+                    del self._cache[old_key]
+                    self.evictions += 1
+
+    def _reindex(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        if self.index is None or not self.index.built:
+            return
+        try:
+            if data is None:
+                self.index.remove(key)
+            else:
+                self.index.update(key, data)
+        except Exception:
+            pass
+
+    def _pre_image(self, key: str) -> Optional[Dict[str, Any]]:
+        """The record as the bot last saw it before a write, for the journal diff.
+
+        Saves nearly always follow a load, so this is the cached copy; the file
+        is read only when the record is not cached at all.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                return pickle.loads(entry.blob)
+        data = files._read_json(self.path_for(key))
+        return upgrade(data) if isinstance(data, dict) else None
+
+    def _journal(self, key: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> None:
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(key, old, new)
+        except Exception as e:
+            logger.warning('Journal entry for %s failed: %s', key, e)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop clean cache entries (all, or one record). Unflushed writes are kept."""
+        with self._lock:
+            if name is None:
+                for k in [k for k, e in self._cache.items() if not e.dirty]:
+                    del self._cache[k]
+            else:
+                key = record_key(name)
+                entry = self._cache.get(key)
+                if entry is not None and not entry.dirty:
+                    del self._cache[key]
+
+    # ---- synchronous API ----
+    def load_sync(self, name: str) -> Optional[Dict[str, Any]]:
+        key = record_key(name)
+        if not key:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.dirty:
+                # Newer than disk until the next flush
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(entry.blob)
+        path = self.path_for(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(key)
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(entry.blob)
+            self.misses += 1
+        try:
+            with open(path, 'rb') as f:
+                data = self.serializer.decode(f.read())
+        except Exception:
+            self.invalidate(key)
+            return None
+        note_storage(read=st.st_size)
+        if not isinstance(data, dict):
+            return None
+        # Older schema versions are upgraded once here; the cache keeps the upgraded form
+        data = upgrade(data)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.dirty:
+                # A deferred save landed while we were reading; it wins over disk
+                self._cache.move_to_end(key)
+                return pickle.loads(entry.blob)
+            self._put(key, data, st)
+        self._reindex(key, data)
+        return data
+
+    def _write_temp(self, data: Dict[str, Any], fsync: bool = False) -> str:
+        raw = self.serializer.encode(data)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.tmp_', suffix='.json')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+                note_storage(written=len(raw))
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception:
+            _remove_quietly(tmp_path)
+            raise
+        return tmp_path
+
+    def save_sync(self, name: str, data: Dict[str, Any]) -> bool:
+        return self.save_many_sync([(name, data)])
+
+    def save_many_sync(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Write several records together.
+
+        Every record is serialized to a temp file first; only when all of them
+        succeeded are they renamed into place, so a serialization failure leaves
+        every target untouched. Each rename is atomic, but the renames happen
+        one record at a time: a crash (or a failed rename) part way through the
+        commit can leave the earlier records written and the later ones not.
+        Returns False when any record was not written.
+        """
+        # Saved records are in the current layout: new records are stamped, stale ones
+        # upgraded. That is done on a copy so the caller's dict is never changed.
+        items = [(name, upgrade(copy.deepcopy(data)) if needs_migration(data) else data) for name, data in items]
+        if self.write_behind:
+            return self._save_deferred(items)
+        staged: List[Tuple[str, Dict[str, Any], str]] = []
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            for name, data in items:
+                key = record_key(name)
+                if not key:
+                    raise ValueError('empty character name')
+                staged.append((key, data, self._write_temp(data)))
+        except Exception as e:
+            for _key, _data, tmp in staged:
+                _remove_quietly(tmp)
+            logger.warning('Save aborted before commit: %s', e)
+            return False
+        ok = True
+        with self._io_lock:
+            for key, data, tmp in staged:
+                path = self.path_for(key)
+                old = self._pre_image(key) if self.journal is not None else None
+                try:
+                    os.replace(tmp, path)
+                    st = os.stat(path)
+                except Exception as e:
+                    _remove_quietly(tmp)
+                    self.invalidate(key)
+                    logger.warning('Commit of %s failed: %s', key, e)
+                    ok = False
+                    continue
+                self._put(key, data, st)
+                self._reindex(key, data)
+                self._journal(key, old, data)
+                self.writes += 1
+        return ok
+
+    def delete_sync(self, name: str) -> bool:
+        key = record_key(name)
+        with self._io_lock:
+            old = self._pre_image(key) if self.journal is not None else None
+            with self._lock:
+                entry = self._cache.pop(key, None)
+            self._reindex(key, None)
+            if old is not None:
+                self._journal(key, old, None)
+            try:
+                os.remove(self.path_for(key))
+                return True
+            except OSError:
+                # A never-flushed record only existed in memory
+                return bool(entry is not None and entry.dirty)
+
+    def rename_sync(self, current: str, new: str, data: Dict[str, Any]) -> bool:
+        """Save ``data`` under ``new`` and drop ``current`` (indexes follow both). Blocking."""
+        if not self.save_many_sync([(new, data)]):
+            return False
+        if record_key(current) != record_key(new):
+            self.delete_sync(current)
+        return True
+
+    # ---- write-behind ----
+    def _save_deferred(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        pending = []
+        for name, data in items:
+            key = record_key(name)
+            if not key:
+                logger.warning('Save aborted: empty character name')
+                return False
+            pending.append((key, data))
+        for key, data in pending:
+            old = self._pre_image(key) if self.journal is not None else None
+            self._put(key, data, None, dirty=True)
+            self._reindex(key, data)
+            self._journal(key, old, data)
+        self._schedule_flush()
+        return True
+
+    def _schedule_flush(self) -> None:
+        with self._flush_cond:
+            if self._flush_deadline is None:
+                # Fixed window from the first dirty write: bounded staleness, writes inside coalesce
+                self._flush_deadline = time.monotonic() + self.flush_window
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flusher_loop, name='char-flusher', daemon=True)
+                self._flusher.start()
+            self._flush_cond.notify()
+
+    def _flusher_loop(self) -> None:
+        while True:
+            with self._flush_cond:
+                while self._flush_deadline is None:
+                    self._flush_cond.wait()
+                delay = self._flush_deadline - time.monotonic()
+                if delay > 0:
+                    self._flush_cond.wait(delay)
+                    continue
+                self._flush_deadline = None
+            try:
+                self.flush_sync()
+            except Exception as e:
+                logger.exception('Write-behind flush failed: %s', e)
+
+    def dirty_count(self) -> int:
+        with self._lock:
+            return sum(1 for e in self._cache.values() if e.dirty)
+
+    def flush_sync(self) -> int:
+        """Write every dirty record (fsync'd, atomic rename). Returns the number written."""
+        with self._io_lock:
+            with self._lock:
+                batch = [(k, e.blob, e.version) for k, e in self._cache.items() if e.dirty]
+            if not batch:
+                return 0
+            os.makedirs(self.folder, exist_ok=True)
+            written = 0
+            for key, blob, version in batch:
+                tmp = None
+                try:
+                    tmp = self._write_temp(pickle.loads(blob), fsync=True)
+                    path = self.path_for(key)
+                    os.replace(tmp, path)
+                    tmp = None
+                    st = os.stat(path)
+                except Exception as e:
+                    if tmp:
+                        _remove_quietly(tmp)
+                    logger.warning('Flush of %s failed (kept dirty): %s', key, e)
+                    continue
+                with self._lock:
+                    entry = self._cache.get(key)
+                    if entry is not None and entry.version == version:
+                        entry.dirty = False
+                        entry.mtime_ns = st.st_mtime_ns
+                        entry.size = st.st_size
+                written += 1
+            _fsync_dir(self.folder)
+            self.flushes += 1
+            self.writes += written
+            return written
+
+    async def flush(self) -> int:
+        return await files.run_io(self.flush_sync)
+
+    # ---- async API (what cogs call; runs on the storage I/O pool) ----
+    async def load(self, name: str) -> Optional[Dict[str, Any]]:
+        return await files.run_io(self.load_sync, name)
+
+    async def save(self, name: str, data: Dict[str, Any]) -> bool:
+        return await files.run_io(self.save_sync, name, data)
+
+    async def delete(self, name: str) -> bool:
+        return await files.run_io(self.delete_sync, name)
+
+    async def rename(self, current: str, new: str, data: Dict[str, Any]) -> bool:
+        return await files.run_io(self.rename_sync, current, new, data)
+
+    async def save_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        return await files.run_io(self.save_many_sync, list(items))
+
+    async def save_batch(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Write many independent records concurrently.
+
+        The records are split into one chunk per I/O worker and each chunk is
+        committed with ``save_many_sync`` on its own pool thread, so a large
+        batch (a funnel's worth of new characters) is not serialized on one
+        worker. Each chunk is atomic on its own; the batch as a whole is not.
+        """
+        items = list(items)
+        if not items:
+            return True
+        parts = max(1, min(files._io_workers(), len(items)))
+        size = -(-len(items) // parts)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        results = await asyncio.gather(*(files.run_io(self.save_many_sync, chunk) for chunk in chunks))
+        return all(results)
+
+    # ---- journal ----
+    def history_sync(self, name: str) -> Optional[JournalLog]:
+        """A record's retained mutation journal (None without one). Blocking."""
+        if self.journal is None:
+            return None
+        return self.journal.read(record_key(name))
+
+    def revert_sync(self, name: str, steps: int = 1, at: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], Optional[JournalLog], Optional[int]]:
+        """Restore a record to ``steps`` mutations ago, or to its state at epoch time ``at``. Blocking.
+
+        Returns (restored record, journal before the revert, sequence restored).
+        The record is None when the journal does not reach that far back or the
+        character did not exist then. The revert is saved like any other change,
+        so it is journaled too (as an undo entry) and indexes follow.
+        """
+        key = record_key(name)
+        log = self.history_sync(key)
+        if log is None:
+            return None, None, None
+        seq = log.seq_at(at) if at is not None else log.undo_seq(steps)
+        if seq is None:
+            return None, log, None
+        state = log.state_at_seq(seq)
+        if state is None:
+            return None, log, seq
+        with self.journal.undoing(seq):
+            if not self.save_many_sync([(key, state)]):
+                return None, log, seq
+        return state, log, seq
+
+    async def history(self, name: str) -> Optional[JournalLog]:
+        return await files.run_io(self.history_sync, name)
+
+    async def revert(self, name: str, steps: int = 1, at: Optional[float] = None):
+        """``revert_sync`` under the record's transaction lock."""
+        async with self._lock_for(record_key(name)):
+            return await files.run_io(self.revert_sync, name, steps, at)
+
+    async def exists_async(self, name: str) -> bool:
+        return await files.run_io(self.exists, name)
+
+    # ---- transactions ----
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, *names: str) -> AsyncIterator[Tuple[Optional[Dict[str, Any]], ...]]:
+        """Locked read-modify-write over one or more records.
+
+        Usage::
+
+            async with repo.transaction("Alice", "Bob") as (alice, bob):
+                alice["hp"]["current"] -= 3
+
+        Locks are taken in sorted key order so two transactions over the same
+        records can never deadlock; the records are then loaded concurrently.
+        Records are yielded in argument order
+        (``None`` for missing ones). On a clean exit every changed record is
+        committed with ``save_many`` (records left unchanged are not rewritten);
+        if the block raises nothing is written. A failed commit raises
+        ``CommitError`` so callers never report writes that did not happen; as
+        with ``save_many_sync``, a commit that fails part way may have written
+        some of the records.
+        """
+        keys = [record_key(n) for n in names]
+        ordered = sorted(set(k for k in keys if k))
+        held: List[asyncio.Lock] = []
+        try:
+            for key in ordered:
+                lock = self._lock_for(key)
+                await lock.acquire()
+                held.append(lock)
+            # Independent reads: fetch every record concurrently on the I/O pool
+            loaded = await asyncio.gather(*(self.load(key) for key in ordered))
+            records = dict(zip(ordered, loaded))
+            before = {k: pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL) for k, v in records.items() if v is not None}
+            yield tuple(records.get(k) for k in keys)
+            dirty = [
+                (k, records[k]) for k in ordered
+                if records[k] is not None and pickle.dumps(records[k], protocol=pickle.HIGHEST_PROTOCOL) != before.get(k)
+            ]
+            if dirty and not await self.save_many(dirty):
+                raise CommitError('could not save ' + ', '.join(k for k, _ in dirty))
+        finally:
+            for lock in reversed(held):
+                lock.release()
+
+    def is_locked(self, name: str) -> bool:
+        lock = self._locks.get(record_key(name))
+        return bool(lock is not None and lock.locked())
+
+    # ---- introspection ----
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._cache)
+            cached_bytes = sum(len(e.blob) for e in self._cache.values())
+        total = self.hits + self.misses
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'cached_bytes': cached_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'write_behind': self.write_behind,
+            'dirty': self.dirty_count(),
+            'flushes': self.flushes,
+            'coalesced': self.coalesced,
+        }
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _fsync_dir(folder: str) -> None:
+    """Persist the directory entry updates from os.replace (no-op where unsupported)."""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+_repository: CharacterRepository | None = None
+
+
+def get_repository() -> CharacterRepository:
+    """Process-wide repository.
+
+    Env: CHAR_CACHE_SIZE (entries, default 256), CHAR_WRITE_BEHIND (1 to enable),
+    CHAR_FLUSH_WINDOW_MS (default 500), CHAR_JOURNAL (1 to enable the mutation journal).
+    """
+    global _repository
+    if _repository is None:
+        try:
+            size = int(os.getenv('CHAR_CACHE_SIZE', '256'))
+        except ValueError:
+            size = 256
+        write_behind = str(os.getenv('CHAR_WRITE_BEHIND', '0')).strip().lower() in ('1', 'true', 'yes', 'on')
+        try:
+            window = int(os.getenv('CHAR_FLUSH_WINDOW_MS', '500')) / 1000.0
+        except ValueError:
+            window = 0.5
+        _repository = CharacterRepository(max_entries=size, index=get_index(), write_behind=write_behind, flush_window=window,
+                                          journal=get_journal())
+        if write_behind:
+            atexit.register(_repository.flush_sync)
+    return _repository
+
+
+__all__ = [
+    "CharacterRepository",
+    "CommitError",
+    "get_repository",
+    "record_key",
+]
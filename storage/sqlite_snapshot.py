@@ -0,0 +1,186 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional, List, Dict, Any
+from . import files
+from .migrations import upgrade
+from .repository import record_key
+
+# Offline SQLite snapshot of the character folder.
+#
+# The bot stores characters only as JSON files through storage.repository and
+# never reads or writes this database. scripts/sqlite_import.py copies the save
+# folder into it (SQLITE_PATH, default characters.db) so scripts and ad-hoc
+# queries can filter many records by owner, name, class or level without
+# parsing every file. It is read-only apart from the importer; re-run the
+# import to refresh it.
+
+_SQLITE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS characters (
+        key        TEXT PRIMARY KEY,
+        name       TEXT NOT NULL,
+        name_lower TEXT NOT NULL,
+        owner      TEXT,
+        class      TEXT,
+        level      INTEGER,
+        data       TEXT NOT NULL,
+        updated_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_characters_owner ON characters(owner)",
+    "CREATE INDEX IF NOT EXISTS idx_characters_name ON characters(name_lower)",
+    "CREATE INDEX IF NOT EXISTS idx_characters_class ON characters(class)",
+    "CREATE INDEX IF NOT EXISTS idx_characters_level ON characters(level)",
+)
+
+
+def _index_columns(data: Dict[str, Any]) -> tuple[str, str, Optional[str], str, int]:
+    """Extract (name, name_lower, owner, class, level) from a raw record."""
+    name = str(data.get("name") or "Unnamed")
+    owner = data.get("owner")
+    try:
+        level = int(data.get("level", 0) or 0)
+    except Exception:
+        level = 0
+    return (
+        name,
+        name.strip().lower(),
+        str(owner) if owner is not None else None,
+        str(data.get("class") or ""),
+        level,
+    )
+
+
+class SqliteSnapshot:
+    """Queryable SQLite copy of the save folder (blocking; for scripts and tools).
+
+    Each record is kept whole in a JSON ``data`` column; owner, name, class and
+    level are duplicated into indexed columns so listing and ownership queries
+    never have to parse the payload.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SQLITE_PATH") or "characters.db"
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    # ---- connection ----
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for stmt in _SQLITE_SCHEMA:
+                conn.execute(stmt)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _fetch(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                finally:
+                    self._conn = None
+
+    # ---- queries ----
+    def load_record(self, name: str) -> Optional[Dict[str, Any]]:
+        """The record as of the last import, upgraded to the current schema."""
+        rows = self._fetch(
+            "SELECT data FROM characters WHERE key = ? OR name_lower = ? LIMIT 1",
+            (record_key(name), name.strip().lower()),
+        )
+        try:
+            return upgrade(json.loads(rows[0][0])) if rows else None
+        except json.JSONDecodeError:
+            return None
+
+    def keys(self) -> List[str]:
+        return [r[0] for r in self._fetch("SELECT key FROM characters ORDER BY key")]
+
+    def list_by_owner(self, owner: int | str) -> List[str]:
+        rows = self._fetch(
+            "SELECT name FROM characters WHERE owner = ? ORDER BY name_lower", (str(owner),)
+        )
+        return [r[0] for r in rows]
+
+    def list_by_class(self, char_class: str, min_level: int = 0) -> List[str]:
+        rows = self._fetch(
+            "SELECT name FROM characters WHERE lower(class) = ? AND level >= ? ORDER BY name_lower",
+            (char_class.strip().lower(), int(min_level)),
+        )
+        return [r[0] for r in rows]
+
+    # ---- importer ----
+    def _upsert_many(self, records: List[tuple[str, Dict[str, Any]]]) -> int:
+        """Upsert ``(key, record)`` pairs; keys are storage.repository.record_key values."""
+        now = time.time()
+        rows = []
+        for key, data in records:
+            name, name_lower, owner, cls, level = _index_columns(data)
+            rows.append((key, name, name_lower, owner, cls, level,
+                         json.dumps(data, ensure_ascii=False), now))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO characters(key, name, name_lower, owner, class, level, data, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET name=excluded.name, name_lower=excluded.name_lower, "
+                    "owner=excluded.owner, class=excluded.class, level=excluded.level, "
+                    "data=excluded.data, updated_at=excluded.updated_at",
+                    rows,
+                )
+        return len(rows)
+
+    def import_json_folder(self, folder: Optional[str] = None, batch_size: int = 200) -> Dict[str, int]:
+        """Copy every ``*.json`` record from ``folder`` (default: the save folder).
+
+        Rows with the same key are overwritten and rows whose file is gone are
+        dropped, so the snapshot matches the folder afterwards; the key is the
+        file name, as in the repository. Returns ``{"imported": n, "skipped": m, "removed": k}``.
+        """
+        folder = folder or files.BASE_DIR
+        imported = 0
+        skipped = 0
+        seen: set[str] = set()
+        batch: List[tuple[str, Dict[str, Any]]] = []
+        if not os.path.isdir(folder):
+            return {"imported": 0, "skipped": 0, "removed": 0}
+        for entry in os.scandir(folder):
+            if not entry.is_file() or not entry.name.lower().endswith(".json") or entry.name.startswith("."):
+                continue
+            data = files._read_json(entry.path)
+            if not isinstance(data, dict) or not data.get("name"):
+                skipped += 1
+                continue
+            key = entry.name[:-5].lower()
+            seen.add(key)
+            batch.append((key, data))
+            if len(batch) >= batch_size:
+                imported += self._upsert_many(batch)
+                batch = []
+        if batch:
+            imported += self._upsert_many(batch)
+        stale = [(k,) for k in self.keys() if k not in seen]
+        if stale:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("DELETE FROM characters WHERE key = ?", stale)
+        return {"imported": imported, "skipped": skipped, "removed": len(stale)}
+
+
+__all__ = [
+    "SqliteSnapshot",
+]
@@ -1,11 +1,169 @@
 import random, re
-from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Tuple, Optional
+
+__all__ = [
+    "roll_dice", "parse_dice_notation", "explode_dice",
+    "DCC_CHAIN", "DiceExpr", "DiceRoll", "compile_dice", "apply_keep", "dice_cache_info",
+    "roll_many",
+]
+
+# Single dice engine shared by roll_dice, /roll (DiceCog) and /create (CharacterCog).
+#
+# Grammar (one term):  [N]d<S>[steps][!|!E][kN|khN|klN|kh|kl|dlN|dl][+M|-M]
+#   steps  +d / +d2 / -d / -d2 move S along the DCC dice chain (only if S is on it)
+#   !E     explode: reroll and add while a die shows E (default: its max face)
+#   k/dl   keep highest/lowest N, drop lowest N (applied to per-die totals)
+# Expressions are parsed once into an immutable DiceExpr and kept in a bounded
+# LRU, so hot strings like '1d20' or '1d4+2' are never re-parsed per attack.
+
+DCC_CHAIN = [3, 4, 5, 6, 7, 8, 10, 12, 14, 16, 20, 24, 30]
+
+_TERM = re.compile(
+    r"^\s*([0-9]*)d(\d+)((?:[+-]d\d*)*)(!(\d*))?(?:(k|dl)([hl]?\d+|[hl]))?(?:([+-])\s*(\d+))?\s*$",
+    re.IGNORECASE,
+)
+_STEP = re.compile(r"([+-])d(\d*)")
+_PLAIN = re.compile(r"^(\d*)d(\d+)$", re.I)
+_MAX_EXPLOSIONS = 100  # per die; guards 'd1!' style infinite chains
+
+
+def apply_keep(rolls: List[int], mode: Optional[str], mode_arg: Optional[str]) -> Tuple[List[int], List[int]]:
+    """Split rolls into (kept, dropped), both in original order.
+
+    mode 'k': keep highest (arg 'hN'/'N'/'h') or lowest ('lN'/'l'), default 1.
+    mode 'dl': drop lowest N (default 1), always keeping at least one die.
+    """
+    if not mode:
+        return rolls, []
+    indices = [i for i, _ in sorted(enumerate(rolls), key=lambda x: x[1])]  # ascending, stable
+    if mode == 'k':
+        if mode_arg and mode_arg.startswith('l'):
+            tail = mode_arg[1:]
+            n = int(tail) if tail.isdigit() else 1
+            kept_idx = set(indices[:n])
+        elif mode_arg and mode_arg.startswith('h'):
+            tail = mode_arg[1:]
+            n = int(tail) if tail.isdigit() else 1
+            kept_idx = set(indices[-n:])
+        elif mode_arg and mode_arg.isdigit():
+            kept_idx = set(indices[-int(mode_arg):])
+        else:
+            kept_idx = set(indices[-1:])
+        kept = [r for i, r in enumerate(rolls) if i in kept_idx]
+        dropped = [r for i, r in enumerate(rolls) if i not in kept_idx]
+        return kept, dropped
+    if mode == 'dl':
+        n = int(mode_arg) if (mode_arg and mode_arg.isdigit()) else 1
+        if n >= len(rolls):  # avoid dropping all; keep at least one
+            n = len(rolls) - 1
+        drop_idx = set(indices[:n])
+        kept = [r for i, r in enumerate(rolls) if i not in drop_idx]
+        dropped = [r for i, r in enumerate(rolls) if i in drop_idx]
+        return kept, dropped
+    return rolls, []
+
+
+@dataclass(frozen=True)
+class DiceRoll:
+    total: int
+    rolls: List[int]    # per-die results in roll order (exploded dice summed per die)
+    kept: List[int]
+    dropped: List[int]
+
+
+@dataclass(frozen=True)
+class DiceExpr:
+    """Compiled dice term. ``sides`` is after dice-chain steps; ``base_sides`` as written."""
+    text: str
+    count: int
+    sides: int
+    base_sides: int
+    mode: Optional[str] = None       # 'k' | 'dl'
+    mode_arg: Optional[str] = None   # e.g. 'h', 'h3', 'l2', '1'
+    explode: Optional[int] = None    # face that triggers another roll
+    modifier: int = 0
+
+    def roll(self, force: Optional[int] = None, rnd: Optional[Callable[[], float]] = None) -> DiceRoll:
+        """Roll once; ``rnd`` substitutes a seeded ``random.Random().random`` for the module RNG."""
+        n = self.count
+        s = self.sides
+        if force is not None:
+            # Force per-die result (clamped to [1..s]); no explosions under forced mode
+            f = max(1, min(int(force), s))
+            rolls = [f] * n
+        else:
+            rnd = rnd or random.random
+            # Batched: one float per die instead of a randint() call per die
+            rolls = [int(rnd() * s) + 1 for _ in range(n)]
+            if self.explode is not None and self.explode <= s:
+                e = self.explode
+                for i, r in enumerate(rolls):
+                    total = r
+                    guard = 0
+                    while r >= e and guard < _MAX_EXPLOSIONS:
+                        r = int(rnd() * s) + 1
+                        total += r
+                        guard += 1
+                    rolls[i] = total
+        kept, dropped = apply_keep(rolls, self.mode, self.mode_arg)
+        return DiceRoll(sum(kept) + self.modifier, rolls, kept, dropped)
+
+    def legacy_tuple(self) -> Tuple[int, int, Optional[str], Optional[str], Optional[str], Optional[int], int]:
+        """(count, sides, mode, mode_arg, sign, mod, original_sides) as DiceCog.parse_expression returned."""
+        sign = ('+' if self.modifier > 0 else '-') if self.modifier else None
+        return (self.count, self.sides, self.mode, self.mode_arg, sign, abs(self.modifier) or None, self.base_sides)
+
+
+@lru_cache(maxsize=512)
+def compile_dice(text: str) -> Optional[DiceExpr]:
+    """Parse one dice term into a cached DiceExpr (None when the text is not valid notation)."""
+    m = _TERM.match(str(text))
+    if not m:
+        return None
+    count_raw, sides_raw, steps, explode_raw, explode_val, mode_raw, mode_arg_raw, sign, mod_raw = m.groups()
+    count = int(count_raw) if count_raw else 1
+    sides = int(sides_raw)
+    if sides < 1:
+        return None
+    base_sides = sides
+    if steps and sides in DCC_CHAIN:
+        net = 0
+        for sign_tok, num_tok in _STEP.findall(steps):
+            mag = int(num_tok) if num_tok else 1
+            net += mag if sign_tok == '+' else -mag
+        if net:
+            idx = DCC_CHAIN.index(sides)
+            sides = DCC_CHAIN[max(0, min(len(DCC_CHAIN) - 1, idx + net))]
+    mode = mode_raw.lower() if mode_raw else None
+    mode_arg = None
+    if mode:
+        # defaults: k -> highest 1, dl -> lowest 1
+        mode_arg = mode_arg_raw.lower() if mode_arg_raw else ('h' if mode == 'k' else '1')
+        if mode == 'k' and not (mode_arg in ('h', 'l') or (mode_arg[0] in ('h', 'l') and mode_arg[1:].isdigit()) or mode_arg.isdigit()):
+            return None
+        if mode == 'dl' and not mode_arg.isdigit():
+            return None
+    explode = None
+    if explode_raw:
+        explode = int(explode_val) if explode_val else sides
+        if explode <= 1:
+            return None
+    mod = int(mod_raw) if mod_raw else 0
+    if sign == '-':
+        mod = -mod
+    return DiceExpr(str(text).strip(), count, sides, base_sides, mode, mode_arg, explode, mod)
+
+
+def dice_cache_info():
+    """Hit/miss counters of the compiled-expression LRU."""
+    return compile_dice.cache_info()
 
-__all__ = ["roll_dice", "parse_dice_notation", "explode_dice"]
 
 def parse_dice_notation(expr: str) -> Tuple[int, int]:
     expr = str(expr).strip()
-    m = re.match(r"^(\d*)d(\d+)$", expr, re.I)
+    m = _PLAIN.match(expr)
     if not m:
         raise ValueError(f"Unsupported dice expression: {expr}")
     n = int(m.group(1)) if m.group(1) else 1
@@ -13,35 +171,53 @@ def parse_dice_notation(expr: str) -> Tuple[int, int]:
     return n, s
 
 def roll_dice(expr: str, force: Optional[int] = None) -> Tuple[int, List[int]]:
+    """Roll a dice term; returns (total, per-die rolls).
+
+    Plain integers roll as themselves. With ``force`` every die shows that face;
+    a forced non-dice expression returns the forced value. Unparseable input
+    falls back to 1d20 (historical behaviour).
+    """
     expr = str(expr).strip()
-    m = re.match(r"^(\d*)d(\d+)$", expr, re.I)
-    rolls: List[int] = []
-    total = 0
-    if m:
-        n = int(m.group(1)) if m.group(1) else 1
-        s = int(m.group(2))
-        if force is not None:
-            # Force per-die result (clamped to [1..s])
-            r = max(1, min(int(force), s))
-            rolls = [r for _ in range(n)]
-            total = sum(rolls)
-        else:
-            for _ in range(n):
-                r = random.randint(1, s)
-                rolls.append(r)
-                total += r
-    else:
-        if force is not None:
-            total = int(force)
-            rolls = [total]
-        else:
-            try:
-                total = int(expr)
-                rolls = [total]
-            except Exception:
-                total = random.randint(1, 20)
-                rolls = [total]
-    return total, rolls
+    compiled = compile_dice(expr)
+    if compiled is not None and (force is None or _PLAIN.match(expr)):
+        res = compiled.roll(force)
+        return res.total, res.rolls
+    if force is not None:
+        total = int(force)
+        return total, [total]
+    try:
+        total = int(expr)
+    except Exception:
+        total = random.randint(1, 20)
+    return total, [total]
+
+def roll_many(expr: str, n: int, rnd: Optional[Callable[[], float]] = None) -> List[Tuple[int, int]]:
+    """Roll the same term ``n`` times; returns (total, first die) per roll.
+
+    Same semantics as roll_dice, but the term is resolved once and a plain
+    single die (1d20, 1d6+1) takes one float per roll, so a mob of thirty
+    attacks or a /init add of forty HD rolls is one tight loop.
+    """
+    n = max(0, int(n))
+    expr = str(expr).strip()
+    rnd = rnd or random.random
+    c = compile_dice(expr)
+    if c is None:
+        try:
+            v = int(expr)
+            return [(v, v)] * n
+        except Exception:
+            rolls = [int(rnd() * 20) + 1 for _ in range(n)]  # roll_dice falls back to a d20
+            return [(r, r) for r in rolls]
+    if c.count == 1 and not c.mode and c.explode is None:
+        s, mod = c.sides, c.modifier
+        rolls = [int(rnd() * s) + 1 for _ in range(n)]
+        return [(r + mod, r) for r in rolls]
+    out: List[Tuple[int, int]] = []
+    for _ in range(n):
+        res = c.roll(rnd=rnd)
+        out.append((res.total, res.rolls[0] if res.rolls else 0))
+    return out
 
 def explode_dice(expr: str, explode_on: int, force: Optional[int] = None) -> Tuple[int, List[int]]:
     n, s = parse_dice_notation(expr)
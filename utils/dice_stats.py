@@ -0,0 +1,299 @@
+from __future__ import annotations
+import re
+from collections import defaultdict
+from functools import lru_cache
+from math import comb, sqrt
+from typing import Dict, List, Optional, Tuple
+
+from .dice import DiceExpr, compile_dice
+
+__all__ = [
+    "Distribution", "distribution", "term_distribution", "normalize_expression", "stats_cache_info",
+]
+
+# Exact outcome distributions for DiceCog notation (NdX, dice-chain steps,
+# keep/drop, +/-modifier), computed by convolution instead of sampling.
+#
+# Counts are exact integers over a denominator of sides**count, so P(total >= N)
+# for '1d20+5' or '4d6dl1' is the true probability, not a Monte Carlo estimate.
+# Results are memoized per normalized expression: '4d6dl1', '4d6k3' and
+# '4D6kh3' share one cache entry.
+
+_SPLIT = re.compile(r"[\s,;]+")
+_TRAILING_MOD = re.compile(r"([+-]\d+)$")  # folded modifier on a normalized form
+
+# Work budgets (rough inner-loop iterations) so a silly expression cannot pin a worker
+_MAX_DICE = 100
+_MAX_WORK = 4_000_000
+
+
+class Distribution:
+    """Exact distribution of an integer total: ``counts[i]`` ways to roll ``low + i`` out of ``total``."""
+
+    __slots__ = ('low', 'counts', 'total')
+
+    def __init__(self, low: int, counts: List[int], total: int):
+        # trim zero-probability edges so min/max are real outcomes
+        start = 0
+        while start < len(counts) - 1 and counts[start] == 0:
+            start += 1
+        end = len(counts)
+        while end > start + 1 and counts[end - 1] == 0:
+            end -= 1
+        self.low = low + start
+        self.counts = tuple(counts[start:end])
+        self.total = total
+
+    @classmethod
+    def constant(cls, value: int) -> 'Distribution':
+        return cls(int(value), [1], 1)
+
+    @property
+    def min(self) -> int:
+        return self.low
+
+    @property
+    def max(self) -> int:
+        return self.low + len(self.counts) - 1
+
+    def items(self) -> List[Tuple[int, float]]:
+        """(value, probability) pairs in ascending value order."""
+        t = self.total
+        return [(self.low + i, c / t) for i, c in enumerate(self.counts) if c]
+
+    def probability(self, value: int) -> float:
+        i = int(value) - self.low
+        if 0 <= i < len(self.counts):
+            return self.counts[i] / self.total
+        return 0.0
+
+    def p_at_least(self, value: int) -> float:
+        """P(total >= value)."""
+        i = int(value) - self.low
+        if i <= 0:
+            return 1.0
+        if i >= len(self.counts):
+            return 0.0
+        return sum(self.counts[i:]) / self.total
+
+    def p_at_most(self, value: int) -> float:
+        """P(total <= value)."""
+        return 1.0 - self.p_at_least(int(value) + 1)
+
+    @property
+    def mean(self) -> float:
+        return self.low + sum(i * c for i, c in enumerate(self.counts)) / self.total
+
+    @property
+    def stdev(self) -> float:
+        t = self.total
+        s1 = sum(i * c for i, c in enumerate(self.counts))
+        s2 = sum(i * i * c for i, c in enumerate(self.counts))
+        return sqrt(max(0.0, (s2 * t - s1 * s1) / (t * t)))
+
+    def percentile(self, p: float) -> int:
+        """Smallest value v with P(total <= v) >= p/100."""
+        want = max(0.0, min(100.0, float(p))) * self.total / 100.0
+        cum = 0
+        for i, c in enumerate(self.counts):
+            cum += c
+            if cum >= want and c:
+                return self.low + i
+        return self.max
+
+    def __add__(self, other: 'Distribution') -> 'Distribution':
+        return _convolve(self, other)
+
+
+def _convolve(a: Distribution, b: Distribution) -> Distribution:
+    if len(a.counts) == 1:
+        return Distribution(a.low + b.low, [a.counts[0] * c for c in b.counts], a.total * b.total)
+    if len(b.counts) == 1:
+        return Distribution(a.low + b.low, [b.counts[0] * c for c in a.counts], a.total * b.total)
+    out = [0] * (len(a.counts) + len(b.counts) - 1)
+    for i, x in enumerate(a.counts):
+        if not x:
+            continue
+        for j, y in enumerate(b.counts):
+            out[i + j] += x * y
+    return Distribution(a.low + b.low, out, a.total * b.total)
+
+
+def _sum_counts(n: int, s: int) -> List[int]:
+    """Ways to roll each total of n dice with s sides (index 0 = total n)."""
+    poly = [1]
+    for _ in range(n):
+        # multiply by (1 + x + ... + x^(s-1)) with a sliding window
+        out = [0] * (len(poly) + s - 1)
+        window = 0
+        for i in range(len(out)):
+            if i < len(poly):
+                window += poly[i]
+            if i - s >= 0:
+                window -= poly[i - s]
+            out[i] = window
+        poly = out
+    return poly
+
+
+def _keep_counts(n: int, s: int, keep: int, highest: bool) -> Dict[int, int]:
+    """Ways to reach each kept sum when keeping ``keep`` of n dice (1 <= keep < n).
+
+    Walks faces from best to worst, choosing how many dice show each face; the
+    first ``keep`` dice placed are the kept ones. Once ``keep`` dice are placed
+    the rest may show any worse face, so those states are closed out directly.
+    """
+    faces = range(s, 0, -1) if highest else range(1, s + 1)
+    states: Dict[Tuple[int, int], int] = {(0, 0): 1}
+    done: Dict[int, int] = defaultdict(int)
+    for step, v in enumerate(faces):
+        worse = s - step - 1  # faces left after this one
+        nxt: Dict[Tuple[int, int], int] = defaultdict(int)
+        for (placed, kept_sum), ways in states.items():
+            room = n - placed
+            need = keep - placed
+            for j in range(room + 1):
+                w = ways * comb(room, j)
+                if j >= need:
+                    rest = room - j
+                    if rest and not worse:
+                        continue
+                    done[kept_sum + need * v] += w * (worse ** rest)
+                else:
+                    nxt[(placed + j, kept_sum + j * v)] += w
+        states = nxt
+        if not states:
+            break
+    return done
+
+
+def _keep_spec(expr: DiceExpr) -> Tuple[int, bool]:
+    """(dice kept, keep highest?) exactly as utils.dice.apply_keep selects them."""
+    n = expr.count
+    mode, arg = expr.mode, expr.mode_arg
+    if not mode:
+        return n, True
+    if mode == 'k':
+        if arg and arg.startswith('l'):
+            tail = arg[1:]
+            return min(n, int(tail) if tail.isdigit() else 1), False
+        if arg and arg.startswith('h'):
+            tail = arg[1:]
+            k = int(tail) if tail.isdigit() else 1
+        elif arg and arg.isdigit():
+            k = int(arg)
+        else:
+            k = 1
+        # apply_keep slices indices[-k:], so k=0 keeps every die
+        return (n if k == 0 else min(n, k)), True
+    if mode == 'dl':
+        d = int(arg) if (arg and arg.isdigit()) else 1
+        if d >= n:
+            d = n - 1
+        return n - max(0, d), True
+    return n, True
+
+
+def _term_key(expr: DiceExpr) -> Tuple[int, int, int, bool]:
+    keep, highest = _keep_spec(expr)
+    if keep >= expr.count:
+        keep, highest = expr.count, True
+    return expr.count, expr.sides, keep, highest
+
+
+def _term_label(key: Tuple[int, int, int, bool]) -> str:
+    n, s, keep, highest = key
+    if keep >= n:
+        return f"{n}d{s}"
+    return f"{n}d{s}k{'h' if highest else 'l'}{keep}"
+
+
+@lru_cache(maxsize=256)
+def _dice_distribution(n: int, s: int, keep: int, highest: bool) -> Distribution:
+    total = s ** n
+    if n <= 0 or keep <= 0:
+        return Distribution(0, [total], total)
+    if keep >= n:
+        if n * n * s > _MAX_WORK:
+            raise ValueError(f"{n}d{s} is too large to compute exactly")
+        return Distribution(n, _sum_counts(n, s), total)
+    if s * keep * keep * s * n > _MAX_WORK:
+        raise ValueError(f"{_term_label((n, s, keep, highest))} is too large to compute exactly")
+    counts = _keep_counts(n, s, keep, highest)
+    low = min(counts)
+    arr = [0] * (max(counts) - low + 1)
+    for v, c in counts.items():
+        arr[v - low] = c
+    return Distribution(low, arr, total)
+
+
+def term_distribution(expr: DiceExpr) -> Distribution:
+    """Exact distribution of one compiled term (raises ValueError for exploding or oversized dice)."""
+    if expr.explode is not None:
+        raise ValueError(f"`{expr.text}`: exploding dice have no finite distribution")
+    if expr.count > _MAX_DICE:
+        raise ValueError(f"`{expr.text}`: at most {_MAX_DICE} dice per term")
+    dist = _dice_distribution(*_term_key(expr))
+    if expr.modifier:
+        dist = Distribution(dist.low + expr.modifier, list(dist.counts), dist.total)
+    return dist
+
+
+def normalize_expression(text: str) -> Optional[str]:
+    """Canonical form of a (possibly multi-term) expression, or None if any term is invalid.
+
+    Terms are reduced to NdS[kh|klK] after dice-chain steps and keep/drop
+    defaults, sorted, and their modifiers folded into one: '1d20+2 d4+d-1'
+    normalizes to '1d20+1d5+1'.
+    """
+    parts = [p for p in _SPLIT.split(str(text or '').strip()) if p]
+    if not parts:
+        return None
+    labels: List[str] = []
+    mod = 0
+    for part in parts:
+        expr = compile_dice(part)
+        if expr is None:
+            return None
+        if expr.explode is not None:
+            labels.append(f"{expr.count}d{expr.sides}!{expr.explode}")
+        else:
+            labels.append(_term_label(_term_key(expr)))
+        mod += expr.modifier
+    out = '+'.join(sorted(labels))
+    if mod:
+        out += f"{mod:+d}"
+    return out
+
+
+@lru_cache(maxsize=256)
+def _distribution(normalized: str) -> Distribution:
+    m = _TRAILING_MOD.search(normalized)
+    mod = int(m.group(1)) if m else 0
+    body = normalized[:m.start()] if m else normalized
+    dist = Distribution.constant(mod)
+    for label in body.split('+'):
+        expr = compile_dice(label)
+        if expr is None:
+            raise ValueError(f"Unsupported dice expression: {label}")
+        nxt = term_distribution(expr)
+        if len(dist.counts) * len(nxt.counts) > _MAX_WORK:
+            raise ValueError("expression is too large to compute exactly")
+        dist = dist + nxt
+    return dist
+
+
+def distribution(text: str) -> Distribution:
+    """Exact distribution of the summed total of a /roll expression (memoized per normalized form).
+
+    Raises ValueError when the expression is invalid or cannot be computed exactly.
+    """
+    normalized = normalize_expression(text)
+    if normalized is None:
+        raise ValueError(f"Unsupported dice expression: {text}")
+    return _distribution(normalized)
+
+
+def stats_cache_info():
+    """Hit/miss counters of the per-expression distribution cache."""
+    return _distribution.cache_info()